@@ -1,15 +1,20 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlmodel import Session
-from app.schemas import AnalysisRequest, AnalysisResult, RecommendationRequest
+from datetime import datetime
+from sqlmodel import select
+from app.schemas import (
+    AnalysisRequest, AnalysisResult, RecommendationRequest, BatchRecommendationRequest,
+    ToolKnowledgeItem, RecommendationFeedbackRequest
+)
 from app.services.tool_factory import ToolFactory
-from app.services.recommender import ToolRecommender
+from app.services.recommender import ToolRecommender, PHASE_MAP, normalize_phases
 from app.core.database import get_session
-from app.domain.models import Analysis
+from app.domain.models import Analysis, ToolKnowledge, RecommendationFeedback
 
 # Creamos un "Router" que luego conectaremos al main
 router = APIRouter()
 
-# Instancia del recomendador
+# Instancia del recomendador (el índice se carga perezosamente en la primera consulta)
 recommender = ToolRecommender()
 
 @router.post("/analyze", response_model=AnalysisResult)
@@ -42,4 +47,81 @@ def get_recommendations(request: RecommendationRequest):
         results = recommender.recommend(request.phase, request.description)
         return {"status": "success", "recommendations": results}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/recommend/batch")
+def get_batch_recommendations(request: BatchRecommendationRequest):
+    """
+    Puntúa muchas descripciones a la vez (una recomendación por descripción).
+    """
+    try:
+        results = recommender.recommend_batch(request.phase, request.descriptions, top_k=request.top_k)
+        return {"status": "success", "recommendations": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# -----------------------------------------------------------------------------
+# Base de conocimiento del recomendador (editable)
+# -----------------------------------------------------------------------------
+@router.get("/recommend/knowledge")
+def list_knowledge(db: Session = Depends(get_session)):
+    """
+    Lista las herramientas que conoce el recomendador.
+    """
+    rows = db.exec(select(ToolKnowledge).order_by(ToolKnowledge.tool_id)).all()
+    return {"status": "success", "tools": rows}
+
+@router.put("/recommend/knowledge/{tool_id}")
+def upsert_knowledge(tool_id: str, item: ToolKnowledgeItem, db: Session = Depends(get_session)):
+    """
+    Crea o edita una herramienta. El índice se actualiza solo para esa herramienta.
+    """
+    try:
+        phases = normalize_phases(item.phases)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    row = db.get(ToolKnowledge, tool_id) or ToolKnowledge(tool_id=tool_id, name=item.name, description=item.description)
+    row.name = item.name
+    row.phases = phases
+    row.description = item.description
+    row.updated_at = datetime.utcnow()
+    db.add(row)
+    db.commit()
+
+    recommender.upsert_tool({"id": tool_id, "name": item.name, "phases": phases, "desc": item.description})
+    return {"status": "success", "tool": {"id": tool_id, "name": item.name, "phases": phases}}
+
+@router.delete("/recommend/knowledge/{tool_id}")
+def delete_knowledge(tool_id: str, db: Session = Depends(get_session)):
+    """
+    Elimina una herramienta de la base de conocimiento y del índice.
+    """
+    row = db.get(ToolKnowledge, tool_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Herramienta '{tool_id}' no encontrada.")
+    db.delete(row)
+    db.commit()
+
+    recommender.remove_tool(tool_id)
+    return {"status": "success"}
+
+@router.post("/recommend/feedback")
+def register_feedback(request: RecommendationFeedbackRequest, db: Session = Depends(get_session)):
+    """
+    Registra qué herramienta recomendada ejecutó realmente el usuario (re-ranking por uso).
+    """
+    phase_code = PHASE_MAP.get(request.phase, request.phase)
+    try:
+        normalize_phases([phase_code])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not recommender.has_tool(request.tool_id):
+        raise HTTPException(status_code=404, detail=f"Herramienta '{request.tool_id}' no encontrada.")
+
+    db.add(RecommendationFeedback(tool_id=request.tool_id, phase=phase_code, query=request.description))
+    db.commit()
+
+    recommender.record_usage(phase_code, request.tool_id)
+    return {"status": "success"}
+
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlmodel import Session
+from app.schemas import CapabilityBatchRequest
+from app.services.capability_batch import batch_capability
+from app.core.database import get_session
+from app.domain.models import Dataset
+
+# Tablero de capacidad: todas las características (CTQs) de una planta en una sola llamada
+router = APIRouter()
+
+
+@router.post("/capability/batch")
+def run_batch_capability(request: CapabilityBatchRequest, db: Session = Depends(get_session)):
+    """
+    Calcula Cp, Cpk, Pp, Ppk, DPMO y Z-bench de cada característica con especificación
+    y devuelve el ranking (el peor primero).
+    """
+    try:
+        if request.dataset_id is not None:
+            dataset = db.get(Dataset, request.dataset_id)
+            if dataset is None:
+                raise HTTPException(status_code=404, detail=f"Dataset {request.dataset_id} no encontrado.")
+            data = dataset.raw_data
+        elif request.data:
+            data = request.data
+        else:
+            raise ValueError("Se requiere 'data' o 'dataset_id' para el tablero de capacidad.")
+
+        specs = [spec.model_dump() for spec in request.specs]
+        result = batch_capability(data, specs, request.parameters or {})
+        return {"status": "success", **result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
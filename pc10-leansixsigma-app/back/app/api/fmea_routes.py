@@ -0,0 +1,86 @@
+from typing import Any, Dict
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.orm.attributes import flag_modified
+from sqlmodel import Session
+from app.schemas import FmeaDatasetRequest
+from app.services.fmea_index import FmeaIndex, FmeaStore
+from app.core.database import get_session
+from app.domain.models import Dataset
+
+# AMEF guardado en el servidor: se indexa una vez y se edita fila por fila
+router = APIRouter()
+
+fmea_store = FmeaStore()
+
+
+def _load_fmea(dataset_id: int, db: Session):
+    """Dataset e índice del AMEF (el índice se reconstruye desde raw_data si salió del caché)."""
+    dataset = db.get(Dataset, dataset_id)
+    if dataset is None:
+        raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} no encontrado.")
+    index = fmea_store.get(dataset_id)
+    if index is None:
+        try:
+            index = fmea_store.put(dataset_id, FmeaIndex(dataset.raw_data))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return dataset, index
+
+
+@router.post("/fmea")
+def create_fmea(request: FmeaDatasetRequest, db: Session = Depends(get_session)):
+    """
+    Guarda la tabla AMEF como Dataset (o indexa uno existente) y devuelve totales y top de riesgos.
+    """
+    try:
+        if request.dataset_id is not None:
+            dataset, index = _load_fmea(request.dataset_id, db)
+        elif request.data:
+            if request.project_id is None:
+                raise ValueError("Se requiere 'project_id' para guardar la tabla AMEF.")
+            index = FmeaIndex(request.data)
+            dataset = Dataset(project_id=request.project_id, name=request.name, raw_data=index.records)
+            db.add(dataset)
+            db.commit()
+            db.refresh(dataset)
+            fmea_store.put(dataset.id, index)
+        else:
+            raise ValueError("Se requiere 'data' o 'dataset_id' para el AMEF.")
+        return {"status": "success", "dataset_id": dataset.id, "details": index.details(), "top": index.top(request.top)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/fmea/{dataset_id}")
+def get_fmea(dataset_id: int, top: int = Query(20, ge=0, le=1000), db: Session = Depends(get_session)):
+    """
+    Totales del AMEF (NPR máximo, suma, críticos, conteos) y los 'top' riesgos de mayor NPR.
+    """
+    _, index = _load_fmea(dataset_id, db)
+    return {"status": "success", "dataset_id": dataset_id, "details": index.details(), "top": index.top(top)}
+
+
+@router.patch("/fmea/{dataset_id}/rows/{row_id}")
+def update_fmea_row(dataset_id: int, row_id: int, changes: Dict[str, Any],
+                    top: int = Query(0, ge=0, le=1000), db: Session = Depends(get_session)):
+    """
+    Edita una fila (ej: {"severity": 7}); totales y prioridades se actualizan sin recalcular la tabla.
+    """
+    dataset, index = _load_fmea(dataset_id, db)
+    changes = {k: v for k, v in changes.items() if k != "row_id"}
+    try:
+        row = index.update(row_id, changes)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"La fila {row_id} no existe (filas: {len(index)}).")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Persistir la fila editada (la lista de registros del índice es el raw_data del Dataset)
+    dataset.raw_data = index.records
+    flag_modified(dataset, "raw_data")
+    db.add(dataset)
+    db.commit()
+    result = {"status": "success", "row": row, "details": index.details()}
+    if top:
+        result["top"] = index.top(top)
+    return result
@@ -0,0 +1,90 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlmodel import Session
+from app.schemas import TreeBuildRequest
+from app.services.tree_store import TreeStore, build_tree, dataset_tree_id, page
+from app.core.database import get_session
+from app.domain.models import Dataset
+
+# Árboles grandes (Estructura/CTQ, Costos): se indexan una vez y se navegan por páginas
+router = APIRouter()
+
+tree_store = TreeStore()
+
+
+def _load_tree(tree_id: str, db: Session):
+    """
+    Busca el árbol en caché; los árboles de un Dataset se reconstruyen (con los mismos
+    parámetros de construcción) si fueron descartados.
+    """
+    stored = tree_store.get(tree_id)
+    if stored is not None:
+        return stored
+
+    if tree_id.startswith("dataset-"):
+        dataset_part, _, tool_name = tree_id[len("dataset-"):].partition("-")
+        dataset = db.get(Dataset, int(dataset_part)) if dataset_part.isdigit() else None
+        if dataset is not None:
+            try:
+                stored = build_tree(tool_name, dataset.raw_data, tree_store.build_params(tree_id), tree_id=tree_id)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return tree_store.put(stored)
+    raise HTTPException(status_code=404, detail=f"Árbol '{tree_id}' no encontrado (vuelva a construirlo).")
+
+
+@router.post("/trees")
+def create_tree(request: TreeBuildRequest, db: Session = Depends(get_session)):
+    """
+    Indexa un árbol y devuelve sus primeros niveles (con child_count y valores agregados por rama).
+    """
+    try:
+        if request.dataset_id is not None:
+            dataset = db.get(Dataset, request.dataset_id)
+            if dataset is None:
+                raise HTTPException(status_code=404, detail=f"Dataset {request.dataset_id} no encontrado.")
+            stored = build_tree(request.tool_name, dataset.raw_data, request.parameters,
+                                tree_id=dataset_tree_id(request.dataset_id, request.tool_name))
+        elif request.data:
+            stored = build_tree(request.tool_name, request.data, request.parameters)
+        else:
+            raise ValueError("Se requiere 'data' o 'dataset_id' para construir el árbol.")
+        tree_store.put(stored)
+
+        tree = stored.tree
+        result = page(stored, levels=request.levels, limit=request.limit, max_children=request.max_children)
+        result.update({
+            "status": "success",
+            "tool_name": stored.tool_name,
+            "total_nodes": tree.n,
+            "max_depth": tree.max_depth + 1,
+            "orphan_ids": tree.ids[tree.orphans[:100]].tolist(),
+            **stored.rollups,
+        })
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/trees/{tree_id}")
+def get_tree_roots(tree_id: str, levels: int = Query(2, ge=1, le=10), offset: int = Query(0, ge=0),
+                   limit: int = Query(100, ge=1, le=5000), max_children: int = Query(100, ge=1, le=5000),
+                   db: Session = Depends(get_session)):
+    """
+    Página de raíces de un árbol ya indexado.
+    """
+    stored = _load_tree(tree_id, db)
+    return {"status": "success", **page(stored, None, levels, offset, limit, max_children)}
+
+
+@router.get("/trees/{tree_id}/nodes/{node_id}")
+def expand_node(tree_id: str, node_id: str, levels: int = Query(1, ge=1, le=10), offset: int = Query(0, ge=0),
+                limit: int = Query(100, ge=1, le=5000), max_children: int = Query(100, ge=1, le=5000),
+                db: Session = Depends(get_session)):
+    """
+    Expande un nodo: devuelve sus hijos (paginados) con 'levels' niveles hacia abajo.
+    """
+    stored = _load_tree(tree_id, db)
+    try:
+        return {"status": "success", **page(stored, node_id, levels, offset, limit, max_children)}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Nodo '{node_id}' no existe en el árbol.")
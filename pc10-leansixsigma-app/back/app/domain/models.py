@@ -68,4 +68,34 @@ class Analysis(SQLModel, table=True):
     
     # Relaciones
     project: Optional[Project] = Relationship(back_populates="analyses")
-    dataset: Optional[Dataset] = Relationship(back_populates="used_in_analyses")
\ No newline at end of file
+    dataset: Optional[Dataset] = Relationship(back_populates="used_in_analyses")
+
+
+# -----------------------------------------------------------------------------
+# TABLA 4: TOOL_KNOWLEDGE (Base de conocimiento del Recomendador)
+# -----------------------------------------------------------------------------
+class ToolKnowledge(SQLModel, table=True):
+    __tablename__ = "tool_knowledge"
+
+    tool_id: str = Field(primary_key=True, max_length=100)
+    name: str = Field(max_length=200)
+    # Fases DMAIC en código corto: ["D", "M", "A", "I", "C"]
+    phases: List[str] = Field(default=[], sa_column=Column(JSON))
+    description: str = Field(sa_column=Column(Text))
+
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# -----------------------------------------------------------------------------
+# TABLA 5: RECOMMENDATION_FEEDBACK (Uso real de las herramientas recomendadas)
+# -----------------------------------------------------------------------------
+class RecommendationFeedback(SQLModel, table=True):
+    __tablename__ = "recommendation_feedback"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    tool_id: str = Field(index=True, max_length=100)
+    phase: str = Field(index=True, max_length=1)
+    query: Optional[str] = Field(default=None, sa_column=Column(Text))
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
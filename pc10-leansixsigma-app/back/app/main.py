@@ -1,7 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.database import create_db_and_tables
+from sqlmodel import Session
+from app.core.database import create_db_and_tables, engine
+from app.services.recommender import seed_knowledge_base
 from app.api import analysis_routes # Importamos las rutas que acabamos de crear
+from app.api import tree_routes
+from app.api import capability_routes
+from app.api import fmea_routes
 
 app = FastAPI(
     title="Six Sigma Desktop Engine",
@@ -21,10 +26,15 @@ app.add_middleware(
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    with Session(engine) as session:
+        seed_knowledge_base(session)
 
 # CONECTAR LAS RUTAS (El paso clave)
 # Ahora las URLs serán: /api/v1/analyze, /api/v1/recommend
 app.include_router(analysis_routes.router, prefix="/api/v1", tags=["Herramientas Six Sigma"])
+app.include_router(tree_routes.router, prefix="/api/v1", tags=["Árboles (paginados)"])
+app.include_router(capability_routes.router, prefix="/api/v1", tags=["Capacidad (tablero)"])
+app.include_router(fmea_routes.router, prefix="/api/v1", tags=["AMEF (edición incremental)"])
 
 @app.get("/")
 def read_root():
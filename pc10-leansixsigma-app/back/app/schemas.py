@@ -1,6 +1,6 @@
 
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from pydantic import Field
 from typing import Literal
 from enum import Enum
@@ -23,8 +23,17 @@ class SamplingParams(BaseModel):
     confidence_level: float = Field(0.95, ge=0.80, le=0.999) 
     margin_error: float = Field(0.05, gt=0) 
     population_size: Optional[int] = None 
-    std_dev: Optional[float] = None 
-    proportion: float = 0.5 
+    std_dev: Optional[float] = None
+    proportion: float = 0.5
+    # Opciones del modo 'extraction'
+    sampling_method: Literal["simple", "stratified", "systematic", "reservoir"] = "simple"
+    n_samples: Optional[int] = Field(None, ge=1, description="Tamaño de muestra fijo. Si se omite, se calcula con la fórmula")
+    strata_column: Optional[str] = Field(None, description="Columna de estratos (ej: 'Sede', 'Turno')")
+    allocation: Literal["proportional", "neyman"] = "proportional"
+    value_column: Optional[str] = Field(None, description="Columna numérica para estimar S_h (asignación de Neyman)")
+    source_path: Optional[str] = Field(None, description="CSV relativo a la carpeta SIXSIGMA_DATA_DIR del servidor, para muestrear por bloques")
+    chunk_size: int = Field(100_000, ge=1, description="Filas por bloque al leer 'source_path'")
+    random_state: int = 42
 
 
 class RiskRow(BaseModel):
@@ -49,8 +58,10 @@ class CostCategory(str, Enum):
 
 class CostItem(BaseModel):
     description: str = Field(..., description="Descripción del gasto (ej: Retrabajo)")
-    amount: float = Field(..., gt=0, description="Monto monetario")
-    category: CostCategory = Field(..., description="Categoría del costo")
+    amount: float = Field(..., ge=0, description="Monto monetario")
+    category: Optional[CostCategory] = Field(None, description="Categoría del costo (se hereda del padre si falta)")
+    id: Optional[str] = Field(None, description="ID del nodo para árboles jerárquicos (ej: Planta -> Línea -> Costo)")
+    parent_id: Optional[str] = Field(None, description="ID del nodo padre (Null si es raíz)")
 
 # El 'data' del request será: List[CostItem]
 # El 'parameters' podría incluir ingresos totales para calcular % de impacto
@@ -66,6 +77,9 @@ class TreeItem(BaseModel):
     parent_id: Optional[str] = Field(None, description="ID del nodo padre (Null si es raíz)")
     type: str = Field("step", description="Tipo de nodo: 'need', 'driver', 'ctq', 'task', 'step'")
     description: Optional[str] = None
+    value: Optional[float] = Field(None, description="Valor propio del nodo (se suma por rama: rollup_value)")
+    score: Optional[float] = Field(None, description="Puntaje del nodo (promedio ponderado por rama: rollup_score)")
+    weight: Optional[float] = Field(None, description="Peso del puntaje")
 
 # El 'data' del request será: List[TreeItem]
 
@@ -93,6 +107,13 @@ class ZBenchParams(BaseModel):
     lsl: Optional[float] = None  # Límite Inferior
     target: Optional[float] = None
     shift: float = 1.5           # Desplazamiento Sigma estándar (Shift)
+    value_column: Optional[str] = None      # Por defecto, la primera columna numérica
+    subgroup_column: Optional[str] = None   # Subgrupos racionales (sigma dentro)
+    subgroup_size: Optional[int] = None     # O bloques consecutivos de este tamaño
+    sigma_method: str = "auto"              # 'auto', 'pooled', 'rbar' o 'mr'
+    distribution: str = "normal"            # 'normal', 'auto' (mejor ajuste AD) o una de las candidatas
+    n_jobs: Optional[int] = None            # Ajustes en paralelo (tope: pool compartido del servidor)
+    previous_stats: Optional[Dict[str, Any]] = None  # 'sufficient_stats' de un análisis anterior
 
 # backend/app/schemas.py (Añade esto)
 
@@ -109,10 +130,28 @@ from datetime import date
 
 class GanttTask(BaseModel):
     task_name: str = Field(..., description="Nombre de la tarea o fase")
-    start_date: date = Field(..., description="Fecha de inicio (YYYY-MM-DD)")
-    end_date: date = Field(..., description="Fecha de fin (YYYY-MM-DD)")
+    start_date: Optional[date] = Field(None, description="Fecha de inicio (YYYY-MM-DD). Obligatoria sin CPM")
+    end_date: Optional[date] = Field(None, description="Fecha de fin (YYYY-MM-DD). Obligatoria sin CPM")
     phase: Optional[str] = Field("General", description="Fase DMAIC a la que pertenece")
     progress: int = Field(0, ge=0, le=100, description="Porcentaje de avance")
+    # Programación por dependencias (CPM)
+    task_id: Optional[str] = Field(None, description="Identificador único. Por defecto se usa task_name")
+    duration_days: Optional[int] = Field(None, ge=0, description="Duración en días (alternativa a las fechas)")
+    predecessors: Optional[List[str]] = Field(None, description="IDs de las tareas que deben terminar antes")
+
+    resource: Optional[str] = Field(None, description="Responsable/recurso que ejecuta la tarea")
+    units: int = Field(1, ge=1, description="Unidades del recurso que consume la tarea")
+
+class GanttParams(BaseModel):
+    project_start: Optional[date] = Field(None, description="(CPM) Fecha de inicio del proyecto")
+    scheduling: Literal["cpm", "resource_constrained"] = "cpm"
+    calendar: Literal["calendar", "workdays"] = Field("calendar", description="'workdays' cuenta solo días laborables")
+    weekmask: str = Field("1111100", description="Días laborables de lunes a domingo (1 = laborable)")
+    holidays: List[date] = Field([], description="Feriados no laborables")
+    resource_capacity: Dict[str, int] = Field({}, description="Capacidad (unidades simultáneas) por recurso")
+    default_capacity: int = Field(1, ge=1)
+    utilization_bucket: int = Field(5, ge=1, description="Días laborables por barra del histograma de utilización")
+    max_solver_seconds: Optional[float] = Field(None, gt=0, description="Tiempo máximo de nivelación")
 
 # El 'data' será: List[GanttTask]
 # backend/app/schemas.py (Añade esto)
@@ -122,17 +161,35 @@ class CashFlowItem(BaseModel):
     amount: float = Field(..., gt=0, description="Monto monetario")
     type: Literal["cost", "benefit"] = Field(..., description="Tipo de flujo")
     period: int = Field(0, ge=0, description="Periodo (Mes/Año). 0 = Inversión inicial")
+    # Incertidumbre del monto (solo se usa en mode='monte_carlo')
+    distribution: Literal["fixed", "triangular", "normal", "lognormal"] = "fixed"
+    low: Optional[float] = Field(None, ge=0, description="(triangular) Monto pesimista/mínimo")
+    mode: Optional[float] = Field(None, ge=0, description="(triangular) Monto más probable. Por defecto 'amount'")
+    high: Optional[float] = Field(None, ge=0, description="(triangular) Monto máximo")
+    std_dev: Optional[float] = Field(None, ge=0, description="(normal/lognormal) Desviación estándar del monto")
+    project_id: Optional[str] = Field(None, description="(portfolio) Proyecto al que pertenece el flujo")
 
 # El 'data' será: List[CashFlowItem]
 class CostBenefitParams(BaseModel):
     period_unit: str = "Meses" # Etiqueta para el tiempo
     discount_rate: float = 0.0 # Tasa de descuento para VAN (opcional)
+    mode: Literal["deterministic", "monte_carlo", "portfolio"] = "deterministic"
+    rank_by: Literal["npv", "irr_percent", "roi_percent"] = Field("npv", description="(portfolio) Criterio de ranking")
+    n_simulations: int = Field(100_000, ge=100, description="(monte_carlo) Escenarios simulados")
+    chunk_size: int = Field(20_000, ge=100, description="(monte_carlo) Escenarios por bloque (acota la memoria)")
+    random_state: Optional[int] = Field(42, description="(monte_carlo) Semilla para reproducibilidad")
 
     # backend/app/schemas.py (Añade esto)
 
 class AffinityParams(BaseModel):
     num_clusters: int = Field(3, ge=2, description="Número de grupos deseados")
     auto_label: bool = Field(True, description="Intentar nombrar los grupos automáticamente")
+    mode: Literal["standard", "scalable"] = Field("standard", description="'scalable' usa MiniBatchKMeans para miles de ideas")
+    auto_k: bool = Field(True, description="(scalable) Elegir k automáticamente por silhouette")
+    k_range: List[int] = Field([2, 10], min_length=2, max_length=2, description="(scalable) Rango [k_min, k_max] de candidatos")
+    silhouette_sample_size: int = Field(2000, ge=10, description="(scalable) Ideas muestreadas para evaluar silhouette")
+    project_id: Optional[int] = Field(None, description="Proyecto dueño del vocabulario en caché")
+    vocabulary_version: int = Field(0, description="Versión del vocabulario del proyecto; cambiarla fuerza a reajustarlo")
 
 # El 'data' será una lista simple de objetos: [{"text": "Idea 1"}, {"text": "Idea 2"}]
 
@@ -143,11 +200,21 @@ class RadarPoint(BaseModel):
     category: str = Field(..., description="El eje del radar (ej: 'Seguridad', 'Calidad')")
     value: float = Field(..., ge=0, description="El valor numérico")
     series: str = Field("Actual", description="Nombre de la serie (ej: 'Meta', 'Real')")
+    entity: Optional[str] = Field(None, description="Sitio/planta/área (modo flota). Sin entidad en la serie meta = meta común")
 
 # El 'data' será: List[RadarPoint]
 # El 'parameters' puede incluir 'max_scale' para fijar el límite del gráfico (ej: 5 o 100)
 class RadarParams(BaseModel):
     max_scale: Optional[float] = None # Si no se envía, se calcula automático
+    target_series: Optional[str] = None  # Serie meta: brechas de las demás series contra ella
+    # Modo flota (se activa si los datos traen la columna de entidad)
+    entity_column: str = "entity"
+    actual_series: Optional[str] = None  # Por defecto, la primera serie que no es la meta
+    higher_is_better: bool = True
+    worst_k: int = Field(3, ge=1)  # Peores categorías por entidad
+    sort_by: Literal["score", "entity", "gap"] = "score"  # score/gap: peores primero
+    page: int = Field(1, ge=1)
+    page_size: int = Field(50, ge=1, le=1000)
 
 # backend/app/schemas.py
 
@@ -200,6 +267,22 @@ class FmeaItem(BaseModel):
     current_controls: str = Field(..., description="Controles actuales")
     detection: int = Field(..., ge=1, le=10, description="Detección (D)")
     recommended_action: Optional[str] = Field(None, description="Acción recomendada (Opcional)")
+    # Re-evaluación después de las acciones (opcional; vacío = sin cambio en esa calificación)
+    revised_severity: Optional[int] = Field(None, ge=1, le=10, description="Severidad revisada")
+    revised_occurrence: Optional[int] = Field(None, ge=1, le=10, description="Ocurrencia revisada")
+    revised_detection: Optional[int] = Field(None, ge=1, le=10, description="Detección revisada")
+
+class FmeaParams(BaseModel):
+    sort_by: Literal["npr", "action_priority"] = "npr"  # Prioridad AIAG-VDA (H > M > L) o NPR
+    rollup_by: Optional[List[str]] = None  # Columnas del consolidado (por defecto 'function_part')
+    rollup_limit: int = 100
+
+class FmeaDatasetRequest(BaseModel):
+    data: Optional[List[Dict[str, Any]]] = Field(None, description="Filas del AMEF (List[FmeaItem]) a guardar como Dataset")
+    dataset_id: Optional[int] = Field(None, description="Dataset ya guardado con las filas del AMEF")
+    project_id: Optional[int] = Field(None, description="Proyecto al que pertenece el AMEF (requerido con 'data')")
+    name: str = "AMEF"
+    top: int = Field(20, ge=0, le=1000, description="Riesgos de mayor NPR a devolver")
 
 # El 'data' será: List[FmeaItem]
 
@@ -231,8 +314,19 @@ class HistogramParams(BaseModel):
 
 class ConfidenceIntervalParams(BaseModel):
     confidence_level: float = Field(0.95, ge=0.0, le=1.0, description="Nivel de confianza (ej: 0.95 para 95%)")
-    variable_type: Literal["mean", "proportion"] = Field("mean", description="Tipo de estimación: 'mean' (Media) o 'proportion' (Proporción)")
+    variable_type: Literal["mean", "proportion", "median", "std", "cpk"] = Field("mean", description="Parámetro a estimar: Media, Proporción, Mediana, Desviación Estándar o Cpk")
     target_value: Optional[float] = Field(None, description="Valor objetivo a comparar (ej: Meta del cliente)")
+    method: Literal["classic", "bootstrap"] = Field("classic", description="Fórmula clásica o remuestreo bootstrap (datos sesgados)")
+    bootstrap_method: Literal["percentile", "bca"] = Field("bca", description="Tipo de intervalo bootstrap")
+    n_resamples: int = Field(10000, ge=1000, le=1_000_000, description="Réplicas bootstrap")
+    random_state: Optional[int] = Field(42, description="Semilla (resultados reproducibles)")
+    n_jobs: Optional[int] = Field(None, description="Bloques del bootstrap en paralelo (None = automático; tope: pool compartido del servidor)")
+    proportion_method: Literal["wald", "wilson", "clopper_pearson"] = Field("wald", description="Intervalo para proporciones")
+    success_value: Optional[Union[str, int, float, bool]] = Field(None, description="Valor que cuenta como éxito en proporciones")
+    lsl: Optional[float] = Field(None, description="Límite inferior de especificación (Cpk)")
+    usl: Optional[float] = Field(None, description="Límite superior de especificación (Cpk)")
+    value_column: Optional[str] = Field(None, description="Columna a analizar (por defecto la primera)")
+    group_column: Optional[str] = Field(None, description="Un intervalo por grupo (ej: sucursal, turno, producto)")
 
 # El 'data' será una lista de valores: [{"valor": 10.5}, {"valor": 10.2}...]
 # Para proporción, pueden ser numéricos (0/1) o texto ("Pasa"/"Falla").
@@ -245,6 +339,26 @@ class ProcessStep(BaseModel):
     type: Literal["start", "task", "decision", "end"] = Field("task", description="Tipo de símbolo")
     next_ids: List[str] = Field(default=[], description="Lista de IDs a los que se conecta este paso")
     role: Optional[str] = Field(None, description="Responsable (útil para diagramas de carril/swimlane)")
+    duration: Optional[float] = Field(None, ge=0, description="Duración del paso (para el tiempo de ciclo)")
+    probabilities: Optional[List[float]] = Field(None, description="Probabilidad de cada salida (mismo orden que next_ids)")
+    # Simulación (mode='simulation')
+    scenario: Optional[str] = Field(None, description="Escenario al que pertenece el paso (ej: 'AS-IS', 'TO-BE')")
+    capacity: int = Field(1, ge=1, description="Servidores/personas que atienden el paso en paralelo")
+    service_dist: Literal["fixed", "exponential", "triangular", "normal", "lognormal"] = "exponential"
+    duration_low: Optional[float] = Field(None, ge=0, description="(triangular) Tiempo mínimo")
+    duration_high: Optional[float] = Field(None, ge=0, description="(triangular) Tiempo máximo")
+    duration_std: Optional[float] = Field(None, ge=0, description="(normal/lognormal) Desviación estándar")
+
+class ProcessMapParams(BaseModel):
+    mode: Literal["analysis", "simulation"] = "analysis"
+    betweenness_samples: int = Field(200, ge=1, description="Orígenes muestreados para estimar la intermediación")
+    max_paths: int = Field(20, ge=0, description="Máximo de caminos inicio-fin a enumerar")
+    arrival_rate: float = Field(1.0, gt=0, description="(simulation) Llegadas por unidad de tiempo (Poisson)")
+    sim_time: float = Field(1000.0, gt=0, description="(simulation) Horizonte de cada réplica")
+    warmup: float = Field(0.0, ge=0, description="(simulation) Periodo de calentamiento excluido de las estadísticas")
+    replications: int = Field(10, ge=1, description="(simulation) Réplicas independientes")
+    n_jobs: Optional[int] = Field(None, ge=1, description="(simulation) Réplicas en paralelo (1 = sin procesos; tope: pool compartido del servidor)")
+    random_state: Optional[int] = 42
 
 # El 'data' será: List[ProcessStep]
 
@@ -254,6 +368,11 @@ class RaciRow(BaseModel):
     task: str = Field(..., description="La tarea o actividad")
     assignments: Dict[str, str] = Field(..., description="Diccionario Rol->Asignación. Ej: {'Gerente': 'A', 'Analista': 'R'}")
 
+class RaciParams(BaseModel):
+    # 'matrix': salida compacta (tareas, roles y una cadena por tarea, ej: "R-A-C");
+    # 'records': un diccionario por tarea (formato anterior)
+    output: Literal["matrix", "records"] = "matrix"
+
 # El 'data' será: List[RaciRow]
 
 # backend/app/schemas.py (Añade esto)
@@ -268,6 +387,12 @@ class ControlPlanItem(BaseModel):
     reaction_plan: str = Field(..., description="Qué hacer si falla (ej: Detener línea y calibrar)")
     responsible: str = Field(..., description="Quién ejecuta la acción")
 
+class ControlPlanParams(BaseModel):
+    # Tipos de control adicionales o palabras clave nuevas: {tipo: [palabras]} o
+    # {tipo: {"category": "Preventivo" | "Detectivo", "keywords": [...]}}
+    taxonomy: Optional[Dict[str, Any]] = None
+    merge_taxonomy: bool = True  # False = usar solo la taxonomía enviada
+
 # El 'data' será: List[ControlPlanItem]
 
 
@@ -291,9 +416,27 @@ class QfdItem(BaseModel):
     weight: int = Field(..., ge=1, le=10, description="Importancia para el cliente (1-5 o 1-10)")
     # Relación: 9 (Fuerte), 3 (Media), 1 (Débil), 0 (Nula)
     relationships: Dict[str, int] = Field(..., description="Relación con los CÓMOs. Clave=NombreTecnico")
+    # Matriz de planificación (benchmarking competitivo, escala 1-5)
+    current: Optional[float] = Field(None, description="Desempeño actual percibido por el cliente")
+    target: Optional[float] = Field(None, description="Meta (si falta: el mejor entre nosotros y la competencia)")
+    sales_point: Optional[float] = Field(None, description="Punto de venta: 1, 1.2 o 1.5")
+    competitors: Optional[Dict[str, float]] = Field(None, description="Desempeño de cada competidor")
+
+class QfdRoofCorrelation(BaseModel):
+    tech_a: str
+    tech_b: str
+    value: Union[int, str] = Field(..., description="-9 a 9 o símbolo: '++', '+', '-', '--'")
+
+class QfdHouse(BaseModel):
+    name: str = Field(..., description="Nombre de la casa (ej: 'Partes', 'Proceso')")
+    technical_reqs: List[str] = Field(..., description="CÓMOs de esta casa")
+    relationships: Dict[str, Dict[str, int]] = Field(..., description="{QUÉ (CÓMO de la casa anterior): {CÓMO: valor}}")
 
 class QfdParams(BaseModel):
     technical_reqs: List[str] = Field(..., description="Lista de los CÓMOs (Requerimientos Técnicos)")
+    correlations: Optional[List[QfdRoofCorrelation]] = Field(None, description="Techo de la casa")
+    houses: Optional[List[QfdHouse]] = Field(None, description="Casas siguientes en cascada (diseño -> partes -> proceso)")
+    technical_benchmark: Optional[Dict[str, Dict[str, float]]] = Field(None, description="{competidor: {CÓMO: valor}}")
 
 # El 'data' será: List[QfdItem]
 
@@ -331,7 +474,10 @@ class HypothesisParams(BaseModel):
 class NormalityTestParams(BaseModel):
     alpha: float = Field(0.05, description="Nivel de significancia (ej: 0.05 para 95% confianza)")
     # Opcional: Elegir método específico si se desea
-    method: Literal["auto", "anderson", "shapiro"] = "auto"
+    # 'auto': Shapiro-Wilk hasta n = 5000; con más datos, Anderson-Darling (valor P interpolado)
+    method: Literal["auto", "anderson", "shapiro", "jarque_bera"] = "auto"
+    value_column: Optional[str] = None  # Por defecto, la primera columna numérica
+    qq_points: int = Field(500, ge=10, description="Máximo de puntos del Q-Q plot (grilla de cuantiles)")
 
 # El 'data' es una lista simple de valores: [{"valor": 10}, {"valor": 12}...]
 
@@ -353,6 +499,13 @@ class BscItem(BaseModel):
     actual: float = Field(..., description="Valor real obtenido")
     # Opcional: 'higher_is_better' (True/False). Por defecto asumimos que MÁS es MEJOR.
     higher_is_better: bool = Field(True, description="True si queremos maximizar, False si queremos minimizar (ej: Defectos)")
+    weight: Optional[float] = Field(None, ge=0, description="Peso del KPI dentro de su perspectiva (por defecto 1)")
+    # Series de tiempo: una fila por KPI y periodo (ej: '2024-01', fecha o número)
+    period: Optional[Union[str, int]] = Field(None, description="Periodo de la medición")
+
+class BscParams(BaseModel):
+    rolling_window: int = Field(3, ge=1, description="Periodos del promedio móvil del cumplimiento")
+    trend_window: int = Field(12, ge=2, description="Últimos periodos usados para la tendencia y el pronóstico")
 
 # El 'data' será: List[BscItem]
 
@@ -370,4 +523,45 @@ class PmiItem(BaseModel):
 # Agrega esto al final:
 class RecommendationRequest(BaseModel):
     phase: str = Field(..., description="Fase DMAIC (Define, Measure, Analyze, Improve, Control)")
-    description: str = Field(..., description="Descripción del problema para que la IA recomiende")
\ No newline at end of file
+    description: str = Field(..., description="Descripción del problema para que la IA recomiende")
+
+class BatchRecommendationRequest(BaseModel):
+    phase: str = Field(..., description="Fase DMAIC (Define, Measure, Analyze, Improve, Control)")
+    descriptions: List[str] = Field(..., description="Descripciones de problemas a puntuar en un solo llamado")
+    top_k: int = Field(5, ge=1, le=50, description="Cantidad de herramientas por descripción")
+
+class ToolKnowledgeItem(BaseModel):
+    name: str = Field(..., description="Nombre visible de la herramienta")
+    phases: List[str] = Field(..., min_length=1, description="Fases DMAIC donde aplica (ej: ['D', 'M'] o ['Define'])")
+    description: str = Field(..., min_length=3, description="Para qué sirve la herramienta (texto que indexa la IA)")
+
+class RecommendationFeedbackRequest(BaseModel):
+    phase: str = Field(..., description="Fase DMAIC en la que se hizo la recomendación")
+    tool_id: str = Field(..., description="Herramienta que el usuario realmente ejecutó")
+    description: Optional[str] = Field(None, description="Descripción del problema consultada (opcional)")
+
+
+class TreeBuildRequest(BaseModel):
+    tool_name: str = Field("structure_tree", description="Herramienta de árbol: structure_tree, ctq_tree, job_tree o cost_tree")
+    data: Optional[List[Dict[str, Any]]] = Field(None, description="Nodos del árbol (si no se indica dataset_id)")
+    dataset_id: Optional[int] = Field(None, description="Dataset guardado cuyo raw_data contiene los nodos")
+    parameters: Optional[Dict[str, Any]] = {}
+    levels: int = Field(2, ge=1, le=10, description="Niveles a devolver desde las raíces")
+    limit: int = Field(100, ge=1, le=5000, description="Raíces por página")
+    max_children: int = Field(100, ge=1, le=5000, description="Hijos incluidos por nodo (el resto se expande)")
+
+
+class CapabilitySpec(BaseModel):
+    characteristic: str = Field(..., description="Nombre de la característica (columna en formato ancho)")
+    lsl: Optional[float] = None
+    usl: Optional[float] = None
+    target: Optional[float] = None
+
+
+class CapabilityBatchRequest(BaseModel):
+    data: Optional[List[Dict[str, Any]]] = Field(None, description="Mediciones en formato ancho o largo (si no se indica dataset_id)")
+    dataset_id: Optional[int] = Field(None, description="Dataset guardado cuyo raw_data contiene las mediciones")
+    specs: List[CapabilitySpec] = Field(..., description="Límites de especificación por característica")
+    # characteristic_column/value_column (formato largo), subgroup_column o subgroup_size,
+    # shift, sort_by ('cpk', 'ppk', 'dpmo', 'z_bench') y limit
+    parameters: Optional[Dict[str, Any]] = {}
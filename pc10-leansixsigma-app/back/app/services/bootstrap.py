@@ -0,0 +1,153 @@
+# backend/app/services/bootstrap.py
+"""
+Bootstrap no paramétrico vectorizado (intervalos percentil y BCa).
+
+Las réplicas se generan por bloques: cada bloque sortea una matriz de índices
+(réplicas × n) y calcula el estadístico sobre el eje 1 de una sola vez. Los bloques
+tienen semillas independientes (SeedSequence.spawn), así que el resultado es
+reproducible con 'random_state' y los bloques pueden repartirse entre procesos
+(pool compartido de app.services.worker_pool).
+"""
+from functools import partial
+from typing import Callable, Optional
+import numpy as np
+from scipy.special import ndtr, ndtri
+from app.services import worker_pool
+
+_MAX_CELLS = 2_000_000      # Elementos por matriz de remuestreo (acota la memoria de cada bloque)
+_PARALLEL_CELLS = 20_000_000  # Trabajo total (réplicas × n) a partir del cual conviene usar procesos
+_JACKKNIFE_GROUPS = 1000    # Con más datos, la aceleración BCa usa jackknife por grupos
+_JACKKNIFE_CELLS = 50_000_000
+
+
+# -----------------------------------------------------------------------------
+# Estadísticos vectorizados (sobre el eje 1: una fila por réplica)
+# -----------------------------------------------------------------------------
+def stat_mean(x: np.ndarray) -> np.ndarray:
+    return x.mean(axis=1)
+
+
+def stat_median(x: np.ndarray) -> np.ndarray:
+    return np.median(x, axis=1)
+
+
+def stat_std(x: np.ndarray) -> np.ndarray:
+    return x.std(axis=1, ddof=1)
+
+
+def stat_cpk(x: np.ndarray, lsl: Optional[float] = None, usl: Optional[float] = None) -> np.ndarray:
+    """Cpk = min(USL - media, media - LSL) / 3s (solo el límite definido si es unilateral)."""
+    mean = x.mean(axis=1)
+    three_s = 3 * x.std(axis=1, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cpu = (usl - mean) / three_s if usl is not None else np.full(len(mean), np.inf)
+        cpl = (mean - lsl) / three_s if lsl is not None else np.full(len(mean), np.inf)
+    return np.minimum(cpu, cpl)
+
+
+STATISTICS = {"mean": stat_mean, "median": stat_median, "std": stat_std, "cpk": stat_cpk}
+
+
+def get_statistic(name: str, **kwargs) -> Callable[[np.ndarray], np.ndarray]:
+    if name not in STATISTICS:
+        raise ValueError(f"Estadístico '{name}' no soportado. Opciones: {', '.join(STATISTICS)}")
+    # partial de una función de módulo: se puede enviar a otros procesos
+    return partial(STATISTICS[name], **kwargs) if kwargs else STATISTICS[name]
+
+
+# -----------------------------------------------------------------------------
+# Remuestreo
+# -----------------------------------------------------------------------------
+def _resample_block(data: np.ndarray, statistic, seed, size: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    n = len(data)
+    rows = max(1, _MAX_CELLS // n)
+    out = np.empty(size)
+    for lo in range(0, size, rows):
+        hi = min(lo + rows, size)
+        out[lo:hi] = statistic(data[rng.integers(0, n, size=(hi - lo, n))])
+    return out
+
+
+def bootstrap_distribution(data: np.ndarray, statistic, n_resamples: int = 10_000,
+                           random_state: Optional[int] = 42, n_jobs: Optional[int] = None) -> np.ndarray:
+    """
+    Distribución bootstrap del estadístico ('n_resamples' réplicas).
+    Con mucho trabajo (o n_jobs > 1) los bloques se reparten en el pool de procesos compartido.
+    """
+    data = np.asarray(data, dtype=float)
+    n_blocks = max(1, min(64, n_resamples // 1000))
+    sizes = np.full(n_blocks, n_resamples // n_blocks)
+    sizes[:n_resamples % n_blocks] += 1
+    seeds = np.random.SeedSequence(random_state).spawn(n_blocks)
+
+    parallel = n_jobs != 1 and n_blocks > 1 and (
+        (n_jobs is not None and n_jobs > 1) or n_resamples * len(data) >= _PARALLEL_CELLS
+    )
+    if not parallel:
+        return np.concatenate([_resample_block(data, statistic, s, int(k)) for s, k in zip(seeds, sizes)])
+    # Pool compartido del servidor: n_jobs solo limita cuántos bloques corren a la vez
+    blocks = worker_pool.run_tasks(_resample_block, [(data, statistic, s, int(k)) for s, k in zip(seeds, sizes)], n_jobs)
+    return np.concatenate(blocks)
+
+
+def jackknife(data: np.ndarray, statistic, random_state: Optional[int] = 42) -> np.ndarray:
+    """
+    Valores jackknife del estadístico (dejando fuera una observación). Con muchos datos
+    se deja fuera un grupo aleatorio por vez (delete-d jackknife), con a lo sumo
+    _JACKKNIFE_GROUPS grupos y un trabajo total acotado a _JACKKNIFE_CELLS elementos.
+    """
+    data = np.asarray(data, dtype=float)
+    n = len(data)
+    n_groups = int(min(n, _JACKKNIFE_GROUPS, max(20, _JACKKNIFE_CELLS // max(n, 1))))
+    size = n // n_groups
+    if n_groups < n:
+        # Grupos del mismo tamaño al inicio; el resto (n % grupos) queda siempre dentro
+        data = data[np.random.default_rng(random_state).permutation(n)]
+
+    keep = n - size
+    base = np.arange(keep)
+    rows = max(1, _MAX_CELLS // max(keep, 1))
+    values = np.empty(n_groups)
+    for lo in range(0, n_groups, rows):
+        hi = min(lo + rows, n_groups)
+        # Índices sin el grupo g: los que están desde el inicio del grupo se desplazan 'size'
+        start = (np.arange(lo, hi) * size)[:, None]
+        values[lo:hi] = statistic(data[base[None, :] + (base[None, :] >= start) * size])
+    return values
+
+
+# -----------------------------------------------------------------------------
+# Intervalos
+# -----------------------------------------------------------------------------
+def percentile_interval(distribution: np.ndarray, confidence: float):
+    alpha = 1 - confidence
+    lower, upper = np.nanquantile(distribution, [alpha / 2, 1 - alpha / 2])
+    return float(lower), float(upper)
+
+
+def bca_interval(data: np.ndarray, statistic, distribution: np.ndarray, estimate: float,
+                 confidence: float, random_state: Optional[int] = 42) -> dict:
+    """
+    Intervalo BCa (sesgo corregido y acelerado, Efron 1987).
+    z0 = sesgo de la distribución bootstrap respecto del estimador; a = aceleración (jackknife).
+    """
+    alpha = 1 - confidence
+    finite = distribution[np.isfinite(distribution)]
+    proportion_below = (np.sum(finite < estimate) + 0.5 * np.sum(finite == estimate)) / max(len(finite), 1)
+    z0 = float(ndtri(np.clip(proportion_below, 1e-10, 1 - 1e-10)))
+
+    jack = jackknife(data, statistic, random_state)
+    jack = jack[np.isfinite(jack)]
+    diff = jack.mean() - jack if jack.size else np.zeros(1)
+    denom = 6.0 * np.sum(diff ** 2) ** 1.5
+    acceleration = float(np.sum(diff ** 3) / denom) if denom > 0 else 0.0
+
+    z = ndtri(np.array([alpha / 2, 1 - alpha / 2]))
+    adjusted = ndtr(z0 + (z0 + z) / (1 - acceleration * (z0 + z)))
+    lower, upper = np.nanquantile(finite, np.clip(adjusted, 0.0, 1.0))
+    return {
+        "lower": float(lower), "upper": float(upper),
+        "bias_correction": round(z0, 4), "acceleration": round(acceleration, 6),
+        "adjusted_quantiles": [round(float(q), 4) for q in adjusted],
+    }
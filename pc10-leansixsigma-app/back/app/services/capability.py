@@ -0,0 +1,332 @@
+# backend/app/services/capability.py
+"""
+Motor de Capacidad de Proceso (Cp, Cpk, Pp, Ppk, PPM, Z-bench).
+
+- Estadísticos suficientes combinables (CapabilityStats): n, media y suma de cuadrados
+  (fórmulas de Chan), suma de cuadrados dentro de subgrupos, rangos y rangos móviles.
+  Guardándolos junto al dataset se puede actualizar la capacidad con datos nuevos sin
+  volver a leer los anteriores.
+- Índices vectorizados: los mismos arreglos sirven para una característica o para
+  cientos (tablero de capacidad), con colas normales de scipy.special (ndtr/ndtri).
+- Datos no normales: ajuste de Weibull, Lognormal, Gamma, Johnson SU y Box-Cox;
+  se elige la distribución con menor estadístico de Anderson-Darling y la capacidad
+  se calcula por el método de percentiles (ISO 22514-4 / Clements).
+- Datos faltantes (regla común de ZBenchTool y del tablero): los NaN se descartan ANTES
+  de formar rangos móviles (entre valores válidos consecutivos) y subgrupos por tamaño
+  (bloques de 'subgroup_size' valores válidos).
+"""
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+import numpy as np
+from scipy import stats
+from scipy.special import boxcox, inv_boxcox, ndtr, ndtri
+from app.services import worker_pool
+
+# Constante d2 (rango medio / sigma) por tamaño de subgrupo, n = 2..25
+D2 = np.array([
+    np.nan, np.nan, 1.128, 1.693, 2.059, 2.326, 2.534, 2.704, 2.847, 2.970, 3.078,
+    3.173, 3.258, 3.336, 3.407, 3.472, 3.532, 3.588, 3.640, 3.689, 3.735,
+    3.778, 3.819, 3.858, 3.895, 3.931,
+])
+
+# Percentiles equivalentes a ±3 sigma en una normal
+P_LOW, P_HIGH = ndtr(-3.0), ndtr(3.0)
+
+
+# -----------------------------------------------------------------------------
+# Subgrupos y datos faltantes
+# -----------------------------------------------------------------------------
+def validate_subgroup_size(size) -> int:
+    size = int(size)
+    if size < 2:
+        raise ValueError("El tamaño de subgrupo debe ser al menos 2.")
+    return size
+
+
+def size_subgroups(valid_position: np.ndarray, size: int) -> np.ndarray:
+    """Subgrupo de cada dato según su posición entre los datos VÁLIDOS (NaN descartados antes)."""
+    return np.asarray(valid_position) // validate_subgroup_size(size)
+
+
+def valid_positions(valid: np.ndarray, axis: int = 0) -> np.ndarray:
+    """Posición de cada dato entre los válidos de su columna (0, 1, 2...; los NaN no cuentan)."""
+    return np.cumsum(valid, axis=axis) - 1
+
+
+# -----------------------------------------------------------------------------
+# Estadísticos suficientes
+# -----------------------------------------------------------------------------
+@dataclass
+class CapabilityStats:
+    """Resumen combinable de una muestra (no guarda los datos)."""
+    n: int = 0
+    mean: float = 0.0
+    m2: float = 0.0               # Suma de cuadrados respecto de la media
+    minimum: float = np.inf
+    maximum: float = -np.inf
+    within_ss: float = 0.0        # Suma de cuadrados dentro de subgrupos (sigma agrupada)
+    within_dof: int = 0
+    range_over_d2: float = 0.0    # Suma de R_i / d2(n_i) de los subgrupos (2 <= n_i <= 25)
+    n_ranges: int = 0
+    mr_sum: float = 0.0           # Rangos móviles (datos individuales, en orden)
+    n_mr: int = 0
+    first_value: Optional[float] = None
+    last_value: Optional[float] = None
+
+    @classmethod
+    def from_values(cls, values: np.ndarray, subgroups: Optional[np.ndarray] = None) -> "CapabilityStats":
+        values = np.asarray(values, dtype=float)
+        n = len(values)
+        if n == 0:
+            return cls()
+        mean = float(values.mean())
+        result = cls(
+            n=n, mean=mean, m2=float(((values - mean) ** 2).sum()),
+            minimum=float(values.min()), maximum=float(values.max()),
+            mr_sum=float(np.abs(np.diff(values)).sum()), n_mr=n - 1,
+            first_value=float(values[0]), last_value=float(values[-1]),
+        )
+        if subgroups is not None:
+            # Un solo ordenamiento estable por subgrupo; sumas por bloque con reduceat
+            codes = np.unique(np.asarray(subgroups), return_inverse=True)[1].ravel()
+            order = np.argsort(codes, kind="stable")
+            grouped = values[order]
+            sizes = np.bincount(codes)
+            sizes = sizes[sizes > 0]
+            starts = np.r_[0, np.cumsum(sizes)[:-1]]
+            # Desvíos respecto de la media de cada subgrupo (sin la cancelación de sq - sums²/n)
+            group_means = np.add.reduceat(grouped, starts) / sizes
+            result.within_ss = float(((grouped - np.repeat(group_means, sizes)) ** 2).sum())
+            result.within_dof = int((sizes - 1).sum())
+            ranges = np.maximum.reduceat(grouped, starts) - np.minimum.reduceat(grouped, starts)
+            usable = (sizes >= 2) & (sizes < len(D2))
+            result.range_over_d2 = float((ranges[usable] / D2[sizes[usable]]).sum())
+            result.n_ranges = int(usable.sum())
+        return result
+
+    def merge(self, other: "CapabilityStats") -> "CapabilityStats":
+        """Combina dos resúmenes (fórmula de Chan para media y suma de cuadrados)."""
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            return other
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        merged = CapabilityStats(
+            n=n,
+            mean=self.mean + delta * other.n / n,
+            m2=self.m2 + other.m2 + delta ** 2 * self.n * other.n / n,
+            minimum=min(self.minimum, other.minimum),
+            maximum=max(self.maximum, other.maximum),
+            within_ss=self.within_ss + other.within_ss,
+            within_dof=self.within_dof + other.within_dof,
+            range_over_d2=self.range_over_d2 + other.range_over_d2,
+            n_ranges=self.n_ranges + other.n_ranges,
+            mr_sum=self.mr_sum + other.mr_sum,
+            n_mr=self.n_mr + other.n_mr,
+            first_value=self.first_value,
+            last_value=other.last_value,
+        )
+        # Rango móvil entre el último dato anterior y el primero del nuevo lote
+        if self.last_value is not None and other.first_value is not None:
+            merged.mr_sum += abs(other.first_value - self.last_value)
+            merged.n_mr += 1
+        return merged
+
+    @property
+    def std_overall(self) -> float:
+        return float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else float("nan")
+
+    def std_within(self, method: str = "auto"):
+        """
+        Sigma dentro de subgrupos (corto plazo). Métodos:
+        - 'pooled': sqrt(SS dentro / gl) (desviación agrupada).
+        - 'rbar': promedio de R_i / d2(n_i).
+        - 'mr': rango móvil medio / 1.128 (datos individuales).
+        'auto' usa la desviación agrupada si hay subgrupos y, si no, el rango móvil.
+        """
+        if method == "auto":
+            method = "pooled" if self.within_dof > 0 else "mr"
+        if method == "pooled" and self.within_dof > 0:
+            return float(np.sqrt(self.within_ss / self.within_dof)), "Desviación agrupada (subgrupos)"
+        if method == "rbar" and self.n_ranges > 0:
+            return self.range_over_d2 / self.n_ranges, "R-barra / d2 (subgrupos)"
+        if self.n_mr > 0:
+            return float(self.mr_sum / self.n_mr / D2[2]), "Rango móvil medio / d2 (individuales)"
+        return self.std_overall, "Desviación global"
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        # JSON no admite infinitos
+        data["minimum"] = None if not np.isfinite(self.minimum) else self.minimum
+        data["maximum"] = None if not np.isfinite(self.maximum) else self.maximum
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CapabilityStats":
+        data = dict(data)
+        data["minimum"] = np.inf if data.get("minimum") is None else data["minimum"]
+        data["maximum"] = -np.inf if data.get("maximum") is None else data["maximum"]
+        fields = cls.__dataclass_fields__
+        return cls(**{k: v for k, v in data.items() if k in fields})
+
+
+# -----------------------------------------------------------------------------
+# Índices (vectorizados: escalares o arreglos por característica; NaN = límite ausente)
+# -----------------------------------------------------------------------------
+def normal_indices(mean, sigma_within, sigma_overall, lsl, usl, target=None) -> Dict[str, np.ndarray]:
+    mean = np.asarray(mean, dtype=float)
+    lsl = np.asarray(np.nan if lsl is None else lsl, dtype=float)
+    usl = np.asarray(np.nan if usl is None else usl, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cp = (usl - lsl) / (6 * sigma_within)
+        cpu = (usl - mean) / (3 * sigma_within)
+        cpl = (mean - lsl) / (3 * sigma_within)
+        pp = (usl - lsl) / (6 * sigma_overall)
+        ppu = (usl - mean) / (3 * sigma_overall)
+        ppl = (mean - lsl) / (3 * sigma_overall)
+
+        # Fracción fuera de especificación (colas normales) con la variación global
+        p_low = np.where(np.isnan(lsl), 0.0, ndtr((lsl - mean) / sigma_overall))
+        p_high = np.where(np.isnan(usl), 0.0, ndtr((mean - usl) / sigma_overall))
+        p_low_st = np.where(np.isnan(lsl), 0.0, ndtr((lsl - mean) / sigma_within))
+        p_high_st = np.where(np.isnan(usl), 0.0, ndtr((mean - usl) / sigma_within))
+
+        result = {
+            "cp": cp, "cpk": np.fmin(cpu, cpl), "cpu": cpu, "cpl": cpl,
+            "pp": pp, "ppk": np.fmin(ppu, ppl), "ppu": ppu, "ppl": ppl,
+            "ppm_below": p_low * 1e6, "ppm_above": p_high * 1e6, "ppm_total": (p_low + p_high) * 1e6,
+            "ppm_within": (p_low_st + p_high_st) * 1e6,
+        }
+        if target is not None:
+            target = np.asarray(target, dtype=float)
+            result["cpm"] = (usl - lsl) / (6 * np.sqrt(sigma_overall ** 2 + (mean - target) ** 2))
+    return result
+
+
+def z_bench(defect_rate) -> np.ndarray:
+    """Z-bench = Φ⁻¹(1 - p) con la fracción defectuosa total (acotada para evitar ±inf)."""
+    p = np.clip(np.asarray(defect_rate, dtype=float), 1e-15, 1 - 1e-15)
+    return -ndtri(p)
+
+
+# -----------------------------------------------------------------------------
+# Ajuste de distribuciones no normales
+# -----------------------------------------------------------------------------
+class _BoxCox:
+    """Box-Cox como distribución: y = boxcox(x, λ) ~ Normal(μ, σ)."""
+
+    def __init__(self, lmbda: float, mu: float, sigma: float):
+        self.lmbda, self.mu, self.sigma = lmbda, mu, sigma
+
+    def cdf(self, x):
+        x = np.asarray(x, dtype=float)
+        y = boxcox(np.maximum(x, 1e-300), self.lmbda)
+        return np.where(x > 0, ndtr((y - self.mu) / self.sigma), 0.0)
+
+    def ppf(self, q):
+        return inv_boxcox(self.mu + self.sigma * ndtri(np.asarray(q, dtype=float)), self.lmbda)
+
+
+def _fit_one(name: str, values: np.ndarray):
+    """Ajusta una distribución candidata. Retorna (objeto con cdf/ppf, parámetros) o None si no aplica."""
+    positive = bool((values > 0).all())
+    try:
+        if name == "normal":
+            loc, scale = stats.norm.fit(values)
+            return stats.norm(loc, scale), {"mean": loc, "std": scale}
+        if name == "lognormal" and positive:
+            shape, _, scale = stats.lognorm.fit(values, floc=0)
+            return stats.lognorm(shape, 0, scale), {"sigma_log": shape, "median": scale}
+        if name == "weibull" and positive:
+            shape, _, scale = stats.weibull_min.fit(values, floc=0)
+            return stats.weibull_min(shape, 0, scale), {"shape": shape, "scale": scale}
+        if name == "gamma" and positive:
+            shape, _, scale = stats.gamma.fit(values, floc=0)
+            return stats.gamma(shape, 0, scale), {"shape": shape, "scale": scale}
+        if name == "johnson_su":
+            a, b, loc, scale = stats.johnsonsu.fit(values)
+            return stats.johnsonsu(a, b, loc, scale), {"gamma": a, "delta": b, "xi": loc, "lambda": scale}
+        if name == "boxcox" and positive:
+            transformed, lmbda = stats.boxcox(values)
+            mu, sigma = float(transformed.mean()), float(transformed.std(ddof=1))
+            return _BoxCox(lmbda, mu, sigma), {"lambda": lmbda, "mean_transformed": mu, "std_transformed": sigma}
+    except (ValueError, RuntimeError, FloatingPointError):
+        return None
+    return None
+
+
+def anderson_darling(values_sorted: np.ndarray, cdf) -> float:
+    """Estadístico A² de Anderson-Darling para una distribución ya ajustada."""
+    n = len(values_sorted)
+    F = np.clip(cdf(values_sorted), 1e-12, 1 - 1e-12)
+    i = np.arange(1, n + 1)
+    return float(-n - np.mean((2 * i - 1) * (np.log(F) + np.log1p(-F[::-1]))))
+
+
+def _evaluate(name: str, values: np.ndarray):
+    fitted = _fit_one(name, values)
+    if fitted is None:
+        return None
+    dist, params = fitted
+    ad = anderson_darling(np.sort(values), dist.cdf)
+    return {"distribution": name, "ad_statistic": ad, "params": {k: float(v) for k, v in params.items()}}
+
+
+CANDIDATES = ["normal", "lognormal", "weibull", "gamma", "johnson_su", "boxcox"]
+
+
+def fit_distributions(values: np.ndarray, candidates: Optional[List[str]] = None, n_jobs: Optional[int] = None,
+                      max_samples: int = 20_000, random_state: int = 42) -> List[dict]:
+    """
+    Ajusta las distribuciones candidatas (en el pool compartido si n_jobs > 1) y las ordena por A².
+    Con muestras grandes el ajuste usa una submuestra aleatoria de 'max_samples' datos.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) > max_samples:
+        values = np.random.default_rng(random_state).choice(values, max_samples, replace=False)
+    candidates = candidates or CANDIDATES
+    unknown = set(candidates) - set(CANDIDATES)
+    if unknown:
+        raise ValueError(f"Distribuciones no soportadas: {', '.join(sorted(unknown))}. Opciones: {', '.join(CANDIDATES)}")
+
+    if n_jobs is not None and n_jobs > 1 and len(candidates) > 1:
+        results = worker_pool.run_tasks(_evaluate, [(name, values) for name in candidates], n_jobs)
+    else:
+        results = [_evaluate(name, values) for name in candidates]
+    results = [r for r in results if r is not None and np.isfinite(r["ad_statistic"])]
+    return sorted(results, key=lambda r: r["ad_statistic"])
+
+
+def frozen_distribution(name: str, params: dict):
+    """Reconstruye la distribución ajustada a partir de sus parámetros."""
+    if name == "normal":
+        return stats.norm(params["mean"], params["std"])
+    if name == "lognormal":
+        return stats.lognorm(params["sigma_log"], 0, params["median"])
+    if name == "weibull":
+        return stats.weibull_min(params["shape"], 0, params["scale"])
+    if name == "gamma":
+        return stats.gamma(params["shape"], 0, params["scale"])
+    if name == "johnson_su":
+        return stats.johnsonsu(params["gamma"], params["delta"], params["xi"], params["lambda"])
+    return _BoxCox(params["lambda"], params["mean_transformed"], params["std_transformed"])
+
+
+def percentile_indices(dist, lsl: Optional[float], usl: Optional[float]) -> Dict[str, float]:
+    """
+    Capacidad no normal por percentiles: Pp = (USL - LSL) / (X99.865 - X0.135),
+    Ppk = min((USL - mediana) / (X99.865 - mediana), (mediana - LSL) / (mediana - X0.135)).
+    PPM a partir de la distribución ajustada.
+    """
+    low, median, high = (float(v) for v in dist.ppf([P_LOW, 0.5, P_HIGH]))
+    ppu = (usl - median) / (high - median) if usl is not None else np.nan
+    ppl = (median - lsl) / (median - low) if lsl is not None else np.nan
+    p_below = float(dist.cdf(lsl)) if lsl is not None else 0.0
+    p_above = float(1 - dist.cdf(usl)) if usl is not None else 0.0
+    return {
+        "pp": (usl - lsl) / (high - low) if usl is not None and lsl is not None else np.nan,
+        "ppk": float(np.fmin(ppu, ppl)), "ppu": ppu, "ppl": ppl,
+        "percentile_0135": low, "median": median, "percentile_99865": high,
+        "ppm_below": p_below * 1e6, "ppm_above": p_above * 1e6, "ppm_total": (p_below + p_above) * 1e6,
+    }
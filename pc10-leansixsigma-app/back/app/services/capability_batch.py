@@ -0,0 +1,296 @@
+# backend/app/services/capability_batch.py
+"""
+Tablero de capacidad multicaracterística (cientos de CTQs en una sola pasada).
+
+Los datos pueden venir en formato ancho (una columna por característica) o largo
+(columna de característica + columna de valor). En ambos casos los estadísticos
+(n, media, desviación global, rango móvil y suma de cuadrados dentro de subgrupos)
+se calculan para todas las características a la vez con sumas por bloque de numpy,
+y los índices salen de capability.normal_indices sobre arreglos (colas con ndtr/ndtri).
+"""
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.services.capability import (D2, normal_indices, size_subgroups, valid_positions,
+                                     validate_subgroup_size, z_bench)
+
+_BLOCK_CELLS = 20_000_000  # Celdas por bloque de columnas (formato ancho): acota la memoria
+
+SORT_KEYS = {
+    # métrica: (columna, ascendente) -> el peor primero
+    "cpk": ("cpk", True),
+    "ppk": ("ppk", True),
+    "dpmo": ("dpmo", False),
+    "z_bench": ("z_bench_st", True),
+}
+
+
+# -----------------------------------------------------------------------------
+# Estadísticos por característica
+# -----------------------------------------------------------------------------
+def _group_bounds(codes: np.ndarray):
+    """Orden estable por código (None si ya vienen ordenados) y comienzo de cada bloque (para reduceat)."""
+    order = None if np.all(codes[1:] >= codes[:-1]) else np.argsort(codes, kind="stable")
+    sorted_codes = codes if order is None else codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(codes) else np.array([], dtype=np.int64)
+    return order, starts
+
+
+def _within_by_size(centered: np.ndarray, valid: Optional[np.ndarray], size: int):
+    """
+    Suma de cuadrados y grados de libertad dentro de subgrupos de 'size' valores válidos,
+    por columna (cada columna forma sus bloques después de descartar sus NaN).
+    """
+    n_rows, k = centered.shape
+    positions = valid_positions(valid, axis=0) if valid is not None else np.arange(n_rows)[:, None]
+    n_groups = -(-n_rows // size)
+    keys = np.arange(k)[None, :] * n_groups + size_subgroups(positions, size)
+    if valid is not None:
+        keys, cells = keys[valid], centered[valid]
+    else:
+        keys, cells = np.broadcast_to(keys, centered.shape).ravel(), centered.ravel()
+    length = k * n_groups
+    counts = np.bincount(keys, minlength=length).reshape(k, n_groups)
+    sums = np.bincount(keys, weights=cells, minlength=length).reshape(k, n_groups)
+    sq = np.bincount(keys, weights=cells * cells, minlength=length).reshape(k, n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ss = np.where(counts > 0, sq - sums ** 2 / counts, 0.0)
+    return ss.clip(min=0).sum(axis=1), np.maximum(counts - 1, 0).sum(axis=1)
+
+
+def wide_stats(values: np.ndarray, subgroups: Optional[np.ndarray] = None,
+               subgroup_size: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Estadísticos por columna de una matriz (filas × características), ignorando NaN con la
+    regla de capability: rangos móviles entre valores válidos consecutivos y subgrupos por
+    tamaño formados con los valores válidos de cada columna.
+    Se procesa por bloques de columnas; los bloques sin NaN evitan las máscaras.
+    """
+    n_rows, k = values.shape
+    out = {key: np.zeros(k) for key in ("n", "mean", "sq", "mr_sum", "n_mr", "within_ss", "within_dof")}
+    if subgroups is not None and n_rows:
+        order, starts = _group_bounds(np.unique(subgroups, return_inverse=True)[1].ravel())
+    step = max(1, _BLOCK_CELLS // max(n_rows, 1))
+    for lo in range(0, k, step):
+        cols = slice(lo, lo + step)
+        block = values[:, cols]
+        has_nan = np.isnan(block).any()
+        valid = ~np.isnan(block) if has_nan else None
+        count = valid.sum(axis=0) if has_nan else np.full(block.shape[1], n_rows)
+        mean = np.nansum(block, axis=0) / np.maximum(count, 1)
+        # Desvíos respecto de la media (suma de cuadrados sin cancelación numérica)
+        centered = block - mean
+        if has_nan:
+            centered[~valid] = 0.0
+        out["n"][cols] = count
+        out["mean"][cols] = mean
+        out["sq"][cols] = np.einsum("ij,ij->j", centered, centered)
+
+        if has_nan and n_rows:
+            # Rango móvil contra el último valor válido anterior de la misma columna
+            rows = np.arange(n_rows)[:, None]
+            last_valid = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+            previous = np.vstack([np.full((1, block.shape[1]), -1), last_valid[:-1]])
+            has_previous = valid & (previous >= 0)
+            moving = np.abs(block - np.take_along_axis(block, np.maximum(previous, 0), axis=0))
+            out["mr_sum"][cols] = np.where(has_previous, moving, 0.0).sum(axis=0)
+            out["n_mr"][cols] = has_previous.sum(axis=0)
+        else:
+            out["mr_sum"][cols] = np.abs(np.diff(block, axis=0)).sum(axis=0)
+            out["n_mr"][cols] = max(n_rows - 1, 0)
+
+        if subgroup_size and n_rows:
+            out["within_ss"][cols], out["within_dof"][cols] = _within_by_size(centered, valid, subgroup_size)
+        elif subgroups is not None and n_rows:
+            grouped = centered if order is None else centered[order]
+            if has_nan:
+                counts = np.add.reduceat((valid if order is None else valid[order]).astype(np.int64), starts, axis=0)
+            else:
+                counts = np.diff(np.r_[starts, n_rows])[:, None]
+            sums = np.add.reduceat(grouped, starts, axis=0)
+            sq = np.add.reduceat(grouped * grouped, starts, axis=0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ss = np.where(counts > 0, sq - sums ** 2 / counts, 0.0)
+            out["within_ss"][cols] = ss.clip(min=0).sum(axis=0)
+            out["within_dof"][cols] = np.broadcast_to(np.maximum(counts - 1, 0), ss.shape).sum(axis=0)
+    return out
+
+
+def long_stats(codes: np.ndarray, n_codes: int, values: np.ndarray,
+               subgroups: Optional[np.ndarray] = None, subgroup_size: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Estadísticos por característica en formato largo (código de característica por fila).
+    El rango móvil respeta el orden original de las filas dentro de cada característica;
+    los NaN se descartan antes (regla de capability), también para los subgrupos por tamaño.
+    """
+    keep = ~np.isnan(values)
+    codes, values = codes[keep], values[keep]
+    if subgroup_size:
+        # Bloques consecutivos de valores válidos dentro de cada característica
+        subgroups = size_subgroups(pd.Series(codes).groupby(codes).cumcount().to_numpy(), subgroup_size)
+    elif subgroups is not None:
+        subgroups = np.asarray(subgroups)[keep]
+    n = np.bincount(codes, minlength=n_codes).astype(float)
+    mean = np.bincount(codes, weights=values, minlength=n_codes) / np.maximum(n, 1)
+    sq = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=n_codes)
+
+    order, _ = _group_bounds(codes)
+    sorted_codes, sorted_values = (codes, values) if order is None else (codes[order], values[order])
+    same = sorted_codes[1:] == sorted_codes[:-1]
+    moving = np.abs(np.diff(sorted_values))[same]
+    mr_sum = np.bincount(sorted_codes[1:][same], weights=moving, minlength=n_codes)
+    n_mr = np.bincount(sorted_codes[1:][same], minlength=n_codes).astype(float)
+
+    within_ss = np.zeros(n_codes)
+    within_dof = np.zeros(n_codes)
+    if subgroups is not None:
+        sub_codes = np.unique(subgroups, return_inverse=True)[1].ravel()
+        centered = values - mean[codes]
+        cells = pd.DataFrame({"c": codes, "s": sub_codes, "count": 1.0, "sum": centered, "sq": centered ** 2})
+        grouped = cells.groupby(["c", "s"], sort=False).sum()
+        ss = (grouped["sq"] - grouped["sum"] ** 2 / grouped["count"]).clip(lower=0)
+        char = grouped.index.get_level_values("c").to_numpy()
+        within_ss = np.bincount(char, weights=ss.to_numpy(), minlength=n_codes)
+        within_dof = np.bincount(char, weights=(grouped["count"] - 1).to_numpy(dtype=float), minlength=n_codes)
+    return {"n": n, "mean": mean, "sq": sq, "mr_sum": mr_sum, "n_mr": n_mr,
+            "within_ss": within_ss, "within_dof": within_dof}
+
+
+def _sigmas(stats: Dict[str, np.ndarray]):
+    """Sigma global (n-1) y sigma dentro: agrupada si hay subgrupos, si no rango móvil / d2."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        overall = np.where(stats["n"] > 1, np.sqrt(stats["sq"] / (stats["n"] - 1)), np.nan)
+        pooled = np.sqrt(stats["within_ss"] / stats["within_dof"])
+        moving = stats["mr_sum"] / stats["n_mr"] / D2[2]
+    use_pooled = stats["within_dof"] > 0
+    use_mr = ~use_pooled & (stats["n_mr"] > 0)
+    within = np.where(use_pooled, pooled, np.where(use_mr, moving, overall))
+    method = np.where(use_pooled, "pooled", np.where(use_mr, "mr", "overall")).astype(object)
+    return overall, within, method
+
+
+# -----------------------------------------------------------------------------
+# Tablero
+# -----------------------------------------------------------------------------
+def _spec_table(specs: List[Dict[str, Any]]) -> pd.DataFrame:
+    if not specs:
+        raise ValueError("Se requiere la tabla de especificaciones ('specs') con lsl/usl por característica.")
+    table = pd.DataFrame(specs)
+    if "characteristic" not in table.columns:
+        raise ValueError("Cada especificación debe indicar 'characteristic'.")
+    for col in ("lsl", "usl", "target"):
+        table[col] = pd.to_numeric(table[col], errors="coerce") if col in table.columns else np.nan
+    table["characteristic"] = table["characteristic"].astype(str)
+    if table["characteristic"].duplicated().any():
+        dup = table.loc[table["characteristic"].duplicated(), "characteristic"].iloc[0]
+        raise ValueError(f"La característica '{dup}' tiene más de una especificación.")
+    return table.set_index("characteristic")
+
+
+def batch_capability(data: List[Dict[str, Any]], specs: List[Dict[str, Any]], params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Capacidad (Cp, Cpk, Pp, Ppk, DPMO, Z-bench) de todas las características con especificación.
+    params:
+    - characteristic_column / value_column: formato largo (si no, ancho: una columna por característica).
+    - subgroup_column o subgroup_size: subgrupos racionales para la sigma dentro.
+    - shift (1.5), sort_by ('cpk', 'ppk', 'dpmo', 'z_bench'), limit (filas del ranking).
+    """
+    # 1. Validación
+    if not data:
+        raise ValueError("Se requieren datos para el tablero de capacidad.")
+    spec_table = _spec_table(specs)
+    sort_by = params.get("sort_by", "cpk")
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"'sort_by' debe ser uno de: {', '.join(SORT_KEYS)}.")
+    shift = float(params.get("shift", 1.5))
+    limit = params.get("limit")
+
+    df = pd.DataFrame(data)
+    char_col = params.get("characteristic_column")
+    subgroup_col = params.get("subgroup_column")
+    for col in (char_col, subgroup_col):
+        if col is not None and col not in df.columns:
+            raise ValueError(f"Falta la columna requerida: {col}")
+    subgroups = df[subgroup_col].astype(str).to_numpy() if subgroup_col is not None else None
+    size = params.get("subgroup_size")
+    size = validate_subgroup_size(size) if size and subgroups is None else None
+
+    # 2. Estadísticos por característica (una pasada vectorizada)
+    if char_col is not None:
+        value_col = params.get("value_column", "value")
+        if value_col not in df.columns:
+            raise ValueError(f"Falta la columna requerida: {value_col}")
+        names, codes = np.unique(df[char_col].astype(str).to_numpy(), return_inverse=True)
+        stats = long_stats(codes.ravel(), len(names), pd.to_numeric(df[value_col], errors="coerce").to_numpy(dtype=float),
+                           subgroups, size)
+        names = names.astype(object)
+    else:
+        columns = [c for c in df.columns if c != subgroup_col and str(c) in spec_table.index]
+        if not columns:
+            raise ValueError("Ninguna columna de los datos coincide con las características de 'specs'.")
+        matrix = df[columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        stats = wide_stats(matrix, subgroups, size)
+        names = np.array([str(c) for c in columns], dtype=object)
+
+    # 3. Cruce con las especificaciones
+    has_spec = np.isin(names, spec_table.index.to_numpy())
+    missing_specs = names[~has_spec].tolist()
+    missing_data = sorted(set(spec_table.index) - set(names))
+    names = names[has_spec]
+    stats = {k: v[has_spec] for k, v in stats.items()}
+    limits = spec_table.reindex(names)
+    lsl, usl, target = (limits[c].to_numpy(dtype=float) for c in ("lsl", "usl", "target"))
+
+    invalid = (np.isnan(lsl) & np.isnan(usl)) | (lsl >= usl) | (stats["n"] < 2)
+    invalid_specs = names[invalid].tolist()
+
+    # 4. Índices (arreglos: una posición por característica)
+    overall, within, method = _sigmas(stats)
+    indices = normal_indices(stats["mean"], within, overall, lsl, usl,
+                             target if not np.isnan(target).all() else None)
+    defect_rate = indices["ppm_total"] / 1e6
+    z_st = z_bench(defect_rate)
+
+    table = pd.DataFrame({
+        "characteristic": names,
+        "n": stats["n"].astype(np.int64),
+        "mean": stats["mean"],
+        "std_overall": overall,
+        "sigma_within": within,
+        "sigma_method": method,
+        "lsl": lsl, "usl": usl,
+        **{k: indices[k] for k in ("cp", "cpk", "pp", "ppk")},
+        "dpmo": indices["ppm_total"],
+        "dpmo_within": indices["ppm_within"],
+        "z_bench_st": z_st,
+        "z_bench_lt": z_st - shift,
+    })
+    if "cpm" in indices:
+        table["cpm"] = indices["cpm"]
+    table = table[~invalid]
+
+    # Clasificación por Cpk (AIAG): >= 1.33 capaz, >= 1.0 marginal, si no, no capaz
+    status_labels = np.array(["No capaz", "Marginal", "Capaz"], dtype=object)
+    cpk = table["cpk"].to_numpy()
+    table["status"] = status_labels[(cpk >= 1.0).astype(np.int64) + (cpk >= 1.33)]
+
+    # 5. Ranking: el peor primero
+    column, ascending = SORT_KEYS[sort_by]
+    table = table.sort_values(column, ascending=ascending, na_position="last", kind="stable").reset_index(drop=True)
+    table.insert(0, "rank", np.arange(1, len(table) + 1))
+    numeric = table.select_dtypes(include="number").columns.drop("rank")
+    table[numeric] = table[numeric].round(4)
+    ranking = table.head(int(limit)) if limit else table
+    ranking = ranking.replace([np.inf, -np.inf], np.nan)
+
+    counts = table["status"].value_counts()
+    return {
+        "characteristics": int(len(table)),
+        "sort_by": sort_by,
+        "status_counts": {k: int(counts.get(k, 0)) for k in ("Capaz", "Marginal", "No capaz")},
+        "worst": ranking.iloc[0]["characteristic"] if len(ranking) else None,
+        "ranking": ranking.astype(object).where(ranking.notna(), None).to_dict(orient="records"),
+        "missing_specs": missing_specs[:100],
+        "missing_data": missing_data[:100],
+        "invalid_specs": invalid_specs[:100],
+    }
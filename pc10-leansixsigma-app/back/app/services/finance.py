@@ -0,0 +1,107 @@
+# backend/app/services/finance.py
+"""
+Núcleos financieros vectorizados (VAN, TIR, Payback).
+
+Todas las funciones reciben una matriz de flujos (filas × periodos), donde cada fila
+es un escenario de simulación o un proyecto, y calculan el indicador para todas las
+filas a la vez. Un vector 1D se trata como una sola fila.
+"""
+import numpy as np
+
+# Límite inferior de la tasa: (1 + r) debe ser positivo para descontar
+_MIN_RATE = -0.9999
+
+
+def _as_matrix(flows) -> np.ndarray:
+    return np.atleast_2d(np.asarray(flows, dtype=float))
+
+
+def discount_factors(n_periods: int, rate: float) -> np.ndarray:
+    """Factores 1 / (1 + r)^t para t = 0..n_periods-1."""
+    return (1.0 + rate) ** -np.arange(n_periods, dtype=float)
+
+
+def npv(flows, rate: float) -> np.ndarray:
+    """Valor Actual Neto de cada fila (el periodo 0 no se descuenta)."""
+    flows = _as_matrix(flows)
+    return flows @ discount_factors(flows.shape[1], rate)
+
+
+def payback_period(flows, rate: float = 0.0) -> np.ndarray:
+    """
+    Primer periodo en que el flujo acumulado (descontado si rate > 0) es >= 0.
+    NaN si la inversión no se recupera en el horizonte analizado.
+    """
+    flows = _as_matrix(flows)
+    cumulative = np.cumsum(flows * discount_factors(flows.shape[1], rate), axis=1)
+    recovered = cumulative >= 0
+    first = recovered.argmax(axis=1).astype(float)
+    first[~recovered.any(axis=1)] = np.nan
+    return first
+
+
+def _npv_at(flows: np.ndarray, rates: np.ndarray) -> np.ndarray:
+    """VAN de cada fila a su propia tasa."""
+    t = np.arange(flows.shape[1], dtype=float)
+    return (flows * (1.0 + rates)[:, None] ** -t).sum(axis=1)
+
+
+def irr(flows, guess: float = 0.1, tol: float = 1e-7, max_iter: int = 50,
+        bisection_iter: int = 100, upper_rate: float = 10.0) -> np.ndarray:
+    """
+    Tasa Interna de Retorno de cada fila.
+
+    1. Newton-Raphson vectorizado sobre todas las filas activas a la vez.
+    2. Las filas que no convergen (derivada nula, salto fuera de dominio) se resuelven
+       por bisección vectorizada en [-0.9999, upper_rate].
+    NaN si la fila no tiene cambio de signo o no hay raíz en el intervalo.
+    """
+    flows = _as_matrix(flows)
+    n_rows, n_periods = flows.shape
+    t = np.arange(n_periods, dtype=float)
+
+    result = np.full(n_rows, np.nan)
+    # Sin flujos positivos y negativos no existe TIR
+    valid = (flows > 0).any(axis=1) & (flows < 0).any(axis=1)
+
+    # 1. Newton
+    rate = np.full(n_rows, guess, dtype=float)
+    pending = valid.copy()
+    for _ in range(max_iter):
+        idx = np.flatnonzero(pending)
+        if idx.size == 0:
+            break
+        r = rate[idx]
+        cf = flows[idx]
+        disc = (1.0 + r)[:, None] ** -t
+        f = (cf * disc).sum(axis=1)
+        df = -(t * cf * disc).sum(axis=1) / (1.0 + r)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            new_rate = r - f / df
+        usable = np.isfinite(new_rate) & (new_rate > _MIN_RATE)
+
+        done = usable & (np.abs(new_rate - r) < tol)
+        result[idx[done]] = new_rate[done]
+        rate[idx[usable]] = new_rate[usable]
+        # Las filas con pasos inválidos pasan directo a bisección
+        pending[idx[done | ~usable]] = False
+
+    # 2. Bisección para lo que Newton no resolvió
+    fallback = np.flatnonzero(valid & np.isnan(result))
+    if fallback.size:
+        cf = flows[fallback]
+        lo = np.full(fallback.size, _MIN_RATE)
+        hi = np.full(fallback.size, upper_rate)
+        f_lo = _npv_at(cf, lo)
+        bracketed = np.sign(f_lo) != np.sign(_npv_at(cf, hi))
+        for _ in range(bisection_iter):
+            mid = (lo + hi) / 2
+            f_mid = _npv_at(cf, mid)
+            same = np.sign(f_mid) == np.sign(f_lo)
+            lo = np.where(same, mid, lo)
+            f_lo = np.where(same, f_mid, f_lo)
+            hi = np.where(same, hi, mid)
+        result[fallback[bracketed]] = ((lo + hi) / 2)[bracketed]
+
+    return result
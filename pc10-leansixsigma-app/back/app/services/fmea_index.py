@@ -0,0 +1,188 @@
+# backend/app/services/fmea_index.py
+"""
+Índice incremental de un AMEF guardado en el servidor (edición fila por fila).
+
+Al crear el índice se evalúa la tabla completa con el motor de riesgos (vectorizado, O(n)).
+Después, cada edición de una fila ajusta los contadores (NPR total, conteos por categoría
+y por AP, fallas críticas) y agrega una entrada al montículo de prioridades, en O(log n):
+- El montículo guarda (-NPR, -S, fila, versión). Las entradas de versiones anteriores de
+  una fila quedan "vencidas" y se descartan al llegar a la cima (borrado perezoso).
+- Si las entradas vencidas superan a las vigentes, el montículo se reconstruye (O(n), amortizado).
+"""
+import heapq
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.services import risk_engine
+from app.services.risk_engine import AP_NAMES, HIGH_RISK_NPR, RATINGS, REVISED
+
+REQUIRED_COLUMNS = ["function_part", "failure_mode", "severity", "occurrence", "detection"]
+
+
+class FmeaIndex:
+    """Estado incremental de un AMEF: calificaciones por fila, totales y top de riesgos."""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        if not records:
+            raise ValueError("La tabla AMEF está vacía.")
+        df = pd.DataFrame(records)
+        missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+        if missing:
+            raise ValueError(f"Faltan las columnas requeridas: {', '.join(missing)}")
+
+        scored = risk_engine.score_risks(df)
+        self.records = [dict(r) for r in records]
+        self.severity = scored["severity"].to_numpy(dtype=np.int64).copy()
+        self.npr = scored["npr"].to_numpy(dtype=np.int64).copy()
+        self.revised_npr = (scored["revised_npr"] if "revised_npr" in scored.columns
+                            else scored["npr"]).to_numpy(dtype=np.int64).copy()
+        self.category = scored["risk_category"].to_numpy(dtype=object).copy()
+        self.ap = scored["action_priority"].to_numpy(dtype=object).copy()
+        self.version = np.zeros(len(df), dtype=np.int64)
+
+        self.category_counts = Counter(self.category.tolist())
+        self.ap_counts = Counter(self.ap.tolist())
+        self.total = int(self.npr.sum())
+        self.revised_total = int(self.revised_npr.sum())
+        self.critical = int((self.npr >= HIGH_RISK_NPR).sum())
+        self._rebuild_heap()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    # -------------------------------------------------------------------------
+    # Montículo con borrado perezoso
+    # -------------------------------------------------------------------------
+    def _rebuild_heap(self):
+        self._heap = list(zip((-self.npr).tolist(), (-self.severity).tolist(),
+                              range(len(self.records)), self.version.tolist()))
+        heapq.heapify(self._heap)
+        self._stale = 0
+
+    def _is_current(self, entry) -> bool:
+        return entry[3] == self.version[entry[2]]
+
+    def _drop_stale_top(self):
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+            self._stale -= 1
+
+    # -------------------------------------------------------------------------
+    # Edición
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _rating(field: str, value) -> int:
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = float("nan")
+        if not (1 <= number <= 10) or number != round(number):
+            raise ValueError(f"'{field}' debe ser un entero entre 1 y 10 (recibido: {value}).")
+        return int(number)
+
+    def update(self, row_id: int, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Aplica los cambios a una fila y actualiza totales y prioridades en O(log n)."""
+        if not 0 <= row_id < len(self.records):
+            raise KeyError(row_id)
+        with self._lock:
+            record = {**self.records[row_id], **changes}
+            ratings = [self._rating(c, record.get(c)) for c in RATINGS]
+            revised = [
+                self._rating(REVISED[c], record[REVISED[c]]) if record.get(REVISED[c]) is not None else ratings[i]
+                for i, c in enumerate(RATINGS)
+            ]
+            new_npr = int(risk_engine.npr(*ratings))
+            new_category = risk_engine.classify_npr(new_npr)[()]
+            new_ap = risk_engine.action_priority(*ratings)
+
+            # Quitar el aporte anterior de la fila y sumar el nuevo
+            old_npr = int(self.npr[row_id])
+            self.category_counts[self.category[row_id]] -= 1
+            self.ap_counts[self.ap[row_id]] -= 1
+            self.category_counts[new_category] += 1
+            self.ap_counts[new_ap] += 1
+            self.total += new_npr - old_npr
+            new_revised = int(risk_engine.npr(*revised))
+            self.revised_total += new_revised - int(self.revised_npr[row_id])
+            self.critical += int(new_npr >= HIGH_RISK_NPR) - int(old_npr >= HIGH_RISK_NPR)
+
+            self.records[row_id] = record
+            self.severity[row_id], self.npr[row_id], self.revised_npr[row_id] = ratings[0], new_npr, new_revised
+            self.category[row_id], self.ap[row_id] = new_category, new_ap
+
+            # Nueva versión de la fila en el montículo (la anterior queda vencida)
+            self.version[row_id] += 1
+            heapq.heappush(self._heap, (-new_npr, -ratings[0], row_id, int(self.version[row_id])))
+            self._stale += 1
+            if self._stale > len(self.records):
+                self._rebuild_heap()
+            return self.row(row_id)
+
+    # -------------------------------------------------------------------------
+    # Consultas
+    # -------------------------------------------------------------------------
+    def row(self, row_id: int) -> Dict[str, Any]:
+        return {
+            "row_id": row_id, **self.records[row_id],
+            "npr": int(self.npr[row_id]),
+            "risk_category": self.category[row_id],
+            "action_priority": self.ap[row_id],
+            "revised_npr": int(self.revised_npr[row_id]),
+        }
+
+    def top(self, n: int = 20) -> List[Dict[str, Any]]:
+        """Los n riesgos de mayor NPR (desempate por severidad), en O(n log N)."""
+        with self._lock:
+            taken = []
+            while self._heap and len(taken) < n:
+                entry = heapq.heappop(self._heap)
+                if self._is_current(entry):
+                    taken.append(entry)
+                else:
+                    self._stale -= 1
+            for entry in taken:
+                heapq.heappush(self._heap, entry)
+            return [self.row(entry[2]) for entry in taken]
+
+    def details(self) -> Dict[str, Any]:
+        with self._lock:
+            self._drop_stale_top()
+            n = len(self.records)
+            return {
+                "total_items": n,
+                "max_npr": -self._heap[0][0] if self._heap else 0,
+                "total_risk_sum": self.total,
+                "avg_npr": round(self.total / n, 2),
+                "critical_count": self.critical,
+                "category_counts": {k: v for k, v in self.category_counts.items() if v > 0},
+                "action_priority_counts": {AP_NAMES[k]: v for k, v in self.ap_counts.items() if v > 0},
+                "revised_total_risk_sum": self.revised_total,
+                "total_npr_reduction": self.total - self.revised_total,
+            }
+
+
+class FmeaStore:
+    """Caché LRU de índices AMEF por Dataset (seguro entre hilos del servidor)."""
+
+    def __init__(self, max_items: int = 16):
+        self.max_items = max_items
+        self._items: "OrderedDict[int, FmeaIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, dataset_id: int, index: FmeaIndex) -> FmeaIndex:
+        with self._lock:
+            self._items[dataset_id] = index
+            self._items.move_to_end(dataset_id)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return index
+
+    def get(self, dataset_id: int) -> Optional[FmeaIndex]:
+        with self._lock:
+            index = self._items.get(dataset_id)
+            if index is not None:
+                self._items.move_to_end(dataset_id)
+            return index
@@ -0,0 +1,182 @@
+# backend/app/services/keyword_matcher.py
+"""
+Clasificación de textos por taxonomía de palabras clave (español e inglés).
+
+Todas las palabras clave de la taxonomía se compilan en UNA expresión regular de
+alternación (las más largas primero, con límites de palabra) y se aplican con los
+métodos vectorizados .str de pandas sobre texto normalizado (minúsculas, sin tildes).
+Solo se analizan los textos distintos: en un plan de control con decenas de miles de
+puntos los métodos de control se repiten mucho. Cada texto puede pertenecer a varios
+tipos; el primero de la taxonomía que coincide es el tipo principal.
+Cada palabra clave acepta además sus flexiones regulares (plurales en español e inglés y
+-ed/-ing/-er en inglés): "test" reconoce "tests", "tested" y "testing".
+
+Los matchers compilados se guardan en caché por taxonomía.
+"""
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import numpy as np
+import pandas as pd
+from app.services.text_pipeline import normalize
+
+# Separadores equivalentes dentro de una palabra clave ("poka-yoke" = "poka yoke")
+_SEPARATORS = re.compile(r"[\s\-_/]+")
+# Flexiones regulares admitidas al final de una palabra clave (plurales, -ed, -ing, -er)
+_INFLECTIONS = r"(?:s|es|ed|ing|ings|er|ers)?"
+
+# Taxonomía por defecto de métodos de control (orden = prioridad del tipo principal).
+# 'category' agrupa los tipos en Preventivo / Detectivo (AIAG: prevención vs detección).
+CONTROL_TAXONOMY: Dict[str, Dict[str, Any]] = {
+    "Prueba de error": {
+        "category": "Preventivo",
+        "keywords": [
+            "poka yoke", "a prueba de error", "a prueba de errores", "anti error", "error proofing",
+            "mistake proofing", "fool proof", "foolproof", "enclavamiento", "interlock", "dispositivo de bloqueo",
+            "lockout", "guia de posicionamiento", "locating pin", "pin guia", "plantilla", "fixture",
+        ],
+    },
+    "Automático": {
+        "category": "Preventivo",
+        "keywords": [
+            "automatico", "automatica", "automatizado", "automatic", "automated", "sensor", "sensores",
+            "plc", "vision artificial", "machine vision", "camara", "camera", "lazo cerrado", "closed loop",
+            "control automatico", "paro automatico", "auto stop", "alarma automatica", "apc", "scada",
+        ],
+    },
+    "Preventivo": {
+        "category": "Preventivo",
+        "keywords": [
+            "diseno", "design", "preventivo", "preventiva", "preventive", "mantenimiento preventivo",
+            "preventive maintenance", "tpm", "mantenimiento autonomo", "trabajo estandar", "standard work",
+            "estandarizacion", "standardization", "capacitacion", "training", "setup verification",
+            "liberacion de primera pieza", "first piece approval", "smed",
+        ],
+    },
+    "Control estadístico": {
+        "category": "Detectivo",
+        "keywords": [
+            "spc", "control estadistico", "statistical process control", "grafica de control", "grafico de control",
+            "carta de control", "control chart", "x r", "xbar", "x barra", "imr", "i mr", "cusum", "ewma",
+            "grafica p", "grafica np", "grafica c", "grafica u", "p chart", "np chart", "c chart", "u chart",
+            "cpk", "capacidad",
+        ],
+    },
+    "Inspección": {
+        "category": "Detectivo",
+        "keywords": [
+            "inspeccion", "inspection", "visual", "auditoria", "audit", "checklist", "check list",
+            "lista de verificacion", "muestreo", "sampling", "sample", "inspect", "prueba", "test", "ensayo", "medicion",
+            "measurement", "calibracion", "calibration", "gauge", "galga", "calibrador", "verificacion",
+            "verification", "revision", "review", "100%",
+        ],
+    },
+}
+
+_CACHE: "OrderedDict[str, KeywordMatcher]" = OrderedDict()
+_CACHE_SIZE = 32
+_CACHE_LOCK = threading.Lock()
+
+
+def _canonical(keyword: str) -> str:
+    text = normalize(pd.Series([keyword])).iloc[0]
+    return _SEPARATORS.sub(" ", text).strip()
+
+
+class KeywordMatcher:
+    """Matcher compilado de una taxonomía {tipo: {'category': ..., 'keywords': [...]}}."""
+
+    def __init__(self, taxonomy: Dict[str, Dict[str, Any]]):
+        if not taxonomy:
+            raise ValueError("La taxonomía de palabras clave está vacía.")
+        self.types = list(taxonomy)
+        self.categories = {t: spec.get("category") for t, spec in taxonomy.items()}
+        self.keyword_type: Dict[str, int] = {}
+        for type_code, spec in enumerate(taxonomy.values()):
+            for keyword in spec.get("keywords", []):
+                canonical = _canonical(str(keyword))
+                # Si una palabra aparece en dos tipos, gana el de mayor prioridad (el primero)
+                if canonical and canonical not in self.keyword_type:
+                    self.keyword_type[canonical] = type_code
+        if not self.keyword_type:
+            raise ValueError("La taxonomía no tiene palabras clave válidas.")
+
+        # Alternación única: las palabras más largas primero (ej: 'control automatico' antes que 'control')
+        alternatives = sorted(self.keyword_type, key=len, reverse=True)
+        body = "|".join(r"[\s\-_/]+".join(map(re.escape, k.split(" "))) for k in alternatives)
+        # Límites de palabra que también funcionan con palabras que empiezan/terminan en símbolo (ej: '100%').
+        # El grupo captura solo la palabra clave (sin la flexión) para mapearla a su tipo.
+        self.pattern = re.compile(rf"(?<![a-z0-9])({body}){_INFLECTIONS}(?![a-z0-9])")
+
+    def classify(self, texts: pd.Series) -> pd.DataFrame:
+        """
+        Por texto: control_types (tipos encontrados, en orden de prioridad), primary_type,
+        category (del tipo principal) y matched_keywords. Textos sin coincidencias: tipo None.
+        """
+        codes, uniques = pd.factorize(texts.fillna("").astype(str))
+        n_unique = len(uniques)
+        matches = normalize(pd.Series(uniques, dtype=object)).str.findall(self.pattern)
+
+        # Coincidencias en formato largo: (texto único, tipo)
+        exploded = matches.explode().dropna()
+        keywords = exploded.str.replace(_SEPARATORS, " ", regex=True)
+        type_codes = keywords.map(self.keyword_type).to_numpy(dtype=np.int64)
+        flags = np.zeros((n_unique, len(self.types)), dtype=bool)
+        flags[exploded.index.to_numpy(dtype=np.int64), type_codes] = True
+
+        any_match = flags.any(axis=1)
+        primary_code = np.where(any_match, flags.argmax(axis=1), -1)
+        type_names = np.array(self.types + [None], dtype=object)
+        category_names = np.array([self.categories[t] for t in self.types] + [None], dtype=object)
+        found_types = [type_names[np.flatnonzero(row)].tolist() for row in flags]
+        # Palabras encontradas por texto único (listas cortas: se arman sobre los únicos, no por fila)
+        matched = [sorted({_SEPARATORS.sub(" ", k) for k in found}) for found in matches]
+
+        per_unique = pd.DataFrame({
+            "control_types": found_types,
+            "primary_type": type_names[primary_code],
+            "category": category_names[primary_code],
+            "matched_keywords": matched,
+        })
+        # Resultado por fila: se expande desde los textos únicos con los códigos de factorize
+        result = per_unique.iloc[codes].reset_index(drop=True)
+        result.index = texts.index
+        return result
+
+
+def build_taxonomy(custom: Optional[Dict[str, Any]] = None, merge: bool = True,
+                   base: Dict[str, Dict[str, Any]] = CONTROL_TAXONOMY) -> Dict[str, Dict[str, Any]]:
+    """
+    Taxonomía efectiva. 'custom' acepta {tipo: [palabras]} o {tipo: {'category': ..., 'keywords': [...]}};
+    con merge=True las palabras se agregan a los tipos existentes (los tipos nuevos van al final).
+    """
+    taxonomy = {t: {"category": s.get("category"), "keywords": list(s.get("keywords", []))}
+                for t, s in base.items()} if merge else {}
+    for type_name, spec in (custom or {}).items():
+        if isinstance(spec, (list, tuple)):
+            spec = {"keywords": list(spec)}
+        if not isinstance(spec, dict):
+            raise ValueError(f"La entrada '{type_name}' de la taxonomía debe ser una lista o un objeto con 'keywords'.")
+        entry = taxonomy.setdefault(type_name, {"category": spec.get("category"), "keywords": []})
+        entry["keywords"].extend(spec.get("keywords", []))
+        if spec.get("category"):
+            entry["category"] = spec["category"]
+    return taxonomy
+
+
+def get_matcher(taxonomy: Dict[str, Dict[str, Any]]) -> KeywordMatcher:
+    """Matcher compilado (en caché LRU por contenido de la taxonomía)."""
+    key = json.dumps(taxonomy, sort_keys=False, ensure_ascii=False)
+    with _CACHE_LOCK:
+        matcher = _CACHE.get(key)
+        if matcher is not None:
+            _CACHE.move_to_end(key)
+            return matcher
+    matcher = KeywordMatcher(taxonomy)
+    with _CACHE_LOCK:
+        _CACHE[key] = matcher
+        while len(_CACHE) > _CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return matcher
@@ -0,0 +1,208 @@
+# backend/app/services/process_simulation.py
+"""
+Simulación de eventos discretos para mapas de proceso (AS-IS vs TO-BE).
+
+Cada paso es una estación con 'capacity' servidores y un tiempo de servicio aleatorio;
+las decisiones enrutan a las entidades según la probabilidad de cada salida. El motor
+usa un heap de eventos (llegadas y fines de servicio) y colas FIFO por estación.
+Las réplicas son independientes (semillas derivadas con SeedSequence) y se ejecutan
+en paralelo en el pool de procesos compartido y acotado (app.services.worker_pool).
+
+Números aleatorios comunes: cada fuente aleatoria tiene su propio flujo, derivado de la
+semilla de la réplica y de una clave estable (llegadas; servicio y enrutamiento por ID de
+paso). Así AS-IS y TO-BE reciben las mismas llegadas y, en los pasos que comparten ID,
+los mismos tiempos de servicio y decisiones de ruteo, aunque el resto del mapa cambie.
+"""
+import heapq
+import zlib
+from bisect import bisect_right
+from collections import deque
+from typing import List, Optional
+import numpy as np
+from app.services import worker_pool
+
+_BLOCK = 1024  # Números aleatorios pre-generados por bloque (evita una llamada a NumPy por evento)
+
+ARRIVAL, DEPARTURE = 0, 1
+
+# Claves de flujo aleatorio (primer componente del spawn_key de cada fuente)
+_ARRIVALS, _SERVICE, _ROUTING = 0, 1, 2
+
+
+def stream_key(step_id) -> int:
+    """Clave estable (entre escenarios y procesos) del flujo aleatorio de un paso."""
+    return zlib.crc32(str(step_id).encode("utf-8"))
+
+
+def _source_rng(seed: np.random.SeedSequence, *key: int) -> np.random.Generator:
+    """Generador independiente de una fuente aleatoria, hijo de la semilla de la réplica."""
+    return np.random.default_rng(
+        np.random.SeedSequence(seed.entropy, spawn_key=tuple(seed.spawn_key) + key)
+    )
+
+
+class _Stream:
+    """Flujo de números aleatorios de una distribución, generados por bloques vectorizados."""
+
+    def __init__(self, draw):
+        self._draw = draw
+        self._buffer = []
+
+    def next(self) -> float:
+        if not self._buffer:
+            self._buffer = self._draw(_BLOCK).tolist()[::-1]
+        return self._buffer.pop()
+
+
+def _service_draw(rng: np.random.Generator, dist: str, mean: float, low: float, high: float, std: float):
+    """Función de muestreo por bloques para el tiempo de servicio de una estación."""
+    if mean <= 0 and dist != "triangular":
+        return lambda size: np.zeros(size)
+    if dist == "exponential":
+        return lambda size: rng.exponential(mean, size)
+    if dist == "triangular":
+        return lambda size: rng.triangular(low, mean, high, size) if high > low else np.full(size, mean)
+    if dist == "normal":
+        return lambda size: np.maximum(rng.normal(mean, std, size), 0.0)
+    if dist == "lognormal":
+        sigma2 = np.log1p((std / mean) ** 2)
+        mu = np.log(mean) - sigma2 / 2
+        return lambda size: rng.lognormal(mu, np.sqrt(sigma2), size)
+    return lambda size: np.full(size, mean)
+
+
+def simulate(model: dict, seed, sim_time: float, warmup: float = 0.0, max_events: int = 5_000_000) -> dict:
+    """
+    Una réplica de la simulación.
+
+    model: dict con listas por estación (service_dist, mean, low, high, std, capacity),
+    'successors'/'cum_probs' por estación (enrutamiento), 'start', 'arrival_mean' y,
+    opcionalmente, 'stream_keys' (clave del flujo aleatorio de cada estación; por defecto su posición).
+    Las estadísticas se acumulan solo en [warmup, sim_time].
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    n = len(model["mean"])
+    capacity = model["capacity"]
+    keys = model.get("stream_keys") or list(range(n))
+    services = [
+        _Stream(_service_draw(_source_rng(seed, _SERVICE, keys[i]), model["service_dist"][i], model["mean"][i],
+                              model["low"][i], model["high"][i], model["std"][i]))
+        for i in range(n)
+    ]
+    routing_rngs = [_source_rng(seed, _ROUTING, keys[i]) for i in range(n)]
+    routing = [_Stream(rng.random) for rng in routing_rngs]
+    arrival_rng = _source_rng(seed, _ARRIVALS)
+    interarrival = _Stream(lambda size: arrival_rng.exponential(model["arrival_mean"], size))
+    successors, cum_probs = model["successors"], model["cum_probs"]
+
+    busy = [0] * n
+    queues = [deque() for _ in range(n)]
+    # Áreas bajo la curva (integrales en el tiempo) para promedios ponderados
+    queue_area = [0.0] * n
+    busy_area = [0.0] * n
+    last_change = [warmup] * n
+    wip = 0
+    wip_area = 0.0
+    wip_last = warmup
+    max_queue = [0] * n
+
+    cycle_times: List[float] = []
+    completed = 0
+    events = [(interarrival.next(), 0, ARRIVAL, -1, model["start"])]
+    seq = 1
+    n_events = 0
+
+    def touch(node: int, now: float):
+        # Acumula el área de cola/ocupación de la estación hasta 'now'
+        t = max(now, warmup)
+        if t > last_change[node]:
+            dt = t - last_change[node]
+            queue_area[node] += len(queues[node]) * dt
+            busy_area[node] += busy[node] * dt
+            last_change[node] = t
+
+    def enter(node: int, entity_start: float, now: float):
+        nonlocal seq, wip, wip_area, wip_last, completed
+        # Estaciones sin salida (Fin o callejón) absorben a la entidad
+        if not successors[node]:
+            if entity_start >= warmup:
+                cycle_times.append(now - entity_start)
+            if now >= warmup:
+                completed += 1
+            t = max(now, warmup)
+            wip_area += wip * (t - wip_last)
+            wip_last = t
+            wip -= 1
+            return
+        touch(node, now)
+        if busy[node] < capacity[node]:
+            busy[node] += 1
+            heapq.heappush(events, (now + services[node].next(), seq, DEPARTURE, entity_start, node))
+            seq += 1
+        else:
+            queues[node].append(entity_start)
+            if len(queues[node]) > max_queue[node]:
+                max_queue[node] = len(queues[node])
+
+    while events and n_events < max_events:
+        now, _, kind, entity_start, node = heapq.heappop(events)
+        if now > sim_time:
+            break
+        n_events += 1
+
+        if kind == ARRIVAL:
+            t = max(now, warmup)
+            wip_area += wip * (t - wip_last)
+            wip_last = t
+            wip += 1
+            heapq.heappush(events, (now + interarrival.next(), seq, ARRIVAL, -1, node))
+            seq += 1
+            enter(node, now, now)
+            continue
+
+        # Fin de servicio: se libera el servidor y se atiende al siguiente en cola
+        touch(node, now)
+        busy[node] -= 1
+        if queues[node]:
+            busy[node] += 1
+            heapq.heappush(events, (now + services[node].next(), seq, DEPARTURE, queues[node].popleft(), node))
+            seq += 1
+
+        # Enrutamiento a la siguiente estación
+        options = successors[node]
+        nxt = options[0] if len(options) == 1 else options[
+            min(bisect_right(cum_probs[node], routing[node].next()), len(options) - 1)
+        ]
+        enter(nxt, entity_start, now)
+
+    for node in range(n):
+        touch(node, sim_time)
+    wip_area += wip * (sim_time - max(wip_last, warmup))
+
+    horizon = max(sim_time - warmup, 1e-12)
+    return {
+        "completed": completed,
+        "throughput": completed / horizon,
+        "avg_wip": wip_area / horizon,
+        "cycle_times": np.asarray(cycle_times),
+        "avg_queue": np.asarray(queue_area) / horizon,
+        "max_queue": np.asarray(max_queue),
+        "utilization": np.asarray(busy_area) / (np.asarray(capacity, dtype=float) * horizon),
+        "events": n_events,
+        "truncated": n_events >= max_events,
+    }
+
+
+def run_replications(model: dict, replications: int, sim_time: float, warmup: float = 0.0,
+                     random_state: Optional[int] = 42, n_jobs: Optional[int] = None) -> List[dict]:
+    """
+    Ejecuta réplicas independientes con semillas derivadas. Con n_jobs=1 (o una réplica)
+    se ejecutan en el proceso actual; si no, en el pool compartido de a lo sumo worker_pool.MAX_WORKERS
+    procesos (n_jobs menor limita cuántas réplicas de esta solicitud corren a la vez).
+    """
+    seeds = np.random.SeedSequence(random_state).spawn(replications)
+    if replications == 1 or n_jobs == 1:
+        return [simulate(model, seed, sim_time, warmup) for seed in seeds]
+
+    return worker_pool.run_tasks(simulate, [(model, seed, sim_time, warmup) for seed in seeds], n_jobs)
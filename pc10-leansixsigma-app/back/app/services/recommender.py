@@ -1,170 +1,433 @@
 # backend/app/services/recommender.py
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import hashlib
+import json
+import threading
+from pathlib import Path
+import numpy as np
+import joblib
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from sqlalchemy import func
+from sqlmodel import Session, select
+from app.core.database import engine
+from app.domain.models import ToolKnowledge, RecommendationFeedback
 from app.domain.tools_matrix import TOOLS_DMAIC_MATRIX
 
+# Artefacto con el índice precalculado (matriz TF-IDF + IDF congelado).
+# Se guarda junto a la base SQLite y se reconstruye solo si la base de conocimiento cambia.
+INDEX_PATH = Path("recommender_index.joblib")
+
+PHASE_CODES = ["D", "M", "A", "I", "C"]
+
+# Espacio de términos por hashing: permite vectorizar una herramienta nueva sin reentrenar el vocabulario
+_HASHER = HashingVectorizer(n_features=2**18, alternate_sign=False, norm=None)
+
+# Tras tantas ediciones incrementales (relativo al tamaño de la base) se recalcula el IDF completo
+REBUILD_RATIO = 0.25
+
+# Convertimos 'Define' -> 'D', etc.
+PHASE_MAP = {
+    "Define": "D", "Measure": "M", "Analyze": "A",
+    "Improve": "I", "Control": "C",
+    "Definir": "D", "Medir": "M", "Analizar": "A",
+    "Mejorar": "I", "Controlar": "C"
+}
+
+# Metadatos de herramientas indexados por id (búsqueda O(1) en lugar de recorrer la matriz)
+TOOLS_BY_ID = {t["id"]: t for t in TOOLS_DMAIC_MATRIX}
+
+# 1. Dataset de Entrenamiento (Contexto de cada herramienta)
+# Aquí definimos para qué sirve cada herramienta con palabras clave
+KNOWLEDGE_BASE = [
+    # --- FASE DEFINIR (Enfoque: Alcance y Cliente) ---
+    {
+        "id": "gantt", 
+        "desc": "Cronograma, planificación de proyecto. Caso UAP: Definir fechas objetivo para cada fase del ciclo DMAIC (Definir, Medir, Analizar, Mejorar, Controlar). Project Charter."
+    },
+    {
+        "id": "structure_tree", 
+        "desc": "Árbol de estructura, CTQ (Critical to Quality). Caso UAP: Traducir la voz del cliente ('demora en atención') a una métrica técnica específica ('tiempo de atención <= 15 minutos')."
+    },
+    {
+        "id": "process_map", 
+        "desc": "Mapa de procesos, Flujograma. Caso UAP: Diagramar el flujo actual (AS-IS) de la matrícula presencial para identificar cuellos de botella y compararlo con el flujo propuesto (TO-BE) vía web."
+    },
+    {
+        "id": "sipoc",
+        "name": "SIPOC",
+        "phases": ["D"],
+        "desc": "SIPOC (Supplier-Input-Process-Output-Customer). Caso UAP: Mapeo de alto nivel para identificar proveedores (Alumnos, Bancos), Entradas (Requisitos), y Salidas (Ficha de matrícula)."
+    },
+
+    # --- FASE MEDIR (Enfoque: Datos y Línea Base) ---
+    {
+        "id": "capability", 
+        "desc": "Capacidad del proceso, Cp, Cpk, Nivel Sigma. Caso UAP: Medir la capacidad del proceso actual para cumplir con el tiempo de atención de 15 minutos. Determinar que el proceso es incapaz (Z negativo o bajo)."
+    },
+    {
+        "id": "data_collection_plan",
+        "name": "Plan de recolección de datos",
+        "phases": ["M"],
+        "desc": "Plan de recolección de datos. Caso UAP: Definir qué medir (Tiempo de ciclo, % Satisfacción), tipo de dato (continuo/discreto) y tamaño de muestra."
+    },
+    {
+        "id": "gage_rr", 
+        "desc": "Gage R&R, MSA. General: Validar que el sistema de medición es confiable antes de recolectar datos masivos."
+    },
+    {
+        "id": "pareto", 
+        "desc": "Diagrama de Pareto. Caso UAP/Sysman: Priorizar las causas más frecuentes de quejas o defectos (Regla 80/20). Enfocarse en los 'pocos vitales'."
+    },
+
+    # --- FASE ANALIZAR (Enfoque: Causa Raíz) ---
+    {
+        "id": "ishikawa", 
+        "desc": "Diagrama Causa-Efecto, Espina de Pescado. Caso UAP: Analizar por qué la matrícula es lenta. Causas: Mano de Obra (falta capacitación), Métodos (trámites manuales), Maquinaria (sistema lento)."
+    },
+    {
+        "id": "hypothesis", 
+        "desc": "Prueba de Hipótesis, T-Test, Proporciones. Caso UAP: Validar estadísticamente si los 'requisitos extracurriculares' son una barrera real para la matrícula web. Comparar medias Antes vs Después."
+    },
+    {
+        "id": "anova", 
+        "desc": "ANOVA. Libro Seis Sigma: Comparar si un factor (ej: turno, proveedor) tiene un efecto significativo en el resultado promedio."
+    },
+    {
+        "id": "fmea", 
+        "desc": "AMEF, Análisis de Riesgos. Caso UAP: Evaluar riesgos en el nuevo proceso web (ej: caída del servidor) y calcular su NPR para tomar acciones preventivas."
+    },
+    {
+        "id": "interviews", 
+        "desc": "Entrevistas, Encuestas. Caso UAP: Recolectar la percepción de los estudiantes sobre por qué no usan la web (Desconfianza, desconocimiento)."
+    },
+
+    # --- FASE MEJORAR (Enfoque: Soluciones y Optimización) ---
+    {
+        "id": "doe", 
+        "desc": "Diseño de Experimentos, DOE Factorial. Caso UAP: Determinar qué factores (Publicidad, Inducción, Reglas de Negocio) tienen mayor impacto en aumentar el % de matrícula web."
+    },
+    {
+        "id": "rsm", 
+        "desc": "Superficie de Respuesta. General: Encontrar los valores óptimos de operación para maximizar una variable."
+    },
+    {
+        "id": "pmi", 
+        "desc": "PMI, Evaluación de soluciones. General: Evaluar los Plus, Minus e Interesante de una propuesta de mejora."
+    },
+    {
+        "id": "raci", 
+        "desc": "Matriz RACI. Caso UAP: Definir roles (Responsable, Aprobador, Consultado) para la implementación del nuevo sistema de pagos online."
+    },
+
+    # --- FASE CONTROLAR (Enfoque: Sostenibilidad) ---
+    {
+        "id": "control_plan", 
+        "desc": "Plan de Control. Caso UAP: Documento para monitorear el nuevo proceso web. Definir métricas, frecuencias y planes de reacción ante caídas del sistema."
+    },
+    {
+        "id": "spc", 
+        "desc": "Gráficos de Control, Cartas P / I-MR. Caso UAP: Monitorear semanalmente el % de matrícula web y el tiempo de ciclo para asegurar que el proceso se mantenga estable."
+    },
+    {
+        "id": "bsc", 
+        "desc": "Balanced Scorecard. General: Monitorear indicadores estratégicos de alto nivel a largo plazo."
+    },
+
+    # --- OTRAS HERRAMIENTAS DE SOPORTE ---
+    {"id": "muestreo", "desc": "Cálculo de tamaño de muestra. Caso UAP: Determinar cuántas encuestas hacer para tener 95% de confianza."},
+    {"id": "z_bench", "name": "Nivel Sigma (Z bench)", "phases": ["M", "I", "C"], "desc": "Nivel Sigma. Caso UAP: Calcular el nivel sigma inicial (0.5) y final (3.0) para demostrar la mejora de calidad."},
+    {"id": "cost_benefit", "desc": "Costo Beneficio. Caso UAP: Calcular el ahorro en horas-hombre y papel al migrar a web."},
+    {"id": "radar", "desc": "Radar Chart. General: Auditorías 5S y evaluación de competencias."},
+    {"id": "scatter", "desc": "Diagrama de dispersión. General: Correlación entre dos variables."},
+    {"id": "stratification", "desc": "Estratificación. General: Análisis por grupos."},
+    {"id": "run_chart", "desc": "Gráfico de corridas. General: Tendencias simples."},
+    {"id": "histogram", "desc": "Histograma. General: Ver distribución de datos."},
+    {"id": "conf_interval", "desc": "Intervalo de confianza. General: Estimación de parámetros."},
+    {"id": "ce_matrix", "desc": "Matriz Causa Efecto. General: Priorizar entradas."},
+    {"id": "qfd", "desc": "QFD. Caso Sysman: Priorizar características técnicas de software."},
+    {"id": "affinity", "desc": "Afinidades. General: Agrupar ideas."},
+    {"id": "normality", "desc": "Prueba de normalidad. General: Validar datos para estadística."},
+    {"id": "chi_square", "desc": "Chi-Cuadrado. General: Independencia de atributos."},
+    {"id": "cost_tree", "desc": "Árbol de costos. General: Desglose de costos de calidad."},
+    {"id": "boxplot", "desc": "Box Plot. Caso UAP: Comparar dispersión de tiempos Antes vs Después."}
+]
+
+
+
+def default_knowledge() -> list:
+    """Base de conocimiento por defecto con nombre y fases completados desde la matriz DMAIC."""
+    entries = []
+    for item in KNOWLEDGE_BASE:
+        tool_info = TOOLS_BY_ID.get(item["id"], {})
+        entries.append({
+            "id": item["id"],
+            "name": item.get("name") or tool_info.get("name", item["id"]),
+            "phases": item.get("phases") or tool_info.get("phases", []),
+            "desc": item["desc"],
+        })
+    return entries
+
+
+def seed_knowledge_base(session: Session):
+    """Carga la base de conocimiento por defecto si la tabla está vacía (primer arranque)."""
+    if session.exec(select(ToolKnowledge).limit(1)).first() is not None:
+        return
+    for item in default_knowledge():
+        session.add(ToolKnowledge(
+            tool_id=item["id"], name=item["name"], phases=item["phases"], description=item["desc"]
+        ))
+    session.commit()
+
+
+def normalize_phases(phases: list) -> list:
+    codes = []
+    for phase in phases:
+        code = PHASE_MAP.get(phase, phase)
+        if code not in PHASE_CODES:
+            raise ValueError(f"Fase DMAIC no válida: '{phase}'.")
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
 class ToolRecommender:
-    def __init__(self):
-        # 1. Dataset de Entrenamiento (Contexto de cada herramienta)
-        # Aquí definimos para qué sirve cada herramienta con palabras clave
-        self.knowledge_base = [
-            # --- FASE DEFINIR (Enfoque: Alcance y Cliente) ---
-            {
-                "id": "gantt", 
-                "desc": "Cronograma, planificación de proyecto. Caso UAP: Definir fechas objetivo para cada fase del ciclo DMAIC (Definir, Medir, Analizar, Mejorar, Controlar). Project Charter."
-            },
-            {
-                "id": "structure_tree", 
-                "desc": "Árbol de estructura, CTQ (Critical to Quality). Caso UAP: Traducir la voz del cliente ('demora en atención') a una métrica técnica específica ('tiempo de atención <= 15 minutos')."
-            },
-            {
-                "id": "process_map", 
-                "desc": "Mapa de procesos, Flujograma. Caso UAP: Diagramar el flujo actual (AS-IS) de la matrícula presencial para identificar cuellos de botella y compararlo con el flujo propuesto (TO-BE) vía web."
-            },
-            {
-                "id": "sipoc", 
-                "desc": "SIPOC (Supplier-Input-Process-Output-Customer). Caso UAP: Mapeo de alto nivel para identificar proveedores (Alumnos, Bancos), Entradas (Requisitos), y Salidas (Ficha de matrícula)."
-            },
-
-            # --- FASE MEDIR (Enfoque: Datos y Línea Base) ---
-            {
-                "id": "capability", 
-                "desc": "Capacidad del proceso, Cp, Cpk, Nivel Sigma. Caso UAP: Medir la capacidad del proceso actual para cumplir con el tiempo de atención de 15 minutos. Determinar que el proceso es incapaz (Z negativo o bajo)."
-            },
-            {
-                "id": "data_collection_plan", 
-                "desc": "Plan de recolección de datos. Caso UAP: Definir qué medir (Tiempo de ciclo, % Satisfacción), tipo de dato (continuo/discreto) y tamaño de muestra."
-            },
-            {
-                "id": "gage_rr", 
-                "desc": "Gage R&R, MSA. General: Validar que el sistema de medición es confiable antes de recolectar datos masivos."
-            },
-            {
-                "id": "pareto", 
-                "desc": "Diagrama de Pareto. Caso UAP/Sysman: Priorizar las causas más frecuentes de quejas o defectos (Regla 80/20). Enfocarse en los 'pocos vitales'."
-            },
-
-            # --- FASE ANALIZAR (Enfoque: Causa Raíz) ---
-            {
-                "id": "ishikawa", 
-                "desc": "Diagrama Causa-Efecto, Espina de Pescado. Caso UAP: Analizar por qué la matrícula es lenta. Causas: Mano de Obra (falta capacitación), Métodos (trámites manuales), Maquinaria (sistema lento)."
-            },
-            {
-                "id": "hypothesis", 
-                "desc": "Prueba de Hipótesis, T-Test, Proporciones. Caso UAP: Validar estadísticamente si los 'requisitos extracurriculares' son una barrera real para la matrícula web. Comparar medias Antes vs Después."
-            },
-            {
-                "id": "anova", 
-                "desc": "ANOVA. Libro Seis Sigma: Comparar si un factor (ej: turno, proveedor) tiene un efecto significativo en el resultado promedio."
-            },
-            {
-                "id": "fmea", 
-                "desc": "AMEF, Análisis de Riesgos. Caso UAP: Evaluar riesgos en el nuevo proceso web (ej: caída del servidor) y calcular su NPR para tomar acciones preventivas."
-            },
-            {
-                "id": "interviews", 
-                "desc": "Entrevistas, Encuestas. Caso UAP: Recolectar la percepción de los estudiantes sobre por qué no usan la web (Desconfianza, desconocimiento)."
-            },
-
-            # --- FASE MEJORAR (Enfoque: Soluciones y Optimización) ---
-            {
-                "id": "doe", 
-                "desc": "Diseño de Experimentos, DOE Factorial. Caso UAP: Determinar qué factores (Publicidad, Inducción, Reglas de Negocio) tienen mayor impacto en aumentar el % de matrícula web."
-            },
-            {
-                "id": "rsm", 
-                "desc": "Superficie de Respuesta. General: Encontrar los valores óptimos de operación para maximizar una variable."
-            },
-            {
-                "id": "pmi", 
-                "desc": "PMI, Evaluación de soluciones. General: Evaluar los Plus, Minus e Interesante de una propuesta de mejora."
-            },
-            {
-                "id": "raci", 
-                "desc": "Matriz RACI. Caso UAP: Definir roles (Responsable, Aprobador, Consultado) para la implementación del nuevo sistema de pagos online."
-            },
-
-            # --- FASE CONTROLAR (Enfoque: Sostenibilidad) ---
-            {
-                "id": "control_plan", 
-                "desc": "Plan de Control. Caso UAP: Documento para monitorear el nuevo proceso web. Definir métricas, frecuencias y planes de reacción ante caídas del sistema."
-            },
-            {
-                "id": "spc", 
-                "desc": "Gráficos de Control, Cartas P / I-MR. Caso UAP: Monitorear semanalmente el % de matrícula web y el tiempo de ciclo para asegurar que el proceso se mantenga estable."
-            },
-            {
-                "id": "bsc", 
-                "desc": "Balanced Scorecard. General: Monitorear indicadores estratégicos de alto nivel a largo plazo."
-            },
-            
-            # --- OTRAS HERRAMIENTAS DE SOPORTE ---
-            {"id": "muestreo", "desc": "Cálculo de tamaño de muestra. Caso UAP: Determinar cuántas encuestas hacer para tener 95% de confianza."},
-            {"id": "z_bench", "desc": "Nivel Sigma. Caso UAP: Calcular el nivel sigma inicial (0.5) y final (3.0) para demostrar la mejora de calidad."},
-            {"id": "cost_benefit", "desc": "Costo Beneficio. Caso UAP: Calcular el ahorro en horas-hombre y papel al migrar a web."},
-            {"id": "radar", "desc": "Radar Chart. General: Auditorías 5S y evaluación de competencias."},
-            {"id": "scatter", "desc": "Diagrama de dispersión. General: Correlación entre dos variables."},
-            {"id": "stratification", "desc": "Estratificación. General: Análisis por grupos."},
-            {"id": "run_chart", "desc": "Gráfico de corridas. General: Tendencias simples."},
-            {"id": "histogram", "desc": "Histograma. General: Ver distribución de datos."},
-            {"id": "conf_interval", "desc": "Intervalo de confianza. General: Estimación de parámetros."},
-            {"id": "ce_matrix", "desc": "Matriz Causa Efecto. General: Priorizar entradas."},
-            {"id": "qfd", "desc": "QFD. Caso Sysman: Priorizar características técnicas de software."},
-            {"id": "affinity", "desc": "Afinidades. General: Agrupar ideas."},
-            {"id": "normality", "desc": "Prueba de normalidad. General: Validar datos para estadística."},
-            {"id": "chi_square", "desc": "Chi-Cuadrado. General: Independencia de atributos."},
-            {"id": "cost_tree", "desc": "Árbol de costos. General: Desglose de costos de calidad."},
-            {"id": "boxplot", "desc": "Box Plot. Caso UAP: Comparar dispersión de tiempos Antes vs Después."}
-        ]
-        
-        # Entrenar el vectorizador (Preparamos el cerebro de la IA)
-        self.descriptions = [item['desc'] for item in self.knowledge_base]
-        self.vectorizer = TfidfVectorizer()
-        self.tfidf_matrix = self.vectorizer.fit_transform(self.descriptions)
-
-    def recommend(self, phase: str, user_query: str):
+    def __init__(self, knowledge_base: list = None, index_path: Path = INDEX_PATH):
+        # El índice se carga (o construye) perezosamente en la primera recomendación,
+        # así importar las rutas no entrena nada.
+        # Sin 'knowledge_base' explícita, la base se lee de la tabla 'tool_knowledge'.
+        self._static_knowledge = knowledge_base
+        self.index_path = Path(index_path)
+        self._index = None
+        self._usage = None
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Índice precalculado e incremental
+    # ------------------------------------------------------------------
+    def _load_knowledge(self) -> list:
+        if self._static_knowledge is not None:
+            return self._static_knowledge
+        try:
+            with Session(engine) as session:
+                rows = session.exec(select(ToolKnowledge).order_by(ToolKnowledge.tool_id)).all()
+        except Exception:
+            rows = [] # Tabla aún no creada: se usa la base por defecto
+        if not rows:
+            return default_knowledge()
+        return [{"id": r.tool_id, "name": r.name, "phases": list(r.phases or []), "desc": r.description} for r in rows]
+
+    @staticmethod
+    def _fingerprint(entries: list) -> str:
+        payload = json.dumps(sorted(entries, key=lambda e: e["id"]), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    @property
+    def index(self) -> dict:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._load_or_build_index()
+        return self._index
+
+    def _load_or_build_index(self) -> dict:
+        entries = self._load_knowledge()
+        fingerprint = self._fingerprint(entries)
+        if self.index_path.exists():
+            try:
+                index = joblib.load(self.index_path)
+                if index.get("fingerprint") == fingerprint:
+                    return index
+            except Exception:
+                pass # Artefacto corrupto o de otra versión: se reconstruye
+
+        index = self._build_index(entries)
+        self._save(index)
+        return index
+
+    def _save(self, index: dict):
+        try:
+            joblib.dump(index, self.index_path)
+        except OSError:
+            pass # Sin permisos de escritura: se usa el índice en memoria
+
+    def _build_index(self, entries: list) -> dict:
+        # Conteo de términos (hashing) + IDF calculado sobre toda la base
+        counts = _HASHER.transform([e["desc"] for e in entries]).tocsr()
+        n_docs = counts.shape[0]
+        doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log((1 + n_docs) / (1 + doc_freq)) + 1
+
+        # Filas normalizadas (L2): la similitud coseno es un simple producto punto
+        matrix = normalize(counts @ sparse.diags(idf)).tocsr()
+
+        return {
+            "fingerprint": self._fingerprint(entries),
+            "idf": idf,
+            "matrix": matrix,
+            "entries": [dict(e) for e in entries],
+            "row_of": {e["id"]: row for row, e in enumerate(entries)},
+            # Fase -> filas permitidas como máscara booleana (filas x fases)
+            "phase_mask": self._phase_mask(entries),
+            "pending_edits": 0,
+        }
+
+    @staticmethod
+    def _phase_mask(entries: list) -> np.ndarray:
+        mask = np.zeros((len(entries), len(PHASE_CODES)), dtype=bool)
+        for row, e in enumerate(entries):
+            for code in e.get("phases", []):
+                if code in PHASE_CODES:
+                    mask[row, PHASE_CODES.index(code)] = True
+        return mask
+
+    def _vectorize(self, index: dict, texts: list):
+        return normalize(_HASHER.transform(texts) @ sparse.diags(index["idf"])).tocsr()
+
+    def upsert_tool(self, entry: dict):
+        """
+        Agrega o reemplaza el vector de UNA herramienta con el IDF vigente (sin reentrenar la base).
+        Cuando se acumulan muchas ediciones se recalcula el IDF completo.
+        El índice vigente nunca se modifica: se arma uno nuevo y se reemplaza de una vez, así una
+        recomendación en curso siempre ve matriz, entradas y máscara de fases del mismo tamaño.
+        """
+        with self._lock:
+            index = self.index
+            vector = self._vectorize(index, [entry["desc"]])
+            row = index["row_of"].get(entry["id"])
+            matrix = index["matrix"]
+            entries, row_of = list(index["entries"]), dict(index["row_of"])
+            entry_mask = self._phase_mask([entry])
+
+            if row is None:
+                matrix = sparse.vstack([matrix, vector], format="csr")
+                entries.append(dict(entry))
+                row_of[entry["id"]] = len(entries) - 1
+                phase_mask = np.vstack([index["phase_mask"], entry_mask])
+            else:
+                matrix = sparse.vstack([matrix[:row], vector, matrix[row + 1:]], format="csr")
+                entries[row] = dict(entry)
+                phase_mask = index["phase_mask"].copy()
+                phase_mask[row] = entry_mask[0]
+
+            self._after_edit({**index, "matrix": matrix, "entries": entries, "row_of": row_of,
+                              "phase_mask": phase_mask})
+
+    def remove_tool(self, tool_id: str):
+        with self._lock:
+            index = self.index
+            row = index["row_of"].get(tool_id)
+            if row is None:
+                return
+            keep = np.ones(len(index["entries"]), dtype=bool)
+            keep[row] = False
+            entries = [e for r, e in enumerate(index["entries"]) if r != row]
+            self._after_edit({
+                **index,
+                "matrix": index["matrix"][keep],
+                "phase_mask": index["phase_mask"][keep],
+                "entries": entries,
+                "row_of": {e["id"]: r for r, e in enumerate(entries)},
+            })
+
+    def has_tool(self, tool_id: str) -> bool:
+        return tool_id in self.index["row_of"]
+
+    def _after_edit(self, index: dict):
+        """Publica el índice editado (reemplazo atómico de la referencia) y lo guarda."""
+        index["pending_edits"] += 1
+        if index["pending_edits"] > REBUILD_RATIO * max(len(index["entries"]), 1):
+            index = self._build_index(index["entries"])
+        else:
+            index["fingerprint"] = self._fingerprint(index["entries"])
+        self._index = index
+        self._save(index)
+
+    # ------------------------------------------------------------------
+    # Retroalimentación de uso
+    # ------------------------------------------------------------------
+    def _usage_counts(self) -> dict:
+        """{(fase, herramienta): veces que el usuario ejecutó la herramienta recomendada}"""
+        if self._usage is None:
+            with self._lock:
+                if self._usage is None:
+                    usage = {}
+                    try:
+                        with Session(engine) as session:
+                            rows = session.exec(
+                                select(RecommendationFeedback.phase, RecommendationFeedback.tool_id, func.count())
+                                .group_by(RecommendationFeedback.phase, RecommendationFeedback.tool_id)
+                            ).all()
+                        usage = {(phase, tool_id): int(n) for phase, tool_id, n in rows}
+                    except Exception:
+                        pass
+                    self._usage = usage
+        return self._usage
+
+    def record_usage(self, phase: str, tool_id: str):
+        usage = self._usage_counts()
+        key = (PHASE_MAP.get(phase, phase), tool_id)
+        with self._lock:
+            usage[key] = usage.get(key, 0) + 1
+
+    # ------------------------------------------------------------------
+    # Recomendación
+    # ------------------------------------------------------------------
+    def recommend(self, phase: str, user_query: str, top_k: int = 5, feedback_weight: float = 0.1):
         """
         Recomienda herramientas basándose en la fase DMAIC y la descripción del usuario.
         """
+        return self.recommend_batch(phase, [user_query], top_k=top_k, feedback_weight=feedback_weight)[0]
+
+    def recommend_batch(self, phase: str, user_queries: list, top_k: int = 5, feedback_weight: float = 0.1):
+        """
+        Puntúa muchas descripciones a la vez: una sola multiplicación (consultas x herramientas)
+        y un top-k por fila con argpartition.
+        El uso real (herramientas ejecutadas tras recomendarse) suma hasta 'feedback_weight' al score.
+        """
+        index = self.index  # Foto del índice: las ediciones publican un índice nuevo, no modifican este
+        entries = index["entries"]
+
         # 1. Filtrar herramientas permitidas por la Fase (Regla de Negocio)
-        # Convertimos 'Define' -> 'D', etc.
-        phase_map = {
-            "Define": "D", "Measure": "M", "Analyze": "A", 
-            "Improve": "I", "Control": "C",
-            "Definir": "D", "Medir": "M", "Analizar": "A", 
-            "Mejorar": "I", "Controlar": "C"
-        }
-        phase_code = phase_map.get(phase, phase) # Si ya viene como 'D', lo deja así
-        
-        allowed_tools_ids = [
-            t['id'] for t in TOOLS_DMAIC_MATRIX 
-            if phase_code in t['phases']
-        ]
-
-        # 2. Analizar la consulta del usuario con IA (Similitud Coseno)
-        query_vec = self.vectorizer.transform([user_query])
-        # Calculamos similitud entre la consulta y TODAS las herramientas
-        similarities = cosine_similarity(query_vec, self.tfidf_matrix).flatten()
-
-        # 3. Combinar Filtro + IA
-        recommendations = []
-        for i, score in enumerate(similarities):
-            tool_id = self.knowledge_base[i]['id']
-            
-            # Solo consideramos si la herramienta es válida para esta fase
-            if tool_id in allowed_tools_ids:
-                # Buscar el nombre bonito
-                tool_info = next(t for t in TOOLS_DMAIC_MATRIX if t['id'] == tool_id)
+        phase_code = PHASE_MAP.get(phase, phase) # Si ya viene como 'D', lo deja así
+        if phase_code not in PHASE_CODES or not user_queries:
+            return [[] for _ in user_queries]
+        allowed_rows = np.flatnonzero(index["phase_mask"][:, PHASE_CODES.index(phase_code)])
+        if len(allowed_rows) == 0:
+            return [[] for _ in user_queries]
+
+        # 2. Analizar las consultas con IA (Similitud Coseno)
+        query_matrix = self._vectorize(index, user_queries)
+        similarities = (query_matrix @ index["matrix"][allowed_rows].T).toarray()
+
+        # 3. Re-ranking por uso: log(1 + usos) normalizado al más usado de la fase
+        usage = self._usage_counts()
+        with self._lock:
+            uses = np.array([usage.get((phase_code, entries[r]["id"]), 0) for r in allowed_rows], dtype=float)
+        boost = np.zeros_like(uses)
+        if feedback_weight and uses.max() > 0:
+            boost = feedback_weight * np.log1p(uses) / np.log1p(uses.max())
+        ranking = similarities + boost
+
+        # 4. Top-k por consulta sin ordenar todas las herramientas
+        k = min(top_k, len(allowed_rows))
+        top = np.argpartition(-ranking, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(ranking, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+
+        results = []
+        for row_scores, row_top in zip(ranking, top):
+            recommendations = []
+            for col in row_top:
+                entry = entries[allowed_rows[col]]
                 recommendations.append({
-                    "id": tool_id,
-                    "name": tool_info['name'],
-                    "score": float(score), # Qué tan bien coincide con el texto
-                    "reason": self.knowledge_base[i]['desc'] # Por qué se eligió
+                    "id": entry["id"],
+                    "name": entry["name"],
+                    "score": float(row_scores[col]), # Qué tan bien coincide con el texto (+ uso)
+                    "usage_count": int(uses[col]),
+                    "reason": entry["desc"] # Por qué se eligió
                 })
+            results.append(recommendations)
 
-        # 4. Ordenar por puntuación (Score)
-        recommendations = sorted(recommendations, key=lambda x: x['score'], reverse=True)
-
-        # Devolver top 5
-        return recommendations[:5]
\ No newline at end of file
+        return results
@@ -0,0 +1,190 @@
+# backend/app/services/risk_engine.py
+"""
+Motor de riesgos AMEF compartido (FmeaTool, RiskAnalysisTool).
+
+- NPR = S × O × D y categorías por umbrales con np.select (sin apply por fila).
+- Prioridad de Acción (AP) AIAG-VDA 2019: tabla 10×10×10 precalculada a partir de las
+  bandas del manual; la consulta de 100k modos de falla es un solo indexado de numpy.
+- Re-evaluación: si vienen columnas 'revised_*' (S/O/D después de las acciones) se calcula
+  el NPR revisado y su reducción.
+- Consolidado por función/parte (o cualquier columna) en un solo groupby.
+"""
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+RATINGS = ("severity", "occurrence", "detection")
+REVISED = {col: f"revised_{col}" for col in RATINGS}
+
+# Umbrales típicos en industria: >= 200 Crítico, >= 100 Alto, >= 50 Medio
+NPR_THRESHOLDS = (200, 100, 50)
+NPR_LABELS = ("Crítico", "Alto", "Medio", "Bajo")
+HIGH_RISK_NPR = 100
+
+# -----------------------------------------------------------------------------
+# Prioridad de Acción AIAG-VDA (H = Alta, M = Media, L = Baja)
+# -----------------------------------------------------------------------------
+AP_LABELS = np.array(["L", "M", "H"], dtype=object)
+AP_NAMES = {"H": "Alta", "M": "Media", "L": "Baja"}
+
+# Bandas del manual: índice de banda para cada calificación 1..10
+_S_BAND = np.array([0, 1, 1, 2, 2, 2, 3, 3, 4, 4])     # 1 | 2-3 | 4-6 | 7-8 | 9-10
+_O_BAND = np.array([0, 1, 1, 2, 2, 3, 3, 4, 4, 4])     # 1 | 2-3 | 4-5 | 6-7 | 8-10
+_D_BAND = np.array([0, 1, 1, 1, 2, 2, 3, 3, 3, 3])     # 1 | 2-4 | 5-6 | 7-10
+
+# [banda S][banda O] -> AP para las bandas D (1, 2-4, 5-6, 7-10)
+_AP_BANDS = {
+    4: {4: "HHHH", 3: "HHHH", 2: "MHHH", 1: "LLMH", 0: "LLLL"},   # S 9-10
+    3: {4: "HHHH", 3: "MHHH", 2: "MMMH", 1: "LLMM", 0: "LLLL"},   # S 7-8
+    2: {4: "MMHH", 3: "LMMM", 2: "LLLM", 1: "LLLL", 0: "LLLL"},   # S 4-6
+    1: {4: "LLMM", 3: "LLLL", 2: "LLLL", 1: "LLLL", 0: "LLLL"},   # S 2-3
+    0: {4: "LLLL", 3: "LLLL", 2: "LLLL", 1: "LLLL", 0: "LLLL"},   # S 1
+}
+_CODE = {"L": 0, "M": 1, "H": 2}
+_BAND_TABLE = np.array(
+    [[[_CODE[c] for c in _AP_BANDS[s][o]] for o in range(5)] for s in range(5)], dtype=np.int8
+)
+# Tabla completa por calificación: AP_TABLE[S-1, O-1, D-1] -> 0 (L), 1 (M), 2 (H)
+AP_TABLE = _BAND_TABLE[_S_BAND[:, None, None], _O_BAND[None, :, None], _D_BAND[None, None, :]]
+
+
+def validate_ratings(df: pd.DataFrame, columns: Sequence[str] = RATINGS) -> Dict[str, np.ndarray]:
+    """Calificaciones S/O/D como enteros 1..10 (ValueError con la primera fila inválida)."""
+    ratings = {}
+    for col in columns:
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+        bad = np.isnan(values) | (values < 1) | (values > 10) | (values != np.round(values))
+        if bad.any():
+            row = int(np.flatnonzero(bad)[0])
+            raise ValueError(f"'{col}' debe ser un entero entre 1 y 10 (fila {row + 1}: {df[col].iloc[row]}).")
+        ratings[col] = values.astype(np.int64)
+    return ratings
+
+
+def npr(severity, occurrence, detection) -> np.ndarray:
+    return np.asarray(severity, dtype=np.int64) * occurrence * detection
+
+
+def classify_npr(values, labels: Sequence[str] = NPR_LABELS) -> np.ndarray:
+    """Categoría de riesgo por umbrales de NPR (vectorizado con np.select)."""
+    values = np.asarray(values)
+    conditions = [values >= t for t in NPR_THRESHOLDS]
+    return np.select(conditions, list(labels[:-1]), default=labels[-1]).astype(object)
+
+
+def action_priority(severity, occurrence, detection) -> np.ndarray:
+    """AP AIAG-VDA ('H', 'M', 'L') por consulta directa en la tabla 10×10×10."""
+    codes = AP_TABLE[np.asarray(severity) - 1, np.asarray(occurrence) - 1, np.asarray(detection) - 1]
+    return AP_LABELS[codes]
+
+
+# -----------------------------------------------------------------------------
+# Evaluación de una tabla completa
+# -----------------------------------------------------------------------------
+def score_risks(df: pd.DataFrame, labels: Sequence[str] = NPR_LABELS,
+                category_column: str = "risk_category") -> pd.DataFrame:
+    """
+    Agrega a la tabla: npr, criticality (S×O), risk_category y action_priority.
+    Si hay columnas revised_severity/occurrence/detection (alcanza con una; las demás
+    toman el valor original) agrega revised_npr, npr_reduction, npr_reduction_pct,
+    revised_action_priority y revised_<categoría>.
+    """
+    ratings = validate_ratings(df)
+    s, o, d = (ratings[c] for c in RATINGS)
+    result = df.copy()
+    result["npr"] = npr(s, o, d)
+    result["criticality"] = s * o
+    result[category_column] = classify_npr(result["npr"].to_numpy(), labels)
+    result["action_priority"] = action_priority(s, o, d)
+
+    revised_cols = [REVISED[c] for c in RATINGS if REVISED[c] in df.columns]
+    if revised_cols:
+        # Celdas vacías en las columnas revisadas = sin cambio en esa calificación
+        filled = df[revised_cols].copy()
+        for col in revised_cols:
+            original = col[len("revised_"):]
+            filled[col] = pd.to_numeric(filled[col], errors="coerce").fillna(df[original])
+        revised = validate_ratings(filled, revised_cols)
+        rs, ro, rd = (revised.get(REVISED[c], ratings[c]) for c in RATINGS)
+        result["revised_npr"] = npr(rs, ro, rd)
+        result["npr_reduction"] = result["npr"] - result["revised_npr"]
+        result["npr_reduction_pct"] = np.round(result["npr_reduction"] / result["npr"] * 100, 1)
+        result["revised_action_priority"] = action_priority(rs, ro, rd)
+        result[f"revised_{category_column}"] = classify_npr(result["revised_npr"].to_numpy(), labels)
+    return result
+
+
+def risk_summary(scored: pd.DataFrame, category_column: str = "risk_category") -> dict:
+    """Totales de la tabla evaluada (conteos por categoría y por AP, NPR máximo/total)."""
+    npr_values = scored["npr"].to_numpy()
+    summary = {
+        "max_npr": int(npr_values.max()),
+        "total_risk_sum": int(npr_values.sum()),
+        "avg_npr": float(npr_values.mean()),
+        "critical_count": int((npr_values >= HIGH_RISK_NPR).sum()),
+        "category_counts": scored[category_column].value_counts().to_dict(),
+        "action_priority_counts": {AP_NAMES[k]: int(v) for k, v in scored["action_priority"].value_counts().items()},
+    }
+    if "revised_npr" in scored.columns:
+        revised_total = int(scored["revised_npr"].sum())
+        high_before = scored["action_priority"] == "H"
+        summary.update({
+            "revised_total_risk_sum": revised_total,
+            "revised_max_npr": int(scored["revised_npr"].max()),
+            "total_npr_reduction": summary["total_risk_sum"] - revised_total,
+            "total_npr_reduction_pct": round((1 - revised_total / summary["total_risk_sum"]) * 100, 1),
+            "revised_critical_count": int((scored["revised_npr"] >= HIGH_RISK_NPR).sum()),
+            "revised_action_priority_counts": {
+                AP_NAMES[k]: int(v) for k, v in scored["revised_action_priority"].value_counts().items()
+            },
+            "high_priority_unresolved": int((high_before & (scored["revised_action_priority"] == "H")).sum()),
+        })
+    return summary
+
+
+def rollup(scored: pd.DataFrame, by: List[str], limit: Optional[int] = 100) -> List[dict]:
+    """
+    Consolidado por función/parte (u otras columnas, ej: ['fmea', 'function_part']) en un groupby:
+    modos de falla, NPR total/máximo/promedio, conteo de AP Alta y NPR >= 100, y NPR revisado.
+    Ordenado por NPR total (descendente).
+    """
+    frame = scored.assign(
+        _high_ap=(scored["action_priority"] == "H").astype(np.int64),
+        _critical=(scored["npr"] >= HIGH_RISK_NPR).astype(np.int64),
+    )
+    aggregations = {
+        "failure_modes": ("npr", "size"),
+        "total_npr": ("npr", "sum"),
+        "max_npr": ("npr", "max"),
+        "avg_npr": ("npr", "mean"),
+        "high_priority": ("_high_ap", "sum"),
+        "critical_count": ("_critical", "sum"),
+    }
+    if "revised_npr" in scored.columns:
+        aggregations["revised_total_npr"] = ("revised_npr", "sum")
+    table = frame.groupby(by, sort=False, dropna=False).agg(**aggregations)
+    table["avg_npr"] = table["avg_npr"].round(1)
+    if "revised_total_npr" in table.columns:
+        table["npr_reduction_pct"] = np.round((1 - table["revised_total_npr"] / table["total_npr"]) * 100, 1)
+    table["share_pct"] = np.round(table["total_npr"] / table["total_npr"].sum() * 100, 2)
+    table = table.sort_values("total_npr", ascending=False, kind="stable").reset_index()
+    if limit:
+        table = table.head(limit)
+    return table.astype(object).where(table.notna(), None).to_dict(orient="records")
+
+
+SORT_OPTIONS = ("npr", "action_priority")
+
+
+def rank_risks(scored: pd.DataFrame, sort_by: str = "npr") -> pd.DataFrame:
+    """
+    Orden de prioridad (un solo lexsort):
+    - 'npr': NPR descendente, luego severidad (criterio clásico).
+    - 'action_priority': AP (H > M > L), luego NPR y severidad.
+    """
+    if sort_by not in SORT_OPTIONS:
+        raise ValueError(f"'sort_by' debe ser uno de: {', '.join(SORT_OPTIONS)}.")
+    keys = [-scored["severity"].to_numpy(dtype=np.int64), -scored["npr"].to_numpy()]
+    if sort_by == "action_priority":
+        keys.append(-scored["action_priority"].map(_CODE).to_numpy())
+    return scored.iloc[np.lexsort(keys)]
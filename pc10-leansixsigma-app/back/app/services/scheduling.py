@@ -0,0 +1,221 @@
+# backend/app/services/scheduling.py
+"""
+Motor de programación de proyectos (CPM - Método de la Ruta Crítica).
+
+El grafo de dependencias se guarda como arreglos NumPy (aristas predecesor -> sucesor)
+y se recorre por niveles topológicos (app.services.graph): cada nivel es un conjunto
+de tareas cuyas predecesoras ya están resueltas, y se procesa con operaciones
+vectorizadas (np.maximum.at / np.minimum.at). Costo total O(V + E).
+
+Incluye además un esquema serial (SGS) para nivelar recursos y utilidades de
+calendario laboral basadas en np.busday_offset / np.busday_count.
+"""
+import heapq
+import time
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from app.services.graph import CycleError, csr, topological_levels
+
+
+def parse_predecessors(task_ids: pd.Index, predecessors: pd.Series):
+    """
+    Convierte la columna 'predecessors' (lista o texto separado por comas) en aristas.
+    Retorna (src, dst) como posiciones de tarea: src debe terminar antes de que empiece dst.
+    """
+    preds = predecessors.map(
+        lambda p: p.split(",") if isinstance(p, str) else (p if isinstance(p, (list, tuple)) else [])
+    )
+    exploded = preds.reset_index(drop=True).explode().dropna().astype(str).str.strip()
+    exploded = exploded[exploded != ""]
+
+    src = task_ids.get_indexer(exploded.to_numpy())
+    unknown = src < 0
+    if unknown.any():
+        missing = sorted(set(exploded.to_numpy()[unknown]))[:10]
+        raise ValueError(f"Predecesoras inexistentes: {', '.join(missing)}")
+
+    return src.astype(np.int64), exploded.index.to_numpy(dtype=np.int64)
+
+
+def critical_path(durations: np.ndarray, src: np.ndarray, dst: np.ndarray) -> dict:
+    """
+    CPM completo sobre posiciones de tarea.
+    Retorna arreglos es, ef, ls, lf, slack, is_critical, el orden topológico,
+    la duración del proyecto y una ruta crítica (posiciones en orden).
+    """
+    durations = np.asarray(durations, dtype=float)
+    n = len(durations)
+    levels = topological_levels(n, src, dst)
+    level_of = np.empty(n, dtype=np.int64)
+    for i, nodes in enumerate(levels):
+        level_of[nodes] = i
+
+    # Aristas agrupadas por nivel del predecesor: cada nivel es un corte contiguo
+    edge_order = np.argsort(level_of[src], kind="stable")
+    e_src, e_dst = src[edge_order], dst[edge_order]
+    bounds = np.searchsorted(level_of[e_src], np.arange(len(levels) + 1))
+
+    # 1. Pasada hacia adelante (inicio/fin tempranos)
+    es = np.zeros(n)
+    ef = np.zeros(n)
+    for i, nodes in enumerate(levels):
+        ef[nodes] = es[nodes] + durations[nodes]
+        lo, hi = bounds[i], bounds[i + 1]
+        np.maximum.at(es, e_dst[lo:hi], ef[e_src[lo:hi]])
+
+    project_duration = float(ef.max()) if n else 0.0
+
+    # 2. Pasada hacia atrás (inicio/fin tardíos)
+    lf = np.full(n, project_duration)
+    ls = np.zeros(n)
+    for i in range(len(levels) - 1, -1, -1):
+        lo, hi = bounds[i], bounds[i + 1]
+        np.minimum.at(lf, e_src[lo:hi], ls[e_dst[lo:hi]])
+        nodes = levels[i]
+        ls[nodes] = lf[nodes] - durations[nodes]
+
+    slack = ls - es
+    is_critical = np.isclose(slack, 0.0)
+
+    return {
+        "es": es, "ef": ef, "ls": ls, "lf": lf,
+        "slack": slack,
+        "is_critical": is_critical,
+        "order": np.concatenate(levels) if levels else np.empty(0, dtype=np.int64),
+        "project_duration": project_duration,
+        "critical_path": _trace_critical_path(es, ef, is_critical, src, dst),
+    }
+
+
+def _trace_critical_path(es, ef, is_critical, src, dst) -> List[int]:
+    """Sigue una cadena de tareas críticas encadenadas (EF del predecesor = ES del sucesor)."""
+    tight = is_critical[src] & is_critical[dst] & np.isclose(ef[src], es[dst])
+    next_of = dict(zip(src[tight].tolist(), dst[tight].tolist()))
+
+    starts = np.flatnonzero(is_critical & np.isclose(es, 0.0))
+    if starts.size == 0:
+        return []
+    # Toda tarea crítica que no termina el proyecto tiene un sucesor crítico ajustado,
+    # por lo que la cadena desde cualquier inicio crítico llega al final del proyecto.
+    path = [int(starts[0])]
+    while path[-1] in next_of:
+        path.append(next_of[path[-1]])
+    return path
+
+
+# -----------------------------------------------------------------------------
+# Programación con recursos limitados (Serial Schedule Generation Scheme)
+# -----------------------------------------------------------------------------
+def _first_fit(row: np.ndarray, start: int, length: int, demand: int, capacity: int) -> int:
+    """Primer instante >= start con 'length' días consecutivos de capacidad libre para 'demand'."""
+    if length == 0:
+        return start
+    free = (row[start:] + demand <= capacity).astype(np.int64)
+    window = np.concatenate(([0], np.cumsum(free)))
+    fits = np.flatnonzero(window[length:] - window[:-length] == length)
+    return start + int(fits[0])
+
+
+def serial_sgs(durations: np.ndarray, src: np.ndarray, dst: np.ndarray,
+               resources: np.ndarray, demand: np.ndarray, capacity: np.ndarray,
+               priority, max_seconds: Optional[float] = None) -> dict:
+    """
+    Esquema serial de generación de cronogramas (SGS) con prioridades.
+
+    Las tareas elegibles (predecesoras ya programadas) se toman de un heap por prioridad
+    (menor valor primero, ej: inicio tardío de CPM; cualquier valor comparable) y se ubican en el primer hueco donde
+    su recurso tenga capacidad durante toda su duración. El tiempo se mide en días
+    laborables enteros. 'resources' usa -1 para tareas sin recurso asignado.
+
+    Si se supera 'max_seconds', las tareas restantes se programan solo por precedencia
+    (sin nivelar) y el resultado se marca con time_limit_reached.
+    """
+    lengths = np.ceil(np.asarray(durations, dtype=float)).astype(np.int64)
+    n = len(lengths)
+    n_resources = len(capacity)
+    if ((resources >= 0) & (demand > capacity[np.maximum(resources, 0)])).any():
+        raise ValueError("Hay tareas que requieren más unidades de las que tiene su recurso.")
+
+    indptr, targets = csr(n, src, dst)
+    pending = np.bincount(dst, minlength=n)
+    ready_at = np.zeros(n, dtype=np.int64)
+    start = np.zeros(n, dtype=np.int64)
+
+    usage = np.zeros((n_resources, max(64, int(lengths.sum() // max(n_resources, 1)) + 1)), dtype=np.int32)
+    horizon_used = 0
+
+    heap = [(priority[i], i) for i in np.flatnonzero(pending == 0).tolist()]
+    heapq.heapify(heap)
+    deadline = time.perf_counter() + max_seconds if max_seconds else None
+    timed_out = False
+
+    while heap:
+        _, i = heapq.heappop(heap)
+        earliest = int(ready_at[i])
+        length = int(lengths[i])
+        r = int(resources[i])
+
+        if r >= 0:
+            needed = max(horizon_used, earliest) + length
+            if needed > usage.shape[1]:
+                grown = np.zeros((n_resources, max(needed, 2 * usage.shape[1])), dtype=np.int32)
+                grown[:, :usage.shape[1]] = usage
+                usage = grown
+            t = earliest if timed_out else _first_fit(usage[r, :needed], earliest, length, int(demand[i]), int(capacity[r]))
+            usage[r, t:t + length] += demand[i]
+        else:
+            t = earliest
+
+        start[i] = t
+        horizon_used = max(horizon_used, t + length)
+
+        successors = targets[indptr[i]:indptr[i + 1]]
+        if successors.size:
+            ready_at[successors] = np.maximum(ready_at[successors], t + length)
+            np.subtract.at(pending, successors, 1)
+            for j in successors[pending[successors] == 0].tolist():
+                heapq.heappush(heap, (priority[j], j))
+
+        if deadline is not None and not timed_out and time.perf_counter() > deadline:
+            timed_out = True
+
+    return {
+        "start": start,
+        "finish": start + lengths,
+        "makespan": int(horizon_used),
+        "usage": usage[:, :horizon_used],
+        "time_limit_reached": timed_out,
+    }
+
+
+def utilization_histogram(usage: np.ndarray, capacity: np.ndarray, bucket: int) -> np.ndarray:
+    """Utilización (0-1+) de cada recurso por bloque de 'bucket' días laborables: matriz recursos × bloques."""
+    n_resources, horizon = usage.shape
+    n_buckets = max(1, -(-horizon // bucket))
+    padded = np.zeros((n_resources, n_buckets * bucket), dtype=np.int64)
+    padded[:, :horizon] = usage
+    busy = padded.reshape(n_resources, n_buckets, bucket).sum(axis=2)
+    return busy / (capacity[:, None] * bucket)
+
+
+# -----------------------------------------------------------------------------
+# Calendario laboral
+# -----------------------------------------------------------------------------
+def workday_dates(project_start, offsets: np.ndarray, weekmask: str = "1111100",
+                  holidays: Optional[List[str]] = None) -> np.ndarray:
+    """Convierte desplazamientos en días laborables a fechas (datetime64[D])."""
+    holidays = np.array(holidays or [], dtype="datetime64[D]")
+    first = np.busday_offset(np.datetime64(project_start, "D"), 0, roll="forward",
+                             weekmask=weekmask, holidays=holidays)
+    return np.busday_offset(first, np.asarray(offsets, dtype=np.int64), roll="forward",
+                            weekmask=weekmask, holidays=holidays)
+
+
+def workday_durations(start_dates, end_dates, weekmask: str = "1111100",
+                      holidays: Optional[List[str]] = None) -> np.ndarray:
+    """Días laborables entre fechas de inicio y fin (vectorizado)."""
+    holidays = np.array(holidays or [], dtype="datetime64[D]")
+    return np.busday_count(np.asarray(start_dates, dtype="datetime64[D]"),
+                           np.asarray(end_dates, dtype="datetime64[D]"),
+                           weekmask=weekmask, holidays=holidays)
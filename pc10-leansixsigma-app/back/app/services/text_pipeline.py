@@ -0,0 +1,149 @@
+# backend/app/services/text_pipeline.py
+"""
+Pipeline de texto compartido por Entrevistas, Brainstorming y Afinidades.
+
+Normaliza (minúsculas + sin tildes), tokeniza con una expresión regular compilada
+sobre la columna completa y filtra stopwords en español de forma vectorizada.
+Los tokens se guardan en caché por hash de documento: al re-analizar un corpus
+que crece (ej: nuevas transcripciones de un proyecto) solo se procesan los textos nuevos.
+"""
+import re
+import threading
+from collections import OrderedDict
+from itertools import chain
+from typing import Iterable, Optional
+import numpy as np
+import pandas as pd
+from pandas.util import hash_pandas_object
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Tokens sobre texto ya normalizado (ASCII en minúsculas)
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Stopwords en español, escritas SIN tildes porque se comparan contra texto normalizado
+SPANISH_STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aun bajo bien cada casi
+como con contra cual cuales cuando cuanto de del desde donde dos durante e el ella ellas
+ellos en entre era eran es esa esas ese eso esos esta estaba estaban estado estan estar
+estas este esto estos estoy fue fueron ha habia hace hacen hacer hasta hay la las le les
+lo los mas me mi mis mucho muy nada ni no nos nosotros o otra otras otro otros para pero
+poco por porque puede pueden que quien se sea segun ser si sido sin sobre solo son su sus
+tambien tan tanto te tener tiene tienen todo todos tu tus un una unas uno unos usted y ya yo
+""".split())
+
+_TOKEN_CACHE: "OrderedDict[int, tuple]" = OrderedDict()
+_TOKEN_CACHE_SIZE = 500_000
+_TOKEN_CACHE_LOCK = threading.Lock()
+
+
+def normalize(series: pd.Series) -> pd.Series:
+    """Minúsculas y eliminación de tildes/diacríticos para toda la columna a la vez."""
+    return (
+        series.fillna("").astype(str).str.lower()
+        .str.normalize("NFKD")
+        .str.encode("ascii", "ignore")
+        .str.decode("ascii")
+    )
+
+
+def _cache_hit(key) -> Optional[tuple]:
+    """Tokens en caché (y marca el documento como usado recientemente). Llamar con el lock tomado."""
+    toks = _TOKEN_CACHE.get(key)
+    if toks is not None:
+        _TOKEN_CACHE.move_to_end(key)
+    return toks
+
+
+def tokenize(series: pd.Series) -> pd.Series:
+    """
+    Tokens normalizados (sin filtrar) de cada documento, conservando el índice.
+    Solo se tokenizan los documentos cuyo hash no está en la caché (LRU: cada acierto
+    pasa al final y se descartan los documentos usados hace más tiempo).
+    """
+    texts = series.fillna("").astype(str)
+    hashes = hash_pandas_object(texts, index=False).to_numpy()
+
+    with _TOKEN_CACHE_LOCK:
+        tokens = np.fromiter((_cache_hit(h) for h in hashes), dtype=object, count=len(hashes))
+    missing = pd.isna(tokens)
+
+    if missing.any():
+        new_tokens = normalize(texts[missing]).str.findall(TOKEN_RE).map(tuple).tolist()
+        with _TOKEN_CACHE_LOCK:
+            for pos, h, toks in zip(np.flatnonzero(missing), hashes[missing], new_tokens):
+                tokens[pos] = toks
+                _TOKEN_CACHE[h] = toks
+                _TOKEN_CACHE.move_to_end(h)
+            while len(_TOKEN_CACHE) > _TOKEN_CACHE_SIZE:
+                _TOKEN_CACHE.popitem(last=False)
+
+    return pd.Series(tokens, index=texts.index, dtype=object)
+
+
+def filtered_tokens(series: pd.Series, min_length: int = 1,
+                    stopwords: Optional[Iterable[str]] = SPANISH_STOPWORDS) -> pd.Series:
+    """Tokens en formato largo (un token por fila, índice = documento) sin stopwords ni palabras cortas."""
+    tokens = tokenize(series)
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+    exploded = pd.Series(
+        np.fromiter(chain.from_iterable(tokens), dtype=object, count=int(lengths.sum())),
+        index=np.repeat(tokens.index.to_numpy(), lengths),
+        dtype=object
+    )
+    # El filtro se evalúa sobre el vocabulario (valores únicos), no sobre cada ocurrencia
+    codes, vocabulary = pd.factorize(exploded.to_numpy())
+    vocabulary = pd.Series(vocabulary, dtype=object)
+    keep = vocabulary.str.len() >= min_length
+    if stopwords:
+        keep &= ~vocabulary.isin(frozenset(stopwords))
+    keep = keep.to_numpy()
+    return exploded[keep[codes]] if len(codes) else exploded
+
+
+def token_counts(series: pd.Series, top_n: Optional[int] = None, min_length: int = 1,
+                 stopwords: Optional[Iterable[str]] = SPANISH_STOPWORDS) -> pd.Series:
+    """Frecuencia de tokens de toda la columna, ordenada de mayor a menor."""
+    counts = filtered_tokens(series, min_length, stopwords).value_counts()
+    return counts.head(top_n) if top_n else counts
+
+
+def ngram_counts(series: pd.Series, n: int = 2, top_n: Optional[int] = None, min_length: int = 1,
+                 stopwords: Optional[Iterable[str]] = SPANISH_STOPWORDS) -> pd.Series:
+    """Frecuencia de n-gramas (dentro de cada documento) tras filtrar stopwords."""
+    tokens = filtered_tokens(series.reset_index(drop=True), min_length, stopwords)
+    by_doc = tokens.groupby(level=0, sort=False)
+
+    grams = tokens
+    for k in range(1, n):
+        grams = grams + " " + by_doc.shift(-k)
+    counts = grams.dropna().value_counts()
+    return counts.head(top_n) if top_n else counts
+
+
+def token_lists(series: pd.Series, min_length: int = 1,
+                stopwords: Optional[Iterable[str]] = SPANISH_STOPWORDS) -> list:
+    """Lista de tokens filtrados por documento (mismo orden que la serie de entrada)."""
+    series = series.reset_index(drop=True)
+    grouped = filtered_tokens(series, min_length, stopwords).groupby(level=0, sort=False).agg(list)
+    return grouped.reindex(series.index).map(lambda t: t if isinstance(t, list) else []).tolist()
+
+
+def tfidf(series: pd.Series, min_length: int = 2,
+          stopwords: Optional[Iterable[str]] = SPANISH_STOPWORDS,
+          vectorizer: Optional[TfidfVectorizer] = None):
+    """
+    Matriz TF-IDF (dispersa) sobre los tokens del pipeline.
+    Si se pasa un vectorizador ya ajustado solo se transforma (vocabulario reutilizado).
+    Retorna (vectorizer, X).
+    """
+    docs = token_lists(series, min_length, stopwords)
+    if vectorizer is not None:
+        return vectorizer, vectorizer.transform(docs)
+
+    vectorizer = TfidfVectorizer(analyzer=_identity)
+    return vectorizer, vectorizer.fit_transform(docs)
+
+
+def _identity(tokens):
+    # Analizador de nivel de módulo (no lambda) para que el vectorizador sea serializable
+    return tokens
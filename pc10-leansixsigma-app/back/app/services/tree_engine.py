@@ -0,0 +1,186 @@
+# backend/app/services/tree_engine.py
+"""
+Motor de árboles compartido (Árbol de Estructura/CTQ, Árbol de Costos).
+
+Construye el índice padre/hijos a partir de los arreglos id/parent_id sin recursión:
+- Profundidad por "salto de punteros" (pointer jumping): O(n log D) vectorizado,
+  funciona con cualquier profundidad y detecta ciclos.
+- Niveles agrupados por profundidad: las agregaciones (sumas, conteos, promedios
+  ponderados) se acumulan de abajo hacia arriba con np.add.at, un nivel a la vez.
+- Hijos en formato CSR para expandir nodos o armar la estructura anidada.
+"""
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.services.graph import csr, gather_edges
+
+
+def id_labels(values) -> pd.Series:
+    """
+    IDs como objetos listos para pasar a texto. Un flotante entero (ej: 1.0, lo que deja pandas
+    en una columna de IDs enteros con algún None) vuelve a entero para que '1.0' coincida con '1'.
+    """
+    labels = pd.Series(values, dtype=object).reset_index(drop=True)
+    numbers = pd.to_numeric(labels, errors="coerce")
+    is_float = labels.map(lambda v: isinstance(v, (float, np.floating)))
+    integral = (is_float & numbers.notna() & np.isfinite(numbers) & (numbers % 1 == 0)).to_numpy(dtype=bool)
+    if integral.any():
+        labels[integral] = numbers[integral].astype(np.int64).to_numpy(dtype=object)
+    return labels
+
+
+class TreeIndex:
+    """Índice de un árbol (o bosque) con n nodos identificados por posición 0..n-1."""
+
+    def __init__(self, ids, parent_ids):
+        ids = id_labels(ids).astype(str)
+        parent_ids = id_labels(parent_ids)
+        self.ids = pd.Index(ids)
+        if self.ids.has_duplicates:
+            raise ValueError(f"El ID '{self.ids[self.ids.duplicated()][0]}' está repetido.")
+        self.n = len(self.ids)
+
+        # 1. Padres (posiciones). Un padre declarado que no existe es un huérfano y se trata como raíz.
+        parent_ids = parent_ids.where(parent_ids.notna(), "").astype(str).str.strip()
+        blank = (parent_ids == "").to_numpy()
+        parent = self.ids.get_indexer(parent_ids.to_numpy())
+        parent[blank] = -1
+        self.orphans = np.flatnonzero(~blank & (parent < 0))
+        self.parent = parent.astype(np.int64)
+
+        # 2. Profundidad y detección de ciclos
+        self.depth, self.cyclic = self._depths(self.parent)
+
+        # 3. Niveles (nodos agrupados por profundidad) e hijos en CSR
+        valid = np.flatnonzero(self.depth >= 0)
+        self.order = valid[np.argsort(self.depth[valid], kind="stable")]
+        self.max_depth = int(self.depth.max()) if valid.size else -1
+        self.level_bounds = np.searchsorted(self.depth[self.order], np.arange(self.max_depth + 2))
+
+        has_parent = np.flatnonzero((self.parent >= 0) & (self.depth >= 0))
+        self.child_ptr, self.child_idx = csr(self.n, self.parent[has_parent], has_parent)
+        self.roots = np.flatnonzero((self.parent < 0) & (self.depth >= 0))
+        self._subtree_size: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _depths(parent: np.ndarray):
+        """
+        Profundidad de cada nodo por salto de punteros: en cada ronda cada nodo suma la
+        distancia acumulada de su ancestro y salta al ancestro de su ancestro.
+        Los nodos que no llegan a una raíz tras log2(n) rondas están en (o bajo) un ciclo.
+        """
+        n = len(parent)
+        depth = (parent >= 0).astype(np.int64)
+        ancestor = parent.copy()
+        for _ in range(max(1, int(np.ceil(np.log2(max(n, 2))))) + 1):
+            active = np.flatnonzero(ancestor >= 0)
+            if active.size == 0:
+                break
+            jump = ancestor[active]
+            new_depth = depth[active] + depth[jump]
+            new_ancestor = ancestor[jump]
+            depth[active] = new_depth
+            ancestor[active] = new_ancestor
+
+        cyclic = np.flatnonzero(ancestor >= 0)
+        depth[cyclic] = -1
+        return depth, cyclic
+
+    # -------------------------------------------------------------------------
+    # Agregaciones
+    # -------------------------------------------------------------------------
+    def levels(self, reverse: bool = False):
+        """Itera los niveles (arreglos de posiciones), de la raíz a las hojas o al revés."""
+        rng = range(self.max_depth, -1, -1) if reverse else range(self.max_depth + 1)
+        for d in rng:
+            yield self.order[self.level_bounds[d]:self.level_bounds[d + 1]]
+
+    def rollup(self, values) -> np.ndarray:
+        """
+        Suma de cada subárbol (el propio nodo + descendientes), de abajo hacia arriba.
+        Acepta un vector (n,) o una matriz (n, k) para agregar varias columnas a la vez.
+        """
+        totals = np.array(values, dtype=float, copy=True)
+        for nodes in self.levels(reverse=True):
+            nodes = nodes[self.parent[nodes] >= 0]
+            if nodes.size:
+                np.add.at(totals, self.parent[nodes], totals[nodes])
+        return totals
+
+    def weighted_rollup(self, scores, weights) -> np.ndarray:
+        """Promedio ponderado de 'scores' en cada subárbol (NaN si el peso total es 0)."""
+        scores = np.nan_to_num(np.asarray(scores, dtype=float))
+        weights = np.nan_to_num(np.asarray(weights, dtype=float))
+        totals = self.rollup(np.column_stack([scores * weights, weights]))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(totals[:, 1] > 0, totals[:, 0] / totals[:, 1], np.nan)
+
+    @property
+    def subtree_size(self) -> np.ndarray:
+        """Cantidad de nodos de cada subárbol (incluye al propio nodo)."""
+        if self._subtree_size is None:
+            self._subtree_size = self.rollup(np.ones(self.n)).astype(np.int64)
+        return self._subtree_size
+
+    @property
+    def child_count(self) -> np.ndarray:
+        return np.diff(self.child_ptr)
+
+    def propagate_down(self, values: np.ndarray, missing: np.ndarray) -> np.ndarray:
+        """Hereda el valor del padre en los nodos donde falta (ej: categoría de un costo), de arriba hacia abajo."""
+        values = np.array(values, dtype=object, copy=True)
+        missing = np.array(missing, dtype=bool, copy=True)
+        for nodes in self.levels():
+            take = nodes[missing[nodes] & (self.parent[nodes] >= 0)]
+            if take.size:
+                values[take] = values[self.parent[take]]
+                missing[take] = missing[self.parent[take]]
+        return values
+
+    def children(self, position: int) -> np.ndarray:
+        return self.child_idx[self.child_ptr[position]:self.child_ptr[position + 1]]
+
+    # -------------------------------------------------------------------------
+    # Salida
+    # -------------------------------------------------------------------------
+    def to_nested(self, fields: Dict[str, np.ndarray], max_depth: Optional[int] = None,
+                  children_key: str = "children", nodes: Optional[np.ndarray] = None,
+                  max_children: Optional[int] = None) -> List[dict]:
+        """
+        Estructura anidada (lista de raíces con sus hijos) sin recursión.
+        'fields' son columnas por nodo; con max_depth se corta en esa profundidad.
+        'nodes' permite partir de otros nodos en vez de las raíces (expansión de subárbol).
+        'max_children' limita los hijos incluidos por nodo (el resto se pide con una expansión).
+        El costo es proporcional a los nodos incluidos si 'fields' ya son arreglos de tipo object.
+        """
+        tops = self.roots if nodes is None else np.asarray(nodes, dtype=np.int64)
+        keys = list(fields)
+        columns = [np.asarray(fields[k], dtype=object) for k in keys]
+
+        def make(position: int) -> dict:
+            return {**{k: col[position] for k, col in zip(keys, columns)}, children_key: []}
+
+        built = {top: make(top) for top in tops.tolist()}
+        result = [built[top] for top in tops.tolist()]
+
+        # Recorrido por niveles desde los nodos iniciales: cada hijo se cuelga de su padre ya construido
+        frontier = tops
+        level = 0
+        while frontier.size and (max_depth is None or level < max_depth):
+            frontier = self.child_idx[self._child_slots(frontier, max_children)]
+            for child in frontier.tolist():
+                built[child] = make(child)
+                built[int(self.parent[child])][children_key].append(built[child])
+            level += 1
+        return result
+
+    def _child_slots(self, nodes: np.ndarray, max_children: Optional[int]) -> np.ndarray:
+        """Posiciones en child_idx de los hijos de 'nodes' (los primeros max_children de cada uno)."""
+        if max_children is None:
+            return gather_edges(self.child_ptr, nodes)
+        starts = self.child_ptr[nodes]
+        counts = np.minimum(self.child_ptr[nodes + 1] - starts, max_children)
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
@@ -0,0 +1,127 @@
+# backend/app/services/tree_store.py
+"""
+Almacén de árboles ya indexados para la API paginada (/trees).
+
+Construir el índice de un árbol grande (200k nodos de un CTQ o una lista de materiales)
+cuesta O(n); expandir un nodo con el índice listo cuesta O(nodos visibles). Por eso el
+índice y las columnas por nodo se guardan en memoria (LRU) y cada respuesta solo arma
+los nodos que el usuario ve. Los árboles creados desde un Dataset usan un id estable
+('dataset-<id>-<herramienta>') y se reconstruyen desde la BD si salieron del caché, con
+los mismos parámetros de construcción (se recuerdan aparte, aunque el árbol se descarte).
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import numpy as np
+from app.services.tree_engine import TreeIndex
+from app.tools.cost_tree import CostTreeTool
+from app.tools.structure_tree import StructureTreeTool
+
+# Herramientas que exponen build_index() -> (tree, fields, rollups)
+TREE_TOOLS = {
+    "structure_tree": StructureTreeTool,
+    "ctq_tree": StructureTreeTool,
+    "job_tree": StructureTreeTool,
+    "cost_tree": CostTreeTool,
+}
+
+
+@dataclass
+class StoredTree:
+    tree_id: str
+    tool_name: str
+    tree: TreeIndex
+    fields: Dict[str, np.ndarray]
+    rollups: Dict[str, Any] = field(default_factory=dict)
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def dataset_tree_id(dataset_id: int, tool_name: str) -> str:
+    return f"dataset-{dataset_id}-{tool_name}"
+
+
+def build_tree(tool_name: str, data: List[Dict[str, Any]], params: Optional[Dict[str, Any]] = None,
+               tree_id: Optional[str] = None) -> StoredTree:
+    """Construye el índice con la herramienta indicada (lanza ValueError si los datos no son válidos)."""
+    tool_class = TREE_TOOLS.get(tool_name)
+    if tool_class is None:
+        raise ValueError(f"La herramienta '{tool_name}' no genera árboles. Opciones: {', '.join(TREE_TOOLS)}")
+    params = dict(params or {})
+    tree, fields, rollups = tool_class(data=data, params=dict(params)).build_index()
+    return StoredTree(tree_id=tree_id or uuid.uuid4().hex, tool_name=tool_name,
+                      tree=tree, fields=fields, rollups=rollups, params=params)
+
+
+class TreeStore:
+    """Caché LRU de árboles indexados (seguro entre hilos del servidor)."""
+
+    def __init__(self, max_trees: int = 16, max_params: int = 1024):
+        self.max_trees = max_trees
+        self.max_params = max_params
+        self._trees: "OrderedDict[str, StoredTree]" = OrderedDict()
+        # Parámetros de construcción por id (livianos): sobreviven al descarte del árbol
+        self._params: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, stored: StoredTree) -> StoredTree:
+        with self._lock:
+            self._trees[stored.tree_id] = stored
+            self._trees.move_to_end(stored.tree_id)
+            while len(self._trees) > self.max_trees:
+                self._trees.popitem(last=False)
+            self._params[stored.tree_id] = stored.params
+            self._params.move_to_end(stored.tree_id)
+            while len(self._params) > self.max_params:
+                self._params.popitem(last=False)
+        return stored
+
+    def build_params(self, tree_id: str) -> Dict[str, Any]:
+        """Parámetros con los que se construyó el árbol (para reconstruirlo igual)."""
+        with self._lock:
+            return dict(self._params.get(tree_id, {}))
+
+    def get(self, tree_id: str) -> Optional[StoredTree]:
+        with self._lock:
+            stored = self._trees.get(tree_id)
+            if stored is not None:
+                self._trees.move_to_end(tree_id)
+            return stored
+
+    def invalidate_dataset(self, dataset_id: int):
+        """Descarta los árboles de un Dataset (ej: si se editan sus datos)."""
+        prefix = f"dataset-{dataset_id}-"
+        with self._lock:
+            for key in [k for k in self._trees if k.startswith(prefix)]:
+                del self._trees[key]
+
+
+def page(stored: StoredTree, parent_id: Optional[str] = None, levels: int = 2,
+         offset: int = 0, limit: int = 100, max_children: int = 100) -> dict:
+    """
+    Vista paginada del árbol: 'levels' niveles desde las raíces (o desde los hijos de
+    'parent_id'), con 'limit' nodos de arranque a partir de 'offset' y como máximo
+    'max_children' hijos por nodo. Cada nodo trae 'child_count' para saber si falta expandir.
+    """
+    tree = stored.tree
+    if parent_id is None:
+        candidates = tree.roots
+    else:
+        position = tree.ids.get_indexer([str(parent_id)])[0]
+        if position < 0:
+            raise KeyError(parent_id)
+        candidates = tree.children(position)
+
+    start_nodes = candidates[offset:offset + limit]
+    nodes = tree.to_nested(stored.fields, max_depth=max(levels - 1, 0), nodes=start_nodes,
+                           max_children=max_children)
+    return {
+        "tree_id": stored.tree_id,
+        "parent_id": parent_id,
+        "total": int(candidates.size),
+        "offset": offset,
+        "limit": limit,
+        "has_more": offset + len(start_nodes) < candidates.size,
+        "nodes": nodes,
+    }
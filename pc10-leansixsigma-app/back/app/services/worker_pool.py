@@ -0,0 +1,53 @@
+# backend/app/services/worker_pool.py
+"""
+Pool de procesos compartido por todas las solicitudes del servidor.
+
+La simulación de eventos discretos, el bootstrap y el ajuste de distribuciones reparten
+su trabajo en un único pool de a lo sumo MAX_WORKERS procesos, creado al primer uso.
+El 'n_jobs' de una solicitud solo limita cuántas de sus tareas corren a la vez: nunca
+crea procesos nuevos, así que un cliente no puede agotar los recursos del servidor.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Sequence
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def shared_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+        return _POOL
+
+
+def discard_pool(pool: ProcessPoolExecutor):
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_tasks(fn: Callable, tasks: Sequence[tuple], n_jobs: Optional[int] = None) -> List:
+    """
+    fn(*args) para cada tarea, en el pool compartido y en el orden de 'tasks'.
+    Se envían ventanas de min(n_jobs, MAX_WORKERS) tareas: una solicitud no acapara el pool.
+    """
+    pool = shared_pool()
+    window = max(1, min(n_jobs or MAX_WORKERS, MAX_WORKERS))
+    results: List = []
+    try:
+        for start in range(0, len(tasks), window):
+            futures = [pool.submit(fn, *args) for args in tasks[start:start + window]]
+            results.extend(f.result() for f in futures)
+    except BrokenProcessPool:
+        # Un proceso del pool murió: se descarta para que la próxima solicitud cree uno nuevo
+        discard_pool(pool)
+        raise
+    return results
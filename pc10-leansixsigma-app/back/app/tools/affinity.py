@@ -1,16 +1,44 @@
 # backend/app/tools/affinity.py
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
+from scipy import sparse
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from app.services import text_pipeline
+
+# Caché de vectorizadores ajustados por proyecto y versión de vocabulario: {(project_id, version): vectorizer}
+# Al agregar ideas a un taller el vocabulario del proyecto se reutiliza (solo se transforma);
+# se reajusta al cambiar 'vocabulary_version' o si muchas ideas nuevas quedan fuera del vocabulario.
+_VECTORIZER_CACHE: "OrderedDict[tuple, object]" = OrderedDict()
+_VECTORIZER_CACHE_SIZE = 32
+_VECTORIZER_LOCK = threading.Lock()
+# Fracción máxima de ideas sin ningún término del vocabulario en caché antes de reajustarlo
+_MAX_UNCOVERED = 0.1
+
+
+def _fit_candidate(X, k: int, sample_idx: np.ndarray, batch_size: int, random_state: int):
+    """Ajusta MiniBatchKMeans para un k candidato y lo evalúa con silhouette sobre una muestra."""
+    model = MiniBatchKMeans(n_clusters=k, batch_size=batch_size, random_state=random_state, n_init=3)
+    labels = model.fit_predict(X)
+    sample_labels = labels[sample_idx]
+    if len(np.unique(sample_labels)) < 2:
+        return k, labels, -1.0
+    score = silhouette_score(X[sample_idx], sample_labels, metric="cosine")
+    return k, labels, float(score)
+
 
 class AffinityTool(SixSigmaTool):
     """
     Herramienta de Diagrama de Afinidades.
     Utiliza Machine Learning (K-Means) para agrupar ideas por similitud de texto.
     Ideal para organizar el caos después de un Brainstorming.
+    Para talleres masivos (miles de notas) use mode='scalable': MiniBatchKMeans sobre
+    la matriz dispersa y selección automática de k por silhouette.
     """
 
     def analyze(self) -> AnalysisResult:
@@ -19,32 +47,29 @@ class AffinityTool(SixSigmaTool):
             raise ValueError("Se requiere una lista de ideas (columna 'text').")
 
         data = self.df["text"].tolist()
-        
+
         # Necesitamos suficientes datos para agrupar
         if len(data) < 3:
              raise ValueError("Se necesitan al menos 3 ideas para crear afinidades.")
 
+        if self.params.get("mode", "standard") == "scalable":
+            return self._analyze_scalable(data)
+
         num_clusters = self.params.get("num_clusters", 3)
-        
+
         # Ajustar clusters si hay pocos datos (no puedes hacer 5 grupos con 4 ideas)
         if len(data) < num_clusters:
             num_clusters = max(2, len(data) // 2)
 
         # 2. Procesamiento NLP (Vectorización)
-        # Convertimos texto a matriz numérica TF-IDF
-        # stop_words='english' funciona bien, para español idealmente cargarías una lista
-        # Aquí usamos un patrón básico para tokenizar
-        vectorizer = TfidfVectorizer(stop_words=None) 
-        try:
-            X = vectorizer.fit_transform(data)
-        except ValueError:
-            # Si el texto es muy corto o vacío
-            raise ValueError("El texto proporcionado no es suficiente para analizar.")
+        # Convertimos texto a matriz numérica TF-IDF con el pipeline compartido
+        # (normalización, tokenización y stopwords en español)
+        vectorizer, X = self._vectorize()
 
         # 3. Clustering (K-Means)
         kmeans = KMeans(n_clusters=num_clusters, random_state=42)
         kmeans.fit(X)
-        
+
         # Asignar el cluster a cada idea
         self.df['cluster_id'] = kmeans.labels_
 
@@ -52,7 +77,7 @@ class AffinityTool(SixSigmaTool):
         # Intentamos adivinar el nombre del grupo buscando las palabras más representativas del centroide
         order_centroids = kmeans.cluster_centers_.argsort()[:, ::-1]
         terms = vectorizer.get_feature_names_out()
-        
+
         cluster_names = {}
         for i in range(num_clusters):
             # Tomamos las 2 palabras más importantes del cluster
@@ -61,6 +86,119 @@ class AffinityTool(SixSigmaTool):
 
         self.df['cluster_name'] = self.df['cluster_id'].map(cluster_names)
 
+        return self._build_result(
+            num_clusters,
+            algorithm="K-Means Clustering + TF-IDF"
+        )
+
+    def _analyze_scalable(self, data: list) -> AnalysisResult:
+        """Modo escalable: MiniBatchKMeans + k automático (silhouette en muestra, candidatos en paralelo)."""
+        n_docs = len(data)
+        random_state = self.params.get("random_state", 42)
+
+        vectorizer, X = self._vectorize()
+
+        # 1. Rango de k candidatos
+        if self.params.get("auto_k", True):
+            k_min, k_max = self.params.get("k_range", [2, 10])
+        else:
+            k_min = k_max = self.params.get("num_clusters", 3)
+        k_max = min(int(k_max), n_docs - 1)
+        k_min = max(2, min(int(k_min), k_max))
+        candidates = list(range(k_min, k_max + 1))
+
+        # 2. Muestra común para silhouette (O(m²) en vez de O(n²))
+        sample_size = min(n_docs, int(self.params.get("silhouette_sample_size", 2000)))
+        rng = np.random.default_rng(random_state)
+        sample_idx = np.sort(rng.choice(n_docs, size=sample_size, replace=False))
+
+        # 3. Ajuste de los candidatos en paralelo
+        batch_size = int(self.params.get("batch_size", 1024))
+        fits = Parallel(n_jobs=self.params.get("n_jobs", -1), prefer="threads")(
+            delayed(_fit_candidate)(X, k, sample_idx, batch_size, random_state) for k in candidates
+        )
+        best_k, labels, best_score = max(fits, key=lambda f: f[2])
+        silhouette_by_k = {int(k): round(score, 4) for k, _, score in fits}
+
+        # 4. Etiquetado con centroides dispersos (promedio TF-IDF de cada grupo)
+        terms = vectorizer.get_feature_names_out()
+        cluster_names = self._label_sparse_centroids(X, labels, best_k, terms)
+
+        self.df['cluster_id'] = labels
+        self.df['cluster_name'] = self.df['cluster_id'].map(cluster_names)
+
+        return self._build_result(
+            best_k,
+            algorithm="MiniBatch K-Means + TF-IDF (k automático por silhouette)",
+            extra_details={
+                "silhouette_by_k": silhouette_by_k,
+                "silhouette_score": round(best_score, 4),
+                "silhouette_sample_size": sample_size
+            }
+        )
+
+    def _vectorize(self):
+        """TF-IDF del corpus, reutilizando el vocabulario del proyecto (y su versión) si lo cubre."""
+        project_id = self.params.get("project_id")
+        key = (str(project_id), str(self.params.get("vocabulary_version", 0)))
+
+        if project_id is not None:
+            with _VECTORIZER_LOCK:
+                cached = _VECTORIZER_CACHE.get(key)
+                if cached is not None:
+                    _VECTORIZER_CACHE.move_to_end(key)
+            if cached is not None:
+                vectorizer, X = text_pipeline.tfidf(self.df["text"], vectorizer=cached)
+                if (X.getnnz(axis=1) == 0).mean() <= _MAX_UNCOVERED:
+                    return vectorizer, X
+
+        try:
+            vectorizer, X = text_pipeline.tfidf(self.df["text"])
+        except ValueError:
+            # Si el texto es muy corto o vacío
+            raise ValueError("El texto proporcionado no es suficiente para analizar.")
+
+        if project_id is not None:
+            with _VECTORIZER_LOCK:
+                _VECTORIZER_CACHE[key] = vectorizer
+                _VECTORIZER_CACHE.move_to_end(key)
+                while len(_VECTORIZER_CACHE) > _VECTORIZER_CACHE_SIZE:
+                    _VECTORIZER_CACHE.popitem(last=False)
+
+        return vectorizer, X
+
+    @staticmethod
+    def _label_sparse_centroids(X, labels: np.ndarray, k: int, terms, top_n: int = 2) -> dict:
+        """Nombra cada grupo con sus términos de mayor peso usando argpartition sobre centroides dispersos."""
+        n_docs = X.shape[0]
+        membership = sparse.csr_matrix(
+            (np.ones(n_docs), (labels, np.arange(n_docs))), shape=(k, n_docs)
+        )
+        sizes = np.asarray(membership.sum(axis=1)).ravel()
+        sizes[sizes == 0] = 1
+        centroids = sparse.diags(1.0 / sizes) @ membership @ X
+        centroids = sparse.csr_matrix(centroids)
+
+        cluster_names = {}
+        for i in range(k):
+            start, end = centroids.indptr[i], centroids.indptr[i + 1]
+            weights = centroids.data[start:end]
+            if weights.size == 0:
+                cluster_names[i] = f"Grupo {i + 1}"
+                continue
+            top = min(top_n, weights.size)
+            best = np.argpartition(-weights, top - 1)[:top]
+            best = best[np.argsort(-weights[best])]
+            top_terms = [terms[ind] for ind in centroids.indices[start:end][best]]
+            name = "Grupo: " + " & ".join(top_terms).upper()
+            # Con muchos grupos dos centroides pueden compartir términos; no deben fusionarse al agrupar
+            if name in cluster_names.values():
+                name = f"{name} ({i + 1})"
+            cluster_names[i] = name
+
+        return cluster_names
+
+    def _build_result(self, num_clusters: int, algorithm: str, extra_details: dict = None) -> AnalysisResult:
         # 5. Estructurar Salida
         # Agrupamos para el frontend: { "Grupo A": ["idea 1", "idea 2"], ... }
         groups = {}
@@ -77,7 +215,7 @@ class AffinityTool(SixSigmaTool):
             })
 
         summary = (
-            f"Se han organizado {len(data)} ideas en {num_clusters} grupos de afinidad. "
+            f"Se han organizado {len(self.df)} ideas en {num_clusters} grupos de afinidad. "
             f"El grupo más grande es '{max(groups, key=lambda k: len(groups[k]))}'."
         )
 
@@ -86,7 +224,8 @@ class AffinityTool(SixSigmaTool):
             summary=summary,
             chart_data=chart_data,
             details={
-                "algorithm": "K-Means Clustering + TF-IDF",
-                "num_clusters_used": num_clusters
+                "algorithm": algorithm,
+                "num_clusters_used": num_clusters,
+                **(extra_details or {})
             }
-        )
\ No newline at end of file
+        )
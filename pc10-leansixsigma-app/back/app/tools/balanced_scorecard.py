@@ -1,4 +1,5 @@
 # backend/app/tools/balanced_scorecard.py
+import numpy as np
 import pandas as pd
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
@@ -7,11 +8,16 @@ class BalancedScorecardTool(SixSigmaTool):
     """
     Herramienta Balanced Scorecard (Cuadro de Mando Integral).
     Monitorea el desempeño estratégico en 4 perspectivas.
+    Con una columna 'period' analiza la serie de cada KPI: tendencia (pendiente por
+    mínimos cuadrados), promedio móvil del cumplimiento y pronóstico del próximo periodo.
+    Todo el cálculo es vectorizado (sin bucles por KPI).
     Referencias:
     - Kaplan & Norton (Concepto original).
     - Uso en Fase Controlar para sostener métricas de alto nivel.
     """
 
+    STATUS_LABELS = np.array(["Rojo", "Amarillo", "Verde"], dtype=object)
+
     def analyze(self) -> AnalysisResult:
         # 1. Validación
         if self.df.empty:
@@ -23,66 +29,48 @@ class BalancedScorecardTool(SixSigmaTool):
         # Default direction si no viene
         if "higher_is_better" not in self.df.columns:
             self.df["higher_is_better"] = True
+        self.df["higher_is_better"] = self.df["higher_is_better"].fillna(True).astype(bool)
+        for col in ("target", "actual"):
+            self.df[col] = pd.to_numeric(self.df[col], errors="coerce")
+        if self.df[["target", "actual"]].isna().any().any():
+            raise ValueError("Las columnas 'target' y 'actual' deben ser numéricas.")
+        weights = (pd.to_numeric(self.df["weight"], errors="coerce").fillna(1.0)
+                   if "weight" in self.df.columns else pd.Series(1.0, index=self.df.index))
+        self.df["_weight"] = weights.clip(lower=0.0)
+
+        # 2. Cálculo de Desempeño (% Cumplimiento) y 3. Semáforo, para todas las filas a la vez
+        achievement = self._achievement(self.df["target"].to_numpy(dtype=float),
+                                        self.df["actual"].to_numpy(dtype=float),
+                                        self.df["higher_is_better"].to_numpy())
+        self.df["achievement"] = np.round(achievement, 1)
+        self.df["status"] = self._status(achievement)
+
+        if "period" in self.df.columns:
+            df_res, extra_details = self._analyze_series()
+        else:
+            df_res, extra_details = self.df, {}
 
-        # 2. Cálculo de Desempeño (% Cumplimiento)
-        results = []
-        
-        for _, row in self.df.iterrows():
-            target = row["target"]
-            actual = row["actual"]
-            direction = row["higher_is_better"]
-            
-            # Evitar división por cero
-            if target == 0:
-                if direction: # Queremos maximizar 0? Raro, pero si actual > 0 es bueno
-                    achievement = 100.0 if actual >= 0 else 0.0
-                else: # Queremos minimizar (ej: 0 accidentes). Si actual es 0, es 100%
-                    achievement = 100.0 if actual == 0 else 0.0
-            else:
-                if direction:
-                    # Más es mejor (Ventas)
-                    achievement = (actual / target) * 100
-                else:
-                    # Menos es mejor (Defectos)
-                    # Si mi meta es 10 y tengo 5, cumplí por mucho. 
-                    # Fórmula invertida simple: (Target / Actual) * 100 puede dispararse.
-                    # Usamos desviación: 100 + (Target - Actual)/Target * 100
-                    # Ejemplo: Meta 10, Actual 5. (10-5)/10 = 50% mejor -> 150% cumplimiento
-                    achievement = (1 + ((target - actual) / target)) * 100
-
-            # 3. Asignación de Semáforo (RAG Status)
-            if achievement >= 100:
-                status = "Verde"
-            elif achievement >= 90:
-                status = "Amarillo"
-            else:
-                status = "Rojo"
-
-            results.append({
-                **row.to_dict(),
-                "achievement": round(achievement, 1),
-                "status": status
-            })
-
-        df_res = pd.DataFrame(results)
-
-        # 4. Agrupación por Perspectiva
+        # 4. Agrupación por Perspectiva (promedio ponderado por 'weight' en un solo groupby)
+        perspective_scores = self._perspective_scores(df_res)
         summary_parts = []
-        perspective_scores = {}
-        
-        for persp, group in df_res.groupby("perspective"):
-            avg_ach = group["achievement"].mean()
-            perspective_scores[persp] = round(avg_ach, 1)
-            
+        for persp, avg_ach in perspective_scores.items():
             # Estado general de la perspectiva
             health = "Crítico" if avg_ach < 90 else ("Alerta" if avg_ach < 100 else "Saludable")
             summary_parts.append(f"{persp}: {health} ({avg_ach:.0f}%)")
 
         summary = f"Scorecard Analizado. Estado General: {', '.join(summary_parts)}."
+        if extra_details:
+            summary += (
+                f" Último periodo: {extra_details['last_period']}. "
+                f"{extra_details['improving']} KPIs mejoran y {extra_details['deteriorating']} empeoran; "
+                f"{len(extra_details['at_risk'])} podrían pasar a Rojo el próximo periodo."
+            )
 
         # 5. Estructura para Frontend
-        # El frontend suele mostrar esto en 4 cuadrantes. Enviamos la lista enriquecida.
-        chart_data = df_res.to_dict(orient="records")
+        # El frontend suele mostrar esto en 4 cuadrantes. Enviamos la lista enriquecida
+        # (con series: la foto del último periodo de cada KPI).
+        output = df_res.drop(columns=["_weight"])
+        chart_data = output.astype(object).where(output.notna(), None).to_dict(orient="records")
 
         return AnalysisResult(
             tool_name="Balanced Scorecard (BSC)",
@@ -90,6 +78,161 @@ class BalancedScorecardTool(SixSigmaTool):
             chart_data=chart_data,
             details={
                 "perspective_averages": perspective_scores,
-                "total_kpis": len(df_res)
+                "total_kpis": len(df_res),
+                "status_counts": df_res["status"].value_counts().to_dict(),
+                **extra_details
             }
-        )
\ No newline at end of file
+        )
+
+    # -------------------------------------------------------------------------
+    # Motor vectorizado
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _achievement(target: np.ndarray, actual: np.ndarray, higher_is_better: np.ndarray) -> np.ndarray:
+        """
+        % de cumplimiento.
+        - Más es mejor (Ventas): actual / meta.
+        - Menos es mejor (Defectos): 100 + (meta - actual) / meta * 100 (Meta 10, Actual 5 -> 150%).
+          La fórmula invertida simple (meta / actual) puede dispararse.
+        - Meta 0: maximizar -> 100% si actual >= 0; minimizar (ej: 0 accidentes) -> 100% si actual es 0.
+        """
+        safe_target = np.where(target == 0, 1.0, target)
+        ratio = np.where(higher_is_better, actual / safe_target, 1 + (target - actual) / safe_target) * 100
+        zero_target = np.where(higher_is_better, actual >= 0, actual == 0) * 100.0
+        return np.where(target == 0, zero_target, ratio)
+
+    @classmethod
+    def _status(cls, achievement: np.ndarray) -> np.ndarray:
+        # Verde >= 100%, Amarillo >= 90%, Rojo < 90%
+        return cls.STATUS_LABELS[(achievement >= 90).astype(np.int64) + (achievement >= 100)]
+
+    @staticmethod
+    def _perspective_scores(df: pd.DataFrame) -> dict:
+        """Cumplimiento promedio ponderado por perspectiva: sum(w·ach) / sum(w)."""
+        sums = (df.assign(_weighted=df["achievement"] * df["_weight"])
+                  .groupby("perspective")[["_weighted", "_weight"]].sum())
+        sums["_weight"] = sums["_weight"].where(sums["_weight"] > 0)
+        scores = (sums["_weighted"] / sums["_weight"]).fillna(
+            df.groupby("perspective")["achievement"].mean())
+        return {k: round(float(v), 1) for k, v in scores.items()}
+
+    def _analyze_series(self):
+        """
+        Series de tiempo por KPI (KPI = perspectiva + nombre). Las filas se ordenan por
+        KPI y periodo; cada KPI es un bloque contiguo y las estadísticas salen de sumas
+        acumuladas y de un groupby por bloque.
+        """
+        window = int(self.params.get("rolling_window", 3))
+        trend_window = int(self.params.get("trend_window", 12))
+        if window < 1 or trend_window < 2:
+            raise ValueError("'rolling_window' debe ser >= 1 y 'trend_window' >= 2.")
+
+        # Todas las filas de una serie deben indicar su periodo
+        missing = self.df["period"].isna() | (self.df["period"].astype(object).astype(str).str.strip() == "")
+        if missing.any():
+            rows = ", ".join(map(str, np.flatnonzero(missing.to_numpy())[:10] + 1))
+            raise ValueError(f"Todas las filas deben indicar el 'period' (filas sin periodo: {rows}).")
+
+        # Índice temporal global: periodos ordenados (fechas, números o texto)
+        period_key = self._period_key(self.df["period"])
+        period_values, t_global = np.unique(period_key, return_inverse=True)
+        # Etiquetas tal como vinieron en los datos (ej: '2024-01', no la fecha normalizada)
+        period_labels = self.df["period"].groupby(t_global).first().map(self._period_label).tolist()
+
+        df = self.df.assign(_t=t_global)
+        df = df.sort_values(["perspective", "kpi", "_t"], kind="stable").reset_index(drop=True)
+        kpi_codes = df.groupby(["perspective", "kpi"], sort=False).ngroup().to_numpy()
+        same_kpi = np.diff(kpi_codes) == 0
+        if (np.diff(df["_t"].to_numpy())[same_kpi] == 0).any():
+            raise ValueError("Hay KPIs con más de un valor en el mismo periodo.")
+
+        n = len(df)
+        starts = np.flatnonzero(np.r_[True, kpi_codes[1:] != kpi_codes[:-1]])
+        ends = np.r_[starts[1:], n]
+        sizes = ends - starts
+        group_start = np.repeat(starts, sizes)
+        from_end = np.repeat(ends, sizes) - 1 - np.arange(n)
+
+        # Promedio móvil del cumplimiento (ventana 'rolling_window', sin salir del bloque del KPI)
+        achievement = df["achievement"].to_numpy(dtype=float)
+        csum = np.r_[0.0, np.cumsum(achievement)]
+        lo = np.maximum(np.arange(n) + 1 - window, group_start)
+        df["rolling_achievement"] = np.round((csum[np.arange(n) + 1] - csum[lo]) / (np.arange(n) + 1 - lo), 1)
+
+        # Tendencia: pendiente de 'actual' vs tiempo (mínimos cuadrados) en los últimos 'trend_window' periodos
+        recent = from_end < trend_window
+        t = df["_t"].to_numpy(dtype=float)
+        y = df["actual"].to_numpy(dtype=float)
+        sums = pd.DataFrame({
+            "k": kpi_codes[recent], "n": 1.0, "t": t[recent], "y": y[recent],
+            "tt": t[recent] ** 2, "ty": t[recent] * y[recent]
+        }).groupby("k", sort=False).sum().reindex(np.unique(kpi_codes)).to_numpy()
+        cnt, st, sy, stt, sty = sums.T
+        denom = cnt * stt - st ** 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(denom > 0, (cnt * sty - st * sy) / denom, 0.0)
+        intercept = (sy - slope * st) / cnt
+
+        # Foto del último periodo de cada KPI + pronóstico del siguiente
+        latest = df.iloc[ends - 1].copy()
+        last_t = t[ends - 1]
+        higher = latest["higher_is_better"].to_numpy()
+        forecast_actual = intercept + slope * (last_t + 1)
+        forecast_ach = self._achievement(latest["target"].to_numpy(dtype=float), forecast_actual, higher)
+
+        # Dirección de la tendencia según el sentido del KPI (pendiente ~0 relativa al nivel = estable)
+        improving_slope = np.where(higher, slope, -slope)
+        scale = np.maximum(np.abs(sy / cnt), 1e-12)
+        trend_code = np.where(np.abs(slope) <= 0.005 * scale, 0, np.sign(improving_slope)).astype(np.int64)
+        trend_labels = np.array(["Empeorando", "Estable", "Mejorando"], dtype=object)
+
+        latest["periods"] = sizes
+        latest["trend_slope"] = np.round(slope, 4)
+        latest["trend"] = trend_labels[trend_code + 1]
+        latest["forecast_actual"] = np.round(forecast_actual, 4)
+        latest["forecast_achievement"] = np.round(forecast_ach, 1)
+        latest["forecast_status"] = self._status(forecast_ach)
+        latest["period"] = latest["period"].astype(object)
+        latest = latest.drop(columns=["_t"]).reset_index(drop=True)
+
+        # Evolución por perspectiva y periodo (promedio ponderado)
+        by_period = (df.assign(_weighted=df["achievement"] * df["_weight"])
+                       .groupby(["perspective", "_t"])[["_weighted", "_weight"]].sum())
+        by_period = (by_period["_weighted"] / by_period["_weight"].where(by_period["_weight"] > 0)).round(1)
+        perspective_trend = by_period.unstack("perspective").sort_index()
+        perspective_trend.index = [period_labels[i] for i in perspective_trend.index]
+        perspective_trend.index.name = "period"
+        perspective_trend = perspective_trend.reset_index()
+
+        # KPIs en riesgo: hoy no están en Rojo pero el pronóstico sí
+        at_risk = latest[(latest["status"] != "Rojo") & (latest["forecast_status"] == "Rojo")]
+        at_risk = at_risk.sort_values("forecast_achievement").head(50)
+
+        extra = {
+            "periods": int(len(period_values)),
+            "last_period": period_labels[-1],
+            "rolling_window": window,
+            "trend_window": trend_window,
+            "improving": int((trend_code > 0).sum()),
+            "deteriorating": int((trend_code < 0).sum()),
+            "forecast_status_counts": latest["forecast_status"].value_counts().to_dict(),
+            "at_risk": at_risk[["perspective", "kpi", "achievement", "forecast_achievement", "trend"]].to_dict(orient="records"),
+            "perspective_trend": perspective_trend.astype(object).where(perspective_trend.notna(), None).to_dict(orient="records"),
+        }
+        return latest, extra
+
+    @staticmethod
+    def _period_key(period: pd.Series) -> np.ndarray:
+        """Clave ordenable del periodo: número, fecha (ej: '2024-01') o, si no, el texto."""
+        numeric = pd.to_numeric(period, errors="coerce")
+        if numeric.notna().all():
+            return numeric.to_numpy(dtype=float)
+        dates = pd.to_datetime(period.astype(str), errors="coerce", format="mixed")
+        if dates.notna().all():
+            return dates.to_numpy(dtype="datetime64[ns]")
+        return period.astype(str).to_numpy()
+
+    @staticmethod
+    def _period_label(value):
+        # Tipos nativos para JSON
+        return value.item() if isinstance(value, np.generic) else value
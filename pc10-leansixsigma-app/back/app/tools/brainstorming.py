@@ -1,9 +1,8 @@
 # backend/app/tools/brainstorming.py
 import pandas as pd
-from collections import Counter
-import re
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from app.services import text_pipeline
 
 class BrainstormingTool(SixSigmaTool):
     """
@@ -48,15 +47,8 @@ class BrainstormingTool(SixSigmaTool):
         grouped_df = grouped_df.sort_values(by='votes', ascending=False)
 
         # 5. Análisis de Palabras Clave (Para Nube de Palabras / WordCloud)
-        # Unimos todo el texto y contamos palabras individuales para ver tendencias
-        all_text = " ".join(grouped_df['text'].tolist())
-        # Limpieza básica de signos (regex)
-        words = re.findall(r'\w+', all_text.lower())
-        # Filtrar palabras vacías comunes (stopwords) muy básicas
-        stopwords = {'de', 'la', 'el', 'en', 'y', 'a', 'los', 'del', 'las', 'por', 'un', 'para', 'con', 'no', 'si', 'o'}
-        filtered_words = [w for w in words if w not in stopwords and len(w) > 2]
-        
-        word_freq = Counter(filtered_words).most_common(20) # Top 20 palabras
+        # Pipeline compartido: normaliza, tokeniza y quita stopwords en español sobre toda la columna
+        word_freq = text_pipeline.token_counts(grouped_df['text'], top_n=20, min_length=3) # Top 20 palabras
 
         # 6. Resumen
         top_idea = grouped_df.iloc[0]
@@ -80,7 +72,7 @@ class BrainstormingTool(SixSigmaTool):
             })
 
         # Datos secundarios: Frecuencia de palabras para WordCloud
-        word_cloud_data = [{"text": w, "value": c} for w, c in word_freq]
+        word_cloud_data = [{"text": w, "value": int(c)} for w, c in word_freq.items()]
 
         return AnalysisResult(
             tool_name="Brainstorming (Lluvia de Ideas)",
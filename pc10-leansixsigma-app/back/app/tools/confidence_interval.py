@@ -4,53 +4,125 @@ import numpy as np
 from scipy import stats
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from app.services import bootstrap
 
 class ConfidenceIntervalTool(SixSigmaTool):
     """
     Herramienta de Intervalo de Confianza.
-    Estima el rango donde se encuentra el parámetro poblacional (Media o Proporción).
+    Estima el rango donde se encuentra el parámetro poblacional (Media, Proporción,
+    Mediana, Desviación Estándar o Cpk).
+    - Método clásico: T/Z para la media, Wald/Wilson/Clopper-Pearson para proporciones,
+      Chi-cuadrado para la desviación, estadísticos de orden para la mediana y Bissell para Cpk.
+    - Método bootstrap (percentil o BCa) para datos sesgados, con réplicas vectorizadas
+      repartidas entre procesos y semilla reproducible.
     Referencias:
     - Libro Seis Sigma y sus Aplicaciones, Cap 8, Pág 103 (Estimación por Intervalos).
     """
 
+    PARAMETER_LABELS = {
+        "mean": "la Media",
+        "median": "la Mediana",
+        "std": "la Desviación Estándar",
+        "cpk": "el Cpk",
+    }
+    PROPORTION_METHODS = {
+        "wald": "Aproximación Normal (Wald)",
+        "wilson": "Wilson (score)",
+        "clopper_pearson": "Clopper-Pearson (exacto)",
+    }
+
     def analyze(self) -> AnalysisResult:
         # 1. Validación
         if self.df.empty:
             raise ValueError("Se requieren datos para calcular el intervalo.")
 
-        col_name = self.df.columns[0]
+        group_col = self.params.get("group_column")
+        if group_col is not None:
+            self.validate_columns([group_col])
+        # Columna a analizar: 'value_column' o la primera (que no sea la de grupos)
+        col_name = self.params.get("value_column") or next(c for c in self.df.columns if c != group_col)
+        self.validate_columns([col_name])
         data = self.df[col_name].dropna()
-        
+
         n = len(data)
         if n < 2:
             raise ValueError("Se requieren al menos 2 datos para calcular un intervalo.")
 
         conf_level = self.params.get("confidence_level", 0.95)
         var_type = self.params.get("variable_type", "mean")
+        method = self.params.get("method", "classic")
         target = self.params.get("target_value")
-        
+
+        if not 0 < conf_level < 1:
+            raise ValueError("El nivel de confianza debe estar entre 0 y 1 (ej: 0.95).")
         alpha = 1 - conf_level
-        
-        result_details = {}
-        chart_data = []
-        summary = ""
-        lower_bound = 0.0
-        upper_bound = 0.0
-        statistic_val = 0.0
-        margin_error = 0.0
-
-        # 2. Lógica para MEDIA (Cuantitativa)
-        if var_type == "mean":
+
+        if group_col is not None:
+            return self._analyze_grouped(col_name, group_col, var_type, method, alpha, conf_level, target)
+
+        # 2. Cálculo del intervalo según el parámetro
+        if var_type == "proportion":
+            statistic_val, lower_bound, upper_bound, summary, result_details = self._proportion(data, alpha, conf_level)
+        elif var_type in self.PARAMETER_LABELS:
             # Validar que sean números
-            if not np.issubdtype(data.dtype, np.number):
-                raise ValueError(f"Para calcular la Media, la columna '{col_name}' debe ser numérica.")
-            
-            mean = np.mean(data)
-            std_dev = np.std(data, ddof=1) # Desviación muestral (s)
-            
-            statistic_val = mean
+            if not pd.api.types.is_numeric_dtype(data):
+                raise ValueError(f"Para calcular {self.PARAMETER_LABELS[var_type]}, la columna '{col_name}' debe ser numérica.")
+            values = data.to_numpy(dtype=float)
+            if method == "bootstrap":
+                statistic_val, lower_bound, upper_bound, result_details = self._bootstrap(values, var_type, conf_level)
+            elif method == "classic":
+                statistic_val, lower_bound, upper_bound, result_details = self._classic(values, var_type, alpha)
+            else:
+                raise ValueError("El método debe ser 'classic' o 'bootstrap'.")
+
+            label = self.PARAMETER_LABELS[var_type]
+            summary = (
+                f"Intervalo de Confianza para {label} ({conf_level*100}%): [{lower_bound:.4f}, {upper_bound:.4f}]. "
+                f"Basado en {n} muestras; estimación puntual {statistic_val:.4f} "
+                f"(Método: {result_details.get('distribution') or result_details.get('method')})."
+            )
+        else:
+            raise ValueError("El tipo de variable debe ser: mean, proportion, median, std o cpk.")
+
+        # 3. Análisis contra Objetivo (Target)
+        if target is not None:
+            if lower_bound <= target <= upper_bound:
+                target_status = "DENTRO"
+                target_msg = f"El objetivo {target} está dentro del intervalo, por lo que es estadísticamente posible que el valor real sea igual al objetivo."
+            else:
+                target_status = "FUERA"
+                target_msg = f"El objetivo {target} está fuera del intervalo. Hay evidencia significativa de que el valor real difiere del objetivo."
+
+            summary += f" {target_msg}"
+            result_details["target_status"] = target_status
+
+        # 4. Datos para Gráfico (Visualización de Rango)
+        # Formato para un gráfico de barras de error o puntos
+        chart_data = [{
+            "label": "Estimación",
+            "value": float(statistic_val),
+            "min": float(lower_bound),
+            "max": float(upper_bound),
+            "target": target if target is not None else None
+        }]
+
+        return AnalysisResult(
+            tool_name="Intervalo de Confianza",
+            summary=summary,
+            chart_data=chart_data,
+            details=result_details
+        )
+
+    # -------------------------------------------------------------------------
+    # Intervalos clásicos (fórmulas cerradas)
+    # -------------------------------------------------------------------------
+    def _classic(self, values: np.ndarray, var_type: str, alpha: float):
+        n = len(values)
+        mean = float(np.mean(values))
+        std_dev = float(np.std(values, ddof=1))  # Desviación muestral (s)
+
+        if var_type == "mean":
             standard_error = std_dev / np.sqrt(n)
-            
             # Decisión: Z vs T
             # Si n < 30 usamos T-Student (más conservador), si n >= 30 usamos Normal (Z)
             # El libro menciona T para varianza desconocida (pág 104)
@@ -60,101 +132,314 @@ class ConfidenceIntervalTool(SixSigmaTool):
             else:
                 dist_name = "Normal (Z)"
                 critical_value = stats.norm.ppf(1 - alpha/2)
-                
             margin_error = critical_value * standard_error
-            lower_bound = mean - margin_error
-            upper_bound = mean + margin_error
-            
-            summary = (
-                f"Intervalo de Confianza para la Media ({conf_level*100}%): [{lower_bound:.4f}, {upper_bound:.4f}]. "
-                f"Basado en {n} muestras con media {mean:.4f} y desviación {std_dev:.4f} (Distribución {dist_name})."
-            )
-            
-            result_details = {
+            details = {
                 "mean": round(mean, 4),
                 "std_dev": round(std_dev, 4),
                 "n": n,
                 "distribution": dist_name,
-                "critical_value": round(critical_value, 4),
-                "standard_error": round(standard_error, 4)
+                "critical_value": round(float(critical_value), 4),
+                "standard_error": round(float(standard_error), 4)
             }
+            return mean, mean - margin_error, mean + margin_error, details
 
-        # 3. Lógica para PROPORCIÓN (Cualitativa/Atributos)
-        elif var_type == "proportion":
-            # Identificar éxito/fracaso
-            # Asumimos que el usuario busca la proporción de un valor específico o
-            # si son datos binarios (0/1, True/False), calculamos la media.
-            
-            unique_vals = data.unique()
-            if len(unique_vals) > 2:
-                # Si hay muchos valores, intentamos binarizar o lanzamos advertencia
-                # Por simplicidad, contaremos el valor más frecuente como "éxito" o pediremos param
-                # Aquí asumiremos que data es binaria o contamos la ocurrencia del primer valor
-                target_category = unique_vals[0] # Tomamos el primero como referencia
-                count = (data == target_category).sum()
-                p_hat = count / n
-                category_label = str(target_category)
-            else:
-                # Caso ideal binario
-                # Si es numérico 0/1, p_hat es la media
-                if np.issubdtype(data.dtype, np.number):
-                    p_hat = data.mean()
-                    category_label = "1 (Éxito)"
-                else:
-                    target_category = unique_vals[0]
-                    count = (data == target_category).sum()
-                    p_hat = count / n
-                    category_label = str(target_category)
-
-            statistic_val = p_hat
-            
-            # Aproximación Normal a la Binomial (Wald)
-            # Requiere n*p >= 5 y n*(1-p) >= 5 para ser preciso
-            critical_value = stats.norm.ppf(1 - alpha/2)
-            standard_error = np.sqrt((p_hat * (1 - p_hat)) / n)
-            
-            margin_error = critical_value * standard_error
-            lower_bound = max(0.0, p_hat - margin_error)
-            upper_bound = min(1.0, p_hat + margin_error)
+        if var_type == "std":
+            # (n-1)s²/σ² ~ Chi-cuadrado(n-1): supone datos normales
+            chi_low, chi_high = stats.chi2.ppf([alpha / 2, 1 - alpha / 2], df=n - 1)
+            lower = np.sqrt((n - 1) * std_dev ** 2 / chi_high)
+            upper = np.sqrt((n - 1) * std_dev ** 2 / chi_low)
+            details = {"std_dev": round(std_dev, 4), "n": n, "distribution": "Chi-cuadrado (supone normalidad)"}
+            return std_dev, float(lower), float(upper), details
 
-            summary = (
-                f"Intervalo para la Proporción de '{category_label}' ({conf_level*100}%): [{lower_bound:.2%}, {upper_bound:.2%}]. "
-                f"Proporción muestral: {p_hat:.2%} (n={n})."
-            )
-            
-            result_details = {
-                "proportion": round(p_hat, 4),
-                "category_analyzed": category_label,
-                "n": n,
-                "method": "Aproximación Normal (Wald)"
+        if var_type == "median":
+            # Libre de distribución: estadísticos de orden x(k), x(n-k+1) con k de la Binomial(n, 0.5)
+            ordered = np.sort(values)
+            k = int(stats.binom.ppf(alpha / 2, n, 0.5))
+            k = max(k, 1)
+            coverage = float(stats.binom.cdf(n - k, n, 0.5) - stats.binom.cdf(k - 1, n, 0.5))
+            median = float(np.median(values))
+            details = {
+                "median": round(median, 4), "n": n,
+                "distribution": "Estadísticos de orden (Binomial, libre de distribución)",
+                "order_statistics": [k, n - k + 1],
+                "achieved_confidence": round(coverage, 4),
             }
+            return median, float(ordered[k - 1]), float(ordered[n - k]), details
 
-        # 4. Análisis contra Objetivo (Target)
-        target_analysis = ""
-        if target is not None:
-            if lower_bound <= target <= upper_bound:
-                target_status = "DENTRO"
-                target_msg = f"El objetivo {target} está dentro del intervalo, por lo que es estadísticamente posible que la media real sea igual al objetivo."
+        # Cpk: aproximación normal de Bissell (1990)
+        lsl, usl = self._spec_limits()
+        cpk = float(bootstrap.stat_cpk(values[None, :], lsl, usl)[0])
+        z = stats.norm.ppf(1 - alpha / 2)
+        standard_error = np.sqrt(1 / (9 * n) + cpk ** 2 / (2 * (n - 1)))
+        details = {
+            "cpk": round(cpk, 4), "mean": round(mean, 4), "std_dev": round(std_dev, 4), "n": n,
+            "lsl": lsl, "usl": usl,
+            "distribution": "Aproximación Normal de Bissell (supone normalidad)",
+            "standard_error": round(float(standard_error), 4),
+        }
+        return cpk, float(cpk - z * standard_error), float(cpk + z * standard_error), details
+
+    # -------------------------------------------------------------------------
+    # Bootstrap
+    # -------------------------------------------------------------------------
+    def _bootstrap(self, values: np.ndarray, var_type: str, conf_level: float):
+        n_resamples = int(self.params.get("n_resamples", 10000))
+        if not 1000 <= n_resamples <= 1_000_000:
+            raise ValueError("'n_resamples' debe estar entre 1,000 y 1,000,000.")
+        random_state = self.params.get("random_state", 42)
+        interval_type = self.params.get("bootstrap_method", "bca")
+        if interval_type not in ("percentile", "bca"):
+            raise ValueError("'bootstrap_method' debe ser 'percentile' o 'bca'.")
+
+        kwargs = dict(zip(("lsl", "usl"), self._spec_limits())) if var_type == "cpk" else {}
+        statistic = bootstrap.get_statistic(var_type, **kwargs)
+        estimate = float(statistic(values[None, :])[0])
+        distribution = bootstrap.bootstrap_distribution(values, statistic, n_resamples, random_state,
+                                                        self.params.get("n_jobs"))
+
+        details = {
+            "estimate": round(estimate, 4),
+            "n": len(values),
+            "method": f"Bootstrap {'BCa' if interval_type == 'bca' else 'Percentil'}",
+            "n_resamples": n_resamples,
+            "random_state": random_state,
+            "bootstrap_std_error": round(float(np.nanstd(distribution, ddof=1)), 4),
+            "bootstrap_bias": round(float(np.nanmean(distribution) - estimate), 4),
+        }
+        if interval_type == "bca":
+            bca = bootstrap.bca_interval(values, statistic, distribution, estimate, conf_level, random_state)
+            lower, upper = bca.pop("lower"), bca.pop("upper")
+            details.update(bca)
+        else:
+            lower, upper = bootstrap.percentile_interval(distribution, conf_level)
+        details.update(kwargs)
+        return estimate, lower, upper, details
+
+    def _spec_limits(self):
+        lsl, usl = self.params.get("lsl"), self.params.get("usl")
+        if lsl is None and usl is None:
+            raise ValueError("Para el intervalo de Cpk se requiere al menos un límite de especificación (lsl o usl).")
+        if lsl is not None and usl is not None and lsl >= usl:
+            raise ValueError("El límite inferior (lsl) debe ser menor que el superior (usl).")
+        return lsl, usl
+
+    # -------------------------------------------------------------------------
+    # Proporciones
+    # -------------------------------------------------------------------------
+    def _proportion(self, data: pd.Series, alpha: float, conf_level: float):
+        n = len(data)
+        successes, category_label = self._success_mask(data)
+        count = int(successes.sum())
+
+        intervals = {m: (float(lo), float(hi)) for m, (lo, hi) in self._proportion_intervals(count, n, alpha).items()}
+        method = self.params.get("proportion_method", "wald")
+        if method not in intervals:
+            raise ValueError(f"'proportion_method' debe ser: {', '.join(intervals)}.")
+
+        p_hat = count / n
+        lower_bound, upper_bound = intervals[method]
+        summary = (
+            f"Intervalo para la Proporción de '{category_label}' ({conf_level*100}%): [{lower_bound:.2%}, {upper_bound:.2%}]. "
+            f"Proporción muestral: {p_hat:.2%} (n={n})."
+        )
+        # Requiere n*p >= 5 y n*(1-p) >= 5 para que Wald sea preciso
+        if method == "wald" and min(count, n - count) < 5:
+            summary += " Con tan pocos éxitos/fracasos se recomienda Wilson o Clopper-Pearson."
+
+        details = {
+            "proportion": round(p_hat, 4),
+            "category_analyzed": category_label,
+            "successes": count,
+            "n": n,
+            "method": self.PROPORTION_METHODS[method],
+            "methods_comparison": [
+                {"method": self.PROPORTION_METHODS[m], "min": round(lo, 6), "max": round(hi, 6)}
+                for m, (lo, hi) in intervals.items()
+            ],
+        }
+        return p_hat, lower_bound, upper_bound, summary, details
+
+    def _success_mask(self, data: pd.Series):
+        """Máscara de éxitos y etiqueta de la categoría analizada."""
+        success_value = self.params.get("success_value")
+
+        # Identificar éxito/fracaso
+        if success_value is not None:
+            # Se compara también como texto (ej: success_value "1" con datos numéricos)
+            matches = (data == success_value) | (data.astype(str) == str(success_value))
+            if not matches.any():
+                raise ValueError(f"El valor de éxito '{success_value}' no aparece en los datos.")
+            return matches, str(success_value)
+        if pd.api.types.is_numeric_dtype(data) and data.isin([0, 1]).all():
+            # Caso ideal binario 0/1: éxito = 1
+            return data == 1, "1 (Éxito)"
+
+        counts = data.value_counts()
+        if len(counts) > 2:
+            raise ValueError(
+                "Hay más de 2 categorías; indique cuál es el éxito con 'success_value' "
+                f"(opciones: {', '.join(map(str, counts.index[:10]))})."
+            )
+        # Sin indicación: se analiza la categoría menos frecuente (típicamente el defecto)
+        return data == counts.index[-1], str(counts.index[-1])
+
+    @staticmethod
+    def _proportion_intervals(count, n, alpha: float) -> dict:
+        """Wald, Wilson y Clopper-Pearson para x éxitos en n ensayos (escalares o arreglos por grupo)."""
+        count = np.asarray(count, dtype=float)
+        n = np.asarray(n, dtype=float)
+        z = stats.norm.ppf(1 - alpha / 2)
+        p = count / n
+
+        margin = z * np.sqrt(p * (1 - p) / n)
+        wald = (np.clip(p - margin, 0.0, 1.0), np.clip(p + margin, 0.0, 1.0))
+
+        denom = 1 + z ** 2 / n
+        center = (p + z ** 2 / (2 * n)) / denom
+        half = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denom
+        wilson = (np.clip(center - half, 0.0, 1.0), np.clip(center + half, 0.0, 1.0))
+
+        # Exacto: cuantiles de la distribución Beta (0 éxitos -> límite inferior 0; n éxitos -> superior 1)
+        cp_low = np.where(count > 0, stats.beta.ppf(alpha / 2, np.maximum(count, 1), n - count + 1), 0.0)
+        cp_high = np.where(count < n, stats.beta.ppf(1 - alpha / 2, count + 1, np.maximum(n - count, 1)), 1.0)
+
+        return {"wald": wald, "wilson": wilson, "clopper_pearson": (cp_low, cp_high)}
+
+    # -------------------------------------------------------------------------
+    # Intervalos por grupo (un solo groupby, sin bucle por grupo)
+    # -------------------------------------------------------------------------
+    def _analyze_grouped(self, col_name: str, group_col: str, var_type: str, method: str,
+                         alpha: float, conf_level: float, target):
+        if method != "classic":
+            raise ValueError("Los intervalos por grupo usan el método clásico (el bootstrap es por muestra).")
+        frame = self.df[[group_col, col_name]].dropna()
+        if frame.empty:
+            raise ValueError("No hay datos válidos para calcular intervalos por grupo.")
+        groups = frame[group_col]
+        values = frame[col_name]
+        z = stats.norm.ppf(1 - alpha / 2)
+
+        if var_type == "proportion":
+            successes, category_label = self._success_mask(values)
+            agg = successes.astype(float).groupby(groups, sort=False).agg(["count", "sum"])
+            n, count = agg["count"].to_numpy(), agg["sum"].to_numpy()
+            prop_method = self.params.get("proportion_method", "wald")
+            intervals = self._proportion_intervals(count, n, alpha)
+            if prop_method not in intervals:
+                raise ValueError(f"'proportion_method' debe ser: {', '.join(intervals)}.")
+            estimate = count / n
+            lower, upper = intervals[prop_method]
+            overall = float(count.sum() / n.sum())
+            method_label = f"{self.PROPORTION_METHODS[prop_method]} - '{category_label}'"
+            label = "la Proporción"
+        elif var_type in self.PARAMETER_LABELS:
+            if not pd.api.types.is_numeric_dtype(values):
+                raise ValueError(f"Para calcular {self.PARAMETER_LABELS[var_type]}, la columna '{col_name}' debe ser numérica.")
+            label = self.PARAMETER_LABELS[var_type]
+            if var_type == "median":
+                index, n, estimate, lower, upper = self._grouped_median(groups, values.to_numpy(dtype=float), alpha)
+                agg = pd.DataFrame(index=index)
+                overall = float(values.median())
+                method_label = "Estadísticos de orden (Binomial)"
             else:
-                target_status = "FUERA"
-                target_msg = f"El objetivo {target} está fuera del intervalo. Hay evidencia significativa de que el proceso no está centrado en el objetivo."
-            
-            summary += f" {target_msg}"
-            result_details["target_status"] = target_status
+                agg = values.astype(float).groupby(groups, sort=False).agg(["count", "mean", "var"])
+                n = agg["count"].to_numpy(dtype=float)
+                mean = agg["mean"].to_numpy()
+                std = np.sqrt(agg["var"].to_numpy())
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    if var_type == "mean":
+                        # T-Student con n < 30, Normal (Z) con n >= 30 (valores críticos por grupo)
+                        critical = np.where(n < 30, stats.t.ppf(1 - alpha / 2, np.maximum(n - 1, 1)), z)
+                        margin = critical * std / np.sqrt(n)
+                        estimate, lower, upper = mean, mean - margin, mean + margin
+                        overall = float(values.mean())
+                        method_label = "T-Student (n < 30) / Normal (Z)"
+                    elif var_type == "std":
+                        dof = np.maximum(n - 1, 1)
+                        estimate = std
+                        lower = np.sqrt(dof * std ** 2 / stats.chi2.ppf(1 - alpha / 2, dof))
+                        upper = np.sqrt(dof * std ** 2 / stats.chi2.ppf(alpha / 2, dof))
+                        overall = float(values.std(ddof=1))
+                        method_label = "Chi-cuadrado"
+                    else:
+                        lsl, usl = self._spec_limits()
+                        cpu = (usl - mean) / (3 * std) if usl is not None else np.full(len(mean), np.inf)
+                        cpl = (mean - lsl) / (3 * std) if lsl is not None else np.full(len(mean), np.inf)
+                        estimate = np.minimum(cpu, cpl)
+                        margin = z * np.sqrt(1 / (9 * n) + estimate ** 2 / (2 * (n - 1)))
+                        lower, upper = estimate - margin, estimate + margin
+                        overall = float(bootstrap.stat_cpk(values.to_numpy(dtype=float)[None, :], lsl, usl)[0])
+                        method_label = "Aproximación Normal de Bissell"
+        else:
+            raise ValueError("El tipo de variable debe ser: mean, proportion, median, std o cpk.")
 
-        # 5. Datos para Gráfico (Visualización de Rango)
-        # Formato para un gráfico de barras de error o puntos
-        chart_data = [{
-            "label": "Estimación",
-            "value": statistic_val,
-            "min": lower_bound,
-            "max": upper_bound,
-            "target": target if target is not None else None
-        }]
+        # Tabla tipo "forest plot": una fila por grupo, ordenada por la estimación
+        table = pd.DataFrame({
+            "label": agg.index.astype(str),
+            "n": np.asarray(n, dtype=np.int64),
+            "value": estimate,
+            "min": lower,
+            "max": upper,
+        })
+        if table["value"].isna().all():
+            raise ValueError(
+                f"Ningún grupo de '{group_col}' tiene datos suficientes para estimar {label} "
+                "(se requieren al menos 2 observaciones por grupo)."
+            )
+        valid = (table["n"] >= 2) & np.isfinite(table["min"]) & np.isfinite(table["max"])
+        table.loc[~valid, ["min", "max"]] = np.nan
+        table["contains_overall"] = (table["min"] <= overall) & (overall <= table["max"])
+        if target is not None:
+            table["target"] = target
+            table["target_status"] = np.where((table["min"] <= target) & (target <= table["max"]), "DENTRO", "FUERA")
+            table.loc[~valid, "target_status"] = None
+        table = table.sort_values("value", ascending=False, kind="stable", na_position="last").reset_index(drop=True)
+        table[["value", "min", "max"]] = table[["value", "min", "max"]].round(6)
 
+        n_groups = len(table)
+        differing = int((~table["contains_overall"] & table["min"].notna()).sum())
+        top, bottom = table.iloc[0], table.dropna(subset=["value"]).iloc[-1]
+        summary = (
+            f"Intervalos de Confianza para {label} ({conf_level*100}%) en {n_groups} grupos de '{group_col}' "
+            f"(Método: {method_label}). Valor global: {overall:.4f}. "
+            f"Mayor: '{top['label']}' ({top['value']:.4f}); menor: '{bottom['label']}' ({bottom['value']:.4f}). "
+            f"{differing} grupos tienen un intervalo que excluye el valor global."
+        )
+        details = {
+            "group_column": group_col,
+            "value_column": col_name,
+            "n_groups": n_groups,
+            "overall_estimate": round(overall, 6),
+            "method": method_label,
+            "groups_differing_from_overall": differing,
+            "groups_without_interval": int((~valid).sum()),
+        }
+        if target is not None:
+            outside = int((table["target_status"] == "FUERA").sum())
+            summary += f" El objetivo {target} queda fuera del intervalo en {outside} grupos."
+            details["groups_target_outside"] = outside
+
+        chart_data = table.astype(object).where(table.notna(), None).to_dict(orient="records")
         return AnalysisResult(
             tool_name="Intervalo de Confianza",
             summary=summary,
             chart_data=chart_data,
-            details=result_details
-        )
\ No newline at end of file
+            details=details
+        )
+
+    @staticmethod
+    def _grouped_median(groups: pd.Series, values: np.ndarray, alpha: float):
+        """
+        Mediana e intervalo por estadísticos de orden para todos los grupos: se ordena una vez
+        por (grupo, valor) y se toman las posiciones de cada bloque con índices vectorizados.
+        """
+        codes, index = pd.factorize(groups, sort=False)
+        order = np.lexsort((values, codes))
+        ordered = values[order]
+        n = np.bincount(codes, minlength=len(index))
+        start = np.r_[0, np.cumsum(n)[:-1]]
+        median = (ordered[start + (n - 1) // 2] + ordered[start + n // 2]) / 2
+        k = np.maximum(stats.binom.ppf(alpha / 2, n, 0.5).astype(np.int64), 1)
+        lower = ordered[start + np.minimum(k, n) - 1]
+        upper = ordered[start + np.maximum(n - k, 0)]
+        return index, n, median, lower, upper
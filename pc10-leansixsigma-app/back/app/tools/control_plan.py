@@ -2,6 +2,7 @@
 import pandas as pd
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from app.services import keyword_matcher
 
 class ControlPlanTool(SixSigmaTool):
     """
@@ -12,6 +13,8 @@ class ControlPlanTool(SixSigmaTool):
     - Libro Seis Sigma y sus Aplicaciones, pág 48 (Etapa de Control).
     """
 
+    MAX_LISTED_STEPS = 20
+
     def analyze(self) -> AnalysisResult:
         # 1. Validación de Datos
         if self.df.empty:
@@ -24,28 +27,38 @@ class ControlPlanTool(SixSigmaTool):
         warnings = []
         
         # Regla: Todo control debe tener un plan de reacción
-        missing_reaction = self.df[
-            (self.df["control_method"].notna()) & 
-            (self.df["reaction_plan"].isna() | (self.df["reaction_plan"] == ""))
-        ]
+        reaction = self.df["reaction_plan"].fillna("").astype(str).str.strip()
+        missing_reaction = self.df["control_method"].notna().to_numpy() & (reaction == "").to_numpy()
+        missing_count = int(missing_reaction.sum())
         
-        if not missing_reaction.empty:
-            steps = ", ".join(missing_reaction["process_step"].tolist())
-            warnings.append(f"Alerta: Los pasos '{steps}' tienen método de control pero NO tienen Plan de Reacción definido.")
+        if missing_count:
+            steps = self.df.loc[missing_reaction, "process_step"].astype(str)
+            listed = ", ".join(steps.head(self.MAX_LISTED_STEPS))
+            if missing_count > self.MAX_LISTED_STEPS:
+                listed += f" y {missing_count - self.MAX_LISTED_STEPS} más"
+            warnings.append(f"Alerta: Los pasos '{listed}' tienen método de control pero NO tienen Plan de Reacción definido.")
 
         # Regla: Distinguir controles preventivos vs detectivos
-        # Heurística simple buscando palabras clave
-        preventive_keywords = ["poka yoke", "automático", "sensor", "diseño", "preventivo"]
-        self.df["type"] = self.df["control_method"].apply(
-            lambda x: "Preventivo" if any(k in str(x).lower() for k in preventive_keywords) else "Detectivo"
-        )
+        # Taxonomía de palabras clave (ES/EN) compilada en un solo matcher; configurable con
+        # 'taxonomy' (se suma a la taxonomía por defecto salvo 'merge_taxonomy' = False)
+        taxonomy = keyword_matcher.build_taxonomy(self.params.get("taxonomy"),
+                                                  merge=self.params.get("merge_taxonomy", True))
+        matcher = keyword_matcher.get_matcher(taxonomy)
+        classes = matcher.classify(self.df["control_method"])
+        # Sin coincidencias se asume Detectivo (como la heurística original)
+        self.df["type"] = classes["category"].fillna("Detectivo")
+        self.df["control_types"] = classes["control_types"].str.join(", ")
+        self.df["primary_control_type"] = classes["primary_type"]
+        self.df["matched_keywords"] = classes["matched_keywords"].str.join(", ")
         
         # 3. Estadísticas del Plan
         total_points = len(self.df)
-        preventive_count = len(self.df[self.df["type"] == "Preventivo"])
+        preventive_count = int((self.df["type"] == "Preventivo").sum())
         detective_count = total_points - preventive_count
+        unclassified = int(classes["primary_type"].isna().sum())
+        type_counts = classes["control_types"].explode().dropna().value_counts().to_dict()
         
-        responsibles = self.df["responsible"].nunique()
+        responsibles = self.df["responsible"].nunique() if "responsible" in self.df.columns else 0
 
         # 4. Resumen
         status = "El plan es robusto." if not warnings else "El plan requiere atención."
@@ -58,7 +71,7 @@ class ControlPlanTool(SixSigmaTool):
             summary += " " + " ".join(warnings)
 
         # 5. Estructura de Salida
-        chart_data = self.df.to_dict(orient="records")
+        chart_data = self.df.astype(object).where(self.df.notna(), None).to_dict(orient="records")
 
         return AnalysisResult(
             tool_name="Plan de Control",
@@ -66,6 +79,10 @@ class ControlPlanTool(SixSigmaTool):
             chart_data=chart_data,
             details={
                 "preventive_ratio": round(preventive_count / total_points * 100, 1),
-                "warnings": warnings
+                "warnings": warnings,
+                "missing_reaction_count": missing_count,
+                "control_type_counts": type_counts,
+                "unclassified_count": unclassified,
+                "control_types": [{"type": t, "category": matcher.categories[t]} for t in matcher.types],
             }
-        )
\ No newline at end of file
+        )
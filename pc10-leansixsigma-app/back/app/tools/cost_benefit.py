@@ -3,11 +3,17 @@ import pandas as pd
 import numpy as np
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from app.services import finance
+
+PERCENTILES = [5, 10, 25, 50, 75, 90, 95]
+
 
 class CostBenefitTool(SixSigmaTool):
     """
     Herramienta de Análisis Costo-Beneficio.
     Calcula ROI, Beneficio Neto y Punto de Equilibrio (Payback).
+    Con mode='monte_carlo' cada flujo puede tener una distribución (triangular, normal,
+    lognormal) y se simulan miles de escenarios para obtener la distribución de VAN, TIR y Payback.
     Referencias:
     - Libro Yellow Belt, pág 106 (ROI y Competitividad).
     - Tesis UAP, pág 59 (Justificación económica del proyecto).
@@ -21,6 +27,12 @@ class CostBenefitTool(SixSigmaTool):
         required_cols = ["amount", "type", "period"]
         self.validate_columns(required_cols)
 
+        mode = self.params.get("mode", "deterministic")
+        if mode == "monte_carlo":
+            return self._analyze_monte_carlo()
+        if mode == "portfolio":
+            return self._analyze_portfolio()
+
         # 2. Organización de Flujos
         # Separar costos y beneficios
         costs = self.df[self.df['type'] == 'cost']
@@ -42,7 +54,7 @@ class CostBenefitTool(SixSigmaTool):
         # 4. Análisis Temporal (Payback Period)
         # Agrupar por periodo para ver el flujo de caja neto por periodo
         # Asumimos que los costos son negativos y beneficios positivos para el flujo
-        self.df['cash_flow'] = self.df.apply(lambda x: -x['amount'] if x['type'] == 'cost' else x['amount'], axis=1)
+        self.df['cash_flow'] = np.where(self.df['type'] == 'cost', -self.df['amount'], self.df['amount'])
         
         # Crear una línea de tiempo agregada
         max_period = int(self.df['period'].max())
@@ -56,15 +68,18 @@ class CostBenefitTool(SixSigmaTool):
         # Calcular acumulado
         timeline['cumulative'] = timeline['cash_flow'].cumsum()
 
-        # Encontrar el Payback (cuando el acumulado pasa de negativo a positivo)
-        payback_period = None
-        for i, row in timeline.iterrows():
-            if row['cumulative'] >= 0:
-                payback_period = row['period']
-                break
-        
+        # Encontrar el Payback (primer periodo con acumulado >= 0)
+        first_recovered = finance.payback_period(timeline['cash_flow'].to_numpy())[0]
+        payback_period = None if np.isnan(first_recovered) else int(first_recovered)
+
         payback_text = f"en el periodo {payback_period}" if payback_period is not None else "No se recupera la inversión en el tiempo analizado"
 
+        # Valor Actual Neto y TIR sobre la línea de tiempo (el periodo 0 no se descuenta)
+        discount_rate = float(self.params.get("discount_rate", 0.0))
+        flows = timeline['cash_flow'].to_numpy()
+        npv = float(finance.npv(flows, discount_rate)[0])
+        irr = float(finance.irr(flows)[0])
+
         # 5. Resumen
         unit = self.params.get("period_unit", "Meses")
         summary = (
@@ -72,15 +87,13 @@ class CostBenefitTool(SixSigmaTool):
             f"El ROI estimado es del {roi_text}. "
             f"El punto de equilibrio (Payback) se alcanza {payback_text} ({unit})."
         )
+        if discount_rate:
+            summary += f" El VAN a una tasa de {discount_rate:.2%} por periodo es ${npv:,.2f}."
 
         # 6. Gráfico (Línea de Tendencia de Flujo Acumulado)
-        chart_data = []
-        for _, row in timeline[['period', 'cumulative', 'cash_flow']].iterrows():
-            chart_data.append({
-                "period": int(row["period"]),
-                "cumulative": float(row["cumulative"]),
-                "cash_flow": float(row["cash_flow"]),
-            })
+        chart_data = timeline[['period', 'cumulative', 'cash_flow']].astype(
+            {"period": int, "cumulative": float, "cash_flow": float}
+        ).to_dict(orient="records")
 
         return AnalysisResult(
             tool_name="Análisis Costo-Beneficio (ROI)",
@@ -92,5 +105,242 @@ class CostBenefitTool(SixSigmaTool):
                 "net_value": float(net_benefit),
                 "roi_percent": float(roi),
                 "payback_period": int(payback_period) if payback_period is not None else None,
+                "discount_rate": discount_rate,
+                "npv": npv,
+                "irr_percent": irr * 100 if np.isfinite(irr) else None,
             }
-        )
\ No newline at end of file
+        )
+
+    def _analyze_portfolio(self) -> AnalysisResult:
+        """
+        Cartera de proyectos: una sola tabla dinámica (proyectos × periodos) y los
+        indicadores de todos los proyectos calculados a la vez con los núcleos de finance.
+        """
+        self.validate_columns(["project_id"])
+        discount_rate = float(self.params.get("discount_rate", 0.0))
+        rank_by = self.params.get("rank_by", "npv")
+        if rank_by not in ("npv", "irr_percent", "roi_percent"):
+            raise ValueError("rank_by debe ser 'npv', 'irr_percent' o 'roi_percent'.")
+
+        # 1. Matriz de flujos (proyectos × periodos)
+        df = self.df.assign(
+            project_id=self.df['project_id'].astype(str),
+            period=self.df['period'].astype(int),
+            cash_flow=np.where(self.df['type'] == 'cost', -self.df['amount'], self.df['amount'])
+        )
+        flows = df.pivot_table(
+            index='project_id', columns='period', values='cash_flow', aggfunc='sum', fill_value=0.0
+        ).reindex(columns=range(int(df['period'].max()) + 1), fill_value=0.0)
+        totals = df.pivot_table(
+            index='project_id', columns='type', values='amount', aggfunc='sum', fill_value=0.0
+        ).reindex(index=flows.index, columns=['cost', 'benefit'], fill_value=0.0)
+
+        matrix = flows.to_numpy(dtype=float)
+        total_cost = totals['cost'].to_numpy()
+        total_benefit = totals['benefit'].to_numpy()
+
+        # 2. Indicadores vectorizados
+        with np.errstate(divide="ignore", invalid="ignore"):
+            roi = np.where(total_cost > 0, (total_benefit - total_cost) / total_cost * 100, np.nan)
+        table = pd.DataFrame({
+            "project_id": flows.index,
+            "total_investment": total_cost,
+            "total_savings": total_benefit,
+            "net_value": total_benefit - total_cost,
+            "roi_percent": roi,
+            "npv": finance.npv(matrix, discount_rate),
+            "irr_percent": finance.irr(matrix) * 100,
+            "payback_period": finance.payback_period(matrix),
+            "discounted_payback_period": finance.payback_period(matrix, discount_rate),
+        })
+
+        # 3. Ranking (los proyectos sin indicador definido quedan al final)
+        table = table.sort_values(rank_by, ascending=False, na_position="last", kind="stable").reset_index(drop=True)
+        table.insert(0, "rank", np.arange(1, len(table) + 1))
+
+        # NaN -> None para serializar a JSON
+        chart_data = table.astype(object).where(table.notna(), None).to_dict(orient="records")
+
+        positive = int((table['npv'] > 0).sum())
+        best = table.iloc[0]
+        summary = (
+            f"Se evaluaron {len(table)} proyectos. {positive} tienen VAN positivo "
+            f"(tasa {discount_rate:.2%} por periodo). "
+            f"El mejor según '{rank_by}' es '{best['project_id']}' con un VAN de ${best['npv']:,.2f}."
+        )
+
+        return AnalysisResult(
+            tool_name="Análisis Costo-Beneficio (Cartera de Proyectos)",
+            summary=summary,
+            chart_data=chart_data,
+            details={
+                "n_projects": len(table),
+                "discount_rate": discount_rate,
+                "rank_by": rank_by,
+                "n_positive_npv": positive,
+                "portfolio_npv": float(table['npv'].sum()),
+                "portfolio_investment": float(table['total_investment'].sum()),
+            }
+        )
+
+    def _analyze_monte_carlo(self) -> AnalysisResult:
+        """
+        Simulación Monte Carlo: matriz (escenarios × periodos) construida por bloques.
+        Cada bloque muestrea los montos de todos los ítems a la vez y los proyecta a
+        periodos con una matriz de incidencia firmada (-1 costo, +1 beneficio).
+        """
+        n_simulations = int(self.params.get("n_simulations", 100_000))
+        chunk_size = int(self.params.get("chunk_size", 20_000))
+        discount_rate = float(self.params.get("discount_rate", 0.0))
+        unit = self.params.get("period_unit", "Meses")
+        rng = np.random.default_rng(self.params.get("random_state", 42))
+
+        # 1. Parámetros de cada ítem
+        items = self._distribution_table()
+        n_periods = int(items['period'].max()) + 1
+        incidence = np.zeros((len(items), n_periods))
+        incidence[np.arange(len(items)), items['period'].to_numpy()] = np.where(items['type'] == 'cost', -1.0, 1.0)
+
+        # 2. Simulación por bloques
+        npv_parts, irr_parts, payback_parts = [], [], []
+        for start in range(0, n_simulations, chunk_size):
+            size = min(chunk_size, n_simulations - start)
+            flows = self._sample_amounts(items, rng, size) @ incidence
+            npv_parts.append(finance.npv(flows, discount_rate))
+            irr_parts.append(finance.irr(flows))
+            payback_parts.append(finance.payback_period(flows, discount_rate))
+
+        npv = np.concatenate(npv_parts)
+        irr = np.concatenate(irr_parts)
+        payback = np.concatenate(payback_parts)
+
+        # 3. Escenario base (montos nominales) como referencia
+        base_npv = float(finance.npv(items['amount'].to_numpy() @ incidence, discount_rate)[0])
+
+        # 4. Estadísticos
+        prob_loss = float((npv < 0).mean())
+        prob_no_payback = float(np.isnan(payback).mean())
+        npv_pct = self._percentiles(npv)
+        irr_pct = self._percentiles(irr * 100)
+        payback_pct = self._payback_percentiles(payback)
+
+        # 5. Gráfico: histograma del VAN
+        counts, edges = np.histogram(npv, bins=int(self.params.get("bins", 40)))
+        chart_data = [
+            {"bin_start": float(lo), "bin_end": float(hi), "count": int(c)}
+            for lo, hi, c in zip(edges[:-1], edges[1:], counts)
+        ]
+
+        summary = (
+            f"Sobre {n_simulations:,} escenarios simulados, el VAN mediano es ${npv_pct['p50']:,.2f} "
+            f"(P5: ${npv_pct['p5']:,.2f}, P95: ${npv_pct['p95']:,.2f}). "
+            f"La probabilidad de VAN negativo es {prob_loss:.1%}"
+        )
+        if payback_pct["p50"] is not None:
+            summary += f" y el Payback mediano es el periodo {payback_pct['p50']:.0f} ({unit})."
+        else:
+            summary += f" y en el {prob_no_payback:.1%} de los escenarios no se recupera la inversión ({unit})."
+
+        return AnalysisResult(
+            tool_name="Análisis Costo-Beneficio (Simulación Monte Carlo)",
+            summary=summary,
+            chart_data=chart_data,
+            details={
+                "n_simulations": n_simulations,
+                "discount_rate": discount_rate,
+                "random_state": self.params.get("random_state", 42),
+                "base_npv": base_npv,
+                "npv_mean": float(npv.mean()),
+                "npv_std": float(npv.std(ddof=1)),
+                "npv_percentiles": npv_pct,
+                "irr_percent_percentiles": irr_pct,
+                "payback_percentiles": payback_pct,
+                "prob_npv_negative": prob_loss,
+                "prob_no_payback": prob_no_payback,
+                "prob_irr_undefined": float(np.isnan(irr).mean()),
+            }
+        )
+
+    def _distribution_table(self) -> pd.DataFrame:
+        """Normaliza y valida los parámetros de distribución de cada flujo."""
+        items = self.df.copy()
+        for col in ["distribution", "low", "mode", "high", "std_dev"]:
+            if col not in items.columns:
+                items[col] = None
+        items['distribution'] = items['distribution'].fillna("fixed")
+        items['amount'] = items['amount'].astype(float)
+        items['period'] = items['period'].astype(int)
+        items['mode'] = items['mode'].fillna(items['amount']).astype(float)
+        for col in ["low", "high", "std_dev"]:
+            items[col] = items[col].astype(float)
+
+        unknown = set(items['distribution']) - {"fixed", "triangular", "normal", "lognormal"}
+        if unknown:
+            raise ValueError(f"Distribución no soportada: {', '.join(sorted(unknown))}")
+
+        negative_period = items['period'] < 0
+        if negative_period.any():
+            rows = ", ".join(map(str, items.index[negative_period] + 1))
+            raise ValueError(f"El periodo de cada flujo debe ser 0 o mayor (filas: {rows}).")
+
+        tri = items['distribution'] == "triangular"
+        bad_tri = tri & ~((items['low'] <= items['mode']) & (items['mode'] <= items['high']))
+        if bad_tri.any():
+            rows = ", ".join(map(str, items.index[bad_tri] + 1))
+            raise ValueError(f"Los flujos triangulares requieren low <= mode <= high (filas: {rows}).")
+
+        dispersed = items['distribution'].isin(["normal", "lognormal"])
+        if (dispersed & items['std_dev'].isna()).any():
+            raise ValueError("Los flujos con distribución normal o lognormal requieren 'std_dev'.")
+
+        bad_log = (items['distribution'] == "lognormal") & ~(items['amount'] > 0)
+        if bad_log.any():
+            rows = ", ".join(map(str, items.index[bad_log] + 1))
+            raise ValueError(f"Los flujos lognormales requieren un 'amount' mayor a cero (filas: {rows}).")
+
+        return items
+
+    @staticmethod
+    def _sample_amounts(items: pd.DataFrame, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Muestra los montos de todos los ítems: matriz (escenarios × ítems)."""
+        amount = items['amount'].to_numpy()
+        samples = np.broadcast_to(amount, (size, len(items))).copy()
+        dist = items['distribution'].to_numpy()
+
+        low, mode, high = (items[c].to_numpy() for c in ["low", "mode", "high"])
+        tri = np.flatnonzero((dist == "triangular") & (high > low))
+        if tri.size:
+            samples[:, tri] = rng.triangular(low[tri], mode[tri], high[tri], size=(size, tri.size))
+
+        std = items['std_dev'].to_numpy()
+        normal = np.flatnonzero(dist == "normal")
+        if normal.size:
+            # Un monto negativo cambiaría el tipo de flujo: se trunca en 0
+            samples[:, normal] = np.maximum(rng.normal(amount[normal], std[normal], size=(size, normal.size)), 0)
+
+        lognormal = np.flatnonzero(dist == "lognormal")
+        if lognormal.size:
+            # Parámetros de la normal subyacente a partir de la media y desviación del monto
+            sigma2 = np.log1p((std[lognormal] / amount[lognormal]) ** 2)
+            mu = np.log(amount[lognormal]) - sigma2 / 2
+            samples[:, lognormal] = rng.lognormal(mu, np.sqrt(sigma2), size=(size, lognormal.size))
+
+        return samples
+
+    @staticmethod
+    def _percentiles(values: np.ndarray) -> dict:
+        """Percentiles ignorando escenarios sin valor (TIR inexistente)."""
+        finite = values[np.isfinite(values)]
+        if finite.size == 0:
+            return {f"p{p}": None for p in PERCENTILES}
+        return {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(finite, PERCENTILES))}
+
+    @staticmethod
+    def _payback_percentiles(payback: np.ndarray) -> dict:
+        """
+        Percentiles del Payback sobre TODOS los escenarios: no recuperar la inversión cuenta
+        como Payback infinito. Un percentil que cae en esa zona es None ("no se recupera").
+        """
+        with np.errstate(invalid="ignore"):  # inf - inf al interpolar entre dos escenarios sin Payback
+            values = np.percentile(np.where(np.isnan(payback), np.inf, payback), PERCENTILES)
+        return {f"p{p}": float(v) if np.isfinite(v) else None for p, v in zip(PERCENTILES, values)}
\ No newline at end of file
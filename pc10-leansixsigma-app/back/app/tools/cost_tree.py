@@ -1,7 +1,9 @@
 # backend/app/tools/cost_tree.py
 import pandas as pd
+import numpy as np
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from app.services.tree_engine import TreeIndex
 
 class CostTreeTool(SixSigmaTool):
     """
@@ -9,15 +11,69 @@ class CostTreeTool(SixSigmaTool):
     Clasifica costos en: Prevención, Evaluación, Fallas Internas, Fallas Externas.
     Referencias:
     - Six Sigma Mejora Procesos Matricula UAP, pág 64 (Costo de mala calidad).
+    Acepta una jerarquía de cualquier profundidad con 'id'/'parent_id' (la categoría se hereda).
     """
 
-    def analyze(self) -> AnalysisResult:
+    # Mapeo de nombres legibles para la gráfica
+    CATEGORY_NAMES = {
+        "prevencion": "Prevención (Inversión)",
+        "evaluacion": "Evaluación (Inspección)",
+        "falla_interna": "Fallas Internas (Desperdicio)",
+        "falla_externa": "Fallas Externas (Daño al Cliente)"
+    }
+
+    def build_index(self):
+        """
+        Índice del árbol de costos y columnas por nodo (name, value = suma de la rama, child_count).
+        Retorna (tree, fields, rollups). Lo reutiliza la API paginada de árboles.
+        """
+        self._prepare()
+        if self._tree is None:
+            # Árbol fijo de dos niveles: categoría -> item, indexado igual que un árbol jerárquico
+            categories = self.df["category"].astype(str)
+            cat_ids = "cat:" + categories
+            unique_cats = pd.unique(cat_ids)
+            ids = np.concatenate([unique_cats, "item:" + self.df.index.astype(str).to_numpy()])
+            parents = np.concatenate([np.full(len(unique_cats), None, dtype=object), cat_ids.to_numpy()])
+            names = np.concatenate([
+                [self.CATEGORY_NAMES.get(c[4:], c[4:]) for c in unique_cats],
+                self.df["description"].to_numpy(dtype=object)
+            ])
+            amounts = np.concatenate([np.zeros(len(unique_cats)), self.df["amount"].to_numpy(dtype=float)])
+            tree = TreeIndex(ids, parents)
+        else:
+            tree = self._tree
+            names = self.df["description"].to_numpy(dtype=object)
+            amounts = self.df["amount"].to_numpy(dtype=float)
+
+        fields = {
+            "id": tree.ids.to_numpy(dtype=object),
+            "name": np.asarray(names, dtype=object),
+            "value": tree.rollup(amounts).astype(object),
+            "child_count": tree.child_count.astype(object),
+        }
+        return tree, fields, {"total_value": float(amounts.sum())}
+
+    def _prepare(self):
         # 1. Validación
         if self.df.empty:
             raise ValueError("Se requiere una lista de costos para generar el árbol.")
 
         required_cols = ["description", "amount", "category"]
-        self.validate_columns(required_cols)
+        if "id" in self.df.columns and "parent_id" in self.df.columns:
+            # Árbol jerárquico (ej: Planta -> Línea -> Proceso -> Costo): la categoría se hereda del padre
+            self.validate_columns(["description", "amount"])
+            self._tree = TreeIndex(self.df["id"], self.df["parent_id"])
+            self._check_cycles(self._tree)
+            category = self.df["category"] if "category" in self.df.columns else pd.Series(None, index=self.df.index)
+            self.df["category"] = self._tree.propagate_down(category.to_numpy(dtype=object), category.isna().to_numpy())
+            self.df["amount"] = pd.to_numeric(self.df["amount"], errors="coerce").fillna(0.0)
+        else:
+            self.validate_columns(required_cols)
+            self._tree = None
+
+    def analyze(self) -> AnalysisResult:
+        tree, fields, _ = self.build_index()
 
         # 2. Cálculos de Agrupación
         # Agrupar por categoría para obtener subtotales
@@ -43,28 +99,8 @@ class CostTreeTool(SixSigmaTool):
             impact_text = f" Los costos de calidad representan el {percent_revenue:.2f}% de los ingresos totales."
 
         # 4. Estructura de Árbol (Para gráficos tipo Treemap/Sunburst en Frontend)
-        # Estructura: Root -> Categoría -> Items
-        tree_structure = {
-            "name": "Costo Total de Calidad",
-            "value": total_quality_cost,
-            "children": []
-        }
-
-        # Mapeo de nombres legibles para la gráfica
-        cat_names = {
-            "prevencion": "Prevención (Inversión)",
-            "evaluacion": "Evaluación (Inspección)",
-            "falla_interna": "Fallas Internas (Desperdicio)",
-            "falla_externa": "Fallas Externas (Daño al Cliente)"
-        }
-
-        for cat, group in self.df.groupby("category"):
-            children_items = group[["description", "amount"]].rename(columns={"description": "name", "amount": "value"}).to_dict(orient="records")
-            tree_structure["children"].append({
-                "name": cat_names.get(cat, cat),
-                "value": float(group["amount"].sum()),
-                "children": children_items
-            })
+        # Se arma con el motor de árboles: Root -> Categoría -> Items, o la jerarquía propia (id/parent_id)
+        tree_structure = self._nested_tree(tree, fields, total_quality_cost)
 
         # 5. Resumen Automático
         summary = (
@@ -82,4 +118,31 @@ class CostTreeTool(SixSigmaTool):
                 "total_cogq": float(cogq),
                 "breakdown": category_totals_py
             }
-        )
\ No newline at end of file
+        )
+
+    @staticmethod
+    def _nested_tree(tree: TreeIndex, fields: dict, total_quality_cost: float) -> dict:
+        """Árbol anidado {name, value, children}. El 'value' de cada nodo es la suma de su rama."""
+        children = tree.to_nested({"name": fields["name"], "value": fields["value"]})
+        # Las hojas no llevan 'children' (formato esperado por Treemap/Sunburst)
+        stack = list(children)
+        while stack:
+            node = stack.pop()
+            if node["children"]:
+                stack.extend(node["children"])
+            else:
+                del node["children"]
+
+        return {
+            "name": "Costo Total de Calidad",
+            "value": total_quality_cost,
+            "children": children
+        }
+
+    @staticmethod
+    def _check_cycles(tree: TreeIndex):
+        if tree.cyclic.size:
+            raise ValueError(
+                "Se detectaron referencias circulares en el árbol de costos: "
+                f"{', '.join(tree.ids[tree.cyclic[:10]])}"
+            )
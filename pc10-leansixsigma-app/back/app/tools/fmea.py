@@ -2,14 +2,18 @@
 import pandas as pd
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from app.services import risk_engine
 
 class FmeaTool(SixSigmaTool):
     """
     Herramienta AMEF / FMEA (Análisis de Modo y Efecto de Falla).
-    Calcula el NPR para priorizar riesgos en procesos o diseños.
+    Calcula el NPR para priorizar riesgos en procesos o diseños, la Prioridad de Acción
+    AIAG-VDA y, si vienen las calificaciones revisadas (revised_severity/occurrence/detection),
+    la reducción del NPR después de las acciones.
     Referencias:
     - Libro Seis Sigma y sus Aplicaciones, Cuadro 12 (Pág 24).
     - Caso Sysman, Pág 58 (Cálculo NPR = S * O * D).
+    - Manual AMEF AIAG-VDA (2019), tablas de Prioridad de Acción.
     """
 
     def analyze(self) -> AnalysisResult:
@@ -20,47 +24,51 @@ class FmeaTool(SixSigmaTool):
         required_cols = ["function_part", "failure_mode", "severity", "occurrence", "detection"]
         self.validate_columns(required_cols)
 
-        # 2. Cálculo del NPR (Número Prioritario de Riesgo)
-        # Fórmula: NPR = Severidad * Ocurrencia * Detección
-        self.df["npr"] = self.df["severity"] * self.df["occurrence"] * self.df["detection"]
-
-        # 3. Clasificación de Riesgo (Lógica de Negocio)
-        # Umbrales típicos en industria: >100 Alto, >200 Crítico
-        def get_risk_category(val):
-            if val >= 200: return "Crítico"
-            if val >= 100: return "Alto"
-            if val >= 50: return "Medio"
-            return "Bajo"
-
-        self.df["risk_category"] = self.df["npr"].apply(get_risk_category)
+        # 2. Cálculo del NPR (Número Prioritario de Riesgo), 3. Clasificación de Riesgo y AP
+        # Fórmula: NPR = Severidad * Ocurrencia * Detección (motor vectorizado compartido)
+        scored = risk_engine.score_risks(self.df)
 
         # 4. Ordenamiento (Priorización)
         # El objetivo del AMEF es atacar primero los NPR más altos
-        self.df = self.df.sort_values(by="npr", ascending=False)
+        self.df = risk_engine.rank_risks(scored, self.params.get("sort_by", "npr"))
+
+        # Consolidado por función/parte (o las columnas indicadas en 'rollup_by')
+        rollup_by = self.params.get("rollup_by") or ["function_part"]
+        if isinstance(rollup_by, str):
+            rollup_by = [rollup_by]
+        self.validate_columns(rollup_by)
+        rollup = risk_engine.rollup(self.df, rollup_by, self.params.get("rollup_limit", 100))
 
         # 5. Generar Resumen
         top_failure = self.df.iloc[0]
         total_items = len(self.df)
-        critical_items = len(self.df[self.df["npr"] >= 100])
+        totals = risk_engine.risk_summary(self.df)
+        critical_items = totals["critical_count"]
+        high_ap = totals["action_priority_counts"].get("Alta", 0)
 
         summary = (
             f"Análisis AMEF completado con {total_items} modos de falla. "
-            f"Se encontraron {critical_items} fallas de riesgo Alto/Crítico. "
-            f"La prioridad #1 es '{top_failure['failure_mode']}' (Causa: {top_failure['cause']}) "
+            f"Se encontraron {critical_items} fallas de riesgo Alto/Crítico y {high_ap} con Prioridad de Acción Alta. "
+            f"La prioridad #1 es '{top_failure['failure_mode']}' (Causa: {top_failure.get('cause', 'N/A')}) "
             f"con un NPR de {top_failure['npr']}."
         )
+        if "revised_total_risk_sum" in totals:
+            summary += (
+                f" Con las acciones, el NPR total baja de {totals['total_risk_sum']} a "
+                f"{totals['revised_total_risk_sum']} ({totals['total_npr_reduction_pct']}% menos)."
+            )
 
         # 6. Estructura de Salida
         # Devolvemos la tabla completa ordenada para que el frontend la muestre como reporte
-        chart_data = self.df.to_dict(orient="records")
+        chart_data = self.df.astype(object).where(self.df.notna(), None).to_dict(orient="records")
 
         return AnalysisResult(
             tool_name="AMEF (Análisis de Modo y Efecto de Falla)",
             summary=summary,
             chart_data=chart_data,
             details={
-                "max_npr": int(self.df["npr"].max()),
-                "total_risk_sum": int(self.df["npr"].sum()),
-                "critical_count": critical_items
+                **totals,
+                "rollup_by": rollup_by,
+                "rollup": rollup,
             }
-        )
\ No newline at end of file
+        )
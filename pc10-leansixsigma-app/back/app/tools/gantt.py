@@ -1,12 +1,18 @@
 # backend/app/tools/gantt.py
 import pandas as pd
+import numpy as np
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from app.services import scheduling
 
 class GanttTool(SixSigmaTool):
     """
     Herramienta de Cronograma / Gráfico de Gantt.
     Organiza tareas, calcula duraciones y valida la planificación del proyecto.
+    Si las tareas traen 'predecessors' se programa con CPM (Ruta Crítica):
+    inicio/fin tempranos y tardíos, holgura y ruta crítica.
+    Con scheduling='resource_constrained' se nivelan los recursos (columna 'resource')
+    y con calendar='workdays' las duraciones son días laborables (fines de semana y feriados).
     Referencias:
     - Tesis UAP, pág 59 (Planificación Preliminar del Project Charter).
     - Libro Yellow Belt, pág 22 (Herramientas de Definición - Gantt).
@@ -17,6 +23,9 @@ class GanttTool(SixSigmaTool):
         if self.df.empty:
             raise ValueError("Se requiere una lista de tareas con fechas.")
 
+        if "predecessors" in self.df.columns or self.params.get("scheduling") == "resource_constrained":
+            return self._analyze_cpm()
+
         required_cols = ["task_name", "start_date", "end_date"]
         self.validate_columns(required_cols)
 
@@ -31,16 +40,28 @@ class GanttTool(SixSigmaTool):
             bad_task = invalid_dates.iloc[0]['task_name']
             raise ValueError(f"La tarea '{bad_task}' tiene una fecha de fin anterior a la de inicio.")
 
-        # 3. Cálculos de Duración
-        self.df['duration_days'] = (self.df['end_date'] - self.df['start_date']).dt.days
+        # 3. Cálculos de Duración (días corridos o laborables según 'calendar')
+        workdays = self.params.get("calendar", "calendar") == "workdays"
+        weekmask = self.params.get("weekmask", "1111100")
+        holidays = self.params.get("holidays") or []
+        if workdays:
+            self.df['duration_days'] = scheduling.workday_durations(
+                self.df['start_date'], self.df['end_date'], weekmask, holidays
+            )
+        else:
+            self.df['duration_days'] = (self.df['end_date'] - self.df['start_date']).dt.days
         
         # Asegurar que duración mínima sea 1 día (para visualización)
-        self.df['duration_days'] = self.df['duration_days'].apply(lambda x: max(x, 1))
+        self.df['duration_days'] = self.df['duration_days'].clip(lower=1)
 
         # 4. Estadísticas del Proyecto
         project_start = self.df['start_date'].min()
         project_end = self.df['end_date'].max()
-        total_duration = (project_end - project_start).days
+        if workdays:
+            total_duration = int(scheduling.workday_durations([project_start], [project_end], weekmask, holidays)[0])
+        else:
+            total_duration = (project_end - project_start).days
+        day_label = "días laborables" if workdays else "días"
         total_tasks = len(self.df)
 
         # Calcular avance ponderado (opcional, simple promedio por ahora)
@@ -51,24 +72,22 @@ class GanttTool(SixSigmaTool):
 
         summary = (
             f"Cronograma del Proyecto: {total_tasks} tareas planificadas. "
-            f"Duración total estimada: {total_duration} días "
+            f"Duración total estimada: {total_duration} {day_label} "
             f"(del {project_start.strftime('%Y-%m-%d')} al {project_end.strftime('%Y-%m-%d')}). "
             f"Progreso promedio: {avg_progress:.1f}%."
         )
 
         # 6. Preparar salida para Frontend
         # Formateamos fechas a string ISO para que JS las lea fácil
-        chart_data = []
-        for _, row in self.df.iterrows():
-            chart_data.append({
-                "id": row.get("task_name"), # Usamos nombre como ID simple
-                "name": row["task_name"],
-                "start": row["start_date"].strftime('%Y-%m-%d'),
-                "end": row["end_date"].strftime('%Y-%m-%d'),
-                "duration": int(row["duration_days"]),
-                "phase": row.get("phase", "General"),
-                "progress": row.get("progress", 0)
-            })
+        chart_data = pd.DataFrame({
+            "id": self.df["task_name"], # Usamos nombre como ID simple
+            "name": self.df["task_name"],
+            "start": self.df["start_date"].dt.strftime('%Y-%m-%d'),
+            "end": self.df["end_date"].dt.strftime('%Y-%m-%d'),
+            "duration": self.df["duration_days"].astype(int),
+            "phase": self.df.get("phase", "General"),
+            "progress": self.df.get("progress", 0)
+        }).to_dict(orient="records")
 
         return AnalysisResult(
             tool_name="Cronograma (Gráfico de Gantt)",
@@ -78,6 +97,184 @@ class GanttTool(SixSigmaTool):
                 "project_start": project_start.strftime('%Y-%m-%d'),
                 "project_end": project_end.strftime('%Y-%m-%d'),
                 "total_days": int(total_duration),
+                "calendar": "workdays" if workdays else "calendar",
                 "phases_detected": self.df['phase'].unique().tolist() if 'phase' in self.df.columns else []
             }
-        )
\ No newline at end of file
+        )
+
+    def _analyze_cpm(self) -> AnalysisResult:
+        """Programación por dependencias (CPM) y, opcionalmente, nivelación de recursos (SGS serial)."""
+        self.validate_columns(["task_name"])
+        workdays = self.params.get("calendar", "calendar") == "workdays"
+        weekmask = self.params.get("weekmask", "1111100")
+        holidays = self.params.get("holidays") or []
+
+        # 1. Identificadores y duraciones
+        ids_col = "task_id" if "task_id" in self.df.columns else "task_name"
+        task_ids = pd.Index(self.df[ids_col].astype(str).str.strip())
+        if task_ids.has_duplicates:
+            dup = task_ids[task_ids.duplicated()][0]
+            raise ValueError(f"El identificador de tarea '{dup}' está repetido.")
+
+        if "duration_days" in self.df.columns:
+            durations = pd.to_numeric(self.df['duration_days'], errors="coerce")
+        elif {"start_date", "end_date"} <= set(self.df.columns):
+            starts = pd.to_datetime(self.df['start_date'])
+            ends = pd.to_datetime(self.df['end_date'])
+            if workdays:
+                durations = pd.Series(scheduling.workday_durations(starts, ends, weekmask, holidays), index=self.df.index)
+            else:
+                durations = (ends - starts).dt.days
+        else:
+            raise ValueError("Cada tarea necesita 'duration_days' o 'start_date' y 'end_date'.")
+        if durations.isna().any() or (durations < 0).any():
+            raise ValueError("Las duraciones de las tareas deben ser números no negativos.")
+        durations = durations.to_numpy(dtype=float)
+
+        # 2. CPM sobre el grafo de dependencias
+        predecessors = self.df['predecessors'] if 'predecessors' in self.df.columns else pd.Series([None] * len(self.df))
+        src, dst = scheduling.parse_predecessors(task_ids, predecessors)
+        try:
+            cpm = scheduling.critical_path(durations, src, dst)
+        except scheduling.CycleError as e:
+            blocked = ", ".join(task_ids[e.nodes[:10]])
+            raise ValueError(f"Se detectaron dependencias circulares. Tareas involucradas: {blocked}")
+
+        start_offsets, finish_offsets = cpm["es"], cpm["ef"]
+        project_days = cpm["project_duration"]
+
+        # 3. Nivelación de recursos (opcional)
+        leveling = None
+        if self.params.get("scheduling") == "resource_constrained":
+            leveling = self._level_resources(durations, src, dst, cpm)
+            start_offsets, finish_offsets = leveling["start"], leveling["finish"]
+            project_days = leveling["makespan"]
+
+        # 4. Fechas a partir del inicio del proyecto
+        if self.params.get("project_start"):
+            project_start = pd.Timestamp(self.params["project_start"])
+        elif "start_date" in self.df.columns:
+            project_start = pd.to_datetime(self.df['start_date']).min()
+        else:
+            project_start = pd.Timestamp.today().normalize()
+
+        to_dates = self._offset_formatter(project_start, workdays, weekmask, holidays)
+
+        schedule = pd.DataFrame({
+            "id": task_ids,
+            "name": self.df['task_name'].to_numpy(),
+            "start": to_dates(start_offsets),
+            "end": to_dates(finish_offsets),
+            "duration": durations.astype(int),
+            "early_start": cpm["es"].astype(int),
+            "early_finish": cpm["ef"].astype(int),
+            "late_start": cpm["ls"].astype(int),
+            "late_finish": cpm["lf"].astype(int),
+            "slack": cpm["slack"].astype(int),
+            "is_critical": cpm["is_critical"],
+            "phase": self.df.get("phase", pd.Series("General", index=self.df.index)).to_numpy(),
+            "progress": self.df.get("progress", pd.Series(0, index=self.df.index)).to_numpy(),
+        })
+        if leveling is not None:
+            schedule["resource"] = leveling["resource_names"]
+            schedule["resource_delay"] = (start_offsets - cpm["es"]).astype(int)
+
+        # Orden de salida: inicio programado y, a igualdad, orden topológico
+        topo_rank = np.empty(len(schedule), dtype=np.int64)
+        topo_rank[cpm["order"]] = np.arange(len(schedule))
+        schedule = schedule.iloc[np.lexsort((topo_rank, start_offsets))]
+
+        critical_path = task_ids[cpm["critical_path"]].tolist()
+        project_days = int(np.ceil(project_days))
+        project_end = str(to_dates(np.array([project_days]))[0])
+        n_critical = int(cpm["is_critical"].sum())
+        day_label = "días laborables" if workdays else "días"
+
+        summary = (
+            f"Cronograma CPM: {len(schedule)} tareas y {len(src)} dependencias. "
+            f"Duración total: {project_days} {day_label} "
+            f"(del {project_start.strftime('%Y-%m-%d')} al {project_end}). "
+            f"{n_critical} tareas son críticas (holgura cero); "
+            f"ruta crítica: {' -> '.join(critical_path[:15])}{' -> ...' if len(critical_path) > 15 else ''}."
+        )
+        if leveling is not None:
+            delayed = int((schedule["resource_delay"] > 0).sum())
+            summary += (
+                f" Con nivelación de recursos la duración pasa de {int(np.ceil(cpm['project_duration']))} "
+                f"a {project_days} {day_label}; {delayed} tareas se desplazan por falta de capacidad."
+            )
+
+        details = {
+            "project_start": project_start.strftime('%Y-%m-%d'),
+            "project_end": project_end,
+            "total_days": project_days,
+            "calendar": "workdays" if workdays else "calendar",
+            "critical_path": critical_path,
+            "critical_tasks": n_critical,
+            "dependencies": int(len(src)),
+            "phases_detected": self.df['phase'].unique().tolist() if 'phase' in self.df.columns else []
+        }
+        if leveling is not None:
+            details.update({
+                "unconstrained_days": int(np.ceil(cpm["project_duration"])),
+                "time_limit_reached": leveling["time_limit_reached"],
+                "resource_utilization": leveling["utilization"],
+            })
+
+        return AnalysisResult(
+            tool_name="Cronograma (Gantt + Ruta Crítica CPM)",
+            summary=summary,
+            # NaN (ej: tareas sin recurso) -> None para serializar a JSON
+            chart_data=schedule.astype(object).where(schedule.notna(), None).to_dict(orient="records"),
+            details=details
+        )
+
+    def _level_resources(self, durations: np.ndarray, src: np.ndarray, dst: np.ndarray, cpm: dict) -> dict:
+        """Nivelación con SGS serial: prioridad = inicio tardío de CPM (menor holgura primero)."""
+        resource_col = "resource" if "resource" in self.df.columns else "owner"
+        self.validate_columns([resource_col])
+
+        assigned = np.where(self.df[resource_col].notna(), self.df[resource_col], None)
+        codes, names = pd.factorize(assigned, use_na_sentinel=True)
+        demand = pd.to_numeric(self.df.get("units", pd.Series(1, index=self.df.index)), errors="coerce").fillna(1)
+
+        capacities = self.params.get("resource_capacity") or {}
+        default_capacity = int(self.params.get("default_capacity", 1))
+        capacity = np.array([int(capacities.get(name, default_capacity)) for name in names], dtype=np.int64)
+        if (capacity <= 0).any():
+            raise ValueError("La capacidad de cada recurso debe ser mayor a cero.")
+
+        # Prioridad: inicio tardío y, a igualdad, inicio temprano
+        priority = list(zip(cpm["ls"].tolist(), cpm["es"].tolist()))
+        result = scheduling.serial_sgs(
+            durations, src, dst, codes, demand.to_numpy(dtype=np.int64), capacity, priority,
+            max_seconds=self.params.get("max_solver_seconds")
+        )
+
+        bucket = int(self.params.get("utilization_bucket", 5))
+        histogram = scheduling.utilization_histogram(result["usage"], capacity, bucket)
+        busy_days = result["usage"].sum(axis=1)
+        horizon = max(result["makespan"], 1)
+
+        result["resource_names"] = assigned
+        result["utilization"] = {
+            "bucket_days": bucket,
+            "resources": names.tolist(),
+            "capacity": capacity.tolist(),
+            "average": np.round(busy_days / (capacity * horizon), 4).tolist(),
+            "peak": np.round(histogram.max(axis=1), 4).tolist() if histogram.size else [],
+            "histogram": np.round(histogram, 4).tolist(),
+        }
+        return result
+
+    @staticmethod
+    def _offset_formatter(project_start: pd.Timestamp, workdays: bool, weekmask: str, holidays: list):
+        """Función que convierte desplazamientos (días o días laborables) en fechas ISO."""
+        if workdays:
+            return lambda offsets: np.datetime_as_string(
+                scheduling.workday_dates(project_start.date(), np.asarray(offsets).astype(np.int64), weekmask, holidays),
+                unit="D"
+            )
+        return lambda offsets: (
+            project_start + pd.to_timedelta(np.asarray(offsets, dtype=float), unit="D")
+        ).strftime('%Y-%m-%d').to_numpy()
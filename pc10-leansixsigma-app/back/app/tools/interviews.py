@@ -1,9 +1,8 @@
 # backend/app/tools/interviews.py
 import pandas as pd
-import re
-from collections import Counter
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from app.services import text_pipeline
 
 class InterviewAnalysisTool(SixSigmaTool):
     """
@@ -24,30 +23,20 @@ class InterviewAnalysisTool(SixSigmaTool):
         top_n = self.params.get("top_n_words", 10)
         min_len = self.params.get("min_word_length", 4)
 
-        # 2. Procesamiento de Texto (NLP Básico)
-        # Concatenar todo el texto para análisis global
-        all_text = " ".join(self.df["transcript"].astype(str).tolist()).lower()
-        
-        # Limpieza: Quitar signos de puntuación y caracteres especiales
-        words = re.findall(r'\w+', all_text)
-        
-        # Stopwords básicas en español (se podría ampliar o cargar de librería externa)
-        stopwords = {
-            "para", "como", "pero", "este", "esta", "porque", "cuando", "todo", 
-            "estos", "estas", "hay", "que", "los", "las", "una", "uno", "con", 
-            "por", "del", "sus", "nos", "más", "muy", "sin", "sobre", "está",
-            "son", "tiene", "donde", "hace", "puede", "ser", "eso", "esa"
-        }
-        
-        # Filtrar palabras: longitud mínima y que no sean stopwords
-        filtered_words = [w for w in words if len(w) >= min_len and w not in stopwords]
+        # 2. Procesamiento de Texto (Pipeline compartido)
+        # Normalización (minúsculas, sin tildes), tokenización y stopwords en español
+        # sobre toda la columna; las transcripciones ya vistas salen de la caché
+        transcripts = self.df["transcript"]
+        total_words = int(text_pipeline.tokenize(transcripts).map(len).sum())
+        keywords = text_pipeline.token_counts(transcripts, min_length=min_len)
 
         # 3. Conteo de Frecuencias
-        word_counts = Counter(filtered_words).most_common(top_n)
+        word_counts = list(keywords.head(top_n).items())
+        bigram_counts = text_pipeline.ngram_counts(transcripts, n=2, top_n=top_n, min_length=min_len)
 
         # 4. Análisis por Entrevistado (Longitud y Riqueza)
         # Calculamos cuántas palabras dijo cada uno para ver quién aportó más info
-        self.df["word_count"] = self.df["transcript"].apply(lambda x: len(str(x).split()))
+        self.df["word_count"] = transcripts.astype(str).str.split().str.len()
         
         # 5. Generar Resumen
         top_word, top_count = word_counts[0] if word_counts else ("N/A", 0)
@@ -56,12 +45,12 @@ class InterviewAnalysisTool(SixSigmaTool):
         summary = (
             f"Análisis de {total_interviews} entrevistas completado. "
             f"El tema más recurrente parece ser '{top_word}' (mencionado {top_count} veces). "
-            f"Se analizaron un total de {len(filtered_words)} palabras relevantes."
+            f"Se analizaron un total de {int(keywords.sum())} palabras relevantes."
         )
 
         # 6. Estructura de Salida
         # Gráfico 1: Frecuencia de palabras (Barras)
-        chart_data = [{"word": w, "count": c} for w, c in word_counts]
+        chart_data = [{"word": w, "count": int(c)} for w, c in word_counts]
         
         # Detalles: Tabla de participación por usuario
         participation_table = self.df[["interviewee", "date", "word_count"]].to_dict(orient="records")
@@ -72,6 +61,7 @@ class InterviewAnalysisTool(SixSigmaTool):
             chart_data=chart_data,
             details={
                 "participation_stats": participation_table,
-                "total_words_processed": len(words)
+                "total_words_processed": total_words,
+                "top_bigrams": [{"phrase": p, "count": int(c)} for p, c in bigram_counts.items()]
             }
         )
\ No newline at end of file
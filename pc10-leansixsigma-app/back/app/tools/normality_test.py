@@ -2,83 +2,120 @@
 import pandas as pd
 import numpy as np
 from scipy import stats
+from scipy.special import ndtr, ndtri
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from app.services.capability import anderson_darling
 
 class NormalityTestTool(SixSigmaTool):
     """
     Herramienta de Prueba de Normalidad y Gráfico de Probabilidad (Q-Q Plot).
     Valida rigurosamente si los datos siguen una distribución Normal.
+    Estrategia según el tamaño de muestra ('method' = 'auto'):
+    - n <= 5000: Shapiro-Wilk (la prueba más potente; su valor P solo es válido hasta ~5000).
+    - n > 5000: Anderson-Darling con valor P interpolado (Stephens / D'Agostino), y Jarque-Bera
+      (asimetría y curtosis) como complemento.
+    El Q-Q plot se calcula sobre una grilla acotada de cuantiles ('qq_points', 500 por defecto).
     Referencias:
     - Libro Seis Sigma y sus Aplicaciones, pág 38 (Gráfica de Probabilidad Normal).
+    - D'Agostino & Stephens (1986), Goodness-of-Fit Techniques, tabla 4.9.
     """
 
+    SHAPIRO_MAX_N = 5000
+    METHODS = ("auto", "shapiro", "anderson", "jarque_bera")
+
     def analyze(self) -> AnalysisResult:
         # 1. Validación
         if self.df.empty:
             raise ValueError("Se requieren datos numéricos.")
 
-        col_name = self.df.select_dtypes(include=['number']).columns[0]
-        data = self.df[col_name].dropna().values
+        col_name = self.params.get("value_column")
+        if col_name is None:
+            numeric_cols = self.df.select_dtypes(include=['number']).columns
+            if len(numeric_cols) == 0:
+                raise ValueError("Se requieren datos numéricos.")
+            col_name = numeric_cols[0]
+        self.validate_columns([col_name])
+        # Copia propia (se ordena en su lugar más abajo)
+        data = np.array(pd.to_numeric(self.df[col_name], errors="coerce").dropna(), dtype=float)
         n = len(data)
 
         if n < 3:
             raise ValueError("Se necesitan al menos 3 datos para una prueba de normalidad.")
 
         alpha = self.params.get("alpha", 0.05)
-        
+        method = self.params.get("method", "auto")
+        if method not in self.METHODS:
+            raise ValueError(f"Método '{method}' no soportado. Opciones: {', '.join(self.METHODS)}")
+        if method == "auto":
+            method = "shapiro" if n <= self.SHAPIRO_MAX_N else "anderson"
+        max_points = int(self.params.get("qq_points", 500))
+        if max_points < 10:
+            raise ValueError("'qq_points' debe ser al menos 10.")
+
+        mean = float(np.mean(data))
+        std_dev = float(np.std(data, ddof=1))
+        if std_dev == 0:
+            raise ValueError("Los datos son constantes: no se puede evaluar la normalidad.")
+
         # 2. Pruebas Estadísticas
-        # Shapiro-Wilk (Mejor para n < 50)
-        shapiro_stat, shapiro_p = stats.shapiro(data)
-        
-        # Anderson-Darling (Más robusto en las colas, estándar en Six Sigma)
-        anderson_res = stats.anderson(data, dist='norm')
-        anderson_stat = anderson_res.statistic
-        # Scipy devuelve valores críticos para alphas específicos. 
-        # Estimamos P-Value aproximado o comparamos con crítico al 5%
-        # Critical values index: 2 correspond to 5% significance level usually
-        critical_val_5pct = anderson_res.critical_values[2] 
-        is_normal_ad = anderson_stat < critical_val_5pct
-
-        # Decisión final (Usando P-Value de Shapiro como referencia principal numérica)
-        p_value_display = shapiro_p
+        # Shapiro-Wilk (solo si corresponde; con n > 5000 forzado se usa una submuestra)
+        shapiro_stat = shapiro_p = None
+        shapiro_sample = None
+        if method == "shapiro":
+            sample = data
+            if n > self.SHAPIRO_MAX_N:
+                rng = np.random.default_rng(self.params.get("random_state", 42))
+                sample = rng.choice(data, self.SHAPIRO_MAX_N, replace=False)
+                shapiro_sample = self.SHAPIRO_MAX_N
+            shapiro_stat, shapiro_p = (float(v) for v in stats.shapiro(sample))
+
+        # Anderson-Darling (Más robusto en las colas, estándar en Six Sigma), con valor P.
+        # Se ordena la copia local de los datos en su lugar (sin otra copia completa).
+        data.sort()
+        anderson_stat = anderson_darling(data, lambda x: ndtr((x - mean) / std_dev))
+        anderson_p = self._anderson_p_value(anderson_stat, n)
+
+        # Jarque-Bera (momentos: asimetría y curtosis; O(n))
+        skewness = float(stats.skew(data))
+        excess_kurtosis = float(stats.kurtosis(data))
+        jb_stat = n / 6 * (skewness ** 2 + excess_kurtosis ** 2 / 4)
+        jb_p = float(stats.chi2.sf(jb_stat, 2))
+
+        p_values = {"shapiro": shapiro_p, "anderson": anderson_p, "jarque_bera": jb_p}
+        test_names = {"shapiro": "Shapiro-Wilk", "anderson": "Anderson-Darling", "jarque_bera": "Jarque-Bera"}
+        p_value_display = p_values[method]
         is_normal = p_value_display > alpha
 
         # 3. Generación de Datos para Gráfico Q-Q (Probability Plot)
-        # Ordenar datos reales
-        sorted_data = np.sort(data)
-        
-        # Calcular cuantiles teóricos (Z-scores esperados)
-        # Fórmula de Filliben (o similar) para la posición de ploteo: (i - 0.5) / n
-        plotting_positions = (np.arange(1, n + 1) - 0.5) / n
-        theoretical_quantiles = stats.norm.ppf(plotting_positions)
+        theoretical_quantiles, observed = self._qq_grid(data, max_points)
 
         # Línea de referencia (Ajuste lineal de los datos ideales)
         # Pendiente = Desviación Estándar, Intercepto = Media
-        mean = np.mean(data)
-        std_dev = np.std(data, ddof=1)
-        
-        # Generar puntos para la línea roja de referencia
-        line_x = [min(theoretical_quantiles), max(theoretical_quantiles)]
+        line_x = [float(theoretical_quantiles[0]), float(theoretical_quantiles[-1])]
         line_y = [mean + (x * std_dev) for x in line_x]
 
         # Estructurar datos para el gráfico
         # Eje X: Cuantiles Teóricos (Desviaciones Estándar)
         # Eje Y: Datos Reales
-        qq_data = []
-        for i in range(n):
-            qq_data.append({
-                "theoretical_quantile": float(theoretical_quantiles[i]), # Eje X
-                "observed_value": float(sorted_data[i])                  # Eje Y
-            })
+        qq_data = [
+            {"theoretical_quantile": float(q), "observed_value": float(v)}
+            for q, v in zip(theoretical_quantiles, observed)
+        ]
 
         # 4. Resumen
         conclusion = "Los datos siguen una distribución Normal." if is_normal else "Los datos NO siguen una distribución Normal."
         summary = (
-            f"Prueba de Normalidad para '{col_name}'. "
-            f"Anderson-Darling: {anderson_stat:.3f}. Valor P (Shapiro): {p_value_display:.4f}. "
+            f"Prueba de Normalidad para '{col_name}' (n = {n}). "
+            f"Anderson-Darling: {anderson_stat:.3f}. Valor P ({test_names[method]}): {p_value_display:.4f}. "
             f"Conclusión (al { (1-alpha)*100 }%): {conclusion}"
         )
+        if n > self.SHAPIRO_MAX_N and not is_normal and abs(skewness) < 0.5 and abs(excess_kurtosis) < 1:
+            # Con muestras grandes cualquier desvío mínimo es significativo
+            summary += (
+                f" Nota: con n grande la prueba detecta desvíos pequeños; la asimetría ({skewness:.2f}) "
+                f"y la curtosis ({excess_kurtosis:.2f}) son moderadas, la aproximación normal puede ser aceptable."
+            )
 
         return AnalysisResult(
             tool_name="Prueba de Normalidad (Q-Q Plot)",
@@ -90,11 +127,55 @@ class NormalityTestTool(SixSigmaTool):
             details={
                 "mean": mean,
                 "std_dev": std_dev,
-                "shapiro_p_value": p_value_display,
+                "test_used": test_names[method],
+                "p_value": p_value_display,
+                "shapiro_statistic": shapiro_stat,
+                "shapiro_p_value": shapiro_p,
+                "shapiro_subsample": shapiro_sample,
                 "anderson_statistic": anderson_stat,
+                "anderson_p_value": anderson_p,
+                "jarque_bera_statistic": float(jb_stat),
+                "jarque_bera_p_value": jb_p,
+                "skewness": skewness,
+                "excess_kurtosis": excess_kurtosis,
                 "n_samples": n,
+                "qq_points": len(qq_data),
                 "is_normal": bool(is_normal)
             }
         )
 
+    @staticmethod
+    def _anderson_p_value(a2: float, n: int) -> float:
+        """
+        Valor P de Anderson-Darling (media y varianza estimadas), corrección A*² = A²(1 + 0.75/n + 2.25/n²)
+        e interpolación por tramos de D'Agostino & Stephens (1986).
+        """
+        a = a2 * (1 + 0.75 / n + 2.25 / n ** 2)
+        if a >= 150:
+            # El último tramo deja de ser decreciente cerca de A*² = 153 (P ya es ~1e-190)
+            return 0.0
+        if a >= 0.6:
+            p = np.exp(1.2937 - 5.709 * a + 0.0186 * a ** 2)
+        elif a >= 0.34:
+            p = np.exp(0.9177 - 4.279 * a - 1.38 * a ** 2)
+        elif a >= 0.2:
+            p = 1 - np.exp(-8.318 + 42.796 * a - 59.938 * a ** 2)
+        else:
+            p = 1 - np.exp(-13.436 + 101.14 * a - 223.73 * a ** 2)
+        return float(np.clip(p, 0.0, 1.0))
 
+    @staticmethod
+    def _qq_grid(data: np.ndarray, max_points: int):
+        """
+        Puntos del Q-Q plot ('data' ya ordenado). Con n <= max_points, un punto por dato (posición (i - 0.5) / n).
+        Si no, 'max_points' cuantiles equiespaciados en la escala normal (así las colas
+        quedan representadas), tomados con np.quantile (método 'hazen', el mismo criterio
+        (i - 0.5) / n; sobre datos ordenados la selección es inmediata).
+        """
+        n = len(data)
+        if n <= max_points:
+            positions = (np.arange(1, n + 1) - 0.5) / n
+            return ndtri(positions), data
+        z_limit = ndtri(1 - 0.5 / n)
+        theoretical = np.linspace(-z_limit, z_limit, max_points)
+        return theoretical, np.quantile(data, ndtr(theoretical), method="hazen")
@@ -1,9 +1,20 @@
 # backend/app/tools/process_map.py
+from itertools import chain
 import pandas as pd
+import numpy as np
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from scipy.stats import t as student_t
+from app.services import graph, process_simulation
 
 class ProcessMapTool(SixSigmaTool):
+    """
+    Herramienta de Mapa de Procesos.
+    Valida la estructura del flujo y lo analiza como grafo dirigido: alcanzabilidad,
+    bucles de retrabajo, tiempo de ciclo (ruta más larga y esperado según las
+    probabilidades de cada decisión) y cuellos de botella por intermediación.
+    """
+
     def analyze(self) -> AnalysisResult:
         # 1. Validación de Entrada
         if self.df.empty:
@@ -12,73 +23,355 @@ class ProcessMapTool(SixSigmaTool):
         required_cols = ["id", "label", "type"]
         self.validate_columns(required_cols)
 
-        # Convertir a lista de diccionarios para trabajar como grafo
-        steps = self.df.to_dict(orient="records")
-        
-        # Crear un mapa de IDs para acceso rápido y validación
-        step_map = {s["id"]: s for s in steps}
-        all_ids = set(step_map.keys())
+        if self.params.get("mode", "analysis") == "simulation":
+            return self._analyze_simulation()
+
+        # Índice de pasos: cada ID se convierte en una posición 0..n-1
+        # 2. Aristas (src -> dst) a partir de 'next_ids'
+        ids, out_degree, targets, edge_src, edge_dst, edge_prob = self._edges(self.df)
+        n = len(ids)
+        labels = self.df["label"].astype(str).to_numpy()
+        types = self.df["type"].to_numpy()
+        is_start, is_end, is_decision = types == "start", types == "end", types == "decision"
 
-        # 2. Análisis de Integridad del Grafo
+        # 3. Análisis de Integridad del Grafo
         warnings = []
-        start_nodes = []
-        end_nodes = []
-        decision_nodes = []
-        
-        # Contadores de conexiones para detectar huérfanos
-        incoming_connections = {id: 0 for id in all_ids}
-
-        for step in steps:
-            step_id = step["id"]
-            step_type = step["type"]
-            next_ids = step.get("next_ids", [])
-
-            # Clasificar nodos
-            if step_type == "start": start_nodes.append(step_id)
-            if step_type == "end": end_nodes.append(step_id)
-            if step_type == "decision": decision_nodes.append(step_id)
-
-            # Validar conexiones salientes
-            if step_type == "decision" and len(next_ids) < 2:
-                warnings.append(f"La decisión '{step['label']}' debería tener al menos 2 caminos de salida.")
-            elif step_type != "end" and len(next_ids) == 0:
-                warnings.append(f"El paso '{step['label']}' es un callejón sin salida (no es 'Fin').")
-
-            # Validar destino de conexiones
-            for target in next_ids:
-                if target not in all_ids:
-                    warnings.append(f"El paso '{step['label']}' apunta a un ID inexistente: '{target}'.")
-                else:
-                    incoming_connections[target] += 1
+        for i in np.flatnonzero(is_decision & (out_degree < 2)):
+            warnings.append(f"La decisión '{labels[i]}' debería tener al menos 2 caminos de salida.")
+        for i in np.flatnonzero(~is_decision & ~is_end & (out_degree == 0)):
+            warnings.append(f"El paso '{labels[i]}' es un callejón sin salida (no es 'Fin').")
+
+        unknown = edge_dst < 0
+        for i, target in zip(edge_src[unknown], targets.to_numpy()[unknown]):
+            warnings.append(f"El paso '{labels[i]}' apunta a un ID inexistente: '{target}'.")
+        edge_src, edge_dst, edge_prob = edge_src[~unknown], edge_dst[~unknown], edge_prob[~unknown]
 
         # Validar conexiones entrantes (Huérfanos)
-        for step_id, count in incoming_connections.items():
-            step_type = step_map[step_id]["type"]
-            if count == 0 and step_type != "start":
-                warnings.append(f"El paso '{step_map[step_id]['label']}' es inalcanzable (nadie conecta con él).")
+        in_degree = np.bincount(edge_dst, minlength=n)
+        for i in np.flatnonzero((in_degree == 0) & ~is_start):
+            warnings.append(f"El paso '{labels[i]}' es inalcanzable (nadie conecta con él).")
 
-        # 3. Estadísticas del Proceso
+        # 4. Análisis de Grafo (alcanzabilidad, bucles, tiempos, cuellos de botella)
+        analytics = self._graph_analytics(n, edge_src, edge_dst, edge_prob, is_start, is_end, labels, warnings)
+
+        # 5. Estadísticas del Proceso
         stats = {
-            "total_steps": len(steps),
-            "decisions": len(decision_nodes),
+            "total_steps": n,
+            "decisions": int(is_decision.sum()),
             "roles_involved": list(self.df["role"].dropna().unique()) if "role" in self.df.columns else []
         }
 
-        # 4. Resumen
+        # 6. Resumen
         status_msg = "Flujo validado correctamente." if not warnings else "Se detectaron problemas lógicos."
         summary = (
-            f"Mapa de Proceso analizado. Consta de {len(steps)} pasos y {len(decision_nodes)} puntos de decisión. "
+            f"Mapa de Proceso analizado. Consta de {n} pasos y {stats['decisions']} puntos de decisión. "
             f"{status_msg} { ' '.join(warnings[:3]) }..." # Mostrar solo los primeros errores en el resumen
         )
+        if analytics["rework_loops"]:
+            summary += f" Se detectaron {len(analytics['rework_loops'])} bucles de retrabajo."
+        if analytics["expected_cycle_time"] is not None:
+            summary += (
+                f" Tiempo de ciclo esperado: {analytics['expected_cycle_time']:.2f} "
+                f"(ruta más larga sin repetir bucles: {analytics['longest_path_time']:.2f})."
+            )
+        if analytics["bottlenecks"]:
+            summary += f" Principal cuello de botella: '{analytics['bottlenecks'][0]['label']}'."
+
+        # 7. Estructura para Frontend
+        # El frontend (React Flow) usa 'id' y 'next_ids' para dibujar las flechas; se agregan las métricas por paso.
+        per_step = analytics.pop("per_step")
+        chart_data = self.df.assign(**per_step).astype(object)
+        chart_data = chart_data.where(chart_data.notna(), None).to_dict(orient="records")
 
-        # 5. Estructura para Frontend
-        # Devolvemos la lista limpia. El frontend (React Flow) usará 'id' y 'next_ids' para dibujar las flechas.
         return AnalysisResult(
             tool_name="Mapa de Procesos",
             summary=summary,
-            chart_data=steps,
+            chart_data=chart_data,
             details={
                 "validation_warnings": warnings,
-                "process_stats": stats
+                "process_stats": stats,
+                **analytics
             }
-        )
\ No newline at end of file
+        )
+
+    def _edges(self, df: pd.DataFrame):
+        """Índice de pasos y aristas (posición origen, posición destino, probabilidad); destino -1 si no existe."""
+        ids = pd.Index(df["id"].astype(str))
+        if ids.has_duplicates:
+            raise ValueError(f"El ID de paso '{ids[ids.duplicated()][0]}' está repetido.")
+
+        next_ids = df["next_ids"] if "next_ids" in df.columns else pd.Series([[]] * len(df), index=df.index)
+        next_ids = next_ids.map(lambda x: x if isinstance(x, (list, tuple)) else [])
+        out_degree = next_ids.map(len).to_numpy()
+        targets = next_ids.reset_index(drop=True).explode().dropna()
+        edge_src = targets.index.to_numpy(dtype=np.int64)
+        edge_dst = ids.get_indexer(targets.astype(str).to_numpy())
+        edge_prob = self._edge_probabilities(df, out_degree, len(targets))
+        return ids, out_degree, targets, edge_src, edge_dst, edge_prob
+
+    @staticmethod
+    def _edge_probabilities(df: pd.DataFrame, out_degree: np.ndarray, n_edges: int) -> np.ndarray:
+        """
+        Probabilidad de cada arista (mismo orden que 'next_ids' explotado).
+        Usa la columna 'probabilities' si existe; si no, reparte por igual entre las salidas.
+        """
+        uniform = np.repeat(1.0 / np.maximum(out_degree, 1), out_degree)
+        if "probabilities" not in df.columns:
+            return uniform
+
+        probs = df["probabilities"].map(lambda x: list(x) if isinstance(x, (list, tuple)) else None)
+        given = probs.notna().to_numpy()
+        if (probs[given].map(len).to_numpy() != out_degree[given]).any():
+            raise ValueError("Cada paso con 'probabilities' debe tener una probabilidad por cada 'next_id'.")
+
+        # Se usan las probabilidades declaradas (o el reparto uniforme) y se normaliza cada salida a 1
+        explicit = np.fromiter(
+            chain.from_iterable(p if p is not None else [np.nan] * d for p, d in zip(probs, out_degree)),
+            dtype=float, count=n_edges
+        )
+        if (explicit < 0).any():
+            raise ValueError("Las probabilidades de las decisiones no pueden ser negativas.")
+        explicit = np.where(np.isnan(explicit), uniform, explicit)
+        owners = np.repeat(np.arange(len(out_degree)), out_degree)
+        totals = np.bincount(owners, weights=explicit, minlength=len(out_degree))
+        return explicit / np.where(totals[owners] > 0, totals[owners], 1.0)
+
+    def _graph_analytics(self, n, src, dst, prob, is_start, is_end, labels, warnings) -> dict:
+        ids = self.df["id"].astype(str).to_numpy()
+        durations = (
+            pd.to_numeric(self.df["duration"], errors="coerce").fillna(0.0).to_numpy()
+            if "duration" in self.df.columns else np.zeros(n)
+        )
+        adjacency = graph.adjacency_matrix(n, src, dst)
+        starts, ends = np.flatnonzero(is_start), np.flatnonzero(is_end)
+
+        # 1. Alcanzabilidad (BFS hacia adelante desde los inicios y hacia atrás desde los fines)
+        from_start = graph.reachable(adjacency, starts) if starts.size else np.zeros(n, dtype=bool)
+        to_end = graph.reachable(adjacency.T.tocsr(), ends) if ends.size else np.zeros(n, dtype=bool)
+        if not starts.size:
+            warnings.append("El mapa no tiene un paso de 'Inicio'.")
+        for i in np.flatnonzero(is_end & ~from_start & (starts.size > 0)):
+            warnings.append(f"El fin '{labels[i]}' no es alcanzable desde el inicio.")
+        for i in np.flatnonzero(from_start & ~to_end & ~is_end):
+            warnings.append(f"Desde el paso '{labels[i]}' no se puede llegar a ningún 'Fin'.")
+
+        # 2. Bucles de retrabajo (componentes fuertemente conexas)
+        n_components, component, in_loop = graph.strongly_connected_components(adjacency)
+        loop_members = pd.Series(labels[in_loop]).groupby(component[in_loop]).agg(list)
+        rework_loops = sorted(loop_members.tolist(), key=len, reverse=True)
+
+        # 3. Tiempos de ciclo
+        longest = graph.longest_path(n_components, component, src, dst, durations)
+        longest_path_time = float(longest[ends].max()) if ends.size else float(longest.max(initial=0.0))
+
+        expected_cycle_time, visits = None, np.full(n, np.nan)
+        if starts.size:
+            # Los fines y los callejones sin salida absorben el flujo
+            absorbing = is_end | (np.bincount(src, minlength=n) == 0)
+            transition = graph.adjacency_matrix(n, src, dst, prob)
+            chain = graph.absorbing_chain(transition, int(starts[0]), durations, absorbing)
+            if chain is None:
+                warnings.append("Hay un bucle del que nunca se sale: el tiempo de ciclo esperado es infinito.")
+            else:
+                expected_cycle_time, visits = chain["expected_time"], chain["visits"]
+
+        # 4. Cuellos de botella (intermediación)
+        indptr, targets = graph.csr(n, src, dst)
+        samples = int(self.params.get("betweenness_samples", 200))
+        centrality = graph.betweenness(indptr, targets, n_samples=samples if samples < n else None)
+        top = np.argsort(-centrality, kind="stable")[:5]
+        bottlenecks = [
+            {"id": ids[i], "label": labels[i], "betweenness": round(float(centrality[i]), 4)}
+            for i in top if centrality[i] > 0
+        ]
+
+        # 5. Caminos de inicio a fin (probabilidad y duración de cada uno)
+        edge_probability = dict(zip(zip(src.tolist(), dst.tolist()), prob.tolist()))
+        paths = []
+        for path in graph.simple_paths(indptr, targets, starts, ends, max_paths=int(self.params.get("max_paths", 20))):
+            probability = float(np.prod([edge_probability[(u, v)] for u, v in zip(path[:-1], path[1:])]))
+            paths.append({
+                "steps": ids[path].tolist(),
+                "probability": round(probability, 4),
+                "duration": float(durations[path].sum()),
+            })
+
+        return {
+            "reachable_from_start": int(from_start.sum()),
+            "rework_loops": rework_loops[:50],
+            "longest_path_time": longest_path_time,
+            "expected_cycle_time": expected_cycle_time,
+            "bottlenecks": bottlenecks,
+            "paths": paths,
+            "per_step": {
+                "reachable": from_start,
+                "in_loop": in_loop,
+                "betweenness": np.round(centrality, 4),
+                "expected_visits": np.round(visits, 4),
+            },
+        }
+
+    # -------------------------------------------------------------------------
+    # Simulación de eventos discretos (AS-IS vs TO-BE)
+    # -------------------------------------------------------------------------
+    def _analyze_simulation(self) -> AnalysisResult:
+        """
+        Simula cada escenario (columna 'scenario', ej: AS-IS / TO-BE) con números aleatorios
+        comunes (un flujo por fuente: llegadas y cada ID de paso) y compara sus indicadores lado a lado.
+        """
+        arrival_rate = float(self.params.get("arrival_rate", 1.0))
+        sim_time = float(self.params.get("sim_time", 1000.0))
+        warmup = float(self.params.get("warmup", 0.0))
+        replications = int(self.params.get("replications", 10))
+        if arrival_rate <= 0 or sim_time <= warmup or replications < 1:
+            raise ValueError("Se requiere arrival_rate > 0, sim_time > warmup y al menos 1 réplica.")
+
+        scenarios = self.df["scenario"].fillna("AS-IS").astype(str) if "scenario" in self.df.columns \
+            else pd.Series("AS-IS", index=self.df.index)
+
+        results = {}
+        for name, steps in self.df.groupby(scenarios, sort=False):
+            steps = steps.reset_index(drop=True)
+            model = self._simulation_model(steps, name, arrival_rate)
+            runs = process_simulation.run_replications(
+                model, replications, sim_time, warmup,
+                random_state=self.params.get("random_state", 42),
+                n_jobs=self.params.get("n_jobs")
+            )
+            results[name] = self._summarize_runs(steps, runs)
+
+        # Tabla comparativa: una fila por indicador y una columna por escenario
+        metrics = [
+            ("throughput", "Throughput (entidades/unidad de tiempo)"),
+            ("cycle_time_mean", "Tiempo de ciclo promedio"),
+            ("cycle_time_p50", "Tiempo de ciclo P50"),
+            ("cycle_time_p90", "Tiempo de ciclo P90"),
+            ("cycle_time_p95", "Tiempo de ciclo P95"),
+            ("avg_wip", "WIP promedio"),
+            ("avg_queue_total", "Entidades en cola (promedio)"),
+        ]
+        chart_data = [
+            {"metric": label, **{name: res[key] for name, res in results.items()}}
+            for key, label in metrics
+        ]
+
+        names = list(results)
+        summary = f"Simulación de eventos discretos: {replications} réplicas de {sim_time:g} unidades de tiempo por escenario. "
+        for name in names:
+            res = results[name]
+            summary += (
+                f"{name}: throughput {res['throughput']:.3f}, tiempo de ciclo promedio "
+                f"{self._fmt(res['cycle_time_mean'])}, WIP {res['avg_wip']:.2f}, "
+                f"cuello de botella '{res['bottleneck']}'. "
+            )
+        if len(names) == 2 and results[names[0]]["cycle_time_mean"] and results[names[1]]["cycle_time_mean"]:
+            change = results[names[1]]["cycle_time_mean"] / results[names[0]]["cycle_time_mean"] - 1
+            summary += f"El tiempo de ciclo de {names[1]} varía {change:+.1%} respecto a {names[0]}."
+
+        return AnalysisResult(
+            tool_name="Mapa de Procesos (Simulación AS-IS vs TO-BE)",
+            summary=summary.strip(),
+            chart_data=chart_data,
+            details={
+                "arrival_rate": arrival_rate,
+                "sim_time": sim_time,
+                "warmup": warmup,
+                "replications": replications,
+                "scenarios": results,
+            }
+        )
+
+    def _simulation_model(self, steps: pd.DataFrame, scenario: str, arrival_rate: float) -> dict:
+        """Traduce los pasos de un escenario al modelo de estaciones del simulador."""
+        ids, out_degree, targets, src, dst, prob = self._edges(steps)
+        if (dst < 0).any():
+            missing = ", ".join(sorted(set(targets.astype(str).to_numpy()[dst < 0]))[:5])
+            raise ValueError(f"[{scenario}] Hay conexiones a IDs inexistentes: {missing}")
+
+        types = steps["type"].to_numpy()
+        starts = np.flatnonzero(types == "start")
+        if starts.size == 0:
+            raise ValueError(f"[{scenario}] El mapa necesita un paso de 'Inicio' para generar llegadas.")
+
+        def column(name, default):
+            if name not in steps.columns:
+                return np.full(len(steps), default, dtype=float)
+            return pd.to_numeric(steps[name], errors="coerce").fillna(default).to_numpy(dtype=float, copy=True)
+
+        mean = column("duration", 0.0)
+        capacity = column("capacity", 1).astype(np.int64)
+        # Inicio y Fin no consumen tiempo ni tienen cola
+        passthrough = np.isin(types, ["start", "end"])
+        mean[passthrough] = 0.0
+        capacity[passthrough] = 10**9
+        if (capacity <= 0).any():
+            raise ValueError(f"[{scenario}] La capacidad de cada paso debe ser mayor a cero.")
+
+        dist = (steps["service_dist"].fillna("exponential") if "service_dist" in steps.columns
+                else pd.Series("exponential", index=steps.index)).astype(str).to_numpy()
+
+        # Enrutamiento por paso: destinos y probabilidades acumuladas (orden CSR)
+        indptr, order_targets = graph.csr(len(steps), src, dst)
+        order = np.argsort(src, kind="stable")
+        cum = np.asarray(prob)[order]
+        successors = [order_targets[indptr[i]:indptr[i + 1]].tolist() for i in range(len(steps))]
+        cum_probs = [np.cumsum(cum[indptr[i]:indptr[i + 1]]).tolist() for i in range(len(steps))]
+
+        return {
+            "service_dist": dist.tolist(),
+            "mean": mean.tolist(),
+            "low": column("duration_low", 0.0).tolist(),
+            "high": column("duration_high", 0.0).tolist(),
+            "std": column("duration_std", 0.0).tolist(),
+            "capacity": capacity.tolist(),
+            "successors": successors,
+            "cum_probs": cum_probs,
+            "start": int(starts[0]),
+            "arrival_mean": 1.0 / arrival_rate,
+            "stream_keys": [process_simulation.stream_key(i) for i in ids],
+        }
+
+    @staticmethod
+    def _summarize_runs(steps: pd.DataFrame, runs: list) -> dict:
+        """Promedia las réplicas: indicadores globales (con IC 95% del throughput) y por estación."""
+        throughput = np.array([r["throughput"] for r in runs])
+        cycle_times = np.concatenate([r["cycle_times"] for r in runs])
+        avg_queue = np.mean([r["avg_queue"] for r in runs], axis=0)
+        utilization = np.mean([r["utilization"] for r in runs], axis=0)
+        max_queue = np.max([r["max_queue"] for r in runs], axis=0)
+
+        half_width = (
+            float(student_t.ppf(0.975, len(runs) - 1) * throughput.std(ddof=1) / np.sqrt(len(runs)))
+            if len(runs) > 1 else None
+        )
+        has_ct = cycle_times.size > 0
+        p50, p90, p95 = np.percentile(cycle_times, [50, 90, 95]) if has_ct else (None, None, None)
+
+        stations = ~steps["type"].isin(["start", "end"]).to_numpy()
+        labels = steps["label"].astype(str).to_numpy()
+        station_stats = pd.DataFrame({
+            "id": steps["id"].astype(str).to_numpy(),
+            "label": labels,
+            "avg_queue": np.round(avg_queue, 4),
+            "max_queue": max_queue.astype(int),
+            "utilization": np.round(utilization, 4),
+        })[stations].sort_values("utilization", ascending=False)
+
+        return {
+            "throughput": float(throughput.mean()),
+            "throughput_ci95": half_width,
+            "completed": int(sum(r["completed"] for r in runs)),
+            "cycle_time_mean": float(cycle_times.mean()) if has_ct else None,
+            "cycle_time_p50": float(p50) if has_ct else None,
+            "cycle_time_p90": float(p90) if has_ct else None,
+            "cycle_time_p95": float(p95) if has_ct else None,
+            "avg_wip": float(np.mean([r["avg_wip"] for r in runs])),
+            "avg_queue_total": float(avg_queue[stations].sum()),
+            "bottleneck": station_stats["label"].iloc[0] if len(station_stats) else None,
+            "truncated": any(r["truncated"] for r in runs),
+            "stations": station_stats.to_dict(orient="records"),
+        }
+
+    @staticmethod
+    def _fmt(value) -> str:
+        return f"{value:.2f}" if value is not None else "N/D"
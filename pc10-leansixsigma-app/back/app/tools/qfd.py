@@ -1,4 +1,7 @@
 # backend/app/tools/qfd.py
+from itertools import chain
+from typing import Dict, List
+import numpy as np
 import pandas as pd
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
@@ -7,94 +10,277 @@ class QfdTool(SixSigmaTool):
     """
     Herramienta QFD (Despliegue de la Función de Calidad) / Casa de la Calidad.
     Prioriza características técnicas (CÓMOs) basadas en necesidades del cliente (QUÉs).
+    La casa se resuelve con productos matriciales (pesos × matriz de relaciones) e incluye:
+    - Matriz de planificación: benchmarking competitivo (current/target/sales_point/competitors).
+    - Techo de correlaciones entre CÓMOs (sinergias y conflictos).
+    - QFD en cascada (cliente -> diseño -> partes -> proceso): los pesos relativos de
+      cada casa son los pesos de los QUÉs de la siguiente.
     """
 
+    # Relaciones del techo: ++ (fuerte positiva), + , - , -- (fuerte negativa)
+    ROOF_SYMBOLS = {"++": 9, "+": 3, "-": -3, "--": -9}
+
     def analyze(self) -> AnalysisResult:
         # 1. Validación
         if self.df.empty:
             raise ValueError("Se requieren los requerimientos del cliente (QUÉs).")
 
-        technical_reqs = self.params.get("technical_reqs", [])
+        technical_reqs = list(self.params.get("technical_reqs", []))
         if not technical_reqs:
             raise ValueError("Se debe definir la lista de Requerimientos Técnicos (CÓMOs).")
+        self.validate_columns(["customer_req", "weight", "relationships"])
 
-        # 2. Construcción de la Matriz de Relaciones
-        # Filas = Clientes, Columnas = Técnicos
-        
-        # Extraer pesos del cliente
-        customer_weights = self.df.set_index("customer_req")["weight"]
-        
-        # Crear DataFrame de relaciones llenando con 0 si falta alguna relación
-        relationship_data = []
-        for _, row in self.df.iterrows():
-            rel_map = row["relationships"]
-            # Asegurar que el orden coincida con technical_reqs
-            row_vals = [rel_map.get(tech, 0) for tech in technical_reqs]
-            relationship_data.append(row_vals)
-            
-        rel_matrix = pd.DataFrame(
-            relationship_data, 
-            index=self.df["customer_req"], 
-            columns=technical_reqs
-        )
+        # 2. Construcción de la Matriz de Relaciones (Filas = Clientes, Columnas = Técnicos)
+        customer_reqs = self.df["customer_req"].astype(str).tolist()
+        customer_weights = pd.to_numeric(self.df["weight"], errors="coerce").fillna(0).to_numpy(dtype=float)
+        rel_matrix = self._relationship_matrix(self.df["relationships"].tolist(), technical_reqs)
 
-        # 3. Cálculo de Puntuaciones Técnicas (Producto Punto)
-        # Importancia Absoluta = Suma(Peso Cliente * Valor Relación)
-        absolute_scores = {}
-        
-        for tech in technical_reqs:
-            # Multiplicamos la columna técnica por el vector de pesos del cliente
-            score = (rel_matrix[tech] * customer_weights.values).sum()
-            absolute_scores[tech] = int(score)
-
-        # 4. Cálculo de Importancia Relativa (%)
-        total_score = sum(absolute_scores.values())
-        relative_scores = {}
-        if total_score > 0:
-            relative_scores = {k: round((v / total_score) * 100, 1) for k, v in absolute_scores.items()}
-        else:
-            relative_scores = {k: 0 for k in absolute_scores}
+        # 3. Matriz de Planificación (benchmarking competitivo) -> pesos ajustados
+        planning = self._planning_matrix(customer_weights)
+        weights = planning["adjusted_weight"] if planning is not None else customer_weights
+
+        # 4. Importancia Absoluta y Relativa (producto matricial: w · R)
+        absolute_scores, relative_scores = self._house_scores(weights, rel_matrix)
 
         # 5. Ordenamiento (Priorización)
-        sorted_techs = sorted(absolute_scores.items(), key=lambda x: x[1], reverse=True)
-        top_tech = sorted_techs[0]
+        ranking = np.argsort(-absolute_scores, kind="stable")
+        top = ranking[0]
 
         summary = (
-            f"Casa de la Calidad analizada. La característica técnica prioritaria es '{top_tech[0]}' "
-            f"con un peso absoluto de {top_tech[1]} ({relative_scores[top_tech[0]]}% del impacto total). "
+            f"Casa de la Calidad analizada. La característica técnica prioritaria es '{technical_reqs[top]}' "
+            f"con un peso absoluto de {self._num(absolute_scores[top])} ({relative_scores[top]:.1f}% del impacto total). "
             f"Mejorar esto tendrá el mayor efecto positivo en la satisfacción del cliente."
         )
 
-        # 6. Estructura de Salida
-        
+        # 6. Techo de correlaciones y cascada
+        roof = self._roof(technical_reqs)
+        cascade = self._cascade(technical_reqs, relative_scores)
+
+        conflicts = roof["conflicts"] if roof else []
+        if conflicts:
+            first = conflicts[0]
+            summary += (
+                f" Atención: {len(conflicts)} pares de CÓMOs están en conflicto "
+                f"(ej: '{first['tech_a']}' vs '{first['tech_b']}'); requieren una solución de compromiso."
+            )
+        if cascade:
+            last = cascade[-1]
+            summary += (
+                f" En la cascada de {len(cascade) + 1} casas, el elemento prioritario de '{last['name']}' "
+                f"es '{last['ranking'][0]['technical_req']}'."
+            )
+
+        # 7. Estructura de Salida
         # Datos para Gráfico de Barras (Ranking Técnico)
         chart_data = [
             {
-                "technical_req": tech, 
-                "absolute_score": score, 
-                "relative_score": relative_scores[tech]
-            } 
-            for tech, score in sorted_techs
+                "technical_req": technical_reqs[j],
+                "absolute_score": self._num(absolute_scores[j]),
+                "relative_score": round(float(relative_scores[j]), 1)
+            }
+            for j in ranking.tolist()
         ]
-        
+
         # Datos para visualizar la Matriz (Grid View) en el frontend
-        matrix_view = []
-        for req_name in rel_matrix.index:
-            row_obj = {
-                "customer_req": req_name,
-                "weight": int(customer_weights[req_name])
-            }
-            # Agregar las columnas dinámicas de relación
-            for tech in technical_reqs:
-                row_obj[tech] = int(rel_matrix.at[req_name, tech])
-            matrix_view.append(row_obj)
+        grid = pd.DataFrame(rel_matrix.astype(np.int64), columns=technical_reqs)
+        grid.insert(0, "weight", customer_weights.astype(np.int64))
+        grid.insert(0, "customer_req", customer_reqs)
+        matrix_view = grid.to_dict(orient="records")
+
+        details = {
+            "matrix_grid": matrix_view,
+            "technical_columns": technical_reqs,
+            # Controles de la casa: QUÉs sin relación fuerte y CÓMOs que no atienden a ningún QUÉ
+            "whats_without_strong_relation": [customer_reqs[i] for i in np.flatnonzero(rel_matrix.max(axis=1) < 9)],
+            "hows_without_relation": [technical_reqs[j] for j in np.flatnonzero(~rel_matrix.any(axis=0))],
+        }
+        if planning is not None:
+            details["planning_matrix"] = planning["table"]
+        if roof:
+            details["correlation_roof"] = roof
+        if cascade:
+            details["cascade"] = cascade
+        benchmark = self.params.get("technical_benchmark")
+        if benchmark:
+            details["technical_benchmark"] = self._technical_benchmark(benchmark, technical_reqs)
 
         return AnalysisResult(
             tool_name="QFD (Casa de la Calidad)",
             summary=summary,
             chart_data=chart_data,
-            details={
-                "matrix_grid": matrix_view,
-                "technical_columns": technical_reqs
-            }
-        )
\ No newline at end of file
+            details=details
+        )
+
+    # -------------------------------------------------------------------------
+    # Motor matricial
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _relationship_matrix(relationships: List[Dict[str, float]], columns: List[str]) -> np.ndarray:
+        """
+        Matriz QUÉs × CÓMOs a partir de los diccionarios de relación de cada fila.
+        Se aplana en (fila, clave, valor) y se ubica con un solo índice (claves desconocidas = 0).
+        """
+        relationships = [r if isinstance(r, dict) else {} for r in relationships]
+        counts = np.fromiter((len(r) for r in relationships), dtype=np.int64, count=len(relationships))
+        rows = np.repeat(np.arange(len(relationships)), counts)
+        keys = pd.Index(columns).get_indexer(list(chain.from_iterable(relationships)))
+        try:
+            values = np.fromiter(chain.from_iterable(r.values() for r in relationships), dtype=float, count=int(counts.sum()))
+        except (TypeError, ValueError):
+            # Valores no numéricos (ej: texto vacío) se tratan como relación nula
+            values = pd.to_numeric(pd.Series(list(chain.from_iterable(r.values() for r in relationships)), dtype=object),
+                                   errors="coerce").to_numpy(dtype=float)
+        values = np.nan_to_num(values)
+
+        matrix = np.zeros((len(relationships), len(columns)))
+        known = keys >= 0
+        matrix[rows[known], keys[known]] = values[known]
+        return matrix
+
+    @staticmethod
+    def _house_scores(weights: np.ndarray, matrix: np.ndarray):
+        """Importancia absoluta (w · R) y relativa (%) de cada CÓMO (sin redondear: alimenta la cascada)."""
+        absolute = weights @ matrix
+        total = absolute.sum()
+        relative = absolute / total * 100 if total > 0 else np.zeros_like(absolute)
+        return absolute, relative
+
+    def _planning_matrix(self, weights: np.ndarray):
+        """
+        Benchmarking competitivo por QUÉ: ratio de mejora = meta / desempeño actual,
+        peso ajustado = importancia × ratio de mejora × punto de venta (1, 1.2, 1.5).
+        Retorna None si los datos no traen 'current'.
+        """
+        if "current" not in self.df.columns:
+            return None
+        current = pd.to_numeric(self.df["current"], errors="coerce").to_numpy(dtype=float)
+        target = (pd.to_numeric(self.df["target"], errors="coerce").to_numpy(dtype=float)
+                  if "target" in self.df.columns else np.full(len(current), np.nan))
+        sales_point = (pd.to_numeric(self.df["sales_point"], errors="coerce").fillna(1.0).to_numpy(dtype=float)
+                       if "sales_point" in self.df.columns else np.ones(len(current)))
+
+        competitors = None
+        if "competitors" in self.df.columns:
+            competitors = pd.DataFrame.from_records(
+                [c if isinstance(c, dict) else {} for c in self.df["competitors"]]
+            ).apply(pd.to_numeric, errors="coerce")
+
+        # Sin meta explícita: igualar al mejor entre nosotros y la competencia
+        best = current if competitors is None or competitors.empty else np.fmax(current, competitors.max(axis=1).to_numpy())
+        target = np.where(np.isnan(target), best, target)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            improvement = np.where(current > 0, target / current, 1.0)
+        improvement = np.nan_to_num(improvement, nan=1.0)
+
+        adjusted = weights * improvement * sales_point
+        total = adjusted.sum()
+        relative = adjusted / total * 100 if total > 0 else np.zeros_like(adjusted)
+
+        table = pd.DataFrame({
+            "customer_req": self.df["customer_req"].astype(str).to_numpy(),
+            "weight": weights,
+            "current": current,
+            "target": target,
+            "improvement_ratio": np.round(improvement, 3),
+            "sales_point": sales_point,
+            "adjusted_weight": np.round(adjusted, 3),
+            "relative_weight": np.round(relative, 1),
+        })
+        if competitors is not None and not competitors.empty:
+            # Brecha contra el mejor competidor (positiva = vamos detrás)
+            table["gap_vs_best_competitor"] = np.round(competitors.max(axis=1).to_numpy() - current, 3)
+            table = pd.concat([table, competitors.add_prefix("competitor_").reset_index(drop=True)], axis=1)
+
+        table = table.astype(object).where(table.notna(), None)
+        return {"adjusted_weight": adjusted, "table": table.to_dict(orient="records")}
+
+    def _roof(self, technical_reqs: List[str]):
+        """
+        Techo de la casa: correlaciones entre CÓMOs ('correlations': [{tech_a, tech_b, value}],
+        value numérico de -9 a 9 o símbolo ++/+/-/--). Matriz simétrica k×k.
+        """
+        correlations = self.params.get("correlations")
+        if not correlations:
+            return None
+        roof_df = pd.DataFrame(correlations)
+        for col in ("tech_a", "tech_b", "value"):
+            if col not in roof_df.columns:
+                raise ValueError("Cada correlación del techo requiere 'tech_a', 'tech_b' y 'value'.")
+
+        index = pd.Index(technical_reqs)
+        a = index.get_indexer(roof_df["tech_a"].astype(str))
+        b = index.get_indexer(roof_df["tech_b"].astype(str))
+        unknown = (a < 0) | (b < 0)
+        if unknown.any():
+            bad = roof_df.loc[unknown, ["tech_a", "tech_b"]].astype(str).agg(" / ".join, axis=1).tolist()[:10]
+            raise ValueError(f"Correlaciones con CÓMOs inexistentes: {', '.join(bad)}")
+
+        values = roof_df["value"].map(lambda v: self.ROOF_SYMBOLS.get(v, v) if isinstance(v, str) else v)
+        values = pd.to_numeric(values, errors="coerce").fillna(0).to_numpy(dtype=float)
+
+        k = len(technical_reqs)
+        roof = np.zeros((k, k))
+        roof[a, b] = values
+        roof[b, a] = values
+        np.fill_diagonal(roof, 0.0)
+
+        upper_a, upper_b = np.triu_indices(k, 1)
+        pair_values = roof[upper_a, upper_b]
+        negative = np.flatnonzero(pair_values < 0)
+        # Conflictos más fuertes primero
+        negative = negative[np.argsort(pair_values[negative], kind="stable")]
+
+        return {
+            "matrix": roof.astype(np.int64).tolist(),
+            "conflicts": [
+                {"tech_a": technical_reqs[upper_a[p]], "tech_b": technical_reqs[upper_b[p]], "value": int(pair_values[p])}
+                for p in negative.tolist()
+            ],
+            "synergy_count": int((pair_values > 0).sum()),
+            "conflict_count_by_tech": dict(zip(technical_reqs, (roof < 0).sum(axis=1).tolist())),
+        }
+
+    def _cascade(self, first_hows: List[str], first_relative: np.ndarray) -> List[dict]:
+        """
+        QFD en cascada: 'houses' = [{name, technical_reqs, relationships: {qué: {cómo: valor}}}].
+        Los QUÉs de cada casa son los CÓMOs de la anterior y heredan su importancia relativa.
+        """
+        houses = self.params.get("houses") or []
+        stages = []
+        whats, weights = first_hows, np.asarray(first_relative, dtype=float)
+        for number, house in enumerate(houses, start=2):
+            name = house.get("name", f"Casa {number}")
+            hows = list(house.get("technical_reqs", []))
+            if not hows:
+                raise ValueError(f"La casa '{name}' no define sus CÓMOs ('technical_reqs').")
+            relations = house.get("relationships", {})
+            matrix = self._relationship_matrix([relations.get(w, {}) for w in whats], hows)
+
+            absolute, relative = self._house_scores(weights, matrix)
+            order = np.argsort(-absolute, kind="stable")
+            stages.append({
+                "name": name,
+                "whats": whats,
+                "technical_columns": hows,
+                "ranking": [
+                    {"technical_req": hows[j], "absolute_score": round(float(absolute[j]), 2),
+                     "relative_score": round(float(relative[j]), 1)}
+                    for j in order.tolist()
+                ],
+            })
+            whats, weights = hows, relative
+        return stages
+
+    @staticmethod
+    def _technical_benchmark(benchmark: Dict[str, Dict[str, float]], technical_reqs: List[str]) -> List[dict]:
+        """Evaluación técnica competitiva: valor de cada competidor por CÓMO (filas = CÓMOs)."""
+        table = pd.DataFrame(benchmark).reindex(technical_reqs)
+        table.index.name = "technical_req"
+        table = table.reset_index()
+        return table.astype(object).where(table.notna(), None).to_dict(orient="records")
+
+    @staticmethod
+    def _num(value: float):
+        """Entero si el puntaje es exacto (pesos y relaciones enteras), si no 2 decimales."""
+        value = float(value)
+        return int(round(value)) if value.is_integer() else round(value, 2)
@@ -1,4 +1,6 @@
 # backend/app/tools/raci.py
+from itertools import chain
+import numpy as np
 import pandas as pd
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
@@ -7,90 +9,131 @@ class RaciTool(SixSigmaTool):
     """
     Herramienta Matriz de Responsabilidades (RACI).
     Valida la asignación de roles y detecta vacíos de responsabilidad.
+    La matriz se codifica como arreglo entero (tareas × roles; 0 = vacío, 1..4 = R, A, C, I):
+    las reglas por tarea y la carga por rol salen de conteos vectorizados por eje.
     Referencias:
     - Tesis UAP, pág 161 (Tabla 50: Actividad de Implementación RACI).
     """
 
+    CODES = ("", "R", "A", "C", "I")
+    # Letra por código en la salida compacta ('-' = sin asignación)
+    ENCODING = "-RACI"
+    MAX_WARNINGS = 500
+
     def analyze(self) -> AnalysisResult:
         # 1. Validación de Entrada
         if self.df.empty:
             raise ValueError("Se requiere una lista de tareas y asignaciones.")
-        
-        # 2. Transformación de Datos (Aplanar el diccionario de asignaciones)
-        # Convertimos [{"task": "X", "assignments": {"Rol1": "A"}}] -> DataFrame plano
-        normalized_data = []
-        all_roles = set()
-        
-        for _, row in self.df.iterrows():
-            task_entry = {"task": row["task"]}
-            assignments = row["assignments"]
-            
-            # Validar valores permitidos (R, A, C, I, o vacío)
-            valid_codes = {'R', 'A', 'C', 'I', ''}
-            
-            for role, code in assignments.items():
-                clean_code = code.upper().strip()
-                if clean_code not in valid_codes:
-                     # Opcional: Lanzar error o ignorar. Aquí lo limpiamos.
-                     clean_code = ""
-                task_entry[role] = clean_code
-                all_roles.add(role)
-            
-            normalized_data.append(task_entry)
-            
-        df_raci = pd.DataFrame(normalized_data).fillna("")
-        
+        self.validate_columns(["task", "assignments"])
+        output = self.params.get("output", "matrix")
+        if output not in ("matrix", "records"):
+            raise ValueError("'output' debe ser 'matrix' o 'records'.")
+
+        # 2. Codificación de la Matriz (una pasada sobre las asignaciones, sin iterrows)
+        tasks = self.df["task"].astype(str).tolist()
+        assignments = [a if isinstance(a, dict) else {} for a in self.df["assignments"]]
+        matrix, roles, invalid_cells = self.encode(assignments)
+        n_tasks, n_roles = matrix.shape
+
+        # Conteos por código: filas = tareas / columnas = roles (reducciones por eje)
+        one_hot = matrix[:, :, None] == np.arange(1, len(self.CODES), dtype=np.int8)
+        task_counts = one_hot.sum(axis=1)   # tareas × (R, A, C, I)
+        role_counts = one_hot.sum(axis=0)   # roles × (R, A, C, I)
+        count_r, count_a = task_counts[:, 0], task_counts[:, 1]
+
         # 3. Análisis Horizontal (Por Tarea) - Reglas de Oro
-        warnings = []
-        
-        for _, row in df_raci.iterrows():
-            task = row['task']
-            # Extraer solo las columnas de roles
-            role_values = [row[r] for r in all_roles if r in df_raci.columns]
-            
-            count_r = role_values.count('R')
-            count_a = role_values.count('A')
-            
-            # Regla 1: Exactamente un A por tarea
-            if count_a == 0:
-                warnings.append(f"La tarea '{task}' no tiene a nadie que rinda cuentas (Falta 'A').")
-            elif count_a > 1:
-                warnings.append(f"La tarea '{task}' tiene {count_a} jefes (Múltiples 'A'). Solo debe haber uno.")
-                
-            # Regla 2: Al menos un R por tarea
-            if count_r == 0:
-                warnings.append(f"Nadie hace el trabajo en '{task}' (Falta 'R').")
+        # Regla 1: Exactamente un A por tarea / Regla 2: Al menos un R por tarea
+        missing_a = np.flatnonzero(count_a == 0)
+        multiple_a = np.flatnonzero(count_a > 1)
+        missing_r = np.flatnonzero(count_r == 0)
+        # 4. Análisis Vertical (Por Rol) - Carga de Trabajo (roles sin R ni A)
+        idle_roles = np.flatnonzero((role_counts[:, 0] + role_counts[:, 1]) == 0)
+
+        warnings = (
+            [f"La tarea '{tasks[i]}' no tiene a nadie que rinda cuentas (Falta 'A')." for i in missing_a[:self.MAX_WARNINGS]]
+            + [f"La tarea '{tasks[i]}' tiene {count_a[i]} jefes (Múltiples 'A'). Solo debe haber uno." for i in multiple_a[:self.MAX_WARNINGS]]
+            + [f"Nadie hace el trabajo en '{tasks[i]}' (Falta 'R')." for i in missing_r[:self.MAX_WARNINGS]]
+            + [f"El rol '{roles[j]}' no tiene responsabilidades asignadas (¿Es necesario?)." for j in idle_roles[:self.MAX_WARNINGS]]
+        )
+        issue_counts = {
+            "missing_a": int(missing_a.size),
+            "multiple_a": int(multiple_a.size),
+            "missing_r": int(missing_r.size),
+            "idle_roles": int(idle_roles.size),
+            "invalid_codes": invalid_cells,
+        }
+        total_issues = sum(v for k, v in issue_counts.items() if k != "invalid_codes")
 
-        # 4. Análisis Vertical (Por Rol) - Carga de Trabajo
-        role_stats = {}
-        for role in all_roles:
-            if role in df_raci.columns:
-                counts = df_raci[role].value_counts().to_dict()
-                role_stats[role] = {
-                    "R": counts.get("R", 0),
-                    "A": counts.get("A", 0),
-                    "C": counts.get("C", 0),
-                    "I": counts.get("I", 0)
-                }
-                
-                # Heurística de sobrecarga
-                if counts.get("R", 0) == 0 and counts.get("A", 0) == 0:
-                     warnings.append(f"El rol '{role}' no tiene responsabilidades asignadas (¿Es necesario?).")
+        role_stats = {
+            role: {"R": int(r), "A": int(a), "C": int(c), "I": int(i)}
+            for role, (r, a, c, i) in zip(roles, role_counts.tolist())
+        }
+        # Carga por rol: tareas donde ejecuta o rinde cuentas, ordenada de mayor a menor
+        load = role_counts[:, 0] + role_counts[:, 1]
+        top_loaded = np.argsort(-load, kind="stable")[:10]
+        workload_ranking = [{"role": roles[j], "r_plus_a": int(load[j]),
+                             "share_pct": round(float(load[j]) / max(n_tasks, 1) * 100, 1)} for j in top_loaded]
 
         # 5. Resumen
-        status = "Matriz equilibrada." if not warnings else "Se detectaron problemas de asignación."
+        status = "Matriz equilibrada." if total_issues == 0 else "Se detectaron problemas de asignación."
         summary = (
-            f"Matriz RACI analizada ({len(df_raci)} tareas, {len(all_roles)} roles). "
-            f"{status} Se encontraron {len(warnings)} advertencias."
+            f"Matriz RACI analizada ({n_tasks} tareas, {n_roles} roles). "
+            f"{status} Se encontraron {total_issues} advertencias."
         )
 
+        if output == "records":
+            # Formato anterior: un diccionario por tarea (solo roles con asignación)
+            chart_data = [
+                {"task": task, **{roles[j]: self.CODES[matrix[i, j]] for j in np.flatnonzero(matrix[i])}}
+                for i, task in enumerate(tasks)
+            ]
+        else:
+            chart_data = [{
+                "tasks": tasks,
+                "roles": roles,
+                "encoding": self.ENCODING,
+                "rows": self.compact_rows(matrix),  # Una cadena por tarea, un carácter por rol
+            }]
+
         return AnalysisResult(
             tool_name="Matriz de Responsabilidades (RACI)",
             summary=summary,
-            chart_data=normalized_data, # La tabla lista para mostrar
+            chart_data=chart_data,
             details={
                 "warnings": warnings,
+                "warnings_truncated": any(v > self.MAX_WARNINGS for k, v in issue_counts.items() if k != "invalid_codes"),
+                "issue_counts": issue_counts,
                 "role_stats": role_stats, # Para gráficas de carga de trabajo
-                "roles_detected": list(all_roles)
+                "workload_ranking": workload_ranking,
+                "roles_detected": roles
             }
-        )
\ No newline at end of file
+        )
+
+    @classmethod
+    def encode(cls, assignments: list):
+        """
+        Aplana [{rol: código}, ...] en tripletas (tarea, rol, código) y las escribe en una
+        matriz int8 tareas × roles. Los roles se numeran en orden de aparición; los códigos
+        fuera de R/A/C/I quedan vacíos (se cuentan como inválidos).
+        """
+        sizes = np.fromiter((len(a) for a in assignments), dtype=np.int64, count=len(assignments))
+        task_idx = np.repeat(np.arange(len(assignments)), sizes)
+        role_names = list(chain.from_iterable(a.keys() for a in assignments))
+        raw_codes = pd.Series(list(chain.from_iterable(a.values() for a in assignments)), dtype=object)
+
+        role_idx, roles = pd.factorize(pd.Series(role_names, dtype=object).astype(str))
+        clean = raw_codes.fillna("").astype(str).str.strip().str.upper()
+        codes = pd.Categorical(clean, categories=list(cls.CODES)).codes  # -1 = inválido
+        invalid = int((codes < 0).sum())
+
+        matrix = np.zeros((len(assignments), len(roles)), dtype=np.int8)
+        matrix[task_idx, role_idx] = np.maximum(codes, 0)
+        return matrix, [str(r) for r in roles], invalid
+
+    @classmethod
+    def compact_rows(cls, matrix: np.ndarray) -> list:
+        """Cada fila de la matriz como texto ('R-A-C'): un solo indexado y una vista de bytes."""
+        if matrix.shape[1] == 0:
+            return [""] * matrix.shape[0]
+        letters = np.frombuffer(cls.ENCODING.encode("ascii"), dtype=np.uint8)[matrix]
+        return np.ascontiguousarray(letters).view(f"S{matrix.shape[1]}").ravel().astype(str).tolist()
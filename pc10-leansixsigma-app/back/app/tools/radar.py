@@ -1,4 +1,6 @@
 # backend/app/tools/radar.py
+import warnings
+import numpy as np
 import pandas as pd
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
@@ -7,6 +9,10 @@ class RadarTool(SixSigmaTool):
     """
     Herramienta de Diagrama de Radar (Gap Analysis).
     Ideal para auditorías 5S, matrices de habilidades y benchmarking.
+    Con una columna de entidad (ej: 'entity' = sitio/planta) compara cada entidad contra
+    la serie meta y contra el promedio de la flota: los datos se pivotean una sola vez a
+    un arreglo entidades × categorías × series y brechas, rankings, percentiles y peores
+    categorías salen de operaciones vectorizadas. La respuesta se pagina por entidad.
     Referencias:
     - Libro Yellow Belt, pág 119 (Auditorías 5S y visualización de desempeño).
     """
@@ -21,43 +27,64 @@ class RadarTool(SixSigmaTool):
 
         if "series" not in self.df.columns:
             self.df["series"] = "Serie 1"
+        self.df["value"] = pd.to_numeric(self.df["value"], errors="coerce")
+
+        entity_col = self.params.get("entity_column", "entity")
+        if entity_col in self.df.columns:
+            return self._analyze_entities(entity_col)
 
         # 2. Normalización y Pivot
         # Necesitamos asegurar que todas las series tengan todas las categorías
         categories = self.df["category"].unique()
         series_names = self.df["series"].unique()
-        
-        # Crear un DataFrame pivoteado: Filas=Categorías, Columnas=Series
-        # Esto facilita mucho el cálculo de diferencias
-        pivot_df = self.df.pivot_table(index="category", columns="series", values="value", fill_value=0)
+
+        # Arreglo Categorías × Series (un solo pivot; celdas sin dato = 0 como en el gráfico)
+        cube, cat_labels, series_labels, _ = self._cube(self.df, None)
+        matrix = np.nan_to_num(cube[0])
+        series_pos = {s: i for i, s in enumerate(series_labels)}
 
         # 3. Cálculos de Análisis (Gaps)
-        # Si hay exactamente 2 series, calculamos la brecha automáticamente
+        # Con 2 series (o con 'target_series'), brecha de cada serie contra la otra/la meta
         gap_analysis = ""
-        if len(series_names) == 2:
+        target_series = self.params.get("target_series")
+        gaps = {}
+        if target_series is not None and target_series not in series_pos:
+            raise ValueError(f"La serie meta '{target_series}' no existe en los datos.")
+        if len(series_names) == 2 and target_series is None:
             s1, s2 = series_names[0], series_names[1]
             # Calcular diferencia absoluta
-            pivot_df["diff"] = pivot_df[s1] - pivot_df[s2]
-            pivot_df["abs_diff"] = pivot_df["diff"].abs()
-            
-            # Encontrar la mayor brecha
-            max_gap_cat = pivot_df["abs_diff"].idxmax()
-            max_gap_val = pivot_df.loc[max_gap_cat, "abs_diff"]
-            
+            diff = matrix[:, series_pos[s1]] - matrix[:, series_pos[s2]]
+            k = int(np.abs(diff).argmax())
+            max_gap_cat, max_gap_val = cat_labels[k], abs(diff[k])
+
             gap_analysis = (
                 f"Comparando '{s1}' vs '{s2}'. "
                 f"La mayor brecha se encuentra en '{max_gap_cat}' con una diferencia de {max_gap_val:.2f}."
             )
+        elif target_series is not None and len(series_names) > 1:
+            # Brecha (serie - meta) de todas las series a la vez
+            diff = matrix - matrix[:, [series_pos[target_series]]]
+            diff[:, series_pos[target_series]] = 0.0
+            flat = int(np.abs(diff).argmax())
+            k, s = divmod(flat, diff.shape[1])
+            gaps = {str(series_labels[j]): dict(zip(map(str, cat_labels), np.round(diff[:, j], 4).tolist()))
+                    for j in range(len(series_labels)) if series_labels[j] != target_series}
+            gap_analysis = (
+                f"Comparando {len(series_names) - 1} series contra la meta '{target_series}'. "
+                f"La mayor brecha es de '{series_labels[s]}' en '{cat_labels[k]}' ({diff[k, s]:+.2f})."
+            )
         else:
             # Análisis general
-            best_cat = self.df.groupby("category")["value"].mean().idxmax()
-            worst_cat = self.df.groupby("category")["value"].mean().idxmin()
+            means = self.df.groupby("category")["value"].mean()
+            best_cat = means.idxmax()
+            worst_cat = means.idxmin()
             gap_analysis = f"El área más fuerte es '{best_cat}' y la más débil es '{worst_cat}'."
 
         # 4. Preparar Datos para Frontend (Formato estándar de gráficos de radar)
-        # Transformamos el pivot de vuelta a una lista de diccionarios:
         # [{ "category": "5S", "Serie A": 4, "Serie B": 5 }, ...]
-        chart_data = pivot_df.drop(columns=["diff", "abs_diff"], errors="ignore").reset_index().to_dict(orient="records")
+        chart_df = pd.DataFrame(matrix, columns=series_labels)
+        chart_df.insert(0, "category", cat_labels)
+        chart_data = chart_df.to_dict(orient="records")
 
         # Calcular escala automática si no se provee
         max_val = self.df["value"].max()
@@ -68,13 +95,232 @@ class RadarTool(SixSigmaTool):
             f"{gap_analysis}"
         )
 
+        details = {
+            "series_names": list(series_names),
+            "categories": list(categories),
+            "suggested_max_scale": suggested_scale
+        }
+        if gaps:
+            details["gaps_to_target"] = gaps
+        return AnalysisResult(
+            tool_name="Diagrama de Radar",
+            summary=summary,
+            chart_data=chart_data,
+            details=details
+        )
+
+    # -------------------------------------------------------------------------
+    # Motor vectorizado
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _cube(df: pd.DataFrame, entity_col):
+        """
+        Pivot único a un arreglo entidades × categorías × series (promedio si hay repetidos;
+        NaN si falta el dato). Categorías, series y entidades ordenadas como en pivot_table.
+        """
+        cat_codes, cat_labels = pd.factorize(df["category"], sort=True)
+        series_codes, series_labels = pd.factorize(df["series"], sort=True)
+        if entity_col is None:
+            ent_codes, ent_labels = np.zeros(len(df), dtype=np.int64), np.array([None], dtype=object)
+        else:
+            ent_codes, ent_labels = pd.factorize(df[entity_col], sort=True)
+
+        values = df["value"].to_numpy(dtype=float)
+        keep = (cat_codes >= 0) & (series_codes >= 0) & (ent_codes >= 0) & ~np.isnan(values)
+        shape = (len(ent_labels), len(cat_labels), len(series_labels))
+        flat = np.ravel_multi_index((ent_codes[keep], cat_codes[keep], series_codes[keep]), shape)
+        size = int(np.prod(shape))
+        sums = np.bincount(flat, weights=values[keep], minlength=size)
+        counts = np.bincount(flat, minlength=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cube = np.where(counts > 0, sums / counts, np.nan).reshape(shape)
+        return (cube, np.asarray(cat_labels, dtype=object), np.asarray(series_labels, dtype=object),
+                np.asarray(ent_labels, dtype=object))
+
+    @staticmethod
+    def _percentile_ranks(values: np.ndarray, higher_is_better: bool):
+        """
+        Ranking por columna (categoría) entre entidades: 1 = mejor; percentil 100 = mejor.
+        NaN no participa. Empates: rango mínimo (competencia).
+        """
+        key = -values if higher_is_better else values
+        key = np.where(np.isnan(key), np.inf, key)
+        order = np.argsort(key, axis=0, kind="stable")
+        sorted_key = np.take_along_axis(key, order, axis=0)
+        # Rango mínimo en empates: posición del primer valor igual
+        positions = np.arange(key.shape[0])[:, None]
+        first = np.where(np.r_[np.ones((1, key.shape[1]), bool), sorted_key[1:] != sorted_key[:-1]], positions, 0)
+        first = np.maximum.accumulate(first, axis=0)
+        ranks = np.empty_like(order)
+        np.put_along_axis(ranks, order, first + 1, axis=0)
+
+        valid = ~np.isnan(values)
+        n_valid = valid.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            percentile = np.where(n_valid > 1, (n_valid - ranks) / (n_valid - 1) * 100, 100.0)
+        return np.where(valid, ranks, 0), np.where(valid, percentile, np.nan)
+
+    def _analyze_entities(self, entity_col: str) -> AnalysisResult:
+        """Modo flota: cada entidad contra la meta y contra el promedio de la flota (incluida ella misma)."""
+        # 1. Parámetros
+        higher_is_better = bool(self.params.get("higher_is_better", True))
+        worst_k = int(self.params.get("worst_k", 3))
+        page = int(self.params.get("page", 1))
+        page_size = int(self.params.get("page_size", 50))
+        sort_by = self.params.get("sort_by", "score")
+        if worst_k < 1 or page < 1 or page_size < 1:
+            raise ValueError("'worst_k', 'page' y 'page_size' deben ser >= 1.")
+        if sort_by not in ("score", "entity", "gap"):
+            raise ValueError("'sort_by' debe ser 'score', 'entity' o 'gap'.")
+
+        # Las filas de la meta pueden venir sin entidad: meta común para toda la flota
+        target_series = self.params.get("target_series")
+        if sort_by == "gap" and target_series is None:
+            raise ValueError("Para ordenar por 'gap' se requiere 'target_series' (la brecha se mide contra la meta).")
+        series_all = self.df["series"].unique()
+        if target_series is not None and target_series not in series_all:
+            raise ValueError(f"La serie meta '{target_series}' no existe en los datos.")
+        actual_series = self.params.get("actual_series") or next(
+            (s for s in series_all if s != target_series), None)
+        if actual_series is None or actual_series not in series_all:
+            raise ValueError("No hay una serie con valores reales para comparar (use 'actual_series').")
+
+        # 2. Pivot único: entidades × categorías × series
+        # Con filas sin entidad (meta común) pandas guarda los IDs enteros como float: se recuperan con Int64
+        entity = self.df[entity_col]
+        if pd.api.types.is_float_dtype(entity) and (entity.dropna() % 1 == 0).all():
+            self.df[entity_col] = entity.astype("Int64")
+        with_entity = self.df[self.df[entity_col].notna()]
+        cube, categories, series_labels, entities = self._cube(with_entity, entity_col)
+        s_idx = {s: i for i, s in enumerate(series_labels)}
+        if actual_series not in s_idx:
+            raise ValueError(f"La serie '{actual_series}' no tiene datos por entidad.")
+        actual = cube[:, :, s_idx[actual_series]]
+        n_entities, n_cat = actual.shape
+
+        # Meta por entidad; donde falta, la meta común (filas de la meta sin entidad)
+        target = None
+        if target_series is not None:
+            target = cube[:, :, s_idx[target_series]] if target_series in s_idx else np.full_like(actual, np.nan)
+            common = self.df[self.df[entity_col].isna() & (self.df["series"] == target_series)]
+            if not common.empty:
+                common_target = (common.groupby("category")["value"].mean()
+                                .reindex(categories).to_numpy(dtype=float))
+                target = np.where(np.isnan(target), common_target[None, :], target)
+
+        # 3. Brechas (signo: positivo = mejor que la referencia)
+        sign = 1.0 if higher_is_better else -1.0
+        with warnings.catch_warnings():
+            # Categorías sin ningún dato en la flota quedan en NaN (sin advertencias de numpy)
+            warnings.simplefilter("ignore", RuntimeWarning)
+            fleet_avg = np.nanmean(actual, axis=0)
+            fleet_min, fleet_max = np.nanmin(actual, axis=0), np.nanmax(actual, axis=0)
+            score = np.nanmean(actual, axis=1)
+            fleet_target = np.nanmean(target, axis=0) if target is not None else None
+        gap_fleet = sign * (actual - fleet_avg[None, :])
+        gap_target = sign * (actual - target) if target is not None else None
+
+        # Puntaje por entidad (promedio de categorías) y cumplimiento vs meta
+        cat_ranks, cat_percentiles = self._percentile_ranks(actual, higher_is_better)
+        entity_rank, entity_percentile = self._percentile_ranks(score[:, None], higher_is_better)
+        entity_rank, entity_percentile = entity_rank[:, 0], entity_percentile[:, 0]
+        if target is not None:
+            # Cumplimiento = Σ real / Σ meta sobre las categorías con ambos datos
+            both = ~np.isnan(actual) & ~np.isnan(target)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                attainment = (np.where(both, actual, 0).sum(axis=1)
+                              / np.where(both, target, 0).sum(axis=1) * 100)
+            below_target = (gap_target < 0).sum(axis=1)
+        else:
+            attainment = np.full(n_entities, np.nan)
+            below_target = np.zeros(n_entities, dtype=np.int64)
+
+        # 4. Peores k categorías por entidad (argpartition: sin ordenar todas las categorías)
+        key = gap_target if gap_target is not None else gap_fleet
+        key = np.where(np.isnan(key), np.inf, key)
+        k = min(worst_k, n_cat)
+        worst = np.argpartition(key, k - 1, axis=1)[:, :k] if k < n_cat else np.tile(np.arange(n_cat), (n_entities, 1))
+        worst = np.take_along_axis(worst, np.argsort(np.take_along_axis(key, worst, axis=1), axis=1), axis=1)
+
+        # 5. Orden y paginación por entidad
+        if sort_by == "entity":
+            order = np.arange(n_entities)
+        elif sort_by == "gap":
+            order = np.argsort(np.nansum(np.minimum(gap_target, 0), axis=1), kind="stable")
+        else:
+            # Peor puntaje primero
+            order = np.argsort(np.where(np.isnan(score), np.inf, sign * score), kind="stable")
+        total_pages = max(1, -(-n_entities // page_size))
+        page_rows = order[(page - 1) * page_size: page * page_size]
+
+        def rounded(arr):
+            return [None if np.isnan(v) else round(float(v), 4) for v in arr]
+
+        chart_data = []
+        for e in page_rows:
+            entry = {
+                "entity": entities[e],
+                "score": None if np.isnan(score[e]) else round(float(score[e]), 4),
+                "rank": int(entity_rank[e]),
+                "percentile": None if np.isnan(entity_percentile[e]) else round(float(entity_percentile[e]), 1),
+                "values": rounded(actual[e]),
+                "gap_to_fleet": rounded(gap_fleet[e]),
+                "category_ranks": cat_ranks[e].tolist(),
+                "category_percentiles": rounded(cat_percentiles[e]),
+                "worst_categories": [
+                    {"category": categories[c], "value": rounded(actual[e, [c]])[0],
+                     "gap": round(float(key[e, c]), 4) if np.isfinite(key[e, c]) else None}
+                    for c in worst[e]
+                ],
+            }
+            if target is not None:
+                entry.update({
+                    "target": rounded(target[e]),
+                    "gap_to_target": rounded(gap_target[e]),
+                    "attainment_pct": None if np.isnan(attainment[e]) else round(float(attainment[e]), 1),
+                    "categories_below_target": int(below_target[e]),
+                })
+            chart_data.append(entry)
+
+        # Visión de flota por categoría
+        fleet = {
+            "categories": categories.tolist(),
+            "fleet_average": rounded(fleet_avg),
+            "fleet_min": rounded(fleet_min),
+            "fleet_max": rounded(fleet_max),
+        }
+        if target is not None:
+            fleet["entities_below_target"] = (gap_target < 0).sum(axis=0).tolist()
+            fleet["fleet_target"] = rounded(fleet_target)
+        fleet_key = np.where(np.isnan(fleet_avg), np.inf, sign * fleet_avg)
+        weakest_category = categories[int(fleet_key.argmin())] if n_cat else None
+
+        worst_entity = entities[order[0]] if n_entities else None
+        summary = (
+            f"Radar de flota: {n_entities} entidades en {n_cat} ejes (serie '{actual_series}'"
+            + (f" vs meta '{target_series}'" if target is not None else "") + "). "
+            f"La entidad con peor desempeño es '{worst_entity}' y la categoría más débil de la flota es '{weakest_category}'."
+        )
+        if target is not None:
+            summary += f" {int((below_target > 0).sum())} entidades tienen al menos una categoría bajo la meta."
+
         return AnalysisResult(
             tool_name="Diagrama de Radar",
             summary=summary,
             chart_data=chart_data,
             details={
-                "series_names": list(series_names),
-                "categories": list(categories),
-                "suggested_max_scale": suggested_scale
+                "mode": "entities",
+                "entity_column": entity_col,
+                "actual_series": actual_series,
+                "target_series": target_series,
+                "higher_is_better": higher_is_better,
+                "series_names": list(series_all),
+                **fleet,
+                "page": page,
+                "page_size": page_size,
+                "total_entities": int(n_entities),
+                "total_pages": total_pages,
+                "has_more": page < total_pages,
+                "suggested_max_scale": self.params.get("max_scale") or float(np.nanmax(self.df["value"])) * 1.1,
             }
-        )
\ No newline at end of file
+        )
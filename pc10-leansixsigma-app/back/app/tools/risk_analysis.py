@@ -2,8 +2,12 @@
 import pandas as pd
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult, RiskRow
+from app.services import risk_engine
 
 class RiskAnalysisTool(SixSigmaTool):
+    # Niveles basados en la práctica estándar de Six Sigma (mismos umbrales de NPR que el AMEF)
+    RISK_LEVELS = ("Crítico (Acción Inmediata)", "Alto (Atención Requerida)", "Medio", "Bajo")
+
     def analyze(self) -> AnalysisResult:
         # 1. Validación de Estructura
         if self.df.empty:
@@ -12,36 +16,20 @@ class RiskAnalysisTool(SixSigmaTool):
         required_cols = ["severity", "occurrence", "detection"]
         self.validate_columns(required_cols)
 
-        # 2. Cálculos Matemáticos (Quantitative)
-        # Cálculo del Número Prioritario de Riesgo (NPR)
-        self.df['npr'] = self.df['severity'] * self.df['occurrence'] * self.df['detection']
-        
-        # Cálculo de Criticidad (Severidad x Ocurrencia)
-        # Según Tabla 29 del Libro Yellow Belt 
-        self.df['criticality'] = self.df['severity'] * self.df['occurrence']
-
-        # 3. Clasificación de Riesgo (Lógica de Negocio)
-        # Definimos niveles basados en la práctica estándar de Six Sigma
-        def classify_risk(row):
-            if row['npr'] >= 200:
-                return "Crítico (Acción Inmediata)"
-            elif row['npr'] >= 100:
-                return "Alto (Atención Requerida)"
-            elif row['npr'] >= 50:
-                return "Medio"
-            else:
-                return "Bajo"
-
-        self.df['risk_level'] = self.df.apply(classify_risk, axis=1)
+        # 2. Cálculos Matemáticos (Quantitative) y 3. Clasificación de Riesgo
+        # NPR = S × O × D; Criticidad = S × O (Tabla 29 del Libro Yellow Belt);
+        # nivel por umbrales de NPR y Prioridad de Acción AIAG-VDA (motor compartido)
+        scored = risk_engine.score_risks(self.df, self.RISK_LEVELS, category_column="risk_level")
 
         # 4. Ordenamiento (Pareto de Riesgos)
         # Ordenamos descendente por NPR para mostrar lo más urgente arriba [cite: 3132]
-        self.df = self.df.sort_values(by='npr', ascending=False)
+        self.df = risk_engine.rank_risks(scored, self.params.get("sort_by", "npr"))
 
         # 5. Generación de Insights (Qualitative)
         top_risk = self.df.iloc[0]
         total_risks = len(self.df)
-        high_risks = len(self.df[self.df['npr'] >= 100])
+        totals = risk_engine.risk_summary(self.df, category_column="risk_level")
+        high_risks = totals["critical_count"]
 
         summary = (
             f"Se han analizado {total_risks} modos de falla potenciales. "
@@ -53,15 +41,18 @@ class RiskAnalysisTool(SixSigmaTool):
         # 6. Estructurar Datos para Gráficos (Matriz de Criticidad)
         # Preparamos datos para un gráfico de dispersión (Scatter Plot)
         # Eje X: Ocurrencia, Eje Y: Severidad, Tamaño: NPR
-        chart_data = self.df.to_dict(orient='records')
+        chart_data = self.df.astype(object).where(self.df.notna(), None).to_dict(orient='records')
 
         return AnalysisResult(
             tool_name="Análisis de Riesgos (AMEF)",
             summary=summary,
             chart_data=chart_data,
             details={
-                "max_npr": int(self.df['npr'].max()),
-                "avg_npr": float(self.df['npr'].mean()),
-                "critical_items_count": high_risks
+                "max_npr": totals["max_npr"],
+                "avg_npr": totals["avg_npr"],
+                "critical_items_count": high_risks,
+                "risk_level_counts": totals["category_counts"],
+                "action_priority_counts": totals["action_priority_counts"],
+                **{k: v for k, v in totals.items() if k.startswith(("revised_", "total_npr_", "high_priority_"))},
             }
-        )
\ No newline at end of file
+        )
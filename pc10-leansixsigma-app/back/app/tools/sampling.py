@@ -1,10 +1,28 @@
 
+import os
 import pandas as pd
 import numpy as np
 from scipy import stats
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
 
+# Carpeta del servidor con los archivos de población que se pueden muestrear por 'source_path'.
+# Si no está configurada, 'source_path' se rechaza: el cliente nunca elige rutas arbitrarias.
+DATA_DIR_ENV = "SIXSIGMA_DATA_DIR"
+
+
+def resolve_source_path(source_path: str) -> str:
+    """Ruta real de un archivo dentro de la carpeta de datos (ValueError si sale de ella)."""
+    data_dir = os.environ.get(DATA_DIR_ENV)
+    if not data_dir:
+        raise ValueError("La lectura de archivos del servidor no está habilitada; envíe los datos en la solicitud.")
+    root = os.path.realpath(data_dir)
+    path = os.path.realpath(os.path.join(root, source_path))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise ValueError(f"El archivo '{source_path}' no existe en la carpeta de datos del servidor.")
+    return path
+
+
 class SamplingTool(SixSigmaTool):
     def analyze(self) -> AnalysisResult:
         method = self.params.get("method", "calculation")
@@ -17,10 +35,43 @@ class SamplingTool(SixSigmaTool):
             raise ValueError("Método de muestreo no válido")
 
     def _calculate_sample_size(self) -> AnalysisResult:
-        # 1. Obtener parámetros
         conf_level = self.params.get("confidence_level", 0.95)
         margin_error = self.params.get("margin_error", 0.05)
         pop_size = self.params.get("population_size") # N (opcional)
+
+        final_n, z_score, formula_text = self._sample_size_formula(pop_size)
+        is_finite = bool(pop_size and pop_size > 0)
+
+        # 5. Respuesta
+        summary = (
+            f"Para un nivel de confianza del {conf_level*100}% y un error del {margin_error*100}%, "
+            f"se requiere un tamaño de muestra de: {final_n} unidades."
+        )
+        
+        if is_finite:
+            summary += f" (Ajustado por población finita N={pop_size})"
+
+        return AnalysisResult(
+            tool_name="Cálculo de Tamaño de Muestra",
+            summary=summary,
+            chart_data=[], # No hay gráfico para el cálculo solo
+            details={
+                "calculated_n": final_n,
+                "z_score": round(z_score, 4),
+                "formula_used": formula_text,
+                "parameters": self.params
+            }
+        )
+
+    def _sample_size_formula(self, pop_size=None, std_dev=None):
+        """
+        Fórmula de tamaño de muestra (Libro Pág 103-104).
+        Retorna (n redondeado hacia arriba, Z, texto de la fórmula).
+        Se reutiliza para cada estrato pasando su N y su desviación.
+        """
+        # 1. Obtener parámetros
+        conf_level = self.params.get("confidence_level", 0.95)
+        margin_error = self.params.get("margin_error", 0.05)
         var_type = self.params.get("variable_type", "attribute")
 
         # 2. Calcular Z (Valor crítico de la distribución normal)
@@ -31,7 +82,7 @@ class SamplingTool(SixSigmaTool):
         n = 0
         formula_text = ""
 
-        # 3. Cálculo según el tipo de variable (Libro Pág 103-104)
+        # 3. Cálculo según el tipo de variable
         if var_type == "attribute":
             # Fórmula para Proporciones (Cualitativa)
             p = self.params.get("proportion", 0.5)
@@ -42,7 +93,7 @@ class SamplingTool(SixSigmaTool):
             
         elif var_type == "variable":
             # Fórmula para Medias (Cuantitativa)
-            sigma = self.params.get("std_dev")
+            sigma = std_dev if std_dev is not None else self.params.get("std_dev")
             if sigma is None:
                 raise ValueError("Para variables continuas se requiere una desviación estándar estimada (sigma).")
             
@@ -52,64 +103,281 @@ class SamplingTool(SixSigmaTool):
             formula_text = "n = (Z * σ / E)²"
 
         # 4. Ajuste por Población Finita (Si N es conocido)
-        is_finite = False
         if pop_size and pop_size > 0:
             n = n / (1 + ((n - 1) / pop_size))
-            is_finite = True
 
         final_n = int(np.ceil(n)) # Redondear siempre hacia arriba
+        return final_n, z_score, formula_text
 
-        # 5. Respuesta
-        summary = (
-            f"Para un nivel de confianza del {conf_level*100}% y un error del {margin_error*100}%, "
-            f"se requiere un tamaño de muestra de: {final_n} unidades."
-        )
-        
-        if is_finite:
-            summary += f" (Ajustado por población finita N={pop_size})"
+    def _extract_sample(self) -> AnalysisResult:
+        sampling_method = self.params.get("sampling_method", "simple")
+
+        # El muestreo de reservorio recorre los datos por bloques (una sola pasada),
+        # por eso no necesita cargar la población completa en memoria
+        if sampling_method == "reservoir":
+            return self._reservoir_sample()
+
+        population = self._load_population()
+        total_rows = len(population)
+        n_samples = self._resolve_sample_size(total_rows)
+
+        # Validar que no pidamos más datos de los que hay
+        if n_samples > total_rows:
+            n_samples = total_rows
+            summary = f"La muestra calculada excede los datos. Se devolvieron todas las {total_rows} filas."
+        else:
+            summary = None
+
+        strata_col = self.params.get("strata_column")
+        seed = self.params.get("random_state", 42) # random_state para reproducibilidad
+
+        if sampling_method == "simple":
+            # Extracción aleatoria (Random Sampling) [cite: 5356]
+            sample_df = population.sample(n=n_samples, random_state=seed)
+            strata = self._strata_report(population, sample_df)
+            tool_name = "Extracción de Muestra Aleatoria"
+            method_text = "aleatoriamente"
+
+        elif sampling_method == "stratified":
+            if not strata_col or strata_col not in population.columns:
+                raise ValueError("El muestreo estratificado requiere una columna de estratos válida ('strata_column').")
+            sample_df, strata = self._stratified_sample(population, n_samples, strata_col, seed)
+            allocation = self.params.get("allocation", "proportional")
+            tool_name = "Extracción de Muestra Estratificada"
+            method_text = f"por estratos (asignación {'de Neyman' if allocation == 'neyman' else 'proporcional'})"
+
+        elif sampling_method == "systematic":
+            # Muestreo sistemático: 1 de cada k registros, con arranque aleatorio
+            k = max(1, total_rows // n_samples)
+            rng = np.random.default_rng(seed)
+            start = int(rng.integers(k))
+            positions = start + k * np.arange(n_samples)
+            sample_df = population.iloc[positions[positions < total_rows]]
+            strata = self._strata_report(population, sample_df)
+            tool_name = "Extracción de Muestra Sistemática"
+            method_text = f"sistemáticamente (1 de cada {k}, inicio en la posición {start})"
+
+        else:
+            raise ValueError("Método de extracción no válido. Use 'simple', 'stratified', 'systematic' o 'reservoir'.")
+
+        if summary is None:
+            summary = f"Se han seleccionado {method_text} {len(sample_df)} registros de un total de {total_rows}."
 
         return AnalysisResult(
-            tool_name="Cálculo de Tamaño de Muestra",
+            tool_name=tool_name,
             summary=summary,
-            chart_data=[], # No hay gráfico para el cálculo solo
+            chart_data=sample_df.to_dict(orient='records'),
             details={
-                "calculated_n": final_n,
-                "z_score": round(z_score, 4),
-                "formula_used": formula_text,
-                "parameters": self.params
+                "total_population": total_rows,
+                "sample_size": int(len(sample_df)),
+                "sampling_method": sampling_method,
+                "strata": strata
             }
         )
 
-    def _extract_sample(self) -> AnalysisResult:
-        # Si el usuario subió datos y quiere que el sistema elija por él
-        if self.df.empty:
-             raise ValueError("Se requieren datos para extraer una muestra.")
-        
+    def _load_population(self) -> pd.DataFrame:
+        """Devuelve la población: los datos enviados o el CSV 'source_path' de la carpeta de datos."""
+        if not self.df.empty:
+            return self.df
+
+        source_path = self.params.get("source_path")
+        if source_path:
+            return pd.read_csv(resolve_source_path(source_path))
+
+        raise ValueError("Se requieren datos para extraer una muestra.")
+
+    def _iter_population_chunks(self):
+        """Recorre la población en bloques de 'chunk_size' filas sin cargarla completa."""
+        chunk_size = int(self.params.get("chunk_size", 100_000))
+        source_path = self.params.get("source_path")
+
+        if self.df.empty and source_path:
+            yield from pd.read_csv(resolve_source_path(source_path), chunksize=chunk_size)
+        elif not self.df.empty:
+            for start in range(0, len(self.df), chunk_size):
+                yield self.df.iloc[start:start + chunk_size]
+        else:
+            raise ValueError("Se requieren datos para extraer una muestra.")
+
+    def _resolve_sample_size(self, total_rows=None) -> int:
         # Si el usuario especifica 'n', usamos ese, si no, calculamos uno sugerido
         n_samples = self.params.get("n_samples")
-        
+
         if not n_samples:
             # Autocalcular n basado en parámetros por defecto
-            calc_result = self._calculate_sample_size()
-            n_samples = calc_result.details["calculated_n"]
+            pop_size = self.params.get("population_size") or total_rows
+            n_samples, _, _ = self._sample_size_formula(pop_size)
 
-        # Validar que no pidamos más datos de los que hay
-        total_rows = len(self.df)
-        if n_samples > total_rows:
-            n_samples = total_rows
-            summary = f"La muestra calculada excede los datos. Se devolvieron todas las {total_rows} filas."
+        return int(n_samples)
+
+    def _stratified_sample(self, population: pd.DataFrame, n_samples: int, strata_col: str, seed):
+        """
+        Muestreo estratificado con asignación proporcional (n_h = n * N_h / N)
+        o de Neyman (n_h = n * N_h * S_h / Σ N_h * S_h).
+        """
+        allocation = self.params.get("allocation", "proportional")
+        value_col = self.params.get("value_column")
+
+        grouped = population.groupby(strata_col, sort=True)
+        strata_sizes = grouped.size()
+
+        if allocation == "neyman":
+            if not value_col or value_col not in population.columns:
+                raise ValueError("La asignación de Neyman requiere una columna numérica ('value_column') para estimar S_h.")
+            strata_std = grouped[value_col].std(ddof=1).fillna(0.0)
+            weights = strata_sizes * strata_std
+            if weights.sum() == 0:
+                # Sin variabilidad en ningún estrato: equivale a la asignación proporcional
+                weights = strata_sizes.astype(float)
+        elif allocation == "proportional":
+            strata_std = None
+            weights = strata_sizes.astype(float)
         else:
-            summary = f"Se han seleccionado aleatoriamente {n_samples} registros de un total de {total_rows}."
+            raise ValueError("Asignación no válida. Use 'proportional' o 'neyman'.")
+
+        allocated = self._allocate(n_samples, weights.to_numpy(dtype=float), strata_sizes.to_numpy())
+        allocated = pd.Series(allocated, index=strata_sizes.index)
+
+        # Extraemos n_h filas de cada estrato en una sola pasada: barajamos la población
+        # y nos quedamos con las primeras n_h filas de cada estrato
+        shuffled = population.sample(frac=1.0, random_state=seed)
+        rank_in_stratum = shuffled.groupby(strata_col, sort=False).cumcount()
+        quota = shuffled[strata_col].map(allocated)
+        sample_df = shuffled[rank_in_stratum < quota]
+
+        strata = []
+        for stratum, pop_h in strata_sizes.items():
+            std_h = float(strata_std[stratum]) if strata_std is not None else None
+            # Tamaño que la fórmula exigiría si el estrato se estudiara por separado
+            required_h, _, _ = self._sample_size_formula(
+                int(pop_h),
+                std_dev=std_h if self.params.get("variable_type") == "variable" and std_h else None
+            )
+            strata.append({
+                "stratum": stratum,
+                "population": int(pop_h),
+                "std_dev": round(std_h, 4) if std_h is not None else None,
+                "required_n": required_h,
+                "sample_size": int(allocated[stratum])
+            })
+
+        return sample_df, strata
+
+    @staticmethod
+    def _allocate(n_samples: int, weights: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+        """Reparte n entre estratos por restos mayores, sin exceder el tamaño de cada estrato."""
+        n_samples = min(n_samples, int(capacity.sum()))
+        allocated = np.zeros(len(weights), dtype=int)
+        remaining = n_samples
+        active = capacity > 0
+
+        # Si un estrato se satura, su excedente se reparte entre los demás
+        while remaining > 0 and active.any():
+            w = np.where(active, weights, 0.0)
+            if w.sum() == 0:
+                w = active.astype(float)
+            exact = remaining * w / w.sum()
+            share = np.floor(exact).astype(int)
+            leftover = remaining - share.sum()
+            if leftover > 0:
+                share[np.argsort(-(exact - share), kind="stable")[:leftover]] += 1
+            share = np.minimum(share, capacity - allocated)
+            allocated += share
+            remaining = n_samples - allocated.sum()
+            active = allocated < capacity
+
+        return allocated
+
+    def _strata_report(self, population: pd.DataFrame, sample_df: pd.DataFrame) -> list:
+        """Tamaño de muestra obtenido por estrato (si se indicó 'strata_column')."""
+        strata_col = self.params.get("strata_column")
+        if not strata_col or strata_col not in population.columns:
+            return [{"stratum": "Total", "population": int(len(population)), "sample_size": int(len(sample_df))}]
+
+        pop_counts = population[strata_col].value_counts()
+        sample_counts = sample_df[strata_col].value_counts().reindex(pop_counts.index, fill_value=0)
+        return [
+            {"stratum": stratum, "population": int(pop_counts[stratum]), "sample_size": int(sample_counts[stratum])}
+            for stratum in pop_counts.index
+        ]
+
+    def _reservoir_sample(self) -> AnalysisResult:
+        """
+        Muestreo de reservorio (Algoritmo R) en una sola pasada por bloques.
+        Permite muestrear archivos de millones de filas sin cargarlos en memoria.
+        """
+        # N puede ser desconocido: sin 'population_size' la fórmula usa población infinita (conservador)
+        n_samples = self._resolve_sample_size()
+        if n_samples < 1:
+            raise ValueError("El tamaño de muestra debe ser al menos 1.")
+
+        rng = np.random.default_rng(self.params.get("random_state", 42))
+        strata_col = self.params.get("strata_column")
+
+        reservoir = None
+        seen = 0
+        strata_population = pd.Series(dtype="int64")
+
+        for chunk in self._iter_population_chunks():
+            m = len(chunk)
+            if m == 0:
+                continue
+            if strata_col and strata_col in chunk.columns:
+                strata_population = strata_population.add(chunk[strata_col].value_counts(), fill_value=0)
+
+            # a) Llenado inicial del reservorio
+            fill = max(0, min(n_samples - seen, m))
+            if fill:
+                head = chunk.iloc[:fill]
+                reservoir = head if reservoir is None else pd.concat([reservoir, head], ignore_index=True)
+
+            # b) Reemplazo: la fila i (global) entra con probabilidad n / (i + 1)
+            if fill < m:
+                global_pos = seen + np.arange(fill, m)
+                slots = rng.integers(0, global_pos + 1)
+                accepted = np.flatnonzero(slots < n_samples)
+                if accepted.size:
+                    slots = slots[accepted]
+                    # Si dos filas del bloque caen en el mismo espacio, gana la última (como en el recorrido secuencial)
+                    _, last_rev = np.unique(slots[::-1], return_index=True)
+                    winners = accepted.size - 1 - last_rev
+                    replaced = slots[winners]
+                    keep = np.ones(len(reservoir), dtype=bool)
+                    keep[replaced] = False
+                    incoming = chunk.iloc[fill + accepted[winners]]
+                    reservoir = pd.concat([reservoir[keep], incoming], ignore_index=True)
+
+            seen += m
+
+        if reservoir is None:
+            raise ValueError("Se requieren datos para extraer una muestra.")
+
+        # Tamaño requerido con la N ya conocida (corrección por población finita)
+        required_n, _, _ = self._sample_size_formula(seen)
+
+        if strata_col and not strata_population.empty:
+            sample_counts = reservoir[strata_col].value_counts().reindex(strata_population.index, fill_value=0)
+            strata = [
+                {"stratum": stratum, "population": int(strata_population[stratum]), "sample_size": int(sample_counts[stratum])}
+                for stratum in strata_population.index
+            ]
+        else:
+            strata = [{"stratum": "Total", "population": seen, "sample_size": int(len(reservoir))}]
+
+        summary = (
+            f"Se han seleccionado {len(reservoir)} registros mediante muestreo de reservorio "
+            f"en una sola pasada sobre {seen} registros."
+        )
 
-        # Extracción aleatoria (Random Sampling) [cite: 5356]
-        sample_df = self.df.sample(n=n_samples, random_state=42) # random_state para reproducibilidad
-        
         return AnalysisResult(
-            tool_name="Extracción de Muestra Aleatoria",
+            tool_name="Extracción de Muestra (Reservorio)",
             summary=summary,
-            chart_data=sample_df.to_dict(orient='records'),
+            chart_data=reservoir.to_dict(orient='records'),
             details={
-                "total_population": total_rows,
-                "sample_size": n_samples
+                "total_population": seen,
+                "sample_size": int(len(reservoir)),
+                "required_n_finite_population": required_n,
+                "sampling_method": "reservoir",
+                "strata": strata
             }
-        )
\ No newline at end of file
+        )
@@ -1,19 +1,26 @@
 # backend/app/tools/structure_tree.py
-from typing import Dict, Any, List
+import numpy as np
 import pandas as pd
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from app.services.tree_engine import TreeIndex
 
 class StructureTreeTool(SixSigmaTool):
     """
     Herramienta de Diagrama de Árbol (Estructura / CTQ).
     Convierte listas planas en jerarquías visuales.
+    Usa el motor de árboles compartido: soporta cualquier profundidad, detecta ciclos
+    y huérfanos, y agrega 'value' (suma) y 'score' (promedio ponderado por 'weight') por rama.
     Referencias:
     - Libro Yellow Belt, pág 92 (Desglose de Trabajo).
     - Tesis UAP, pág 74 (Árbol CTQ).
     """
 
-    def analyze(self) -> AnalysisResult:
+    def build_index(self):
+        """
+        Construye el índice del árbol y las columnas por nodo (tipo object, listas para JSON).
+        Retorna (tree, fields, rollups). Lo reutiliza la API paginada de árboles.
+        """
         # 1. Validación
         if self.df.empty:
             raise ValueError("Se requieren datos para construir el árbol.")
@@ -27,55 +34,67 @@ class StructureTreeTool(SixSigmaTool):
         if "parent_id" not in self.df.columns:
             self.df["parent_id"] = None
 
-        # 2. Lógica de Construcción de Árbol (Algoritmo Recursivo)
-        nodes = self.df.to_dict(orient="records")
-        tree_map = {node["id"]: {**node, "children": []} for node in nodes}
-        roots = []
+        # 2. Construcción del Árbol (índice padre/hijos iterativo, sin recursión)
+        tree = TreeIndex(self.df["id"], self.df["parent_id"])
+        if tree.cyclic.size:
+            raise ValueError(
+                "Se detectaron referencias circulares entre nodos: "
+                f"{', '.join(tree.ids[tree.cyclic[:10]])}"
+            )
+
+        # 3. Agregados por subárbol (de las hojas hacia la raíz)
+        fields = {col: self.df[col].astype(object).where(self.df[col].notna(), None).to_numpy()
+                  for col in self.df.columns}
+        fields["subtree_size"] = tree.subtree_size.astype(object)
+        rollups = {}
+        if "value" in self.df.columns:
+            values = pd.to_numeric(self.df["value"], errors="coerce").fillna(0.0).to_numpy()
+            fields["rollup_value"] = tree.rollup(values).astype(object)
+            rollups["total_value"] = float(values.sum())
+        if "score" in self.df.columns:
+            weights = (pd.to_numeric(self.df["weight"], errors="coerce").fillna(1.0).to_numpy()
+                       if "weight" in self.df.columns else np.ones(tree.n))
+            scores = pd.to_numeric(self.df["score"], errors="coerce").to_numpy()
+            # Los nodos sin puntaje no pesan en el promedio de su rama
+            weighted = tree.weighted_rollup(scores, np.where(np.isnan(scores), 0.0, weights))
+            fields["rollup_score"] = np.where(np.isnan(weighted), None, np.round(weighted, 4))
+
+        fields["child_count"] = tree.child_count.astype(object)
+        return tree, fields, rollups
 
-        for node in nodes:
-            node_id = node["id"]
-            parent_id = node.get("parent_id")
+    def analyze(self) -> AnalysisResult:
+        tree, fields, rollups = self.build_index()
 
-            # Si tiene padre y el padre existe en el mapa
-            if parent_id and parent_id in tree_map:
-                # Agregamos este nodo a la lista de hijos del padre
-                tree_map[parent_id]["children"].append(tree_map[node_id])
-            else:
-                # Si no tiene padre (o el padre no está en la lista), es una raíz
-                roots.append(tree_map[node_id])
+        # Con 'max_levels' solo se envían los primeros niveles (el resto se expande con /trees/...)
+        max_levels = self.params.get("max_levels")
+        roots = tree.to_nested(fields, max_depth=None if max_levels is None else max(int(max_levels) - 1, 0))
 
-        # 3. Generar Resumen
-        total_nodes = len(nodes)
-        depth = self._calculate_max_depth(roots)
+        # 4. Generar Resumen
+        total_nodes = tree.n
+        depth = tree.max_depth + 1
         root_labels = [r['label'] for r in roots]
-        
+        orphan_ids = tree.ids[tree.orphans].tolist()
+
         summary = (
             f"Se ha estructurado un árbol con {total_nodes} elementos y {depth} niveles de profundidad. "
-            f"Nodos raíz detectados: {', '.join(root_labels)}."
+            f"Nodos raíz detectados: {', '.join(map(str, root_labels[:20]))}"
+            f"{'...' if len(root_labels) > 20 else ''}."
         )
+        if orphan_ids:
+            summary += f" {len(orphan_ids)} nodos apuntan a un padre inexistente y se muestran como raíz."
 
-        # 4. Retorno
-        # Enviamos 'roots' que contiene toda la estructura anidada hacia abajo
+        # 5. Retorno
+        # Enviamos 'roots' que contiene la estructura anidada hacia abajo (completa salvo 'max_levels')
         return AnalysisResult(
             tool_name="Diagrama de Árbol (Estructura/CTQ)",
             summary=summary,
-            chart_data=roots, 
+            chart_data=roots,
             details={
                 "total_nodes": total_nodes,
                 "max_depth": depth,
-                "structure_type": self.params.get("type", "General")
+                "leaves": int((tree.child_count == 0).sum()),
+                "orphan_ids": orphan_ids[:100],
+                "structure_type": self.params.get("type", "General"),
+                **rollups
             }
         )
-
-    def _calculate_max_depth(self, nodes: List[Dict], current_depth=1):
-        """Helper recursivo para saber qué tan profundo es el árbol"""
-        if not nodes:
-            return current_depth - 1
-        
-        max_d = current_depth
-        for node in nodes:
-            if node["children"]:
-                d = self._calculate_max_depth(node["children"], current_depth + 1)
-                if d > max_d:
-                    max_d = d
-        return max_d
\ No newline at end of file
@@ -4,11 +4,18 @@ import numpy as np
 from scipy.stats import norm
 from app.tools.base_tool import SixSigmaTool
 from app.schemas import AnalysisResult
+from app.services import capability
+from app.services.capability import CapabilityStats
 
 class ZBenchTool(SixSigmaTool):
     """
-    Herramienta de Cálculo de Z-Bench (Nivel Sigma) y DPMO.
-    Convierte la tasa de defectos en una métrica Sigma estandarizada.
+    Herramienta de Cálculo de Z-Bench (Nivel Sigma) y DPMO, con Análisis de Capacidad.
+    Convierte la tasa de defectos en una métrica Sigma estandarizada y reporta
+    Cp/Cpk (sigma dentro de subgrupos) y Pp/Ppk (sigma global).
+    - Subgrupos por 'subgroup_column' o 'subgroup_size'; sin subgrupos se usa el rango móvil.
+    - Datos no normales: 'distribution' = 'auto' elige la mejor distribución por Anderson-Darling.
+    - 'previous_stats' (estadísticos suficientes de un análisis anterior) se combina con los datos
+      nuevos; el resultado devuelve los estadísticos actualizados en 'sufficient_stats'.
     Referencias:
     - Tesis UAP, pág 84 (Cálculo de Z del proceso y DPMO).
     - Libro Seis Sigma y sus Aplicaciones, pág 18-19 (Cálculo de probabilidad Z).
@@ -19,66 +26,106 @@ class ZBenchTool(SixSigmaTool):
         if self.df.empty:
             raise ValueError("Se requieren datos numéricos para calcular el Z-Bench.")
 
-        num_col = self.df.select_dtypes(include=['number']).columns[0]
-        data = self.df[num_col].dropna()
-        
+        value_col = self.params.get("value_column")
+        if value_col is None:
+            numeric_cols = self.df.select_dtypes(include=['number']).columns
+            if len(numeric_cols) == 0:
+                raise ValueError("Se requieren datos numéricos para calcular el Z-Bench.")
+            value_col = numeric_cols[0]
+        self.validate_columns([value_col])
+        data = pd.to_numeric(self.df[value_col], errors="coerce")
+        valid = data.notna()
+        values = data[valid].to_numpy(dtype=float)
+
         usl = self.params.get("usl")
         lsl = self.params.get("lsl")
+        target = self.params.get("target")
         shift = self.params.get("shift", 1.5) # El desplazamiento estándar de 1.5 sigma
-        
+
         if usl is None and lsl is None:
             raise ValueError("Debes especificar al menos un límite (USL o LSL).")
+        if usl is not None and lsl is not None and lsl >= usl:
+            raise ValueError("El límite inferior (LSL) debe ser menor que el superior (USL).")
 
-        # 2. Estadísticos del Proceso (Short Term)
-        mean = np.mean(data)
-        std_dev = np.std(data, ddof=1) # Desviación estándar muestral
+        # 2. Estadísticos del Proceso (suficientes y combinables con un análisis anterior)
+        stats_ = CapabilityStats.from_values(values, self._subgroups(valid))
+        previous = self.params.get("previous_stats")
+        if previous:
+            stats_ = CapabilityStats.from_dict(previous).merge(stats_)
+        if stats_.n < 2:
+            raise ValueError("Se requieren al menos 2 datos para calcular la capacidad.")
 
-        # 3. Cálculo de Probabilidades de Defecto
-        prob_below_lsl = 0
-        prob_above_usl = 0
+        mean = stats_.mean
+        std_dev = stats_.std_overall # Desviación estándar muestral (global)
+        sigma_within, sigma_method = stats_.std_within(self.params.get("sigma_method", "auto"))
 
-        if lsl is not None:
-            # Z = (X - Mean) / StdDev
-            z_lsl = (lsl - mean) / std_dev
-            prob_below_lsl = norm.cdf(z_lsl) # Área a la izquierda
+        # 3. Índices de Capacidad (teoría normal)
+        indices = {k: float(v) for k, v in capability.normal_indices(
+            mean, sigma_within, std_dev, lsl, usl, target
+        ).items()}
 
-        if usl is not None:
-            z_usl = (usl - mean) / std_dev
-            prob_above_usl = 1 - norm.cdf(z_usl) # Área a la derecha
+        # Distribución no normal (opcional): se ajusta sobre los datos de esta carga
+        distribution = self.params.get("distribution", "normal")
+        fits = []
+        fitted = None
+        if distribution != "normal":
+            if len(values) < 10:
+                raise ValueError("Se requieren al menos 10 datos para ajustar una distribución no normal.")
+            candidates = None if distribution == "auto" else [distribution]
+            fits = capability.fit_distributions(values, candidates, n_jobs=self.params.get("n_jobs"))
+            if not fits:
+                raise ValueError(f"No se pudo ajustar la distribución '{distribution}' (¿hay valores <= 0?).")
+            best = fits[0]
+            fitted = capability.frozen_distribution(best["distribution"], best["params"])
+            indices.update({k: float(v) for k, v in capability.percentile_indices(fitted, lsl, usl).items()})
 
-        total_defect_rate = prob_below_lsl + prob_above_usl
-        
+        # 4. Cálculo de Z-Bench y Métricas
+        # Z-Bench es el inverso de la normal para la probabilidad de NO defecto
+        total_defect_rate = indices["ppm_total"] / 1_000_000
         # Evitar división por cero o log de cero si el proceso es perfecto
         if total_defect_rate == 0:
             total_defect_rate = 1e-9 # Un valor infinitesimal
 
-        # 4. Cálculo de Z-Bench y Métricas
-        # Z-Bench es el inverso de la normal para la probabilidad de NO defecto (o defecto, según convención)
-        # Usualmente: Z_bench = norm.ppf(1 - total_defect_rate)
-        z_bench_st = norm.ppf(1 - total_defect_rate) # Short Term Z
-        z_bench_lt = z_bench_st - shift              # Long Term Z (Realidad del cliente)
-        
+        z_bench_st = float(capability.z_bench(total_defect_rate)) # Short Term Z
+        z_bench_lt = z_bench_st - shift                           # Long Term Z (Realidad del cliente)
+
         # DPMO (Defectos por Millón de Oportunidades)
         dpmo = total_defect_rate * 1_000_000
-        
+
         # Yield (Rendimiento)
         yield_percentage = (1 - total_defect_rate) * 100
 
         # 5. Interpretación (Nivel Sigma)
         # La escala estándar de "Nivel Sigma" suele referirse al Z Short Term (Zst)
-        sigma_level = z_bench_st 
+        sigma_level = z_bench_st
 
         summary = (
             f"El proceso tiene un Nivel Sigma de {sigma_level:.2f} σ. "
             f"Se esperan {dpmo:,.0f} defectos por millón (DPMO). "
             f"El rendimiento (Yield) es del {yield_percentage:.4f}%."
         )
+        if fitted is None:
+            cpk, ppk = indices["cpk"], indices["ppk"]
+            summary += f" Capacidad: Cpk = {cpk:.2f} (corto plazo), Ppk = {ppk:.2f} (largo plazo)."
+            if cpk < 1.33:
+                summary += " El proceso no es capaz (Cpk < 1.33)."
+        else:
+            summary += (
+                f" Los datos se ajustan mejor a una distribución {fits[0]['distribution']} "
+                f"(AD = {fits[0]['ad_statistic']:.3f}); Ppk por percentiles = {indices['ppk']:.2f}."
+            )
 
-        # 6. Gráfico: Distribución Normal Estándar mostrando el área de defecto
+        # 6. Gráfico: Distribución ajustada mostrando el área de defecto
         # Generamos puntos para dibujar la campana
-        x_axis = np.linspace(mean - 4*std_dev, mean + 4*std_dev, 100)
-        y_axis = norm.pdf(x_axis, mean, std_dev)
-        
+        if fitted is None:
+            x_axis = np.linspace(mean - 4*std_dev, mean + 4*std_dev, 100)
+            y_axis = norm.pdf(x_axis, mean, std_dev)
+        else:
+            low, high = indices["percentile_0135"], indices["percentile_99865"]
+            x_axis = np.linspace(low - 0.1 * (high - low), high + 0.1 * (high - low), 100)
+            # Densidad como derivada numérica de la CDF (sirve para cualquier ajuste)
+            y_axis = np.clip(np.gradient(fitted.cdf(x_axis), x_axis), 0, None)
+
         chart_data = [{"x": float(x), "y": float(y)} for x, y in zip(x_axis, y_axis)]
 
         return AnalysisResult(
@@ -94,6 +141,27 @@ class ZBenchTool(SixSigmaTool):
                 "std_dev": float(round(std_dev, 3)),
 
                 "lsl_limit": lsl,
-                "usl_limit": usl
+                "usl_limit": usl,
+
+                "n": stats_.n,
+                "sigma_within": float(round(sigma_within, 4)),
+                "sigma_within_method": sigma_method,
+                "capability": {k: (None if not np.isfinite(v) else round(v, 4)) for k, v in indices.items()},
+                "distribution": fits[0]["distribution"] if fits else "normal",
+                "distribution_fits": [
+                    {**f, "ad_statistic": round(f["ad_statistic"], 4)} for f in fits
+                ],
+                "sufficient_stats": stats_.to_dict(),
             }
-        )
\ No newline at end of file
+        )
+
+    def _subgroups(self, valid: pd.Series):
+        """Etiqueta de subgrupo por dato: columna 'subgroup_column' o bloques consecutivos de 'subgroup_size'."""
+        subgroup_col = self.params.get("subgroup_column")
+        if subgroup_col is not None:
+            self.validate_columns([subgroup_col])
+            return self.df.loc[valid, subgroup_col].astype(str).to_numpy()
+        size = self.params.get("subgroup_size")
+        if size:
+            return capability.size_subgroups(np.arange(int(valid.sum())), size)
+        return None
@@ -0,0 +1,2 @@
+# backend/conftest.py
+# Permite importar el paquete 'app' al ejecutar pytest desde la carpeta del backend.
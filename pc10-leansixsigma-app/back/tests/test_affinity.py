@@ -0,0 +1,36 @@
+# backend/tests/test_affinity.py
+from app.tools import affinity
+from app.tools.affinity import AffinityTool
+
+NOTES = [
+    "falta capacitación del operador", "capacitación insuficiente en el turno noche",
+    "máquina sin mantenimiento preventivo", "mantenimiento tardío de la prensa",
+    "material defectuoso del proveedor", "proveedor entrega material fuera de especificación",
+]
+
+
+def _vectorizer(notes, **params):
+    tool = AffinityTool([{"text": t} for t in notes], {"project_id": 7, **params})
+    return tool._vectorize()[0]
+
+
+def test_project_vocabulary_reused_when_notes_are_added(monkeypatch):
+    monkeypatch.setattr(affinity, "_VECTORIZER_CACHE", affinity.OrderedDict())
+    first = _vectorizer(NOTES)
+    assert _vectorizer(NOTES + ["capacitación del proveedor"]) is first
+    # Nueva versión de vocabulario: se reajusta
+    assert _vectorizer(NOTES, vocabulary_version=1) is not first
+
+
+def test_project_vocabulary_refit_when_new_notes_are_uncovered(monkeypatch):
+    monkeypatch.setattr(affinity, "_VECTORIZER_CACHE", affinity.OrderedDict())
+    first = _vectorizer(NOTES)
+    other = _vectorizer(["ruido excesivo", "iluminación deficiente", "temperatura alta", "polvo acumulado"])
+    assert other is not first
+    assert "ruido" in other.vocabulary_
+
+
+def test_standard_mode_groups_notes():
+    result = AffinityTool([{"text": t} for t in NOTES], {"num_clusters": 3}).analyze()
+    assert result.details["num_clusters_used"] == 3
+    assert sum(group["count"] for group in result.chart_data) == len(NOTES)
@@ -0,0 +1,20 @@
+# backend/tests/test_balanced_scorecard.py
+import pytest
+from app.tools.balanced_scorecard import BalancedScorecardTool
+
+
+def _series(periods):
+    return [{"perspective": "Financiera", "kpi": "Margen", "target": 10, "actual": 8 + i, "period": p}
+            for i, p in enumerate(periods)]
+
+
+@pytest.mark.parametrize("missing", [None, ""])
+def test_missing_period_raises_value_error(missing):
+    with pytest.raises(ValueError, match="filas sin periodo: 2"):
+        BalancedScorecardTool(_series(["2024-01", missing, "2024-03"]), {}).analyze()
+
+
+def test_series_ordered_by_period():
+    result = BalancedScorecardTool(_series(["2024-01", "2024-02", "2024-03"]), {}).analyze()
+    assert result.details["periods"] == 3
+    assert result.details["last_period"] == "2024-03"
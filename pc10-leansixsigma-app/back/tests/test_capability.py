@@ -0,0 +1,67 @@
+# backend/tests/test_capability.py
+import numpy as np
+import pytest
+from app.services import capability
+from app.services.capability import CapabilityStats
+from app.tools.z_bench import ZBenchTool
+
+
+def _pooled_reference(values, size):
+    blocks = values.reshape(-1, size)
+    return np.sqrt(((blocks - blocks.mean(axis=1, keepdims=True)) ** 2).sum() / (blocks.size - len(blocks)))
+
+
+def test_pooled_sigma_is_stable_with_large_mean():
+    values = np.random.default_rng(0).normal(1e8, 0.01, 500)
+    stats = CapabilityStats.from_values(values, np.arange(500) // 5)
+    sigma, _ = stats.std_within("pooled")
+    assert sigma == pytest.approx(_pooled_reference(values - 1e8, 5), rel=1e-6)
+
+
+def test_zbench_indices_with_large_mean_and_subgroups():
+    values = np.random.default_rng(1).normal(1e8, 0.01, 200)
+    rows = [{"value": float(v)} for v in values]
+    details = ZBenchTool(rows, {"lsl": 1e8 - 0.05, "usl": 1e8 + 0.05, "subgroup_size": 5}).analyze().details
+    sigma = _pooled_reference(values - 1e8, 5)
+    assert details["sigma_within"] == pytest.approx(sigma, abs=1e-4)
+    assert details["capability"]["cp"] == pytest.approx(0.1 / (6 * sigma), rel=1e-3)
+
+
+def test_previous_stats_merge_matches_single_pass():
+    rng = np.random.default_rng(2)
+    values = rng.normal(50, 2, 120)
+    params = {"value_column": "value", "lsl": 44, "usl": 56, "subgroup_size": 4}
+    full = ZBenchTool([{"value": float(v)} for v in values], params).analyze().details
+
+    first = ZBenchTool([{"value": float(v)} for v in values[:60]], params).analyze().details
+    second = ZBenchTool([{"value": float(v)} for v in values[60:]],
+                        {**params, "previous_stats": first["sufficient_stats"]}).analyze().details
+    assert second["n"] == 120
+    for key in ("mean", "std_dev", "sigma_within"):
+        assert second[key] == pytest.approx(full[key], abs=1e-3)
+    assert second["capability"]["cpk"] == pytest.approx(full["capability"]["cpk"], abs=1e-3)
+
+
+def test_merge_joins_moving_range_across_batches():
+    values = np.array([1.0, 3.0, 2.0, 6.0, 5.0])
+    merged = CapabilityStats.from_values(values[:2]).merge(CapabilityStats.from_values(values[2:]))
+    whole = CapabilityStats.from_values(values)
+    assert merged.mr_sum == whole.mr_sum and merged.n_mr == whole.n_mr
+    assert merged.m2 == pytest.approx(whole.m2)
+
+
+def test_non_normal_fit_prefers_lognormal_for_skewed_data():
+    values = np.random.default_rng(3).lognormal(1.0, 0.6, 400)
+    fits = capability.fit_distributions(values, ["normal", "lognormal"])
+    assert fits[0]["distribution"] == "lognormal"
+    rows = [{"value": float(v)} for v in values]
+    details = ZBenchTool(rows, {"usl": 20.0, "distribution": "lognormal"}).analyze().details
+    assert details["distribution"] == "lognormal"
+    dist = capability.frozen_distribution("lognormal", fits[0]["params"])
+    median, upper = dist.median(), dist.ppf(0.99865)
+    assert details["capability"]["ppk"] == pytest.approx((20.0 - median) / (upper - median), abs=1e-3)
+
+
+def test_unknown_distribution_is_rejected():
+    with pytest.raises(ValueError, match="no soportadas"):
+        capability.fit_distributions(np.arange(1.0, 20.0), ["cauchy"])
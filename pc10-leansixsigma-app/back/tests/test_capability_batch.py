@@ -0,0 +1,57 @@
+# backend/tests/test_capability_batch.py
+import numpy as np
+import pytest
+from app.services.capability_batch import batch_capability
+from app.tools.z_bench import ZBenchTool
+
+SPECS = [{"characteristic": "a", "lsl": 5.0, "usl": 15.0}, {"characteristic": "b", "lsl": 0.0, "usl": 40.0}]
+
+
+def _columns():
+    rng = np.random.default_rng(7)
+    a = rng.normal(10, 1.2, 60)
+    b = rng.normal(20, 4.0, 60)
+    a[[3, 4, 17, 30, 41]] = np.nan
+    b[[0, 9, 22]] = np.nan
+    return {"a": a, "b": b}
+
+
+def _wide():
+    cols = _columns()
+    return [{k: (None if np.isnan(cols[k][i]) else float(cols[k][i])) for k in cols} for i in range(60)]
+
+
+def _long():
+    cols = _columns()
+    return [{"ctq": k, "value": None if np.isnan(v) else float(v)} for k in cols for v in cols[k]]
+
+
+def _zbench(name, params):
+    spec = next(s for s in SPECS if s["characteristic"] == name)
+    rows = [{"value": row[name]} for row in _wide()]
+    return ZBenchTool(rows, {"value_column": "value", "lsl": spec["lsl"], "usl": spec["usl"], **params}).analyze().details
+
+
+def _assert_matches_zbench(result, params):
+    by_char = {row["characteristic"]: row for row in result["ranking"]}
+    for name in ("a", "b"):
+        details = _zbench(name, params)
+        assert by_char[name]["sigma_within"] == pytest.approx(details["sigma_within"], abs=1e-4)
+        assert by_char[name]["cpk"] == pytest.approx(details["capability"]["cpk"], abs=1e-4)
+        assert by_char[name]["ppk"] == pytest.approx(details["capability"]["ppk"], abs=1e-4)
+
+
+@pytest.mark.parametrize("params", [{}, {"subgroup_size": 5}])
+def test_wide_format_with_missing_values_matches_zbench(params):
+    _assert_matches_zbench(batch_capability(_wide(), SPECS, params), params)
+
+
+@pytest.mark.parametrize("params", [{}, {"subgroup_size": 5}])
+def test_long_format_with_missing_values_matches_zbench(params):
+    result = batch_capability(_long(), SPECS, {"characteristic_column": "ctq", "value_column": "value", **params})
+    _assert_matches_zbench(result, params)
+
+
+def test_subgroup_size_one_is_rejected():
+    with pytest.raises(ValueError, match="al menos 2"):
+        batch_capability(_wide(), SPECS, {"subgroup_size": 1})
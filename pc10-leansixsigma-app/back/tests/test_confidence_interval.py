@@ -0,0 +1,25 @@
+# backend/tests/test_confidence_interval.py
+import pytest
+from app.tools.confidence_interval import ConfidenceIntervalTool
+
+SINGLETONS = [{"grupo": f"G{i}", "valor": 10.0 + i} for i in range(5)]
+
+
+@pytest.mark.parametrize("params", [
+    {"variable_type": "std"},
+    {"variable_type": "cpk", "lsl": 0, "usl": 30},
+])
+def test_grouped_all_singleton_groups_raise_value_error(params):
+    tool = ConfidenceIntervalTool(SINGLETONS, {"group_column": "grupo", "value_column": "valor", **params})
+    with pytest.raises(ValueError, match="Ningún grupo"):
+        tool.analyze()
+
+
+def test_grouped_mean_skips_singleton_groups():
+    data = SINGLETONS + [{"grupo": "G0", "valor": 12.0}, {"grupo": "G1", "valor": 9.0}]
+    params = {"group_column": "grupo", "value_column": "valor", "variable_type": "std"}
+    result = ConfidenceIntervalTool(data, params).analyze()
+    assert result.details["n_groups"] == 5
+    assert result.details["groups_without_interval"] == 3
+    labels = [row["label"] for row in result.chart_data if row["value"] is not None]
+    assert sorted(labels) == ["G0", "G1"]
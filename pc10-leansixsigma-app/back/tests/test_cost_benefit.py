@@ -0,0 +1,42 @@
+# backend/tests/test_cost_benefit.py
+import pytest
+from app.tools.cost_benefit import CostBenefitTool
+
+MC = {"mode": "monte_carlo", "n_simulations": 20_000, "chunk_size": 5_000, "random_state": 7}
+
+
+def _flows(benefit_mean):
+    return [
+        {"amount": 100, "type": "cost", "period": 0},
+        {"amount": benefit_mean, "type": "benefit", "period": 1, "distribution": "normal", "std_dev": 20},
+    ]
+
+
+def test_median_payback_counts_scenarios_that_never_recover():
+    # P(beneficio >= 100) ≈ 31%: la mayoría de escenarios no recupera la inversión
+    result = CostBenefitTool(_flows(90), MC).analyze()
+    assert result.details["prob_no_payback"] > 0.5
+    assert result.details["payback_percentiles"]["p50"] is None
+    assert result.details["payback_percentiles"]["p5"] is not None
+    assert "no se recupera la inversión" in result.summary
+    assert "Payback mediano" not in result.summary
+
+
+def test_median_payback_when_most_scenarios_recover():
+    result = CostBenefitTool(_flows(130), MC).analyze()
+    assert result.details["prob_no_payback"] < 0.5
+    assert result.details["payback_percentiles"]["p50"] is not None
+    assert "Payback mediano" in result.summary
+    assert result.details["payback_percentiles"]["p95"] is None or result.details["prob_no_payback"] < 0.05
+
+
+def test_negative_period_is_rejected():
+    flows = [{"amount": 100, "type": "cost", "period": 0}, {"amount": 300, "type": "benefit", "period": -1}]
+    with pytest.raises(ValueError, match="periodo de cada flujo debe ser 0 o mayor \\(filas: 2\\)"):
+        CostBenefitTool(flows, MC).analyze()
+
+
+def test_lognormal_requires_positive_amount():
+    flows = _flows(130) + [{"amount": 0, "type": "cost", "period": 1, "distribution": "lognormal", "std_dev": 5}]
+    with pytest.raises(ValueError, match="lognormales requieren un 'amount' mayor a cero \\(filas: 3\\)"):
+        CostBenefitTool(flows, MC).analyze()
@@ -0,0 +1,52 @@
+# backend/tests/test_finance.py
+import math
+import numpy as np
+import pytest
+from app.services import finance
+
+
+def test_npv_and_discount_factors():
+    assert finance.discount_factors(3, 0.1) == pytest.approx([1.0, 1 / 1.1, 1 / 1.21])
+    assert finance.npv([-100, 60, 60], 0.1) == pytest.approx([-100 + 60 / 1.1 + 60 / 1.21])
+    flows = np.array([[-100, 60, 60], [-50, 0, 80]])
+    assert finance.npv(flows, 0.0).tolist() == [20.0, 30.0]
+
+
+def test_irr_closed_form():
+    # -100 + 60x + 60x² = 0 con x = 1 / (1 + r)
+    x = (-1 + math.sqrt(1 + 4 * 100 / 60)) / 2
+    assert finance.irr([-100, 60, 60])[0] == pytest.approx(1 / x - 1, abs=1e-7)
+    assert finance.irr([-100, 110])[0] == pytest.approx(0.10, abs=1e-9)
+    # Retorno negativo (se recupera menos de lo invertido): 40x² + 50x - 100 = 0
+    x = (-50 + math.sqrt(50 ** 2 + 4 * 40 * 100)) / (2 * 40)
+    assert finance.irr([-100, 50, 40])[0] == pytest.approx(1 / x - 1, abs=1e-7)
+
+
+def test_irr_is_a_root_of_npv_for_every_row():
+    rng = np.random.default_rng(1)
+    flows = np.column_stack([-rng.uniform(50, 150, 500), rng.uniform(0, 60, (500, 5))])
+    rates = finance.irr(flows)
+    assert np.isfinite(rates).all()
+    for row, rate in zip(flows[:50], rates[:50]):
+        assert finance.npv(row, rate)[0] == pytest.approx(0.0, abs=1e-5)
+
+
+def test_irr_without_sign_change_is_nan():
+    rates = finance.irr([[100, 50, 50], [-100, -10, 0], [-100, 60, 60]])
+    assert np.isnan(rates[:2]).all()
+    assert np.isfinite(rates[2])
+
+
+def test_irr_bisection_fallback_agrees_with_newton():
+    flows = np.array([[-100, 60, 60, 0], [-100, 20, 30, 70], [-100, 50, 40, 0]], dtype=float)
+    newton = finance.irr(flows)
+    bisection = finance.irr(flows, max_iter=0)
+    assert bisection == pytest.approx(newton, abs=1e-6)
+
+
+def test_payback_period():
+    flows = [[-100, 60, 60], [-100, 10, 10], [50, -10, 0]]
+    paid = finance.payback_period(flows)
+    assert paid[0] == 2 and np.isnan(paid[1]) and paid[2] == 0
+    # Descontado al 20%: 60/1.2 + 60/1.44 = 91.7 < 100, no se recupera
+    assert np.isnan(finance.payback_period([-100, 60, 60], 0.2)[0])
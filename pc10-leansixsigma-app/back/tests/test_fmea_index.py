@@ -0,0 +1,80 @@
+# backend/tests/test_fmea_index.py
+import numpy as np
+import pandas as pd
+import pytest
+from app.services import risk_engine
+from app.services.fmea_index import FmeaIndex
+
+
+def _records(n=300, seed=3):
+    rng = np.random.default_rng(seed)
+    records = []
+    for i in range(n):
+        row = {
+            "function_part": f"F{i % 7}", "failure_mode": f"Modo {i}",
+            "severity": int(rng.integers(1, 11)), "occurrence": int(rng.integers(1, 11)),
+            "detection": int(rng.integers(1, 11)),
+        }
+        row["revised_occurrence"] = int(rng.integers(1, row["occurrence"] + 1)) if i % 3 == 0 else None
+        records.append(row)
+    return records
+
+
+def _recompute(records):
+    scored = risk_engine.score_risks(pd.DataFrame(records))
+    return scored, risk_engine.risk_summary(scored)
+
+
+def _edit_randomly(index, n_edits, seed=11):
+    rng = np.random.default_rng(seed)
+    for _ in range(n_edits):
+        row_id = int(rng.integers(len(index)))
+        field = ["severity", "occurrence", "detection", "revised_occurrence"][int(rng.integers(4))]
+        value = int(rng.integers(1, 11))
+        if field == "revised_occurrence":
+            value = None if rng.random() < 0.3 else min(value, index.records[row_id]["occurrence"])
+        index.update(row_id, {field: value})
+
+
+def test_details_after_edits_match_full_recompute():
+    index = FmeaIndex(_records())
+    # Más ediciones que filas: fuerza al menos una reconstrucción del montículo
+    _edit_randomly(index, 800)
+    scored, summary = _recompute(index.records)
+    details = index.details()
+
+    assert details["total_risk_sum"] == summary["total_risk_sum"]
+    assert details["max_npr"] == summary["max_npr"]
+    assert details["avg_npr"] == pytest.approx(summary["avg_npr"], abs=0.01)
+    assert details["critical_count"] == summary["critical_count"]
+    assert details["category_counts"] == summary["category_counts"]
+    assert details["action_priority_counts"] == summary["action_priority_counts"]
+    assert details["revised_total_risk_sum"] == summary["revised_total_risk_sum"]
+    assert details["total_npr_reduction"] == summary["total_npr_reduction"]
+
+    for row_id in (0, 3, 150, len(index) - 1):
+        row = index.row(row_id)
+        assert row["npr"] == scored["npr"].iloc[row_id]
+        assert row["action_priority"] == scored["action_priority"].iloc[row_id]
+        assert row["risk_category"] == scored["risk_category"].iloc[row_id]
+
+
+def test_top_after_edits_matches_ranking():
+    index = FmeaIndex(_records())
+    _edit_randomly(index, 250, seed=5)
+    scored, _ = _recompute(index.records)
+    expected = risk_engine.rank_risks(scored, "npr").head(25)
+    top = index.top(25)
+    assert [r["row_id"] for r in top] == expected.index.tolist()
+    # Consultar no consume el montículo
+    assert [r["row_id"] for r in index.top(25)] == expected.index.tolist()
+
+
+def test_invalid_edit_leaves_index_unchanged():
+    index = FmeaIndex(_records(20))
+    before = index.details()
+    with pytest.raises(ValueError, match="entero entre 1 y 10"):
+        index.update(4, {"severity": 0})
+    with pytest.raises(KeyError):
+        index.update(20, {"severity": 5})
+    assert index.details() == before
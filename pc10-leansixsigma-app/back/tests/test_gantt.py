@@ -0,0 +1,44 @@
+# backend/tests/test_gantt.py
+from app.tools.gantt import GanttTool
+
+TASKS = [
+    {"task_name": "Medir", "start_date": "2024-01-05", "end_date": "2024-01-09"},   # vie -> mar
+    {"task_name": "Analizar", "start_date": "2024-01-09", "end_date": "2024-01-16"},  # mar -> mar
+]
+
+
+def _durations(result):
+    return {row["name"]: row["duration"] for row in result.chart_data}
+
+
+def test_date_only_schedule_counts_workdays():
+    result = GanttTool(TASKS, {"calendar": "workdays"}).analyze()
+    assert _durations(result) == {"Medir": 2, "Analizar": 5}
+    assert result.details["total_days"] == 7
+    assert result.details["project_end"] == "2024-01-16"
+    assert result.details["calendar"] == "workdays"
+    assert "7 días laborables" in result.summary
+
+
+def test_date_only_schedule_skips_holidays():
+    result = GanttTool(TASKS, {"calendar": "workdays", "holidays": ["2024-01-08"]}).analyze()
+    assert _durations(result) == {"Medir": 1, "Analizar": 5}
+    assert result.details["total_days"] == 6
+
+
+def test_date_only_schedule_defaults_to_calendar_days():
+    result = GanttTool(TASKS, {}).analyze()
+    assert _durations(result) == {"Medir": 4, "Analizar": 7}
+    assert result.details["total_days"] == 11
+
+
+def test_cpm_schedule_places_workdays_on_the_calendar():
+    tasks = [
+        {"task_name": "A", "duration_days": 2, "predecessors": None},
+        {"task_name": "B", "duration_days": 3, "predecessors": "A"},
+    ]
+    result = GanttTool(tasks, {"calendar": "workdays", "project_start": "2024-01-05"}).analyze()
+    by_name = {row["name"]: row for row in result.chart_data}
+    assert by_name["B"]["start"] == "2024-01-09"  # vie + 2 días laborables
+    assert result.details["project_end"] == "2024-01-12"
+    assert result.details["critical_path"] == ["A", "B"]
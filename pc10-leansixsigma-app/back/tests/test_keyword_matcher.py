@@ -0,0 +1,28 @@
+# backend/tests/test_keyword_matcher.py
+import pandas as pd
+from app.services.keyword_matcher import CONTROL_TAXONOMY, KeywordMatcher, build_taxonomy
+
+
+def _classify(texts, taxonomy=CONTROL_TAXONOMY):
+    return KeywordMatcher(taxonomy).classify(pd.Series(texts))
+
+
+def test_inflected_english_forms_match_their_stem():
+    result = _classify(["Testing manual", "Parts tested at end of line", "Sensors on the press"])
+    assert result["primary_type"].tolist() == ["Inspección", "Inspección", "Automático"]
+    assert result.loc[0, "matched_keywords"] == ["test"]
+    assert result.loc[2, "matched_keywords"] == ["sensor"]
+
+
+def test_spanish_plurals_and_separators():
+    result = _classify(["Inspecciones visuales", "Poka-yoke y cámaras"])
+    assert result.loc[0, "primary_type"] == "Inspección"
+    assert result.loc[1, "control_types"] == ["Prueba de error", "Automático"]
+    assert result.loc[1, "category"] == "Preventivo"
+
+
+def test_word_boundaries_still_apply_inside_other_words():
+    taxonomy = build_taxonomy({"Fijo": {"category": "Preventivo", "keywords": ["pin"]}}, merge=False)
+    result = _classify(["Spinning wheel", "Pins on fixture", None], taxonomy)
+    assert result["primary_type"].isna().tolist() == [True, False, True]
+    assert result.loc[1, "primary_type"] == "Fijo"
@@ -0,0 +1,58 @@
+# backend/tests/test_qfd.py
+import numpy as np
+import pytest
+from app.tools.qfd import QfdTool
+
+HOWS = ["Torque", "Peso", "Costo"]
+WHATS = [
+    {"customer_req": "Potente", "weight": 5, "relationships": {"Torque": 9, "Peso": 1}},
+    {"customer_req": "Liviano", "weight": 3, "relationships": {"Peso": 9, "Costo": 3}},
+    {"customer_req": "Barato", "weight": 4, "relationships": {"Costo": 9, "Torque": 3}},
+]
+HOUSES = [
+    {"name": "Partes", "technical_reqs": ["Motor", "Carcasa"],
+     "relationships": {"Torque": {"Motor": 9}, "Peso": {"Carcasa": 9, "Motor": 3}, "Costo": {"Motor": 1, "Carcasa": 3}}},
+    {"name": "Proceso", "technical_reqs": ["Bobinado", "Inyección"],
+     "relationships": {"Motor": {"Bobinado": 9, "Inyección": 1}, "Carcasa": {"Inyección": 9}}},
+]
+
+
+def _relative(weights, matrix):
+    absolute = np.asarray(weights, dtype=float) @ np.asarray(matrix, dtype=float)
+    return absolute / absolute.sum() * 100
+
+
+def test_roof_symbols_conflicts_and_symmetry():
+    correlations = [
+        {"tech_a": "Torque", "tech_b": "Peso", "value": "--"},
+        {"tech_a": "Peso", "tech_b": "Costo", "value": "+"},
+        {"tech_a": "Torque", "tech_b": "Costo", "value": -3},
+    ]
+    roof = QfdTool(WHATS, {"technical_reqs": HOWS, "correlations": correlations}).analyze().details["correlation_roof"]
+    assert roof["matrix"] == [[0, -9, -3], [-9, 0, 3], [-3, 3, 0]]
+    assert [(c["tech_a"], c["tech_b"], c["value"]) for c in roof["conflicts"]] == [
+        ("Torque", "Peso", -9), ("Torque", "Costo", -3)
+    ]
+    assert roof["synergy_count"] == 1
+    assert roof["conflict_count_by_tech"] == {"Torque": 2, "Peso": 1, "Costo": 1}
+
+
+def test_roof_rejects_unknown_hows():
+    with pytest.raises(ValueError, match="CÓMOs inexistentes: Torque / Ruido"):
+        QfdTool(WHATS, {"technical_reqs": HOWS, "correlations": [{"tech_a": "Torque", "tech_b": "Ruido", "value": 3}]}).analyze()
+
+
+def test_cascade_propagates_unrounded_weights():
+    result = QfdTool(WHATS, {"technical_reqs": HOWS, "houses": HOUSES}).analyze()
+    first = _relative([5, 3, 4], [[9, 1, 0], [0, 9, 3], [3, 0, 9]])
+    second = _relative(first, [[9, 0], [3, 9], [1, 3]])
+    third = _relative(second, [[9, 1], [0, 9]])
+
+    assert [row["relative_score"] for row in result.chart_data] == np.round(np.sort(first)[::-1], 1).tolist()
+    partes, proceso = result.details["cascade"]
+    assert partes["whats"] == HOWS and proceso["whats"] == ["Motor", "Carcasa"]
+    scores = {row["technical_req"]: row for row in proceso["ranking"]}
+    assert scores["Bobinado"]["relative_score"] == round(third[0], 1)
+    # Puntaje absoluto de la última casa calculado con los pesos exactos (sin redondeo intermedio)
+    assert scores["Bobinado"]["absolute_score"] == round(9 * second[0], 2)
+    assert "el elemento prioritario de 'Proceso'" in result.summary
@@ -0,0 +1,53 @@
+# backend/tests/test_radar.py
+import pytest
+from app.tools.radar import RadarTool
+
+CATEGORIES = ["Orden", "Limpieza", "Seguridad"]
+SCORES = {1: [4, 5, 3], 2: [2, 3, 1], 3: [5, 4, 4]}
+
+
+def _fleet(target_without_entity=True):
+    rows = [{"entity": e, "category": c, "value": v, "series": "Actual"}
+            for e, values in SCORES.items() for c, v in zip(CATEGORIES, values)]
+    rows += [{"entity": None if target_without_entity else e, "category": c, "value": 4, "series": "Meta"}
+             for e in ([None] if target_without_entity else SCORES) for c in CATEGORIES]
+    return rows
+
+
+def test_integer_entities_keep_their_type_with_common_target():
+    result = RadarTool(_fleet(), {"target_series": "Meta"}).analyze()
+    entities = [row["entity"] for row in result.chart_data]
+    assert entities == [2, 1, 3]  # peor puntaje primero
+    assert all(type(e) is int for e in entities)
+    assert "peor desempeño es '2'" in result.summary
+    assert result.chart_data[0]["target"] == [4.0, 4.0, 4.0]
+
+
+def test_fleet_average_and_ranks():
+    result = RadarTool(_fleet(False), {"target_series": "Meta", "sort_by": "entity"}).analyze()
+    categories = result.details["categories"]
+    assert categories == sorted(CATEGORIES)
+    expected_avg = [sum(SCORES[e][CATEGORIES.index(c)] for e in SCORES) / 3 for c in categories]
+    assert result.details["fleet_average"] == pytest.approx(expected_avg, abs=1e-4)
+    by_entity = {row["entity"]: row for row in result.chart_data}
+    assert by_entity[3]["rank"] == 1 and by_entity[2]["rank"] == 3
+    assert by_entity[2]["worst_categories"][0]["gap"] == -3.0
+
+
+def test_gap_sort_requires_target_series():
+    with pytest.raises(ValueError, match="target_series"):
+        RadarTool(_fleet(False), {"sort_by": "gap"}).analyze()
+
+
+def test_paging():
+    result = RadarTool(_fleet(), {"target_series": "Meta", "page": 2, "page_size": 2}).analyze()
+    assert len(result.chart_data) == 1
+    assert result.details["total_pages"] == 2 and result.details["has_more"] is False
+
+
+def test_two_series_mode_unchanged():
+    data = [{"category": c, "value": v, "series": s}
+            for s, values in [("A", [3, 4, 5]), ("B", [5, 2, 4])] for c, v in zip(["Orden", "Limpieza", "Seiri"], values)]
+    result = RadarTool(data, {}).analyze()
+    assert result.chart_data[0] == {"category": "Limpieza", "A": 4.0, "B": 2.0}
+    assert "'Limpieza' con una diferencia de 2.00" in result.summary
@@ -0,0 +1,75 @@
+# backend/tests/test_recommender.py
+import threading
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+from app.api import analysis_routes
+from app.core.database import get_session
+from app.services.recommender import ToolRecommender, default_knowledge
+
+
+@pytest.fixture
+def recommender(tmp_path):
+    return ToolRecommender(knowledge_base=default_knowledge(), index_path=tmp_path / "index.joblib")
+
+
+def test_upsert_and_remove_publish_a_new_index(recommender):
+    before = recommender.index
+    recommender.upsert_tool({"id": "nueva", "name": "Nueva", "phases": ["M"], "desc": "medición de tiempos de ciclo"})
+    after = recommender.index
+    assert after is not before
+    assert len(before["entries"]) == before["matrix"].shape[0] == before["phase_mask"].shape[0]
+    assert after["matrix"].shape[0] == len(after["entries"]) == len(before["entries"]) + 1
+    assert recommender.recommend("Measure", "tiempos de ciclo")[0]["id"] == "nueva"
+
+    recommender.remove_tool("nueva")
+    assert not recommender.has_tool("nueva")
+    assert recommender.index["phase_mask"].shape[0] == recommender.index["matrix"].shape[0]
+
+
+def test_recommend_during_concurrent_edits(recommender):
+    errors, stop = [], threading.Event()
+
+    def edit():
+        for i in range(60):
+            recommender.upsert_tool({"id": f"t{i}", "name": f"T{i}", "phases": ["A"], "desc": f"causa raíz número {i}"})
+            if i % 3 == 0:
+                recommender.remove_tool(f"t{i}")
+        stop.set()
+
+    def query():
+        while not stop.is_set():
+            try:
+                recommender.recommend_batch("Analyze", ["causa raíz del defecto", "variación del proceso"])
+            except Exception as e:  # pragma: no cover - solo falla si hay una condición de carrera
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=edit)] + [threading.Thread(target=query) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+
+def test_feedback_rejects_unknown_tool(recommender, monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+
+    def session_override():
+        with Session(engine) as session:
+            yield session
+
+    monkeypatch.setattr(analysis_routes, "recommender", recommender)
+    app = FastAPI()
+    app.include_router(analysis_routes.router, prefix="/api/v1")
+    app.dependency_overrides[get_session] = session_override
+    client = TestClient(app)
+
+    response = client.post("/api/v1/recommend/feedback", json={"phase": "Define", "tool_id": "no_existe"})
+    assert response.status_code == 404
+    response = client.post("/api/v1/recommend/feedback", json={"phase": "Define", "tool_id": "gantt"})
+    assert response.status_code == 200
@@ -0,0 +1,56 @@
+# backend/tests/test_risk_engine.py
+import numpy as np
+import pandas as pd
+import pytest
+from app.services import risk_engine
+from app.services.risk_engine import AP_TABLE, action_priority
+
+
+@pytest.mark.parametrize("s, o, d, expected", [
+    # Celdas del manual AIAG-VDA 2019 (S, O, D -> AP)
+    (10, 10, 1, "H"), (9, 6, 1, "H"), (9, 4, 1, "M"), (9, 4, 2, "H"),
+    (10, 2, 4, "L"), (10, 3, 5, "M"), (10, 2, 7, "H"), (9, 1, 10, "L"),
+    (8, 8, 1, "H"), (7, 6, 1, "M"), (7, 7, 2, "H"), (8, 5, 4, "M"), (7, 4, 7, "H"),
+    (8, 3, 4, "L"), (7, 2, 5, "M"),
+    (6, 8, 4, "M"), (4, 9, 5, "H"), (5, 7, 1, "L"), (6, 6, 10, "M"),
+    (4, 5, 6, "L"), (6, 4, 7, "M"), (6, 3, 10, "L"),
+    (3, 8, 4, "L"), (2, 10, 5, "M"), (3, 7, 10, "L"),
+    (1, 10, 10, "L"),
+])
+def test_action_priority_matches_handbook(s, o, d, expected):
+    assert action_priority(s, o, d) == expected
+
+
+def test_ap_table_shape_and_monotonic():
+    assert AP_TABLE.shape == (10, 10, 10)
+    # Empeorar cualquier calificación nunca baja la prioridad
+    for axis in range(3):
+        assert (np.diff(AP_TABLE.astype(int), axis=axis) >= 0).all()
+
+
+def test_action_priority_is_vectorized():
+    s = np.array([10, 7, 1])
+    o = np.array([10, 4, 10])
+    d = np.array([10, 1, 10])
+    assert action_priority(s, o, d).tolist() == ["H", "M", "L"]
+
+
+def test_score_risks_with_partial_revision():
+    df = pd.DataFrame({
+        "severity": [8, 5], "occurrence": [6, 2], "detection": [5, 3],
+        "revised_occurrence": [2, None],
+    })
+    scored = risk_engine.score_risks(df)
+    assert scored["npr"].tolist() == [240, 30]
+    assert scored["risk_category"].tolist() == ["Crítico", "Bajo"]
+    assert scored["revised_npr"].tolist() == [80, 30]
+    assert scored["revised_action_priority"].tolist() == ["M", "L"]
+    summary = risk_engine.risk_summary(scored)
+    assert summary["total_npr_reduction"] == 160
+    assert summary["high_priority_unresolved"] == 0
+
+
+def test_invalid_rating_reports_row():
+    df = pd.DataFrame({"severity": [5, 11], "occurrence": [1, 1], "detection": [1, 1]})
+    with pytest.raises(ValueError, match="fila 2"):
+        risk_engine.score_risks(df)
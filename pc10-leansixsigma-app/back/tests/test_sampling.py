@@ -0,0 +1,36 @@
+# backend/tests/test_sampling.py
+import pandas as pd
+import pytest
+from app.tools.sampling import DATA_DIR_ENV, SamplingTool
+
+EXTRACTION = {"method": "extraction", "n_samples": 5, "random_state": 1}
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    folder = tmp_path / "datos"
+    folder.mkdir()
+    pd.DataFrame({"id": range(100), "turno": ["A", "B"] * 50}).to_csv(folder / "poblacion.csv", index=False)
+    (tmp_path / "secreto.csv").write_text("clave\nxyz\n")
+    monkeypatch.setenv(DATA_DIR_ENV, str(folder))
+    return folder
+
+
+def test_source_path_rejected_without_data_dir(monkeypatch):
+    monkeypatch.delenv(DATA_DIR_ENV, raising=False)
+    with pytest.raises(ValueError, match="no está habilitada"):
+        SamplingTool([], {**EXTRACTION, "source_path": "/etc/passwd"}).analyze()
+
+
+@pytest.mark.parametrize("path", ["../secreto.csv", "/etc/passwd", "no_existe.csv"])
+def test_source_path_outside_data_dir(data_dir, path):
+    with pytest.raises(ValueError, match="no existe en la carpeta"):
+        SamplingTool([], {**EXTRACTION, "source_path": path}).analyze()
+
+
+@pytest.mark.parametrize("sampling_method", ["simple", "reservoir"])
+def test_source_path_inside_data_dir(data_dir, sampling_method):
+    params = {**EXTRACTION, "sampling_method": sampling_method, "source_path": "poblacion.csv", "chunk_size": 30}
+    result = SamplingTool([], params).analyze()
+    assert len(result.chart_data) == 5
+    assert result.details["total_population"] == 100
@@ -0,0 +1,41 @@
+# backend/tests/test_scheduling.py
+import numpy as np
+import pandas as pd
+import pytest
+from app.services import scheduling
+from app.services.graph import CycleError
+
+# A(3) -> B(2) -> D(4); A -> C(1) -> D; D -> E(2)
+TASKS = pd.Index(["A", "B", "C", "D", "E"])
+PREDS = pd.Series([None, "A", "A", "B, C", ["D"]])
+DURATIONS = np.array([3, 2, 1, 4, 2], dtype=float)
+
+
+def test_critical_path_forward_and_backward_pass():
+    src, dst = scheduling.parse_predecessors(TASKS, PREDS)
+    cpm = scheduling.critical_path(DURATIONS, src, dst)
+    assert cpm["project_duration"] == 11
+    assert cpm["es"].tolist() == [0, 3, 3, 5, 9]
+    assert cpm["lf"].tolist() == [3, 5, 5, 9, 11]
+    assert cpm["slack"].tolist() == [0, 0, 1, 0, 0]
+    assert [TASKS[i] for i in cpm["critical_path"]] == ["A", "B", "D", "E"]
+
+
+def test_unknown_predecessor_and_cycle_are_rejected():
+    with pytest.raises(ValueError, match="Predecesoras inexistentes: Z"):
+        scheduling.parse_predecessors(TASKS, pd.Series([None, "A", "Z", "B", "D"]))
+    src, dst = scheduling.parse_predecessors(TASKS, pd.Series(["E", "A", "A", "B", "D"]))
+    with pytest.raises(CycleError):
+        scheduling.critical_path(DURATIONS, src, dst)
+
+
+def test_serial_sgs_levels_a_single_resource():
+    src, dst = scheduling.parse_predecessors(TASKS, PREDS)
+    cpm = scheduling.critical_path(DURATIONS, src, dst)
+    # B y C compiten por el mismo recurso de capacidad 1: C se corre detrás de B
+    resources = np.array([-1, 0, 0, -1, -1])
+    demand = np.array([0, 1, 1, 0, 0])
+    result = scheduling.serial_sgs(DURATIONS, src, dst, resources, demand, np.array([1]), cpm["ls"].tolist())
+    assert result["start"].tolist() == [0, 3, 5, 6, 10]
+    assert result["makespan"] == 12
+    assert result["usage"][0].max() == 1
@@ -0,0 +1,21 @@
+# backend/tests/test_text_pipeline.py
+import pandas as pd
+from app.services import text_pipeline
+from app.services.text_pipeline import tokenize
+
+
+def test_tokenize_normalizes_accents():
+    tokens = tokenize(pd.Series(["Capacitación del Operador", None]))
+    assert tokens.iloc[0] == ("capacitacion", "del", "operador")
+    assert tokens.iloc[1] == ()
+
+
+def test_token_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(text_pipeline, "_TOKEN_CACHE", text_pipeline.OrderedDict())
+    monkeypatch.setattr(text_pipeline, "_TOKEN_CACHE_SIZE", 2)
+    tokenize(pd.Series(["uno"]))
+    tokenize(pd.Series(["dos"]))
+    tokenize(pd.Series(["uno"]))   # acierto: 'uno' pasa a ser el más reciente
+    tokenize(pd.Series(["tres"]))  # se descarta 'dos', no 'uno'
+    cached = set(text_pipeline._TOKEN_CACHE.values())
+    assert cached == {("uno",), ("tres",)}
@@ -0,0 +1,45 @@
+# backend/tests/test_tree_engine.py
+from app.services.tree_engine import TreeIndex
+from app.tools.cost_tree import CostTreeTool
+from app.tools.structure_tree import StructureTreeTool
+
+INT_TREE = [
+    {"id": 1, "parent_id": None, "label": "Raíz"},
+    {"id": 2, "parent_id": 1, "label": "A"},
+    {"id": 3, "parent_id": 2, "label": "B"},
+]
+
+
+def test_integer_ids_with_null_root_parent():
+    # La columna parent_id queda como float (NaN, 1.0, 2.0): debe coincidir con los IDs enteros
+    tool = StructureTreeTool(INT_TREE, {})
+    tree = TreeIndex(tool.df["id"], tool.df["parent_id"])
+    assert tree.orphans.size == 0
+    assert tree.max_depth == 2
+    assert list(tree.ids) == ["1", "2", "3"]
+    assert tree.roots.tolist() == [0]
+
+
+def test_structure_tree_reports_depth_with_integer_ids():
+    result = StructureTreeTool(INT_TREE, {}).analyze()
+    assert "3 niveles" in result.summary
+    assert "inexistente" not in result.summary
+
+
+def test_cost_tree_hierarchical_integer_ids():
+    data = [
+        {"id": 1, "parent_id": None, "description": "Planta", "amount": 0, "category": "Interna"},
+        {"id": 2, "parent_id": 1, "description": "Línea", "amount": 100},
+        {"id": 3, "parent_id": 2, "description": "Scrap", "amount": 50},
+    ]
+    tool = CostTreeTool(data, {})
+    tool._prepare()
+    assert tool._tree.orphans.size == 0
+    assert tool._tree.max_depth == 2
+    assert tool.df["category"].tolist() == ["Interna"] * 3
+
+
+def test_string_and_float_ids_are_preserved():
+    tree = TreeIndex(["a", "1.5", "b"], [None, "a", "a"])
+    assert list(tree.ids) == ["a", "1.5", "b"]
+    assert tree.parent.tolist() == [-1, 0, 0]
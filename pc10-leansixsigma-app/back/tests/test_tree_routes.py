@@ -0,0 +1,76 @@
+# backend/tests/test_tree_routes.py
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+from app.api import tree_routes
+from app.core.database import get_session
+from app.domain.models import Dataset, Project
+
+NODES = [
+    {"id": 1, "parent_id": None, "label": "Planta", "value": 0},
+    {"id": 2, "parent_id": 1, "label": "Línea", "value": 5},
+    {"id": 3, "parent_id": 2, "label": "Estación", "value": 7},
+]
+
+
+@pytest.fixture
+def client_and_db(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        project = Project(name="Piloto")
+        db.add(project)
+        db.commit()
+        dataset = Dataset(project_id=project.id, name="árbol", raw_data=NODES)
+        db.add(dataset)
+        db.commit()
+        db.refresh(dataset)
+        dataset_id = dataset.id
+
+    def session_override():
+        with Session(engine) as session:
+            yield session
+
+    monkeypatch.setattr(tree_routes, "tree_store", tree_routes.TreeStore(max_trees=1))
+    app = FastAPI()
+    app.include_router(tree_routes.router, prefix="/api/v1")
+    app.dependency_overrides[get_session] = session_override
+    return TestClient(app), engine, dataset_id
+
+
+def _evict(client):
+    # Con max_trees=1, construir otro árbol descarta el del Dataset
+    client.post("/api/v1/trees", json={"tool_name": "structure_tree", "data": NODES})
+
+
+def test_rebuild_after_eviction_reuses_build_parameters(client_and_db):
+    client, _, dataset_id = client_and_db
+    params = {"type": "CTQ"}
+    created = client.post("/api/v1/trees", json={"tool_name": "structure_tree", "dataset_id": dataset_id,
+                                                 "parameters": params}).json()
+    tree_id = created["tree_id"]
+    assert created["max_depth"] == 3
+    _evict(client)
+    assert tree_routes.tree_store.get(tree_id) is None
+
+    response = client.get(f"/api/v1/trees/{tree_id}")
+    assert response.status_code == 200
+    assert response.json()["nodes"][0]["rollup_value"] == 12
+    assert tree_routes.tree_store.get(tree_id).params == params
+
+
+def test_rebuild_with_invalid_data_returns_400(client_and_db):
+    client, engine, dataset_id = client_and_db
+    tree_id = client.post("/api/v1/trees", json={"tool_name": "structure_tree", "dataset_id": dataset_id}).json()["tree_id"]
+    _evict(client)
+    with Session(engine) as db:
+        dataset = db.get(Dataset, dataset_id)
+        dataset.raw_data = [{"id": 1, "parent_id": 2, "label": "A"}, {"id": 2, "parent_id": 1, "label": "B"}]
+        db.add(dataset)
+        db.commit()
+
+    response = client.get(f"/api/v1/trees/{tree_id}")
+    assert response.status_code == 400
+    assert "circulares" in response.json()["detail"]
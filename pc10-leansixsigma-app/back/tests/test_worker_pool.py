@@ -0,0 +1,25 @@
+# backend/tests/test_worker_pool.py
+import numpy as np
+import pytest
+from app.services import bootstrap, capability, worker_pool
+
+
+def test_large_n_jobs_reuses_the_bounded_shared_pool():
+    data = np.random.default_rng(0).normal(10, 2, 200)
+    statistic = bootstrap.get_statistic("mean")
+    serial = bootstrap.bootstrap_distribution(data, statistic, n_resamples=4000, random_state=1, n_jobs=1)
+    parallel = bootstrap.bootstrap_distribution(data, statistic, n_resamples=4000, random_state=1, n_jobs=500)
+    assert parallel == pytest.approx(serial)
+    pool = worker_pool._POOL
+    assert pool is not None and pool._max_workers <= worker_pool.MAX_WORKERS
+
+    values = np.random.default_rng(1).lognormal(1.0, 0.5, 300)
+    fits = capability.fit_distributions(values, ["normal", "lognormal", "gamma"], n_jobs=500)
+    assert [f["distribution"] for f in fits] == [f["distribution"] for f in capability.fit_distributions(
+        values, ["normal", "lognormal", "gamma"])]
+    # Ningún llamado crea un pool nuevo
+    assert worker_pool._POOL is pool
+
+
+def test_run_tasks_keeps_task_order():
+    assert worker_pool.run_tasks(pow, [(2, k) for k in range(10)], n_jobs=3) == [2 ** k for k in range(10)]